@@ -0,0 +1,121 @@
+# Copyright (c) 2018, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/quaternion/blob/master/LICENSE>
+
+# Cython declarations for the quaternion kernels
+#
+# Use these with `cimport quaternion`, add `quaternion.get_include()` to the include directories of the extension, and
+# call `quaternion.import_quaternion()` once at module level before using any of the functions.  The kernels work on
+# plain C structs, and do not need the GIL.
+
+cdef extern from "quaternion_api.h":
+    ctypedef struct quaternion:
+        double w
+        double x
+        double y
+        double z
+
+    int import_quaternion() except -1
+
+    ctypedef struct PyQuaternion:
+        quaternion obval
+    bint PyQuaternion_Check(object o)
+    quaternion PyQuaternion_AsQuaternion(object o)
+    object PyQuaternion_FromQuaternion(quaternion q)
+    int NPY_QUATERNION
+
+    # Compiled into `quaternion.numpy_quaternion`, and called through its C API
+    quaternion quaternion_create_from_spherical_coords(double vartheta, double varphi) nogil
+    quaternion quaternion_create_from_euler_angles(double alpha, double beta, double gamma) nogil
+    quaternion quaternion_sqrt(quaternion q) nogil
+    quaternion quaternion_log(quaternion q) nogil
+    quaternion quaternion_exp(quaternion q) nogil
+    quaternion quaternion_scalar_power(double s, quaternion q) nogil
+
+    # Unary bool returners
+    bint quaternion_isnan(quaternion q) nogil
+    bint quaternion_nonzero(quaternion q) nogil
+    bint quaternion_isinf(quaternion q) nogil
+    bint quaternion_isfinite(quaternion q) nogil
+
+    # Binary bool returners
+    bint quaternion_equal(quaternion q1, quaternion q2) nogil
+    bint quaternion_not_equal(quaternion q1, quaternion q2) nogil
+    bint quaternion_less(quaternion q1, quaternion q2) nogil
+    bint quaternion_greater(quaternion q1, quaternion q2) nogil
+    bint quaternion_less_equal(quaternion q1, quaternion q2) nogil
+    bint quaternion_greater_equal(quaternion q1, quaternion q2) nogil
+    bint quaternion_isclose(quaternion q1, quaternion q2, double rtol, double atol, bint equal_nan) nogil
+
+    # Unary float returners
+    double quaternion_norm(quaternion q) nogil
+    double quaternion_absolute(quaternion q) nogil
+    double quaternion_angle(quaternion q) nogil
+
+    # Unary quaternion returners
+    quaternion quaternion_normalized(quaternion q) nogil
+    quaternion quaternion_negative(quaternion q) nogil
+    quaternion quaternion_conjugate(quaternion q) nogil
+    quaternion quaternion_inverse(quaternion q) nogil
+    quaternion quaternion_x_parity_conjugate(quaternion q) nogil
+    quaternion quaternion_y_parity_conjugate(quaternion q) nogil
+    quaternion quaternion_z_parity_conjugate(quaternion q) nogil
+    quaternion quaternion_parity_conjugate(quaternion q) nogil
+    quaternion quaternion_exp_approx(quaternion q) nogil
+    quaternion quaternion_log_approx(quaternion q) nogil
+
+    # Rotation of 3-vectors
+    void quaternion_rotate_vector(quaternion q, double *v, double *vprime) nogil
+    void quaternion_rotate_vector_and_normalize(quaternion q, double *v, double *vprime) nogil
+
+    # Binary quaternion returners
+    quaternion quaternion_add(quaternion q1, quaternion q2) nogil
+    quaternion quaternion_subtract(quaternion q1, quaternion q2) nogil
+    quaternion quaternion_multiply(quaternion q1, quaternion q2) nogil
+    quaternion quaternion_divide(quaternion q1, quaternion q2) nogil
+    quaternion quaternion_power(quaternion q, quaternion p) nogil
+    quaternion quaternion_copysign(quaternion q1, quaternion q2) nogil
+    quaternion quaternion_scalar_add(double s, quaternion q) nogil
+    quaternion quaternion_add_scalar(quaternion q, double s) nogil
+    quaternion quaternion_scalar_subtract(double s, quaternion q) nogil
+    quaternion quaternion_subtract_scalar(quaternion q, double s) nogil
+    quaternion quaternion_scalar_multiply(double s, quaternion q) nogil
+    quaternion quaternion_multiply_scalar(quaternion q, double s) nogil
+    quaternion quaternion_scalar_divide(double s, quaternion q) nogil
+    quaternion quaternion_divide_scalar(quaternion q, double s) nogil
+    quaternion quaternion_power_scalar(quaternion q, double s) nogil
+
+    # Distances
+    double quaternion_rotor_intrinsic_distance(quaternion q1, quaternion q2) nogil
+    double quaternion_rotor_chordal_distance(quaternion q1, quaternion q2) nogil
+    double quaternion_rotation_intrinsic_distance(quaternion q1, quaternion q2) nogil
+    double quaternion_rotation_chordal_distance(quaternion q1, quaternion q2) nogil
+    quaternion quaternion_hemisphere_canonicalized(quaternion q, quaternion reference) nogil
+
+    # Interpolation
+    quaternion slerp(quaternion q1, quaternion q2, double tau) nogil
+    quaternion slerp_approx(quaternion q1, quaternion q2, double tau) nogil
+    quaternion slerp_adaptive(quaternion q1, quaternion q2, double tau, double threshold) nogil
+    quaternion nlerp(quaternion q1, quaternion q2, double tau) nogil
+    quaternion squad_evaluate(double tau_i, quaternion q_i, quaternion a_i, quaternion b_ip1,
+                              quaternion q_ip1) nogil
+    quaternion squad_evaluate_approx(double tau_i, quaternion q_i, quaternion a_i, quaternion b_ip1,
+                                     quaternion q_ip1) nogil
+    quaternion squad_evaluate_adaptive(double tau_i, quaternion q_i, quaternion a_i, quaternion b_ip1,
+                                       quaternion q_ip1, double threshold) nogil
+
+    # Dual quaternions r + eps*d, representing rigid transformations
+    ctypedef struct dual_quaternion:
+        quaternion r
+        quaternion d
+    bint dual_quaternion_isnan(dual_quaternion q) nogil
+    bint dual_quaternion_isfinite(dual_quaternion q) nogil
+    bint dual_quaternion_equal(dual_quaternion q1, dual_quaternion q2) nogil
+    dual_quaternion dual_quaternion_conjugate(dual_quaternion q) nogil
+    dual_quaternion dual_quaternion_inverse(dual_quaternion q) nogil
+    dual_quaternion dual_quaternion_normalized(dual_quaternion q) nogil
+    dual_quaternion dual_quaternion_multiply(dual_quaternion q1, dual_quaternion q2) nogil
+    dual_quaternion dual_quaternion_from_rotation_and_translation(quaternion R, double *t) nogil
+    void dual_quaternion_translation(dual_quaternion q, double *t) nogil
+    void dual_quaternion_transform_point(dual_quaternion q, double *v, double *vprime) nogil
+    dual_quaternion dual_quaternion_power_scalar(dual_quaternion q, double tau) nogil
+    dual_quaternion dual_quaternion_sclerp(dual_quaternion q1, dual_quaternion q2, double tau) nogil
@@ -3,15 +3,23 @@
 
 from __future__ import division, print_function, absolute_import
 
+import sys
+import importlib
+import threading
 import numpy as np
 
 from .numpy_quaternion import (quaternion, _eps,
                                slerp_evaluate, squad_evaluate,
+                               from_components, to_components, _array_from_sequence, _pairwise_distance, _allclose,
+                               _super_fibonacci,
+                               _as_rotation_matrix, _from_rotation_matrix, _as_rotation_vector, _from_rotation_vector,
+                               _as_euler_angles, _from_euler_angles, _as_spherical_coords, _from_spherical_coords,
+                               _rotate_vectors, _optimal_rotation,
+                               dual_quaternion, _from_rotation_and_translation, _as_rotation_and_translation,
+                               _transform_points,
                                # slerp_vectorized, squad_vectorized,
                                # slerp, squad,
                                )
-from .quaternion_time_series import slerp, squad, integrate_angular_velocity, minimal_rotation
-from .calculus import derivative, definite_integral, indefinite_integral
 from ._version import __version__
 
 __doc_title__ = "Quaternion dtype for NumPy"
@@ -20,22 +28,55 @@ __doc__ = "Adds a quaternion dtype to NumPy."
 __all__ = ['quaternion',
            'as_quat_array', 'as_spinor_array',
            'as_float_array', 'from_float_array',
-           'as_rotation_matrix', 'from_rotation_matrix',
+           'from_components', 'to_components',
+           'as_rotation_matrix', 'from_rotation_matrix', 'optimal_rotation',
            'as_rotation_vector', 'from_rotation_vector',
            'as_euler_angles', 'from_euler_angles',
            'as_spherical_coords', 'from_spherical_coords',
            'rotate_vectors', 'allclose',
+           'random_rotors', 'random_perturbations', 'rotation_grid', 'rotation_grid_chunks',
+           'dual_quaternion', 'as_dual_quat_array',
+           'from_rotation_and_translation', 'as_rotation_and_translation',
+           'transform_points', 'sclerp',
            'rotor_intrinsic_distance', 'rotor_chordal_distance',
            'rotation_intrinsic_distance', 'rotation_chordal_distance',
+           'hemisphere_canonicalized', 'unflip_rotors',
+           'pairwise_distance', 'pairwise_distance_chunks',
            'slerp_evaluate', 'squad_evaluate',
            'zero', 'one', 'x', 'y', 'z', 'integrate_angular_velocity',
-           'squad', 'slerp', 'derivative', 'definite_integral', 'indefinite_integral']
+           'squad', 'slerp', 'slerp_series', 'interpolation_segments',
+           'slerp_series_coefficients', 'squad_coefficients',
+           'derivative', 'definite_integral', 'indefinite_integral',
+           'mean_rotor_in_chordal_metric', 'optimal_alignment_in_chordal_metric',
+           'RotationIndex', 'get_include']
+
+# These functions live in submodules that import numba (through `numba_wrapper`) or are otherwise slow to load, so
+# they are only imported when first accessed.  Python versions without module-level `__getattr__` (PEP 562) import them
+# immediately instead.
+_lazy_functions = {
+    'slerp': 'quaternion_time_series',
+    'squad': 'quaternion_time_series',
+    'slerp_series': 'quaternion_time_series',
+    'interpolation_segments': 'quaternion_time_series',
+    'slerp_series_coefficients': 'quaternion_time_series',
+    'squad_coefficients': 'quaternion_time_series',
+    'integrate_angular_velocity': 'quaternion_time_series',
+    'minimal_rotation': 'quaternion_time_series',
+    'derivative': 'calculus',
+    'definite_integral': 'calculus',
+    'indefinite_integral': 'calculus',
+    'mean_rotor_in_chordal_metric': 'means',
+    'optimal_alignment_in_chordal_metric': 'means',
+    'RotationIndex': 'rotation_index',
+}
 
 if 'quaternion' in np.__dict__:
     raise RuntimeError('The NumPy package already has a quaternion type')
 
 np.quaternion = quaternion
 np.typeDict['quaternion'] = np.dtype(quaternion)
+np.dual_quaternion = dual_quaternion
+np.typeDict['dual_quaternion'] = np.dtype(dual_quaternion)
 
 zero = np.quaternion(0, 0, 0, 0)
 one = np.quaternion(1, 0, 0, 0)
@@ -47,6 +88,43 @@ rotor_intrinsic_distance = np.rotor_intrinsic_distance
 rotor_chordal_distance = np.rotor_chordal_distance
 rotation_intrinsic_distance = np.rotation_intrinsic_distance
 rotation_chordal_distance = np.rotation_chordal_distance
+hemisphere_canonicalized = np.hemisphere_canonicalized
+
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        try:
+            module_name = _lazy_functions[name]
+        except KeyError:
+            raise AttributeError("module '{0}' has no attribute '{1}'".format(__name__, name))
+        value = getattr(importlib.import_module('.' + module_name, __name__), name)
+        globals()[name] = value  # Subsequent lookups bypass this function
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(_lazy_functions))
+else:
+    from .quaternion_time_series import (slerp, squad, slerp_series, interpolation_segments,
+                                         slerp_series_coefficients, squad_coefficients,
+                                         integrate_angular_velocity, minimal_rotation)
+    from .calculus import derivative, definite_integral, indefinite_integral
+    from .means import mean_rotor_in_chordal_metric, optimal_alignment_in_chordal_metric
+    from .rotation_index import RotationIndex
+
+
+def get_include():
+    """Return the directory containing the C headers and Cython declarations for this package
+
+    C extensions that need to call the quaternion kernels directly, without going through python, should add this
+    directory to their include path, `#include "quaternion_api.h"`, and call `import_quaternion()` in their module
+    initialization function.  Cython extensions can instead `cimport quaternion`, which uses the declarations in
+    `__init__.pxd` from this directory, and call `quaternion.import_quaternion()`.  For example, in `setup.py`:
+
+        Extension('my_module', ['my_module.c'], include_dirs=[numpy.get_include(), quaternion.get_include()])
+
+    """
+    import os.path
+    return os.path.dirname(os.path.abspath(__file__))
 
 
 def as_float_array(a):
@@ -56,13 +134,16 @@ def as_float_array(a):
     copied; the returned quantity is just a "view" of the original.
 
     The output view has one more dimension (of size 4) than the input
-    array, but is otherwise the same shape.
+    array, but is otherwise the same shape.  Arrays of dual quaternions
+    are viewed in the same way, with a final dimension of size 8.
 
     """
+    if getattr(a, 'dtype', None) == np.dual_quaternion:
+        return np.asarray(a).view((np.double, 8))
     return np.asarray(a, dtype=np.quaternion).view((np.double, 4))
 
 
-def as_quat_array(a):
+def as_quat_array(a, copy=None):
     """View a float array as an array of quaternions
 
     The input array must have a final dimension whose size is
@@ -72,12 +153,15 @@ def as_quat_array(a):
 
     This function is usually fast (of order 1 microsecond) because no
     data is copied; the returned quantity is just a "view" of the
-    original.  However, if the input array is not C-contiguous
-    (basically, as you increment the index into the last dimension of
-    the array, you just move to the neighboring float in memory), the
-    data will need to be copied which may be quite slow.  Therefore,
-    you should try to ensure that the input array is in that order.
-    Slices and transpositions will frequently break that rule.
+    original.  This works whenever the last dimension of the input is
+    contiguous (as you increment the index into the last dimension of
+    the array, you just move to the neighboring float in memory), even
+    if the other dimensions are sliced or strided.  Otherwise -- for
+    example, after transposing the last axis away, or if the input is
+    not already an array of doubles -- the data must be copied, which
+    may be quite slow.  The number of such copies (including
+    conversions of lists and other non-array inputs) is recorded in
+    `as_quat_array.copies`, which may be reset to zero at any time.
 
     We will not convert back from a two-spinor array because there is
     no unique convention for them, so I don't want to mess with that.
@@ -85,18 +169,56 @@ def as_quat_array(a):
     process of swapping columns required for useful definitions of
     the two-spinors.
 
+    Parameters
+    ----------
+    a: array_like
+        Float array whose last dimension has size divisible by 4.  A
+        list or tuple of quaternion objects is also accepted, and is
+        copied into a new array in a single pass.
+    copy: None or bool, optional
+        If None (the default), the data are copied only when necessary.
+        If False, a ValueError is raised rather than copying the data,
+        which includes inputs that are not already arrays, and inputs of
+        shape (4,), which are returned as new quaternion scalars.
+        If True, the data are always copied.
+
     """
-    a = np.asarray(a, dtype=np.double)
+    original = a
+    q = _array_from_sequence(a) if isinstance(a, (list, tuple)) else None
+    if q is not None:
+        # Lists and tuples of quaternion objects are read in bulk, rather than converted one element at a time
+        a = q.view((np.double, 4))
+    else:
+        a = np.asarray(a, dtype=np.double)
 
     # fast path
     if a.shape == (4,):
+        if copy is False:
+            raise ValueError('Input of shape (4,) is returned as a new quaternion scalar, which copies the data; '
+                             'use `as_quat_array(a[np.newaxis])[0, ...]` for a 0-d view')
         return quaternion(a[0], a[1], a[2], a[3])
 
-    # view only works if the last axis is C-contiguous
-    if not a.flags['C_CONTIGUOUS'] or a.strides[-1] != a.itemsize:
+    # `np.asarray` returns the input itself (or a view of it, for an ndarray subclass) unless it converted the data
+    copied = not (a is original or a.base is original)
+    if (copy and not copied) or a.ndim == 0 or a.strides[-1] != a.itemsize:
+        # view only works if the last axis is contiguous
         a = a.copy(order='C')
+        copied = True
+    if copied:
+        if copy is False:
+            if isinstance(original, np.ndarray):
+                description = 'array of shape {0} and dtype {1}'.format(original.shape, original.dtype)
+            else:
+                description = 'of type {0}'.format(type(original).__name__)
+            raise ValueError('Input {0} cannot be viewed as quaternions without copying; it must be an array of '
+                             'float64 whose last axis is contiguous'.format(description))
+        as_quat_array.copies += 1
+
     try:
-        av = a.view(np.quaternion)
+        if a.shape[-1] % 4 != 0 or a.flags['C_CONTIGUOUS']:
+            av = a.view(np.quaternion)
+        else:
+            av = _strided_quaternion_view(a)
     except ValueError as e:
         message = (str(e) + '\n            '
                    + 'Failed to view input data as a series of quaternions.  '
@@ -111,6 +233,29 @@ def as_quat_array(a):
 
     return av
 
+as_quat_array.copies = 0
+
+
+class _ArrayInterface(object):
+    """Expose memory through the array interface, keeping a reference to the array that owns it"""
+    def __init__(self, interface, base):
+        self.__array_interface__ = interface
+        self.base = base
+
+
+def _strided_quaternion_view(a):
+    """View a float array whose last axis is contiguous (but whose other axes need not be) as quaternions"""
+    interface = {
+        'shape': a.shape[:-1] + (a.shape[-1] // 4,),
+        'strides': a.strides[:-1] + (4 * a.itemsize,),
+        'typestr': '|V{0}'.format(4 * a.itemsize),
+        'data': (a.__array_interface__['data'][0], not a.flags['WRITEABLE']),
+        'version': 3,
+    }
+    av = np.asarray(_ArrayInterface(interface, a))
+    av.dtype = np.quaternion  # Same itemsize, so this is just a reinterpretation
+    return av
+
 
 def from_float_array(a):
     return as_quat_array(a)
@@ -131,13 +276,15 @@ def as_spinor_array(a):
     return a.view(np.float).reshape(a.shape + (4,))[..., [0, 3, 2, 1]].ravel().view(np.complex).reshape(a.shape + (2,))
 
 
-def as_rotation_matrix(q):
+def as_rotation_matrix(q, out=None):
     """Convert input quaternion to 3x3 rotation matrix
 
     Parameters
     ----------
     q: quaternion or array of quaternions
         The quaternion(s) need not be normalized, but must all be nonzero
+    out: float array, optional
+        Array of shape q.shape+(3,3) in which to place the result.
 
     Returns
     -------
@@ -156,37 +303,31 @@ def as_rotation_matrix(q):
         if n == 0.0:
             raise ZeroDivisionError("Input to `as_rotation_matrix({0})` has zero norm".format(q))
         elif abs(n-1.0) < _eps:  # Input q is basically normalized
-            return np.array([
+            m = np.array([
                 [1 - 2*(q.y**2 + q.z**2),   2*(q.x*q.y - q.z*q.w),      2*(q.x*q.z + q.y*q.w)],
                 [2*(q.x*q.y + q.z*q.w),     1 - 2*(q.x**2 + q.z**2),    2*(q.y*q.z - q.x*q.w)],
                 [2*(q.x*q.z - q.y*q.w),     2*(q.y*q.z + q.x*q.w),      1 - 2*(q.x**2 + q.y**2)]
             ])
         else:  # Input q is not normalized
-            return np.array([
+            m = np.array([
                 [1 - 2*(q.y**2 + q.z**2)/n,   2*(q.x*q.y - q.z*q.w)/n,      2*(q.x*q.z + q.y*q.w)/n],
                 [2*(q.x*q.y + q.z*q.w)/n,     1 - 2*(q.x**2 + q.z**2)/n,    2*(q.y*q.z - q.x*q.w)/n],
                 [2*(q.x*q.z - q.y*q.w)/n,     2*(q.y*q.z + q.x*q.w)/n,      1 - 2*(q.x**2 + q.y**2)/n]
             ])
+        if out is None:
+            return m
+        _output_array(out, (3, 3))[...] = m
+        return out
     else:  # This is an array of quaternions
-        n = np.norm(q)
-        if np.any(n == 0.0):
+        if np.count_nonzero(q) != q.size:
             raise ZeroDivisionError("Array input to `as_rotation_matrix` has at least one element with zero norm")
         else:  # Assume input q is not normalized
-            m = np.empty(q.shape + (3, 3))
-            q = as_float_array(q)
-            m[..., 0, 0] = 1.0 - 2*(q[..., 2]**2 + q[..., 3]**2)/n
-            m[..., 0, 1] = 2*(q[..., 1]*q[..., 2] - q[..., 3]*q[..., 0])/n
-            m[..., 0, 2] = 2*(q[..., 1]*q[..., 3] + q[..., 2]*q[..., 0])/n
-            m[..., 1, 0] = 2*(q[..., 1]*q[..., 2] + q[..., 3]*q[..., 0])/n
-            m[..., 1, 1] = 1.0 - 2*(q[..., 1]**2 + q[..., 3]**2)/n
-            m[..., 1, 2] = 2*(q[..., 2]*q[..., 3] - q[..., 1]*q[..., 0])/n
-            m[..., 2, 0] = 2*(q[..., 1]*q[..., 3] - q[..., 2]*q[..., 0])/n
-            m[..., 2, 1] = 2*(q[..., 2]*q[..., 3] + q[..., 1]*q[..., 0])/n
-            m[..., 2, 2] = 1.0 - 2*(q[..., 1]**2 + q[..., 2]**2)/n
+            m = _output_array(out, q.shape + (3, 3))
+            _as_rotation_matrix(q, *_matrix_elements(m))
             return m
 
 
-def from_rotation_matrix(rot, nonorthogonal=True):
+def from_rotation_matrix(rot, nonorthogonal=True, out=None):
     """Convert input 3x3 rotation matrix to unit quaternion
 
     By default, if scipy.linalg is available, this function uses
@@ -215,6 +356,8 @@ def from_rotation_matrix(rot, nonorthogonal=True):
     nonorthogonal: bool, optional
         If scipy.linalg is available, use the more robust algorithm of
         Bar-Itzhack.  Default value is True.
+    out: array of quaternions, optional
+        Array of shape rot.shape[:-2] in which to place the result.
 
     Returns
     -------
@@ -263,69 +406,92 @@ def from_rotation_matrix(rot, nonorthogonal=True):
             eigvals, eigvecs = linalg.eigh(K3.T, eigvals=(3, 3))
             q.components[0] = eigvecs[-1]
             q.components[1:] = -eigvecs[:-1].flatten()
-            return q
+            if out is None:
+                return q
+            _output_array(out, (), np.quaternion)[...] = q
+            return out
         else:
-            q = np.empty(shape+(4,), dtype=np.float)
+            R = _output_array(out, shape, np.quaternion)
+            q = as_float_array(R)
             for flat_index in range(reduce(mul, shape)):
                 multi_index = np.unravel_index(flat_index, shape)
                 eigvals, eigvecs = linalg.eigh(K3[multi_index], eigvals=(3, 3))
                 q[multi_index+(0,)] = eigvecs[-1]
                 q[multi_index+(slice(1,None),)] = -eigvecs[:-1].flatten()
-            return as_quat_array(q)
+            return R
 
     else:  # No scipy.linalg or not `nonorthogonal`
-        diagonals = np.empty(shape+(4,))
-        diagonals[..., 0] = rot[..., 0, 0]
-        diagonals[..., 1] = rot[..., 1, 1]
-        diagonals[..., 2] = rot[..., 2, 2]
-        diagonals[..., 3] = rot[..., 0, 0] + rot[..., 1, 1] + rot[..., 2, 2]
-
-        indices = np.argmax(diagonals, axis=-1)
-
-        q = diagonals  # reuse storage space
-        indices_i = (indices == 0)
-        if np.any(indices_i):
-            if indices_i.shape == ():
-                indices_i = Ellipsis
-            rot_i = rot[indices_i, :, :]
-            q[indices_i, 0] = rot_i[..., 2, 1] - rot_i[..., 1, 2]
-            q[indices_i, 1] = 1 + rot_i[..., 0, 0] - rot_i[..., 1, 1] - rot_i[..., 2, 2]
-            q[indices_i, 2] = rot_i[..., 0, 1] + rot_i[..., 1, 0]
-            q[indices_i, 3] = rot_i[..., 0, 2] + rot_i[..., 2, 0]
-        indices_i = (indices == 1)
-        if np.any(indices_i):
-            if indices_i.shape == ():
-                indices_i = Ellipsis
-            rot_i = rot[indices_i, :, :]
-            q[indices_i, 0] = rot_i[..., 0, 2] - rot_i[..., 2, 0]
-            q[indices_i, 1] = rot_i[..., 1, 0] + rot_i[..., 0, 1]
-            q[indices_i, 2] = 1 - rot_i[..., 0, 0] + rot_i[..., 1, 1] - rot_i[..., 2, 2]
-            q[indices_i, 3] = rot_i[..., 1, 2] + rot_i[..., 2, 1]
-        indices_i = (indices == 2)
-        if np.any(indices_i):
-            if indices_i.shape == ():
-                indices_i = Ellipsis
-            rot_i = rot[indices_i, :, :]
-            q[indices_i, 0] = rot_i[..., 1, 0] - rot_i[..., 0, 1]
-            q[indices_i, 1] = rot_i[..., 2, 0] + rot_i[..., 0, 2]
-            q[indices_i, 2] = rot_i[..., 2, 1] + rot_i[..., 1, 2]
-            q[indices_i, 3] = 1 - rot_i[..., 0, 0] - rot_i[..., 1, 1] + rot_i[..., 2, 2]
-        indices_i = (indices == 3)
-        if np.any(indices_i):
-            if indices_i.shape == ():
-                indices_i = Ellipsis
-            rot_i = rot[indices_i, :, :]
-            q[indices_i, 0] = 1 + rot_i[..., 0, 0] + rot_i[..., 1, 1] + rot_i[..., 2, 2]
-            q[indices_i, 1] = rot_i[..., 2, 1] - rot_i[..., 1, 2]
-            q[indices_i, 2] = rot_i[..., 0, 2] - rot_i[..., 2, 0]
-            q[indices_i, 3] = rot_i[..., 1, 0] - rot_i[..., 0, 1]
-
-        q /= np.linalg.norm(q, axis=-1)[..., np.newaxis]
-
-        return as_quat_array(q)
-
-
-def as_rotation_vector(q):
+        # Markley's algorithm, applied by the C ufunc
+        q = _output_array(out, shape, np.quaternion)
+        _from_rotation_matrix(*(_matrix_elements(rot) + [q]))
+        return q if out is not None else q[()]
+
+
+def optimal_rotation(vectors_a, vectors_b, weights=None, out=None):
+    """Find the rotation that best takes one set of vectors onto another
+
+    This solves Wahba's problem: it returns the unit quaternion R that
+    minimizes
+
+      sum_i weights[i] * |vectors_a[i] - R * vectors_b[i] * R^{-1}|^2
+
+    so that `rotate_vectors(R, vectors_b)` is as close as possible to
+    `vectors_a`.  This is the same convention as
+    `optimal_alignment_in_chordal_metric`.  Any leading dimensions of
+    the inputs are broadcast against each other, so that thousands of
+    separate problems -- one per frame, for example -- are solved at
+    once, in a single C loop without temporary arrays.
+
+    The optimal rotation is the eigenvector with the largest eigenvalue
+    of Davenport's 4x4 matrix K, built from the attitude profile matrix
+    sum_i weights[i] * vectors_a[i] * vectors_b[i]^T in the same way as
+    the matrix used by `from_rotation_matrix`.  The eigenvalue is found
+    by Newton's method on the characteristic polynomial as in QUEST,
+    and the eigenvector from the adjugate of the shifted matrix as in
+    ESOQ, falling back on Jacobi iteration when the largest eigenvalue
+    is (nearly) repeated -- for example, if all the vectors are
+    parallel, in which case the optimal rotation is not unique.
+
+    Parameters
+    ----------
+    vectors_a: (...Nx3) float array
+        Target vectors
+    vectors_b: (...Nx3) float array
+        Vectors to be rotated onto the targets
+    weights: (...N) float array, optional
+        Nonnegative weights of each pair of vectors; all 1 by default
+    out: array of quaternions, optional
+        Array of the broadcast leading shape in which to place the result.
+
+    Returns
+    -------
+    R: array of quaternions
+        Unit quaternions with nonnegative scalar parts.  The shape is the
+        broadcast shape of vectors_a.shape[:-2], vectors_b.shape[:-2],
+        and weights.shape[:-1].
+
+    """
+    a = np.asarray(vectors_a, dtype=float)
+    b = np.asarray(vectors_b, dtype=float)
+    if a.ndim < 2 or a.shape[-1] != 3 or b.ndim < 2 or b.shape[-1] != 3:
+        raise ValueError("Inputs must have shape (...Nx3); they have shapes {0} and {1}".format(a.shape, b.shape))
+    if a.shape[-2] != b.shape[-2]:
+        raise ValueError("Inputs must have the same number of vectors; they have {0} and {1}".format(a.shape[-2],
+                                                                                                    b.shape[-2]))
+    if weights is None:
+        weights = np.ones(a.shape[-2])
+    weights = np.asarray(weights, dtype=float)
+    if weights.ndim < 1 or weights.shape[-1] != a.shape[-2]:
+        raise ValueError("Input `weights` must have shape (...{0}); it has shape {1}".format(a.shape[-2],
+                                                                                            weights.shape))
+    shape = np.broadcast(np.empty(a.shape[:-2] + (0,)), np.empty(b.shape[:-2] + (0,)),
+                         np.empty(weights.shape[:-1] + (0,))).shape[:-1]
+    R = _output_array(out, shape, np.quaternion)
+    _optimal_rotation(a, b, weights, R)
+    return R if out is not None else R[()]
+
+
+def as_rotation_vector(q, out=None):
     """Convert input quaternion to the axis-angle representation
 
     Note that if any of the input quaternions has norm zero, no error is
@@ -335,6 +501,8 @@ def as_rotation_vector(q):
     ----------
     q: quaternion or array of quaternions
         The quaternion(s) need not be normalized, but must all be nonzero
+    out: float array, optional
+        Array of shape q.shape+(3,) in which to place the result.
 
     Returns
     -------
@@ -344,10 +512,13 @@ def as_rotation_vector(q):
         radians.
 
     """
-    return as_float_array(2*np.log(np.normalized(q)))[..., 1:]
+    q = np.asarray(q, dtype=np.quaternion)
+    rot = _output_array(out, q.shape + (3,))
+    _as_rotation_vector(q, rot[..., 0], rot[..., 1], rot[..., 2])
+    return rot
 
 
-def from_rotation_vector(rot):
+def from_rotation_vector(rot, out=None):
     """Convert input 3-vector in axis-angle representation to unit quaternion
 
     Parameters
@@ -355,6 +526,8 @@ def from_rotation_vector(rot):
     rot: (Nx3) float array
         Each vector represents the axis of the rotation, with norm
         proportional to the angle of the rotation in radians.
+    out: array of quaternions, optional
+        Array of shape rot.shape[:-1] in which to place the result.
 
     Returns
     -------
@@ -363,14 +536,13 @@ def from_rotation_vector(rot):
         rotations.  Output shape is rot.shape[:-1].
 
     """
-    rot = np.array(rot, copy=False)
-    quats = np.zeros(rot.shape[:-1]+(4,))
-    quats[..., 1:] = rot[...]/2
-    quats = as_quat_array(quats)
-    return np.exp(quats)
+    rot = np.asarray(rot, dtype=float)
+    q = _output_array(out, rot.shape[:-1], np.quaternion)
+    _from_rotation_vector(rot[..., 0], rot[..., 1], rot[..., 2], q)
+    return q if out is not None else q[()]
 
 
-def as_euler_angles(q):
+def as_euler_angles(q, out=None):
     """Open Pandora's Box
 
     If somebody is trying to make you use Euler angles, tell them no, and
@@ -396,6 +568,8 @@ def as_euler_angles(q):
     ----------
     q: quaternion or array of quaternions
         The quaternion(s) need not be normalized, but must all be nonzero
+    out: float array, optional
+        Array of shape q.shape+(3,) in which to place the result.
 
     Returns
     -------
@@ -411,16 +585,13 @@ def as_euler_angles(q):
         been using quaternions like a sensible person.
 
     """
-    alpha_beta_gamma = np.empty(q.shape + (3,), dtype=np.float)
-    n = np.norm(q)
-    q = as_float_array(q)
-    alpha_beta_gamma[..., 0] = np.arctan2(q[..., 3], q[..., 0]) + np.arctan2(-q[..., 1], q[..., 2])
-    alpha_beta_gamma[..., 1] = 2*np.arccos(np.sqrt((q[..., 0]**2 + q[..., 3]**2)/n))
-    alpha_beta_gamma[..., 2] = np.arctan2(q[..., 3], q[..., 0]) - np.arctan2(-q[..., 1], q[..., 2])
+    q = np.asarray(q, dtype=np.quaternion)
+    alpha_beta_gamma = _output_array(out, q.shape + (3,))
+    _as_euler_angles(q, alpha_beta_gamma[..., 0], alpha_beta_gamma[..., 1], alpha_beta_gamma[..., 2])
     return alpha_beta_gamma
 
 
-def from_euler_angles(alpha_beta_gamma, beta=None, gamma=None):
+def from_euler_angles(alpha_beta_gamma, beta=None, gamma=None, out=None):
     """Improve your life drastically
 
     Assumes the Euler angles correspond to the quaternion R via
@@ -447,6 +618,9 @@ def from_euler_angles(alpha_beta_gamma, beta=None, gamma=None):
     gamma: None, float, or array of floats
         If this array is given, it must be able to broadcast against the
         first and second arguments.
+    out: array of quaternions, optional
+        Array in which to place the result, with the shape described
+        below.
 
     Returns
     -------
@@ -466,19 +640,13 @@ def from_euler_angles(alpha_beta_gamma, beta=None, gamma=None):
         beta  = np.asarray(beta, dtype=np.double)
         gamma = np.asarray(gamma, dtype=np.double)
 
-    # Set up the output array
-    R = np.empty(np.broadcast(alpha, beta, gamma).shape + (4,), dtype=np.double)
-
-    # Compute the actual values of the quaternion components
-    R[..., 0] =  np.cos(beta/2)*np.cos((alpha+gamma)/2)  # scalar quaternion components
-    R[..., 1] = -np.sin(beta/2)*np.sin((alpha-gamma)/2)  # x quaternion components
-    R[..., 2] =  np.sin(beta/2)*np.cos((alpha-gamma)/2)  # y quaternion components
-    R[..., 3] =  np.cos(beta/2)*np.sin((alpha+gamma)/2)  # z quaternion components
+    # Set up the output array, and compute the quaternion components
+    R = _output_array(out, np.broadcast(alpha, beta, gamma).shape, np.quaternion)
+    _from_euler_angles(alpha, beta, gamma, R)
+    return R if out is not None else R[()]
 
-    return as_quat_array(R)
 
-
-def as_spherical_coords(q):
+def as_spherical_coords(q, out=None):
     """Return the spherical coordinates corresponding to this quaternion
 
     Obviously, spherical coordinates do not contain as much information as a
@@ -490,6 +658,8 @@ def as_spherical_coords(q):
     ----------
     q: quaternion or array of quaternions
         The quaternion(s) need not be normalized, but must be nonzero
+    out: float array, optional
+        Array of shape q.shape+(2,) in which to place the result.
 
     Returns
     -------
@@ -500,10 +670,13 @@ def as_spherical_coords(q):
         rotation about `z`.
 
     """
-    return as_euler_angles(q)[..., 1::-1]
+    q = np.asarray(q, dtype=np.quaternion)
+    vartheta_varphi = _output_array(out, q.shape + (2,))
+    _as_spherical_coords(q, vartheta_varphi[..., 0], vartheta_varphi[..., 1])
+    return vartheta_varphi
 
 
-def from_spherical_coords(theta_phi, phi=None):
+def from_spherical_coords(theta_phi, phi=None, out=None):
     """Return the quaternion corresponding to these spherical coordinates
 
     Assumes the spherical coordinates correspond to the quaternion R via
@@ -526,6 +699,9 @@ def from_spherical_coords(theta_phi, phi=None):
     phi: None, float, or array of floats
         If this array is given, it must be able to broadcast against the
         first argument.
+    out: array of quaternions, optional
+        Array in which to place the result, with the shape described
+        below.
 
     Returns
     -------
@@ -546,37 +722,24 @@ def from_spherical_coords(theta_phi, phi=None):
         theta = np.asarray(theta_phi, dtype=np.double)
         phi = np.asarray(phi, dtype=np.double)
 
-    # Set up the output array
-    R = np.empty(np.broadcast(theta, phi).shape + (4,), dtype=np.double)
-
-    # Compute the actual values of the quaternion components
-    R[..., 0] =  np.cos(phi/2)*np.cos(theta/2)  # scalar quaternion components
-    R[..., 1] = -np.sin(phi/2)*np.sin(theta/2)  # x quaternion components
-    R[..., 2] =  np.cos(phi/2)*np.sin(theta/2)  # y quaternion components
-    R[..., 3] =  np.sin(phi/2)*np.cos(theta/2)  # z quaternion components
-
-    return as_quat_array(R)
+    # Set up the output array, and compute the quaternion components
+    R = _output_array(out, np.broadcast(theta, phi).shape, np.quaternion)
+    _from_spherical_coords(theta, phi, R)
+    return R if out is not None else R[()]
 
 
-def rotate_vectors(R, v, axis=-1):
+def rotate_vectors(R, v, axis=-1, out=None):
     """Rotate vectors by given quaternions
 
-    For simplicity, this function simply converts the input
-    quaternion(s) to a matrix, and rotates the input vector(s) by the
-    usual matrix multiplication.  However, it should be noted that if
-    each input quaternion is only used to rotate a single vector, it
-    is more efficient (in terms of operation counts) to use the
-    formula
+    Each vector is rotated by each quaternion in a single C loop, using
+    the formula
 
       v' = v + 2 * r x (s * v + r x v) / m
 
     where x represents the cross product, s and r are the scalar and
     vector parts of the quaternion, respectively, and m is the sum of
-    the squares of the components of the quaternion.  If you are
-    looping over a very large number of quaternions, and just rotating
-    a single vector each time, you might want to implement that
-    alternative algorithm using numba (or something that doesn't use
-    python).
+    the squares of the components of the quaternion.  No rotation
+    matrices or other temporary arrays are constructed.
 
 
     Parameters
@@ -588,6 +751,8 @@ def rotate_vectors(R, v, axis=-1):
     axis: int
         Axis of the `v` array to use as the vector dimension.  This
         axis of `v` must have length 3.
+    out: float array, optional
+        Array of shape R.shape+v.shape in which to place the result.
 
     Returns
     =======
@@ -601,14 +766,499 @@ def rotate_vectors(R, v, axis=-1):
         raise ValueError("Input `v` does not have at least one dimension of length 3")
     if v.shape[axis] != 3:
         raise ValueError("Input `v` axis {0} has length {1}, not 3.".format(axis, v.shape[axis]))
-    m = as_rotation_matrix(R)
-    m_axes = list(range(m.ndim))
-    v_axes = list(range(m.ndim, m.ndim+v.ndim))
-    mv_axes = list(v_axes)
-    mv_axes[axis] = m_axes[-2]
-    mv_axes = m_axes[:-2] + mv_axes
-    v_axes[axis] = m_axes[-1]
-    return np.einsum(m, m_axes, v, v_axes, mv_axes)
+    if np.count_nonzero(R) != R.size:
+        raise ZeroDivisionError("Array input to `rotate_vectors` has at least one quaternion with zero norm")
+    axis = axis % v.ndim
+    vprime = _output_array(out, R.shape + v.shape)
+    v_components = [v[(slice(None),)*axis + (i,)] for i in range(3)]
+    vprime_components = [vprime[(slice(None),)*(R.ndim+axis) + (i, Ellipsis)] for i in range(3)]
+    R = R.reshape(R.shape + (1,)*(v.ndim-1))  # Broadcast against the remaining dimensions of v
+    _rotate_vectors(*([R] + v_components + vprime_components))
+    return vprime
+
+
+def random_rotors(shape=None, rng=None, out=None):
+    """Draw unit quaternions uniformly distributed over the rotation group
+
+    Normalizing a vector of four independent standard normal variates gives a point distributed uniformly over the
+    3-sphere, which is the Haar measure on SO(3) when each quaternion is taken as a rotor.  The normal variates are
+    written directly into the output array and normalized there, so -- when `rng` is a numpy `Generator` and the
+    output is contiguous -- no temporary arrays are allocated.  Very large numbers of samples can be drawn in chunks by passing slices of
+    a preallocated array as `out`.
+
+    Parameters
+    ----------
+    shape: int or tuple of ints, optional
+        Shape of the output.  Defaults to the shape of `out` if that is given, or a single quaternion otherwise.
+    rng: None, int, numpy.random.Generator, or numpy.random.RandomState, optional
+        Source of random numbers.  An int seeds a new `RandomState`, giving the same output with any version of
+        numpy; None uses numpy's global random state, as seeded by `np.random.seed`.  Passing a `Generator` (for
+        example, `np.random.default_rng(seed)`) avoids a temporary array for the normal variates.
+    out: array of quaternions, optional
+        Array of shape `shape` in which to place the result.
+
+    Returns
+    -------
+    R: array of quaternions
+        Unit quaternions of the given shape.
+
+    """
+    rng = _random_generator(rng)
+    if shape is None:
+        shape = out.shape if out is not None else ()
+    shape = tuple(np.atleast_1d(shape)) if np.ndim(shape) else (shape,)
+    R = _output_array(out, shape, np.quaternion)
+    _standard_normal(rng, as_float_array(R))
+    np.normalized(R, out=R)
+    return R if out is not None else R[()]
+
+
+def random_perturbations(mean=one, cov=1.0, shape=None, rng=None, out=None):
+    """Draw rotors from a Gaussian distribution in the tangent space about a mean rotor
+
+    Each output is `mean * from_rotation_vector(v)`, where the rotation vector `v` is drawn from a normal distribution
+    with zero mean and covariance `cov`.  That is, `as_rotation_vector(mean.inverse() * R)` is Gaussian, so the
+    perturbation is applied in the frame rotated by `mean`.  The rotors are written directly into the output array,
+    and the rotation vectors are drawn in blocks of at most `2**16` elements (or one slice along the first axis, if
+    that is larger), so the only temporary arrays are one or two buffers of that size, reused for every block.
+
+    Parameters
+    ----------
+    mean: quaternion or array of quaternions, optional
+        Rotor(s) about which to draw the samples, broadcast against `shape`.  Defaults to the identity.
+    cov: float, float array of shape (3,), or float array of shape (3, 3), optional
+        Covariance of the rotation vector, in square radians.  A scalar is the variance of each component, and a
+        3-vector gives the diagonal of the covariance matrix.  A full matrix must be symmetric positive semidefinite.
+    shape: int or tuple of ints, optional
+        Shape of the output.  Defaults to the shape of `out` if that is given, or otherwise the shape of `mean`.
+    rng: None, int, numpy.random.Generator, or numpy.random.RandomState, optional
+        Source of random numbers, as in `random_rotors`.
+    out: array of quaternions, optional
+        Array of shape `shape` in which to place the result.
+
+    Returns
+    -------
+    R: array of quaternions
+        Unit quaternions (if `mean` is normalized) of the given shape.
+
+    """
+    rng = _random_generator(rng)
+    mean = np.asarray(mean, dtype=np.quaternion)
+    cov = np.asarray(cov, dtype=float)
+    if shape is None:
+        shape = out.shape if out is not None else mean.shape
+    shape = tuple(np.atleast_1d(shape)) if np.ndim(shape) else (shape,)
+    if cov.shape == (3, 3):
+        # Factor as L*L^T, allowing for singular matrices, which `np.linalg.cholesky` rejects
+        eigenvalues, eigenvectors = np.linalg.eigh(cov)
+        if not np.all(eigenvalues >= -1e3 * np.finfo(float).eps * max(np.max(np.abs(eigenvalues)), 1.0)):
+            raise ValueError("Input `cov` is not positive semidefinite")
+        L = eigenvectors * np.sqrt(np.maximum(eigenvalues, 0.0))
+    elif cov.shape in [(), (3,)]:
+        if np.any(cov < 0):
+            raise ValueError("Input `cov` has negative variances")
+        L = None
+    else:
+        raise ValueError("Input `cov` has shape {0}, rather than (), (3,), or (3, 3)".format(cov.shape))
+    R = _output_array(out, shape, np.quaternion)
+    # Work in blocks along the first axis (of a 1-d view, for a single output), reusing the same buffers for each
+    R_blocks = R if R.ndim else R[np.newaxis]
+    mean_blocks = np.broadcast_to(mean, R_blocks.shape)
+    block_size = max(1, _random_perturbations_block_size // max(1, R_blocks[:1].size))
+    v_buffer = np.empty((min(block_size, len(R_blocks)),) + R_blocks.shape[1:] + (3,))
+    Lv_buffer = None if L is None else np.empty_like(v_buffer)
+    for start in range(0, len(R_blocks), block_size):
+        stop = min(start + block_size, len(R_blocks))
+        v = v_buffer[:stop - start]
+        _standard_normal(rng, v)
+        if L is None:
+            v *= np.sqrt(cov)
+        else:
+            v = np.dot(v, L.T, out=Lv_buffer[:stop - start])
+        _from_rotation_vector(v[..., 0], v[..., 1], v[..., 2], R_blocks[start:stop])
+        np.multiply(mean_blocks[start:stop], R_blocks[start:stop], out=R_blocks[start:stop])
+    return R if out is not None else R[()]
+
+
+_random_perturbations_block_size = 2**16
+
+
+def rotation_grid(n, start=0, stop=None, out=None):
+    """Return points of a deterministic, nearly uniform grid of `n` rotors
+
+    The grid is the super-Fibonacci spiral of Alexa (CVPR 2022), which places `n` points on the unit 3-sphere with low
+    discrepancy for any `n`, and needs no search or optimization to construct.  The points are not symmetric under
+    q -> -q, so each one is a distinct rotation, and the grid is nearly uniform over SO(3) as well as over the
+    3-sphere.  The distance (as measured by `rotation_intrinsic_distance`) from any rotation to its nearest grid point
+    is about 4*n**(-1/3) radians at most, within 50% of the (6*pi/n)**(1/3) that no grid of `n` points can improve on.
+    Coverage for a particular `n` can be checked by applying `pairwise_distance_chunks` to random rotors and the grid.
+
+    Each point depends only on its index and `n`, so a grid too large to hold in memory can be generated in pieces by
+    passing `start` and `stop`, or by iterating over `rotation_grid_chunks`.
+
+    Parameters
+    ----------
+    n: int
+        Total number of points in the grid.
+    start, stop: int, optional
+        Range of indices of the points to return.  Defaults to the whole grid.
+    out: array of quaternions, optional
+        Contiguous array of shape (stop-start,) in which to place the result.
+
+    Returns
+    -------
+    R: array of quaternions
+        Unit quaternions with indices `start` through `stop-1` in the grid.
+
+    """
+    n = int(n)
+    stop = n if stop is None else int(stop)
+    if n < 0 or not 0 <= start <= stop <= n:
+        raise ValueError("Invalid range [{0}, {1}) of points for a grid of size {2}".format(start, stop, n))
+    R = _output_array(out, (stop - start,), np.quaternion)
+    _super_fibonacci(n, int(start), R)
+    return R
+
+
+def rotation_grid_chunks(n, chunk_size=2**20):
+    """Iterate over blocks of the grid of `n` rotors returned by `rotation_grid`
+
+    This is a generator version of `rotation_grid`, for exhaustive searches over grids that are too large to hold in
+    memory at once.  Each step yields a tuple `(points, block)`, where `points` is a slice of the indices of the full
+    grid, and `block` is the array of rotors with those indices.  The same array is refilled at each step, so copy
+    `block` to keep it past the next step.
+
+    Parameters
+    ----------
+    n: int
+        Total number of points in the grid.
+    chunk_size: int, optional
+        Maximum number of points in each block.  Defaults to 2**20.
+
+    """
+    n = int(n)
+    chunk_size = max(1, min(int(chunk_size), n))
+    buffer = np.empty(chunk_size, dtype=np.quaternion)
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        block = rotation_grid(n, start, stop, out=buffer[:stop - start])
+        yield slice(start, stop), block
+
+
+def as_dual_quat_array(a):
+    """View a float array as an array of dual quaternions
+
+    The input array must have a final dimension of size 8, holding the
+    components (w, x, y, z) of the real part followed by those of the
+    dual part.  As with `as_quat_array`, no data is copied if the last
+    axis of the input is a contiguous array of doubles.
+
+    """
+    a = np.asarray(a, dtype=np.double)
+    if a.ndim == 0 or a.shape[-1] != 8:
+        raise ValueError("Input array of shape {0} cannot be viewed as dual quaternions; "
+                         "the last axis must have size 8".format(a.shape))
+    if a.strides[-1] != a.itemsize or not a.flags['C_CONTIGUOUS']:
+        a = np.ascontiguousarray(a)
+    return a.view(np.dual_quaternion).reshape(a.shape[:-1])
+
+
+def from_rotation_and_translation(R, t, out=None):
+    """Construct dual quaternions representing rotation followed by translation
+
+    Each output dual quaternion r + eps*d represents the rigid
+    transformation v -> R*v*R^{-1} + t, with r = R and d = t*R/2.  The
+    rotations need not be normalized; if they are, so are the outputs.
+
+    Parameters
+    ----------
+    R: quaternion array
+        Rotations, broadcast against t.shape[:-1]
+    t: float array
+        Translation vectors, with last dimension of size 3
+    out: dual-quaternion array, optional
+        Array of the broadcast shape in which to place the result.
+
+    Returns
+    -------
+    dq: dual-quaternion array
+        Array of the shape of R broadcast against t.shape[:-1]
+
+    """
+    R = np.asarray(R, dtype=np.quaternion)
+    t = np.asarray(t, dtype=float)
+    if t.ndim < 1 or t.shape[-1] != 3:
+        raise ValueError("Input `t` must have a final dimension of size 3; it has shape {0}".format(t.shape))
+    shape = np.broadcast(R, t[..., 0]).shape
+    dq = _output_array(out, shape, np.dual_quaternion)
+    _from_rotation_and_translation(R, t[..., 0], t[..., 1], t[..., 2], dq)
+    return dq if out is not None else dq[()]
+
+
+def as_rotation_and_translation(dq):
+    """Return the rotations and translations represented by dual quaternions
+
+    This is the inverse of `from_rotation_and_translation`.  The rotation
+    is the real part of the dual quaternion, which is not normalized.
+
+    Returns
+    -------
+    R: quaternion array
+        Array of the same shape as dq
+    t: float array
+        Array of shape dq.shape+(3,)
+
+    """
+    dq = np.asarray(dq, dtype=np.dual_quaternion)
+    R = np.empty(dq.shape, dtype=np.quaternion)
+    t = np.empty(dq.shape + (3,))
+    _as_rotation_and_translation(dq, R, t[..., 0], t[..., 1], t[..., 2])
+    return R[()], t
+
+
+def transform_points(dq, points, axis=-1, out=None):
+    """Apply the rigid transformations represented by dual quaternions to points
+
+    Each point is rotated and then translated in a single C loop, without
+    temporary arrays.  Unlike `rotate_vectors`, the inputs are broadcast
+    against each other (apart from the vector axis of `points`), rather
+    than combined in an outer product, so that each of an array of poses
+    may be applied to its own point.  To apply every pose to every point,
+    add axes to `dq`, as in `dq[:, np.newaxis]`.
+
+    Parameters
+    ==========
+    dq: dual-quaternion array
+        Rigid transformations to apply.  These need not be normalized.
+    points: float array
+        Three-vectors to be transformed.
+    axis: int
+        Axis of the `points` array to use as the vector dimension.  This
+        axis of `points` must have length 3.
+    out: float array, optional
+        Array in which to place the result, with the vector dimension in
+        the same position as in `points`.
+
+    Returns
+    =======
+    points_prime: float array
+        The transformed points.
+
+    """
+    dq = np.asarray(dq, dtype=np.dual_quaternion)
+    points = np.asarray(points, dtype=float)
+    if points.ndim < 1 or points.shape[axis] != 3:
+        raise ValueError("Input `points` axis {0} does not have length 3; it has shape {1}".format(axis, points.shape))
+    points = np.moveaxis(points, axis, -1)
+    if out is None:
+        return np.moveaxis(_transform_points(dq, points), -1, axis)
+    _transform_points(dq, points, out=np.moveaxis(out, axis, -1))
+    return out
+
+
+def sclerp(dq1, dq2, tau, out=None):
+    """Screw linear interpolation between unit dual quaternions
+
+    The result is (dq2 * dq1^{-1})**tau * dq1, which moves from dq1 (at
+    tau=0) to dq2 (at tau=1) along a screw motion, rotating about and
+    translating along a fixed axis at constant rates.  Like `slerp`, this
+    takes the shorter path, from dq1 to whichever of dq2 and -dq2 is
+    closer.  The inputs are broadcast against each other, and must be
+    normalized; see `np.normalized`.
+
+    This is a thin wrapper around `np.sclerp_vectorized`.
+
+    """
+    dq1 = np.asarray(dq1, dtype=np.dual_quaternion)
+    dq2 = np.asarray(dq2, dtype=np.dual_quaternion)
+    if out is None:
+        return np.sclerp_vectorized(dq1, dq2, tau)
+    return np.sclerp_vectorized(dq1, dq2, tau, out=out)
+
+
+def unflip_rotors(q, axis=0, inplace=False):
+    """Flip signs of quaternions along an axis to remove sign discontinuities
+
+    A rotor and its negative represent the same rotation, so a time
+    series of rotations may jump between the two -- for example, when
+    it is computed from rotation matrices.  Functions like `squad`
+    assume that there are no such jumps.  This function negates each
+    quaternion (after the first) whose inner product with the previous
+    output is negative, in a single pass at the C level.  To map all
+    rotors onto a fixed hemisphere instead, use the ufunc
+    `hemisphere_canonicalized`.
+
+    Parameters
+    ==========
+    q: array_like of quaternions
+        Quaternions to be unflipped.
+    axis: int, optional
+        Axis along which to enforce continuity.  Defaults to 0.  All
+        other axes are treated independently.
+    inplace: bool, optional
+        If True, modify the input array rather than returning a new
+        one.  Defaults to False.
+
+    Returns
+    =======
+    q_out: array of quaternions
+        Array of the same shape as `q`, with signs chosen so that
+        successive elements along `axis` are in the same hemisphere.
+        If `inplace` is True, this is the input array.
+
+    """
+    q = np.asarray(q, dtype=np.quaternion)
+    if q.ndim == 0:
+        return q if inplace else q.copy()
+    if inplace:
+        return np.unflip_rotors(q, axis=axis, out=q)
+    return np.unflip_rotors(q, axis=axis)
+
+
+_pairwise_metrics = ['rotor_intrinsic', 'rotor_chordal', 'rotation_intrinsic', 'rotation_chordal']
+
+
+def pairwise_distance(A, B=None, metric='rotation_intrinsic', condensed=False, out=None, threads=1):
+    """Compute the distance between every element of `A` and every element of `B`
+
+    This gives the same result as, for example,
+    `rotation_intrinsic_distance(A[..., np.newaxis], B)`, but without
+    materializing the broadcast arrays.  The distances are computed at
+    the C level in cache-sized tiles, optionally in several threads.
+    The intrinsic metrics also avoid the general quaternion logarithm
+    and division, so the results may differ from the ufuncs' at the
+    level of roundoff.
+
+    For distance matrices too large to hold in memory, see
+    `pairwise_distance_chunks`.
+
+    Parameters
+    ==========
+    A: array_like of quaternions
+        First set of quaternions, of any shape.
+    B: array_like of quaternions, optional
+        Second set of quaternions, of any shape.  If not given, `A` is
+        used.
+    metric: str or ufunc, optional
+        One of 'rotor_intrinsic', 'rotor_chordal',
+        'rotation_intrinsic' (the default), or 'rotation_chordal', or
+        the corresponding distance ufunc -- for example,
+        `quaternion.rotor_chordal_distance`.
+    condensed: bool, optional
+        If True, `B` must not be given, and only the distances between
+        distinct elements of `A` are returned, in the condensed form of
+        `scipy.spatial.distance.pdist`: a 1-d array of length
+        m*(m-1)/2, where m is the size of `A`, containing the upper
+        triangle of the distance matrix row by row.  Defaults to False.
+    out: array of floats, optional
+        C-contiguous float64 array of the output shape, into which the
+        result is written.
+    threads: int, optional
+        Number of threads to use.  Defaults to 1.
+
+    Returns
+    =======
+    distances: array of floats
+        Array of shape `A.shape+B.shape`, or the condensed 1-d array
+        described above.
+
+    """
+    metric_index = _pairwise_metric_index(metric)
+    A = np.ascontiguousarray(A, dtype=np.quaternion)
+    if condensed:
+        if B is not None:
+            raise ValueError("Condensed output is only possible when `B` is not given")
+        m = A.size
+        shape = (m * (m - 1) // 2,)
+        B = A
+    else:
+        B = A if B is None else np.ascontiguousarray(B, dtype=np.quaternion)
+        shape = A.shape + B.shape
+    if out is None:
+        out = np.empty(shape)
+    elif out.shape != shape or out.dtype != np.double or not out.flags['C_CONTIGUOUS']:
+        raise ValueError("Output array must be C-contiguous with dtype float64 and shape {0}".format(shape))
+    A_flat, B_flat = A.reshape(-1), B.reshape(-1)
+    out_flat = out.reshape(A_flat.size, B_flat.size) if not condensed else out
+
+    m = A_flat.size
+    threads = max(1, min(int(threads), m))
+    if condensed:
+        # Row i has m-i-1 entries, so split the rows to equalize the number of entries per thread
+        entries_before_row = np.arange(m) * m - np.arange(m) * np.arange(1, m + 1) // 2
+        bounds = np.searchsorted(entries_before_row, np.linspace(0, shape[0], threads + 1), side='left')
+        bounds[0], bounds[-1] = 0, m
+        _run_in_threads(_pairwise_distance, [(A_flat, A_flat, metric_index, out, bounds[k], bounds[k + 1], 1)
+                                             for k in range(threads) if bounds[k] < bounds[k + 1]])
+    else:
+        bounds = np.linspace(0, m, threads + 1).astype(int)
+        _run_in_threads(_pairwise_distance, [(A_flat, B_flat, metric_index, out_flat[bounds[k]:bounds[k + 1]],
+                                              bounds[k], bounds[k + 1], 0)
+                                             for k in range(threads) if bounds[k] < bounds[k + 1]])
+    return out
+
+
+def pairwise_distance_chunks(A, B=None, metric='rotation_intrinsic', chunk_size=1024, threads=1):
+    """Iterate over blocks of rows of the matrix of distances between `A` and `B`
+
+    This is a generator version of `pairwise_distance`, for distance
+    matrices that are too large to hold in memory at once.  `A` and
+    `B` are flattened, and each step yields a tuple `(rows, block)`,
+    where `rows` is a slice of the flattened `A`, and `block` is the
+    array of shape `(len(A.ravel()[rows]), B.size)` containing the
+    distances from those elements of `A` to every element of `B`.
+
+    Parameters
+    ==========
+    A, B, metric, threads:
+        As in `pairwise_distance`.
+    chunk_size: int, optional
+        Maximum number of rows in each block.  Defaults to 1024.
+
+    """
+    metric_index = _pairwise_metric_index(metric)
+    A = np.ascontiguousarray(A, dtype=np.quaternion).reshape(-1)
+    B = A if B is None else np.ascontiguousarray(B, dtype=np.quaternion).reshape(-1)
+    chunk_size = max(1, int(chunk_size))
+    for start in range(0, A.size, chunk_size):
+        stop = min(start + chunk_size, A.size)
+        block = np.empty((stop - start, B.size))
+        n_threads = max(1, min(int(threads), stop - start))
+        bounds = np.linspace(start, stop, n_threads + 1).astype(int)
+        _run_in_threads(_pairwise_distance, [(A, B, metric_index, block[bounds[k] - start:bounds[k + 1] - start],
+                                              bounds[k], bounds[k + 1], 0)
+                                             for k in range(n_threads) if bounds[k] < bounds[k + 1]])
+        yield slice(start, stop), block
+
+
+def _pairwise_metric_index(metric):
+    name = getattr(metric, '__name__', metric)
+    if isinstance(name, str) and name.endswith('_distance'):
+        name = name[:-len('_distance')]
+    if name not in _pairwise_metrics:
+        raise ValueError("Unknown metric {0!r}; expected one of {1}".format(metric, _pairwise_metrics))
+    return _pairwise_metrics.index(name)
+
+
+def _run_in_threads(function, argument_lists):
+    """Call `function` with each list of arguments, in separate threads if there is more than one"""
+    if len(argument_lists) == 1:
+        function(*argument_lists[0])
+        return
+    errors = []
+
+    def target(*args):
+        try:
+            function(*args)
+        except Exception as e:
+            errors.append(e)
+    workers = [threading.Thread(target=target, args=args) for args in argument_lists]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if errors:
+        raise errors[0]
 
 
 def isclose(a, b, rtol=4*np.finfo(float).eps, atol=0.0, equal_nan=False):
@@ -675,6 +1325,17 @@ def isclose(a, b, rtol=4*np.finfo(float).eps, atol=0.0, equal_nan=False):
     >>> quaternion.isclose([quaternion.x, np.nan*quaternion.y], [quaternion.x, np.nan*quaternion.y], equal_nan=True)
     array([True, True])
     """
+    x = np.array(a, copy=False, subok=True, ndmin=1)
+    y = np.array(b, copy=False, subok=True, ndmin=1)
+
+    # Quaternion inputs are compared in a single pass by the C ufunc
+    x_q, y_q = _as_quaternion_pair(x, y)
+    if x_q is not None:
+        result = np.isclose_vectorized(x_q, y_q, rtol, atol, bool(equal_nan))
+        if np.isscalar(a) and np.isscalar(b):
+            result = bool(result)
+        return result
+
     def within_tol(x, y, atol, rtol):
         with np.errstate(invalid='ignore'):
             result = np.less_equal(abs(x-y), atol + rtol * abs(y))
@@ -682,9 +1343,6 @@ def isclose(a, b, rtol=4*np.finfo(float).eps, atol=0.0, equal_nan=False):
             result = bool(result)
         return result
 
-    x = np.array(a, copy=False, subok=True, ndmin=1)
-    y = np.array(b, copy=False, subok=True, ndmin=1)
-
     # Make sure y is an inexact type to avoid bad behavior on abs(MIN_INT).
     # This will cause casting of x later. Also, make sure to allow subclasses
     # (e.g., for numpy.ma).
@@ -775,11 +1433,64 @@ def allclose(a, b, rtol=4*np.finfo(float).eps, atol=0.0, equal_nan=False, verbos
     some rare cases.
 
     """
-    close = isclose(a, b, rtol=rtol, atol=atol, equal_nan=equal_nan)
-    result = np.all(close)
+    x_q, y_q = _as_quaternion_pair(a, b)
+    if x_q is not None:
+        # Stop at the first element that is not close
+        result = _allclose(x_q, y_q, rtol, atol, bool(equal_nan))
+    else:
+        result = np.all(isclose(a, b, rtol=rtol, atol=atol, equal_nan=equal_nan))
     if verbose and not result:
+        close = isclose(a, b, rtol=rtol, atol=atol, equal_nan=equal_nan)
         print('Non-close values:')
         for i in np.argwhere(close == False):
             i = tuple(i)
             print('\n    x[{0}]={1}\n    y[{0}]={2}'.format(i, a[i], b[i]))
     return result
+
+
+def _as_quaternion_pair(a, b):
+    """Convert `a` and `b` to quaternion arrays if either is one already, or return (None, None)"""
+    a, b = np.asarray(a), np.asarray(b)
+    quaternion_dtype = np.dtype(np.quaternion)
+    if a.dtype != quaternion_dtype and b.dtype != quaternion_dtype:
+        return None, None
+    try:
+        return np.asarray(a, dtype=np.quaternion), np.asarray(b, dtype=np.quaternion)
+    except (TypeError, ValueError):
+        return None, None
+
+
+def _output_array(out, shape, dtype=float):
+    """Return `out` after checking its shape and dtype, or a new array if `out` is None"""
+    if out is None:
+        return np.empty(shape, dtype=dtype)
+    if not isinstance(out, np.ndarray) or out.shape != tuple(shape) or out.dtype != np.dtype(dtype):
+        raise ValueError("Output array must have shape {0} and dtype {1}".format(tuple(shape), np.dtype(dtype)))
+    return out
+
+
+def _random_generator(rng):
+    """Return a source of random numbers from a seed, generator, or None (for numpy's global random state)
+
+    An integer seeds a `RandomState`, whose stream is the same in every version of numpy.  With None, the functions
+    of the `np.random` module itself draw from the global state, which is controlled by `np.random.seed`.
+
+    """
+    if rng is None:
+        return np.random
+    if isinstance(rng, (int, np.integer)):
+        return np.random.RandomState(rng)
+    return rng
+
+
+def _standard_normal(rng, a):
+    """Fill the float array `a` with standard normal variates from `rng`, writing directly into `a` if possible"""
+    if hasattr(np.random, 'Generator') and isinstance(rng, np.random.Generator) and a.flags.c_contiguous:
+        rng.standard_normal(out=a)
+    else:
+        a[...] = rng.standard_normal(size=a.shape)
+
+
+def _matrix_elements(m):
+    """Return views of the 3x3 matrix elements in the last two dimensions of `m`, in row-major order"""
+    return [m[..., i, j] for i in range(3) for j in range(3)]
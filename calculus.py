@@ -2,11 +2,13 @@
 # See LICENSE file for details: <https://github.com/moble/quaternion/blob/master/LICENSE>
 
 from __future__ import division, print_function, absolute_import
+from collections import OrderedDict
 import numpy as np
-from quaternion.numba_wrapper import njit, jit, xrange
+import quaternion
+from quaternion.numba_wrapper import njit, xrange, prange
 
 
-def derivative(f, t):
+def derivative(f, t=None, axis=0, out=None, dt=None):
     """Fourth-order finite-differencing with non-uniform time steps
 
     The formula for this finite difference comes from Eq. (A 5b) of "Derivative formulas and errors for non-uniformly
@@ -15,268 +17,207 @@ def derivative(f, t):
 
     TODO: If there are fewer than five points, the function should revert to simpler (lower-order) formulas.
 
+    Parameters
+    ----------
+    f: array of floats or quaternions
+        Values to be differentiated.  The array may have any number of dimensions; the derivative is taken along
+        `axis`, and all other axes are treated independently (and in parallel, if numba is available).
+    t: array of floats, optional
+        Times corresponding to `f` along `axis`.  Must have length `f.shape[axis]`.  If these times are uniformly
+        spaced, the much faster uniform-grid stencil is used.  Information about non-uniform time arrays is cached,
+        so that the stencil weights need not be recomputed when many signals share the same `t`.
+    axis: int, optional
+        Axis of `f` corresponding to `t`.  Defaults to 0.
+    out: array, optional
+        Array into which the result will be written.  Must have the same shape and dtype as `f`.  If not given, a new
+        array is allocated.
+    dt: float, optional
+        Uniform time step.  If given, `t` is ignored and need not be passed.
+
+    Returns
+    -------
+    dfdt: array
+        Derivative of `f` with respect to `t`, with the same shape and dtype as `f`.  If `out` was given, this is
+        that array.
+
     """
-    dfdt = np.empty_like(f)
-    if (f.ndim == 1):
-        _derivative(f, t, dfdt)
-    elif (f.ndim == 2):
-        _derivative_2d(f, t, dfdt)
-    elif (f.ndim == 3):
-        _derivative_3d(f, t, dfdt)
+    f = np.asarray(f)
+    axis = _normalize_axis(axis, f.ndim)
+    grid = _time_grid(t, dt, f.shape[axis])
+    if f.shape[axis] < 5:
+        raise ValueError("Derivatives require at least 5 points along axis {0}; input has {1}".format(
+            axis, f.shape[axis]))
+    if out is None:
+        out = np.empty_like(f)
+    elif out.shape != f.shape or out.dtype != f.dtype:
+        raise ValueError("Output array has shape {0} and dtype {1}; expected shape {2} and dtype {3}".format(
+            out.shape, out.dtype, f.shape, f.dtype))
+    if f.dtype == np.dtype(np.quaternion):
+        f_view, out_view = quaternion.as_float_array(f), quaternion.as_float_array(out)
+    else:
+        f_view, out_view = f, out
+    f_moved = np.moveaxis(f_view, axis, 0)
+    out_moved = np.moveaxis(out_view, axis, 0)
+    if grid.dt is not None:
+        _derivative_uniform(f_moved, grid.dt, out_moved)
+        return out
+    f_2d = f_moved.reshape(f_moved.shape[0], -1)
+    out_2d = out_moved.view()
+    try:
+        out_2d.shape = f_2d.shape  # Raises if this cannot be done without copying
+    except AttributeError:
+        out_2d = np.empty(f_2d.shape, dtype=out_view.dtype)
+    if f_2d.dtype == np.float64 and out_2d.dtype == np.float64:
+        _derivative_apply_kernel(f_2d, grid.derivative_weights, out_2d)
     else:
-        raise NotImplementedError("Taking derivatives of {0}-dimensional arrays is not yet implemented".format(f.ndim))
-    return dfdt
+        # The ahead-of-time kernels are only compiled for float64, so other dtypes go to the JIT version
+        _derivative_apply(f_2d, grid.derivative_weights, out_2d)
+    if not np.shares_memory(out_2d, out_moved):
+        out_moved[...] = out_2d.reshape(out_moved.shape)
+    return out
 
 
-@njit
-def _derivative(f, t, dfdt):
-    for i in xrange(2):
-        t_i = t[i]
-        t1 = t[0]
-        t2 = t[1]
-        t3 = t[2]
-        t4 = t[3]
-        t5 = t[4]
-        h1 = t1 - t_i
-        h2 = t2 - t_i
-        h3 = t3 - t_i
-        h4 = t4 - t_i
-        h5 = t5 - t_i
-        h12 = t1 - t2
-        h13 = t1 - t3
-        h14 = t1 - t4
-        h15 = t1 - t5
-        h23 = t2 - t3
-        h24 = t2 - t4
-        h25 = t2 - t5
-        h34 = t3 - t4
-        h35 = t3 - t5
-        h45 = t4 - t5
-        dfdt[i] = (-((h2 * h3 * h4 + h2 * h3 * h5 + h2 * h4 * h5 + h3 * h4 * h5) / (h12 * h13 * h14 * h15)) * f[0]
-                   + ((h1 * h3 * h4 + h1 * h3 * h5 + h1 * h4 * h5 + h3 * h4 * h5) / (h12 * h23 * h24 * h25)) * f[1]
-                   - ((h1 * h2 * h4 + h1 * h2 * h5 + h1 * h4 * h5 + h2 * h4 * h5) / (h13 * h23 * h34 * h35)) * f[2]
-                   + ((h1 * h2 * h3 + h1 * h2 * h5 + h1 * h3 * h5 + h2 * h3 * h5) / (h14 * h24 * h34 * h45)) * f[3]
-                   - ((h1 * h2 * h3 + h1 * h2 * h4 + h1 * h3 * h4 + h2 * h3 * h4) / (h15 * h25 * h35 * h45)) * f[4])
-
-    for i in xrange(2, len(t) - 2):
-        t1 = t[i - 2]
-        t2 = t[i - 1]
-        t3 = t[i]
-        t4 = t[i + 1]
-        t5 = t[i + 2]
-        h1 = t1 - t3
-        h2 = t2 - t3
-        h4 = t4 - t3
-        h5 = t5 - t3
-        h12 = t1 - t2
-        h13 = t1 - t3
-        h14 = t1 - t4
-        h15 = t1 - t5
-        h23 = t2 - t3
-        h24 = t2 - t4
-        h25 = t2 - t5
-        h34 = t3 - t4
-        h35 = t3 - t5
-        h45 = t4 - t5
-        dfdt[i] = (-((h2 * h4 * h5) / (h12 * h13 * h14 * h15)) * f[i - 2]
-                   + ((h1 * h4 * h5) / (h12 * h23 * h24 * h25)) * f[i - 1]
-                   - ((h1 * h2 * h4 + h1 * h2 * h5 + h1 * h4 * h5 + h2 * h4 * h5) / (h13 * h23 * h34 * h35)) * f[i]
-                   + ((h1 * h2 * h5) / (h14 * h24 * h34 * h45)) * f[i + 1]
-                   - ((h1 * h2 * h4) / (h15 * h25 * h35 * h45)) * f[i + 2])
+def _normalize_axis(axis, ndim):
+    if not -ndim <= axis < ndim:
+        raise ValueError("Axis {0} is out of bounds for array of dimension {1}".format(axis, ndim))
+    return axis % ndim
 
-    for i in xrange(len(t) - 2, len(t)):
-        t_i = t[i]
-        t1 = t[-5]
-        t2 = t[-4]
-        t3 = t[-3]
-        t4 = t[-2]
-        t5 = t[-1]
-        h1 = t1 - t_i
-        h2 = t2 - t_i
-        h3 = t3 - t_i
-        h4 = t4 - t_i
-        h5 = t5 - t_i
-        h12 = t1 - t2
-        h13 = t1 - t3
-        h14 = t1 - t4
-        h15 = t1 - t5
-        h23 = t2 - t3
-        h24 = t2 - t4
-        h25 = t2 - t5
-        h34 = t3 - t4
-        h35 = t3 - t5
-        h45 = t4 - t5
-        dfdt[i] = (-((h2 * h3 * h4 + h2 * h3 * h5 + h2 * h4 * h5 + h3 * h4 * h5) / (h12 * h13 * h14 * h15)) * f[-5]
-                   + ((h1 * h3 * h4 + h1 * h3 * h5 + h1 * h4 * h5 + h3 * h4 * h5) / (h12 * h23 * h24 * h25)) * f[-4]
-                   - ((h1 * h2 * h4 + h1 * h2 * h5 + h1 * h4 * h5 + h2 * h4 * h5) / (h13 * h23 * h34 * h35)) * f[-3]
-                   + ((h1 * h2 * h3 + h1 * h2 * h5 + h1 * h3 * h5 + h2 * h3 * h5) / (h14 * h24 * h34 * h45)) * f[-2]
-                   - ((h1 * h2 * h3 + h1 * h2 * h4 + h1 * h3 * h4 + h2 * h3 * h4) / (h15 * h25 * h35 * h45)) * f[-1])
 
-    return
+class _TimeGrid(object):
+    """Information about a time axis that may be shared by many signals
 
+    If the grid is uniform, `dt` is its step and the general derivative stencil weights are never needed.  Otherwise,
+    `dt` is None.  Weights are computed the first time they are requested, and then kept for reuse.
 
-@njit
-def _derivative_2d(f, t, dfdt):
-    for i in xrange(2):
-        t_i = t[i]
-        t1 = t[0]
-        t2 = t[1]
-        t3 = t[2]
-        t4 = t[3]
-        t5 = t[4]
-        h1 = t1 - t_i
-        h2 = t2 - t_i
-        h3 = t3 - t_i
-        h4 = t4 - t_i
-        h5 = t5 - t_i
-        h12 = t1 - t2
-        h13 = t1 - t3
-        h14 = t1 - t4
-        h15 = t1 - t5
-        h23 = t2 - t3
-        h24 = t2 - t4
-        h25 = t2 - t5
-        h34 = t3 - t4
-        h35 = t3 - t5
-        h45 = t4 - t5
-        for k in xrange(f.shape[1]):
-            dfdt[i, k] = (
-            -((h2 * h3 * h4 + h2 * h3 * h5 + h2 * h4 * h5 + h3 * h4 * h5) / (h12 * h13 * h14 * h15)) * f[0, k]
-            + ((h1 * h3 * h4 + h1 * h3 * h5 + h1 * h4 * h5 + h3 * h4 * h5) / (h12 * h23 * h24 * h25)) * f[1, k]
-            - ((h1 * h2 * h4 + h1 * h2 * h5 + h1 * h4 * h5 + h2 * h4 * h5) / (h13 * h23 * h34 * h35)) * f[2, k]
-            + ((h1 * h2 * h3 + h1 * h2 * h5 + h1 * h3 * h5 + h2 * h3 * h5) / (h14 * h24 * h34 * h45)) * f[3, k]
-            - ((h1 * h2 * h3 + h1 * h2 * h4 + h1 * h3 * h4 + h2 * h3 * h4) / (h15 * h25 * h35 * h45)) * f[4, k])
-
-    for i in xrange(2, len(t) - 2):
-        t1 = t[i - 2]
-        t2 = t[i - 1]
-        t3 = t[i]
-        t4 = t[i + 1]
-        t5 = t[i + 2]
-        h1 = t1 - t3
-        h2 = t2 - t3
-        h4 = t4 - t3
-        h5 = t5 - t3
-        h12 = t1 - t2
-        h13 = t1 - t3
-        h14 = t1 - t4
-        h15 = t1 - t5
-        h23 = t2 - t3
-        h24 = t2 - t4
-        h25 = t2 - t5
-        h34 = t3 - t4
-        h35 = t3 - t5
-        h45 = t4 - t5
-        for k in xrange(f.shape[1]):
-            dfdt[i, k] = (-((h2 * h4 * h5) / (h12 * h13 * h14 * h15)) * f[i - 2, k]
-                          + ((h1 * h4 * h5) / (h12 * h23 * h24 * h25)) * f[i - 1, k]
-                          - ((h1 * h2 * h4 + h1 * h2 * h5 + h1 * h4 * h5 + h2 * h4 * h5) / (h13 * h23 * h34 * h35))
-                            * f[i, k]
-                          + ((h1 * h2 * h5) / (h14 * h24 * h34 * h45)) * f[i + 1, k]
-                          - ((h1 * h2 * h4) / (h15 * h25 * h35 * h45)) * f[i + 2, k])
-
-    for i in xrange(len(t) - 2, len(t)):
-        t_i = t[i]
-        t1 = t[-5]
-        t2 = t[-4]
-        t3 = t[-3]
-        t4 = t[-2]
-        t5 = t[-1]
-        h1 = t1 - t_i
-        h2 = t2 - t_i
-        h3 = t3 - t_i
-        h4 = t4 - t_i
-        h5 = t5 - t_i
-        h12 = t1 - t2
-        h13 = t1 - t3
-        h14 = t1 - t4
-        h15 = t1 - t5
-        h23 = t2 - t3
-        h24 = t2 - t4
-        h25 = t2 - t5
-        h34 = t3 - t4
-        h35 = t3 - t5
-        h45 = t4 - t5
-        for k in xrange(f.shape[1]):
-            dfdt[i, k] = (
-            -((h2 * h3 * h4 + h2 * h3 * h5 + h2 * h4 * h5 + h3 * h4 * h5) / (h12 * h13 * h14 * h15)) * f[-5, k]
-            + ((h1 * h3 * h4 + h1 * h3 * h5 + h1 * h4 * h5 + h3 * h4 * h5) / (h12 * h23 * h24 * h25)) * f[-4, k]
-            - ((h1 * h2 * h4 + h1 * h2 * h5 + h1 * h4 * h5 + h2 * h4 * h5) / (h13 * h23 * h34 * h35)) * f[-3, k]
-            + ((h1 * h2 * h3 + h1 * h2 * h5 + h1 * h3 * h5 + h2 * h3 * h5) / (h14 * h24 * h34 * h45)) * f[-2, k]
-            - ((h1 * h2 * h3 + h1 * h2 * h4 + h1 * h3 * h4 + h2 * h3 * h4) / (h15 * h25 * h35 * h45)) * f[-1, k])
+    """
+    def __init__(self, t, dt, n):
+        self.t = t
+        self.dt = dt
+        self.n = n
+        self._derivative_weights = None
+        self._interval_weights = {}
+        self._quadrature_weights = {}
 
-    return
+    @property
+    def steps(self):
+        if self.t is None:
+            return np.full(self.n - 1, self.dt)
+        return np.diff(self.t)
 
+    @property
+    def derivative_weights(self):
+        if self._derivative_weights is None:
+            weights = np.empty((len(self.t), 5))
+            _derivative_weights_kernel(self.t, weights)
+            self._derivative_weights = weights
+        return self._derivative_weights
 
-@njit
-def _derivative_3d(f, t, dfdt):
-    for i in xrange(2):
-        t_i = t[i]
-        t1 = t[0]
-        t2 = t[1]
-        t3 = t[2]
-        t4 = t[3]
-        t5 = t[4]
-        h1 = t1 - t_i
-        h2 = t2 - t_i
-        h3 = t3 - t_i
-        h4 = t4 - t_i
-        h5 = t5 - t_i
-        h12 = t1 - t2
-        h13 = t1 - t3
-        h14 = t1 - t4
-        h15 = t1 - t5
-        h23 = t2 - t3
-        h24 = t2 - t4
-        h25 = t2 - t5
-        h34 = t3 - t4
-        h35 = t3 - t5
-        h45 = t4 - t5
-        for k in xrange(f.shape[1]):
-            for m in xrange(f.shape[1]):
-                dfdt[i, k, m] = (
-                -((h2 * h3 * h4 + h2 * h3 * h5 + h2 * h4 * h5 + h3 * h4 * h5) / (h12 * h13 * h14 * h15)) * f[0, k, m]
-                + ((h1 * h3 * h4 + h1 * h3 * h5 + h1 * h4 * h5 + h3 * h4 * h5) / (h12 * h23 * h24 * h25)) * f[1, k, m]
-                - ((h1 * h2 * h4 + h1 * h2 * h5 + h1 * h4 * h5 + h2 * h4 * h5) / (h13 * h23 * h34 * h35)) * f[2, k, m]
-                + ((h1 * h2 * h3 + h1 * h2 * h5 + h1 * h3 * h5 + h2 * h3 * h5) / (h14 * h24 * h34 * h45)) * f[3, k, m]
-                - ((h1 * h2 * h3 + h1 * h2 * h4 + h1 * h3 * h4 + h2 * h3 * h4) / (h15 * h25 * h35 * h45)) * f[4, k, m])
-
-    for i in xrange(2, len(t) - 2):
-        t1 = t[i - 2]
-        t2 = t[i - 1]
-        t3 = t[i]
-        t4 = t[i + 1]
-        t5 = t[i + 2]
-        h1 = t1 - t3
-        h2 = t2 - t3
-        h4 = t4 - t3
-        h5 = t5 - t3
-        h12 = t1 - t2
-        h13 = t1 - t3
-        h14 = t1 - t4
-        h15 = t1 - t5
-        h23 = t2 - t3
-        h24 = t2 - t4
-        h25 = t2 - t5
-        h34 = t3 - t4
-        h35 = t3 - t5
-        h45 = t4 - t5
-        for k in xrange(f.shape[1]):
-            for m in xrange(f.shape[1]):
-                dfdt[i, k, m] = (-((h2 * h4 * h5) / (h12 * h13 * h14 * h15)) * f[i - 2, k, m]
-                              + ((h1 * h4 * h5) / (h12 * h23 * h24 * h25)) * f[i - 1, k, m]
-                              - ((h1 * h2 * h4 + h1 * h2 * h5 + h1 * h4 * h5 + h2 * h4 * h5) / (h13 * h23 * h34 * h35))
-                                 * f[i, k, m]
-                              + ((h1 * h2 * h5) / (h14 * h24 * h34 * h45)) * f[i + 1, k, m]
-                              - ((h1 * h2 * h4) / (h15 * h25 * h35 * h45)) * f[i + 2, k, m])
-
-    for i in xrange(len(t) - 2, len(t)):
+    def interval_weights(self, method):
+        """Weights giving the integral over each interval in terms of the nearby values
+
+        Row `i` of the result gives the integral from `t[i]` to `t[i+1]` as the dot product of the row with the
+        values at consecutive points starting with `i`.  For Simpson's rule, the last row instead begins with point
+        `n-3`, because there is no point beyond the last interval.
+
+        """
+        if method not in self._interval_weights:
+            h = self.steps
+            if method == 'trapezoid':
+                weights = np.empty((self.n - 1, 2))
+                weights[:, 0] = h / 2.0
+                weights[:, 1] = h / 2.0
+            elif method == 'simpson':
+                if self.n < 3:
+                    raise ValueError("Simpson's rule requires at least 3 points; input has {0}".format(self.n))
+                # Integrate the quadratic through points (i, i+1, i+2) over the first of its intervals
+                a, b = h[:-1], h[1:]
+                weights = np.empty((self.n - 1, 3))
+                weights[:-1, 0] = a * (2 * a + 3 * b) / (6 * (a + b))
+                weights[:-1, 1] = a * (a + 3 * b) / (6 * b)
+                weights[:-1, 2] = -a**3 / (6 * b * (a + b))
+                # ...and the quadratic through the last three points over the second of its intervals
+                a, b = h[-2], h[-1]
+                weights[-1, 0] = -b**3 / (6 * a * (a + b))
+                weights[-1, 1] = b * (b + 3 * a) / (6 * a)
+                weights[-1, 2] = b * (2 * b + 3 * a) / (6 * (a + b))
+            else:
+                raise ValueError("Unknown integration method '{0}'; use 'trapezoid' or 'simpson'".format(method))
+            self._interval_weights[method] = weights
+        return self._interval_weights[method]
+
+    def quadrature_weights(self, method):
+        """Weights giving the integral over the whole grid as a dot product with the values at every point"""
+        if method not in self._quadrature_weights:
+            interval_weights = self.interval_weights(method)
+            k = interval_weights.shape[1]
+            m = self.n - k + 1  # Number of intervals whose stencil starts at the interval's own first point
+            weights = np.zeros(self.n)
+            for j in range(k):
+                weights[j:j + m] += interval_weights[:m, j]
+                weights[self.n - k + j] += interval_weights[m:, j].sum()
+            self._quadrature_weights[method] = weights
+        return self._quadrature_weights[method]
+
+
+_time_grid_cache = OrderedDict()
+_time_grid_cache_size = 16
+
+
+def _uniform_step(t):
+    """Return the step of `t` if it is uniformly spaced to within roundoff, or None otherwise"""
+    if t.size < 2:
+        return None
+    dt = (t[-1] - t[0]) / (t.size - 1)
+    if dt == 0.0 or not np.isfinite(dt):
+        return None
+    tolerance = 64 * np.finfo(float).eps * max(abs(t[0]), abs(t[-1]))
+    if np.max(np.abs(np.diff(t) - dt)) > tolerance:
+        return None
+    return dt
+
+
+def _time_grid(t, dt, n):
+    """Return the (possibly cached) `_TimeGrid` for the time array `t`, or for the uniform step `dt`"""
+    if dt is not None:
+        key = (float(dt), n)
+        grid = _time_grid_cache.pop(key, None)
+        if grid is None:
+            grid = _TimeGrid(None, float(dt), n)
+    else:
+        if t is None:
+            raise ValueError("Either `t` or `dt` must be given")
+        t = np.asarray(t, dtype=float)
+        if t.shape != (n,):
+            raise ValueError("Input `t` has shape {0}, but the input data has length {1} along the time axis".format(
+                t.shape, n))
+        key = hash(t.tobytes())
+        grid = _time_grid_cache.pop(key, None)
+        if grid is None or not np.array_equal(grid.t, t):
+            grid = _TimeGrid(t.copy(), _uniform_step(t), n)
+    _time_grid_cache[key] = grid  # (Re-)insert as most recently used
+    while len(_time_grid_cache) > _time_grid_cache_size:
+        _time_grid_cache.popitem(last=False)
+    return grid
+
+
+@njit(cache=True)
+def _derivative_weights(t, weights):
+    """Compute the five stencil weights for each point of `t`
+
+    Row `i` of `weights` holds the coefficients multiplying `f[s]`, ..., `f[s+4]`, where `s = min(max(i-2, 0),
+    len(t)-5)`.  Away from the boundaries, the stencil is centered on `t[i]`, so `h3` below is identically zero, and
+    this expression reduces exactly to the simpler centered formula.
+
+    """
+    n = len(t)
+    for i in xrange(n):
+        s = min(max(i - 2, 0), n - 5)
         t_i = t[i]
-        t1 = t[-5]
-        t2 = t[-4]
-        t3 = t[-3]
-        t4 = t[-2]
-        t5 = t[-1]
+        t1 = t[s]
+        t2 = t[s + 1]
+        t3 = t[s + 2]
+        t4 = t[s + 3]
+        t5 = t[s + 4]
         h1 = t1 - t_i
         h2 = t2 - t_i
         h3 = t3 - t_i
@@ -292,33 +233,153 @@ def _derivative_3d(f, t, dfdt):
         h34 = t3 - t4
         h35 = t3 - t5
         h45 = t4 - t5
-        for k in xrange(f.shape[1]):
-            for m in xrange(f.shape[1]):
-                dfdt[i, k, m] = (
-                -((h2 * h3 * h4 + h2 * h3 * h5 + h2 * h4 * h5 + h3 * h4 * h5) / (h12 * h13 * h14 * h15)) * f[-5, k, m]
-                + ((h1 * h3 * h4 + h1 * h3 * h5 + h1 * h4 * h5 + h3 * h4 * h5) / (h12 * h23 * h24 * h25)) * f[-4, k, m]
-                - ((h1 * h2 * h4 + h1 * h2 * h5 + h1 * h4 * h5 + h2 * h4 * h5) / (h13 * h23 * h34 * h35)) * f[-3, k, m]
-                + ((h1 * h2 * h3 + h1 * h2 * h5 + h1 * h3 * h5 + h2 * h3 * h5) / (h14 * h24 * h34 * h45)) * f[-2, k, m]
-                - ((h1 * h2 * h3 + h1 * h2 * h4 + h1 * h3 * h4 + h2 * h3 * h4) / (h15 * h25 * h35 * h45)) * f[-1, k, m])
+        weights[i, 0] = -((h2 * h3 * h4 + h2 * h3 * h5 + h2 * h4 * h5 + h3 * h4 * h5) / (h12 * h13 * h14 * h15))
+        weights[i, 1] = ((h1 * h3 * h4 + h1 * h3 * h5 + h1 * h4 * h5 + h3 * h4 * h5) / (h12 * h23 * h24 * h25))
+        weights[i, 2] = -((h1 * h2 * h4 + h1 * h2 * h5 + h1 * h4 * h5 + h2 * h4 * h5) / (h13 * h23 * h34 * h35))
+        weights[i, 3] = ((h1 * h2 * h3 + h1 * h2 * h5 + h1 * h3 * h5 + h2 * h3 * h5) / (h14 * h24 * h34 * h45))
+        weights[i, 4] = -((h1 * h2 * h3 + h1 * h2 * h4 + h1 * h3 * h4 + h2 * h3 * h4) / (h15 * h25 * h35 * h45))
+    return
 
+
+@njit(parallel=True, cache=True)
+def _derivative_apply(f, weights, dfdt):
+    """Apply the stencil weights along the first axis of the 2-d array `f`, in parallel over the second axis"""
+    n = f.shape[0]
+    for k in prange(f.shape[1]):
+        for i in xrange(n):
+            s = min(max(i - 2, 0), n - 5)
+            dfdt[i, k] = (weights[i, 0] * f[s, k] + weights[i, 1] * f[s + 1, k] + weights[i, 2] * f[s + 2, k]
+                          + weights[i, 3] * f[s + 3, k] + weights[i, 4] * f[s + 4, k])
     return
 
 
-# @njit('void(f8[:,:], f8[:], f8[:,:])')
-@jit
-def indefinite_integral(f, t):
-    Sfdt = np.empty_like(f)
-    Sfdt[0] = 0.0
-    for i in xrange(1, len(t)):
-        for j in xrange(f.shape[1]):
-            Sfdt[i, j] = Sfdt[i - 1, j] + (f[i, j] + f[i - 1, j]) * ((t[i] - t[i - 1]) / 2.0)
-    return Sfdt
-
-
-#@njit('void(f8[:,:], f8[:], f8[:])')
-@jit
-def definite_integral(f, t):
-    Sfdt = np.zeros_like(f)
-    for i in xrange(1, f.shape[0]):
-        Sfdt[i, ...] += (f[i, ...] + f[i - 1, ...]) * ((t[i] - t[i - 1]) / 2.0)
-    return Sfdt
+# Prefer the kernels compiled ahead of time by `quaternion.numba_aot`, if they have been built
+try:
+    from quaternion._numba_aot import (derivative_weights as _derivative_weights_kernel,
+                                       derivative_apply as _derivative_apply_kernel)
+except ImportError:
+    _derivative_weights_kernel, _derivative_apply_kernel = _derivative_weights, _derivative_apply
+
+# Weights for the first two points of a uniform grid with unit step; the last two are the negated reversals.  The
+# interior stencil is (1, -8, 0, 8, -1)/12.
+_uniform_derivative_boundary_weights = np.array([[-25.0, 48.0, -36.0, 16.0, -3.0],
+                                                 [-3.0, -10.0, 18.0, -6.0, 1.0]]) / 12.0
+
+
+def _derivative_uniform(f, dt, dfdt):
+    """Apply the uniform-grid stencil along the first axis of `f`, as a sequence of whole-array operations"""
+    interior = dfdt[2:-2]
+    np.subtract(f[3:-1], f[1:-3], out=interior)
+    interior *= 8.0
+    interior += f[:-4]
+    interior -= f[4:]
+    interior *= 1.0 / (12.0 * dt)
+    for i in range(2):
+        weights = _uniform_derivative_boundary_weights[i] / dt
+        dfdt[i] = np.tensordot(weights, f[:5], axes=1)
+        dfdt[-1 - i] = np.tensordot(-weights[::-1], f[-5:], axes=1)
+
+
+def indefinite_integral(f, t=None, axis=0, out=None, dt=None, method='trapezoid'):
+    """Integrate `f` along `axis`, returning the integral from the first time up to each time
+
+    Parameters
+    ----------
+    f: array of floats or quaternions
+        Values to be integrated.  The array may have any number of dimensions; all axes other than `axis` are
+        treated independently.
+    t: array of floats, optional
+        Times corresponding to `f` along `axis`.  Must have length `f.shape[axis]`.
+    axis: int, optional
+        Axis of `f` corresponding to `t`.  Defaults to 0.
+    out: array, optional
+        Array into which the result will be written.  Must have the same shape and dtype as `f`.
+    dt: float, optional
+        Uniform time step.  If given, `t` is ignored and need not be passed.
+    method: {'trapezoid', 'simpson'}, optional
+        The trapezoidal rule (the default) is second-order accurate.  Simpson's rule integrates the quadratic through
+        each interval and its neighbor, which is exact for quadratics (even on non-uniform grids).
+
+    Returns
+    -------
+    Sfdt: array
+        Same shape and dtype as `f`, with `Sfdt` equal to 0 at the first time along `axis`.
+
+    """
+    f = np.asarray(f)
+    axis = _normalize_axis(axis, f.ndim)
+    grid = _time_grid(t, dt, f.shape[axis])
+    if out is None:
+        out = np.empty_like(f)
+    elif out.shape != f.shape or out.dtype != f.dtype:
+        raise ValueError("Output array has shape {0} and dtype {1}; expected shape {2} and dtype {3}".format(
+            out.shape, out.dtype, f.shape, f.dtype))
+    if f.dtype == np.dtype(np.quaternion):
+        f_view, out_view = quaternion.as_float_array(f), quaternion.as_float_array(out)
+    else:
+        f_view, out_view = f, out
+    f_moved = np.moveaxis(f_view, axis, 0)
+    out_moved = np.moveaxis(out_view, axis, 0)
+    out_moved[0] = 0.0
+    if method == 'trapezoid' and grid.dt is not None:
+        np.add(f_moved[1:], f_moved[:-1], out=out_moved[1:])
+        np.cumsum(out_moved[1:], axis=0, out=out_moved[1:])
+        out_moved[1:] *= grid.dt / 2.0
+    else:
+        _interval_integrals(f_moved, grid.interval_weights(method), out_moved[1:])
+        np.cumsum(out_moved[1:], axis=0, out=out_moved[1:])
+    return out
+
+
+def definite_integral(f, t=None, axis=0, dt=None, method='trapezoid'):
+    """Integrate `f` along `axis` over the full range of times
+
+    This reduces over `axis`, computing the integral as a single weighted sum of the input values, so the only
+    additional memory used beyond the output is a vector of weights for the time axis (which is cached and reused for
+    equal time arrays).  The sum runs over `f` in place along any axis, so no copy of `f` is made.
+
+    Parameters
+    ----------
+    f: array of floats or quaternions
+        Values to be integrated.
+    t: array of floats, optional
+        Times corresponding to `f` along `axis`.  Must have length `f.shape[axis]`.
+    axis: int, optional
+        Axis of `f` corresponding to `t`.  Defaults to 0.
+    dt: float, optional
+        Uniform time step.  If given, `t` is ignored and need not be passed.
+    method: {'trapezoid', 'simpson'}, optional
+        Integration rule, as in `indefinite_integral`.
+
+    Returns
+    -------
+    Sfdt: array or scalar
+        Integral with the same dtype as `f`, and the shape of `f` with `axis` removed.
+
+    """
+    f = np.asarray(f)
+    axis = _normalize_axis(axis, f.ndim)
+    grid = _time_grid(t, dt, f.shape[axis])
+    is_quaternion = (f.dtype == np.dtype(np.quaternion))
+    if is_quaternion:
+        f = quaternion.as_float_array(f)
+    # Unlike `np.tensordot`, `np.einsum` (without `optimize`) iterates over `f` directly instead of transposing it
+    axes = list(range(f.ndim))
+    Sfdt = np.einsum(grid.quadrature_weights(method), [axis], f, axes, axes[:axis] + axes[axis + 1:])
+    if is_quaternion:
+        return quaternion.as_quat_array(Sfdt)
+    return Sfdt[()]
+
+
+def _interval_integrals(f, weights, integrals):
+    """Evaluate the integral over each interval along the first axis of `f`, as given by `_TimeGrid.interval_weights`"""
+    k = weights.shape[1]
+    m = f.shape[0] - k + 1  # Number of intervals whose stencil starts at the interval's own first point
+    weights = weights.reshape(weights.shape + (1,) * (f.ndim - 1))
+    np.multiply(weights[:m, 0], f[:m], out=integrals[:m])
+    for j in range(1, k):
+        integrals[:m] += weights[:m, j] * f[j:j + m]
+    for i in range(m, len(integrals)):
+        integrals[i] = weights[i, 0] * f[-k]
+        for j in range(1, k):
+            integrals[i] += weights[i, j] * f[j - k]
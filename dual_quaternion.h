@@ -0,0 +1,174 @@
+// Copyright (c) 2018, Michael Boyle
+// See LICENSE file for details: <https://github.com/moble/quaternion/blob/master/LICENSE>
+
+// Dual quaternions r + eps*d, with eps^2 = 0, built from pairs of quaternions
+//
+// A rigid transformation that rotates by the quaternion R and then translates by the vector t is represented by
+// r = R and d = t*R/2, where t is treated as a pure-vector quaternion.  The product dq1*dq2 represents the
+// transformation dq2 followed by dq1, just as for rotors.  The rotation need not be normalized: everything below that
+// extracts the rotation or translation divides by the norm of the real part, so that a nonzero multiple of a dual
+// quaternion represents the same transformation -- except for `dual_quaternion_sclerp`, which requires unit inputs.
+
+#ifndef __DUAL_QUATERNION_H__
+#define __DUAL_QUATERNION_H__
+
+#include "quaternion.h"
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+  typedef struct {
+    quaternion r;  // real part, representing the rotation
+    quaternion d;  // dual part, representing the translation
+  } dual_quaternion;
+
+  // Unary bool returners
+  static NPY_INLINE int dual_quaternion_isnan(dual_quaternion q) {
+    return quaternion_isnan(q.r) || quaternion_isnan(q.d);
+  }
+  static NPY_INLINE int dual_quaternion_nonzero(dual_quaternion q) {
+    return quaternion_nonzero(q.r) || quaternion_nonzero(q.d);
+  }
+  static NPY_INLINE int dual_quaternion_isinf(dual_quaternion q) {
+    return quaternion_isinf(q.r) || quaternion_isinf(q.d);
+  }
+  static NPY_INLINE int dual_quaternion_isfinite(dual_quaternion q) {
+    return quaternion_isfinite(q.r) && quaternion_isfinite(q.d);
+  }
+
+  // Binary bool returners
+  static NPY_INLINE int dual_quaternion_equal(dual_quaternion q1, dual_quaternion q2) {
+    return quaternion_equal(q1.r, q2.r) && quaternion_equal(q1.d, q2.d);
+  }
+  static NPY_INLINE int dual_quaternion_not_equal(dual_quaternion q1, dual_quaternion q2) {
+    return !dual_quaternion_equal(q1, q2);
+  }
+
+  // Unary dual-quaternion returners
+  static NPY_INLINE dual_quaternion dual_quaternion_conjugate(dual_quaternion q) {
+    // The quaternion conjugate of each part, so that the conjugate of a unit dual quaternion is its inverse
+    dual_quaternion r = {quaternion_conjugate(q.r), quaternion_conjugate(q.d)};
+    return r;
+  }
+  static NPY_INLINE dual_quaternion dual_quaternion_inverse(dual_quaternion q) {
+    // (r + eps*d)^{-1} = r^{-1} - eps * r^{-1} * d * r^{-1}
+    quaternion r_inverse = quaternion_inverse(q.r);
+    dual_quaternion r = {
+      r_inverse,
+      quaternion_negative(quaternion_multiply(quaternion_multiply(r_inverse, q.d), r_inverse))
+    };
+    return r;
+  }
+  static NPY_INLINE dual_quaternion dual_quaternion_normalized(dual_quaternion q) {
+    // Scale the real part to unit norm, and then project the dual part so that it is orthogonal to the real part (as
+    // four-vectors), which is the condition for the dual norm to be exactly 1
+    double r_abs = quaternion_absolute(q.r);
+    double r_dot_d;
+    dual_quaternion r = {
+      {q.r.w/r_abs, q.r.x/r_abs, q.r.y/r_abs, q.r.z/r_abs},
+      {q.d.w/r_abs, q.d.x/r_abs, q.d.y/r_abs, q.d.z/r_abs}
+    };
+    r_dot_d = r.r.w*r.d.w + r.r.x*r.d.x + r.r.y*r.d.y + r.r.z*r.d.z;
+    r.d.w -= r_dot_d*r.r.w;
+    r.d.x -= r_dot_d*r.r.x;
+    r.d.y -= r_dot_d*r.r.y;
+    r.d.z -= r_dot_d*r.r.z;
+    return r;
+  }
+
+  // Binary dual-quaternion returners
+  static NPY_INLINE dual_quaternion dual_quaternion_multiply(dual_quaternion q1, dual_quaternion q2) {
+    quaternion d1 = quaternion_multiply(q1.r, q2.d), d2 = quaternion_multiply(q1.d, q2.r);
+    dual_quaternion r = {quaternion_multiply(q1.r, q2.r), {d1.w+d2.w, d1.x+d2.x, d1.y+d2.y, d1.z+d2.z}};
+    return r;
+  }
+
+  // Conversions
+  static NPY_INLINE dual_quaternion dual_quaternion_from_rotation_and_translation(quaternion R, double t[]) {
+    // d = t*R/2
+    dual_quaternion r = {
+      R,
+      {
+        (-t[0]*R.x - t[1]*R.y - t[2]*R.z) / 2,
+        ( t[0]*R.w + t[1]*R.z - t[2]*R.y) / 2,
+        (-t[0]*R.z + t[1]*R.w + t[2]*R.x) / 2,
+        ( t[0]*R.y - t[1]*R.x + t[2]*R.w) / 2
+      }
+    };
+    return r;
+  }
+  static NPY_INLINE void dual_quaternion_translation(dual_quaternion q, double t[]) {
+    // The vector part of 2*d*conj(r)/|r|^2
+    double f = 2 / quaternion_norm(q.r);
+    t[0] = f * (-q.d.w*q.r.x + q.d.x*q.r.w - q.d.y*q.r.z + q.d.z*q.r.y);
+    t[1] = f * (-q.d.w*q.r.y + q.d.x*q.r.z + q.d.y*q.r.w - q.d.z*q.r.x);
+    t[2] = f * (-q.d.w*q.r.z - q.d.x*q.r.y + q.d.y*q.r.x + q.d.z*q.r.w);
+  }
+  static NPY_INLINE void dual_quaternion_transform_point(dual_quaternion q, double v[], double vprime[]) {
+    // Rotate as in `rotate_vectors`, using v' = v + 2 * r x (s * v + r x v) / m, and then translate
+    double t[3], f = 2 / quaternion_norm(q.r);
+    quaternion R = q.r;
+    double u[3] = {
+      R.w*v[0] + R.y*v[2] - R.z*v[1],
+      R.w*v[1] + R.z*v[0] - R.x*v[2],
+      R.w*v[2] + R.x*v[1] - R.y*v[0]
+    };
+    dual_quaternion_translation(q, t);
+    vprime[0] = v[0] + f*(R.y*u[2] - R.z*u[1]) + t[0];
+    vprime[1] = v[1] + f*(R.z*u[0] - R.x*u[2]) + t[1];
+    vprime[2] = v[2] + f*(R.x*u[1] - R.y*u[0]) + t[2];
+  }
+
+  // Screw linear interpolation
+  static NPY_INLINE dual_quaternion dual_quaternion_power_scalar(dual_quaternion q, double tau) {
+    // Power of a unit dual quaternion with nonnegative scalar part.  Writing the real part as cos(a) + l*sin(a), for
+    // unit vector l, the dual part is -sin(a)*h + eps*(m*sin(a) + l*cos(a)*h), where h is half the translation along
+    // the screw axis and m is the moment of the axis.  The power scales the dual angle a + eps*h by tau.
+    double s = sqrt(q.r.x*q.r.x + q.r.y*q.r.y + q.r.z*q.r.z);
+    double c = q.r.w;
+    dual_quaternion r;
+    if(s > _QUATERNION_EPS*fabs(c)) {
+      double a = atan2(s, c);
+      double h = -q.d.w / s;
+      double l[3] = {q.r.x/s, q.r.y/s, q.r.z/s};
+      double m[3] = {(q.d.x - l[0]*c*h)/s, (q.d.y - l[1]*c*h)/s, (q.d.z - l[2]*c*h)/s};
+      double sin_ta = sin(tau*a), cos_ta = cos(tau*a);
+      double lf = cos_ta*tau*h;
+      r.r.w = cos_ta;
+      r.r.x = l[0]*sin_ta;
+      r.r.y = l[1]*sin_ta;
+      r.r.z = l[2]*sin_ta;
+      r.d.w = -sin_ta*tau*h;
+      r.d.x = m[0]*sin_ta + l[0]*lf;
+      r.d.y = m[1]*sin_ta + l[1]*lf;
+      r.d.z = m[2]*sin_ta + l[2]*lf;
+    } else {
+      // Pure translation (to within roundoff), for which the screw axis is undefined, but the power is linear
+      r.r.w = cos(tau*atan2(s, c));
+      r.r.x = tau*q.r.x;
+      r.r.y = tau*q.r.y;
+      r.r.z = tau*q.r.z;
+      r.d.w = tau*q.d.w;
+      r.d.x = tau*q.d.x;
+      r.d.y = tau*q.d.y;
+      r.d.z = tau*q.d.z;
+    }
+    return r;
+  }
+  static NPY_INLINE dual_quaternion dual_quaternion_sclerp(dual_quaternion q1, dual_quaternion q2, double tau) {
+    // (q2 * q1^{-1})^tau * q1 for unit dual quaternions, which moves along the screw taking q1 to q2 (or -q2,
+    // whichever is shorter) at a constant rate
+    dual_quaternion q_rel = dual_quaternion_multiply(q2, dual_quaternion_conjugate(q1));
+    if(q_rel.r.w < 0) {
+      q_rel.r = quaternion_negative(q_rel.r);
+      q_rel.d = quaternion_negative(q_rel.d);
+    }
+    return dual_quaternion_multiply(dual_quaternion_power_scalar(q_rel, tau), q1);
+  }
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif // __DUAL_QUATERNION_H__
@@ -22,11 +22,9 @@ def mean_rotor_in_chordal_metric(R, t=None):
     faster).
 
     """
-    if not t:
-        return np.quaternion(*(np.sum(as_float_array(R)))).normalized()
-    mean = np.empty((4,), dtype=float)
-    definite_integral(as_float_array(R), t, mean)
-    return np.quaternion(*mean).normalized()
+    if t is None:
+        return np.sum(R).normalized()
+    return definite_integral(R, t).normalized()
 
 
 def optimal_alignment_in_chordal_metric(Ra, Rb, t=None):
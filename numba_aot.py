@@ -0,0 +1,60 @@
+# Copyright (c) 2018, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/quaternion/blob/master/LICENSE>
+
+"""Ahead-of-time compilation of the numba kernels used by `quaternion.calculus`
+
+The kernels in `calculus` are compiled by numba the first time they are called, and the result is cached on disk, so
+that later processes can load it instead of compiling again.  When that cache is unavailable -- for example, because
+the package is installed in a read-only location, or because many short-lived workers start at once on fresh
+machines -- the kernels can instead be compiled once into an ordinary extension module with explicit type
+signatures.  After installing this package, run
+
+    python -m quaternion.numba_aot
+
+to build `quaternion._numba_aot` next to the installed package (or pass a different output directory as the only
+argument).  When that module is present, `quaternion.calculus` uses it in place of the JIT kernels.  Note that the
+precompiled kernels are serial, whereas the JIT version of `derivative` parallelizes over independent signals.
+
+"""
+
+from __future__ import division, print_function, absolute_import
+
+import os.path
+
+
+module_name = '_numba_aot'
+
+# Exported name, signature, and name of the kernel in `calculus`
+signatures = [
+    ('derivative_weights', 'void(f8[:], f8[:,:])', '_derivative_weights'),
+    ('derivative_apply', 'void(f8[:,:], f8[:,:], f8[:,:])', '_derivative_apply'),
+]
+
+
+def compile_kernels(output_dir=None, verbose=False):
+    """Compile the calculus kernels into the extension module `quaternion._numba_aot`
+
+    Parameters
+    ----------
+    output_dir: str, optional
+        Directory in which to place the compiled module.  Defaults to the directory containing this package.
+    verbose: bool, optional
+        If True, show the compiler output.
+
+    """
+    from numba.pycc import CC
+    from quaternion import calculus
+    cc = CC(module_name)
+    cc.output_dir = output_dir or os.path.dirname(os.path.abspath(__file__))
+    cc.verbose = verbose
+    for exported_name, signature, kernel_name in signatures:
+        kernel = getattr(calculus, kernel_name)
+        cc.export(exported_name, signature)(getattr(kernel, 'py_func', kernel))
+    cc.compile()
+    return cc.output_dir
+
+
+if __name__ == '__main__':
+    import sys
+    output_dir = compile_kernels(*sys.argv[1:2])
+    print("Compiled {0} in {1}".format(module_name, output_dir))
@@ -5,7 +5,7 @@ from __future__ import division, print_function, absolute_import
 
 ## Allow the code to function without numba, but discourage it
 try:
-    from numba import njit, jit, vectorize, int64, float64, complex128
+    from numba import njit, jit, vectorize, int64, float64, complex128, prange
     from numba.utils import IS_PY3
     GOT_NUMBA = True
 except ImportError:
@@ -28,6 +28,7 @@ except ImportError:
     int64 = int
     float64 = float
     complex128 = complex
+    prange = range
     IS_PY3 = (sys.version_info[:2] >= (3, 0))
     GOT_NUMBA = False
 
@@ -10,6 +10,7 @@
 #include "structmember.h"
 
 #include "quaternion.h"
+#include "dual_quaternion.h"
 
 // The following definitions, along with `#define NPY_PY3K 1`, can
 // also be found in the header <numpy/npy_3kcompat.h>.
@@ -41,10 +42,28 @@ static PyTypeObject PyQuaternion_Type;
 // built-in numpy data type.  We will describe its features below.
 PyArray_Descr* quaternion_descr;
 
+// The dual-quaternion type and dtype are filled in further below, but
+// the quaternion operators need to recognize them, so that mixed
+// operations are left to the dual-quaternion versions.
+static PyTypeObject PyDualQuaternion_Type;
+PyArray_Descr* dual_quaternion_descr;
+
+static NPY_INLINE int
+PyDualQuaternion_Check(PyObject* object) {
+  return Py_TYPE(object) == &PyDualQuaternion_Type || PyType_IsSubtype(Py_TYPE(object), &PyDualQuaternion_Type);
+}
+
 
 static NPY_INLINE int
 PyQuaternion_Check(PyObject* object) {
-  return PyObject_IsInstance(object,(PyObject*)&PyQuaternion_Type);
+  // The exact-type test avoids walking the MRO in the common case; unlike `PyObject_IsInstance`, neither test can
+  // call back into python
+  return Py_TYPE(object) == &PyQuaternion_Type || PyType_IsSubtype(Py_TYPE(object), &PyQuaternion_Type);
+}
+
+static NPY_INLINE int
+PyQuaternion_CheckExact(PyObject* object) {
+  return Py_TYPE(object) == &PyQuaternion_Type;
 }
 
 static PyObject*
@@ -54,6 +73,65 @@ PyQuaternion_FromQuaternion(quaternion q) {
   return (PyObject*)p;
 }
 
+// The table exported to other extension modules as the capsule `quaternion.numpy_quaternion._C_API`; see
+// quaternion_api.h.  The type number is filled in when the dtype is registered.
+static quaternion_c_api quaternion_c_api_table = {
+  QUATERNION_C_API_VERSION,
+  quaternion_create_from_spherical_coords,
+  quaternion_create_from_euler_angles,
+  quaternion_sqrt,
+  quaternion_log,
+  quaternion_exp,
+  quaternion_scalar_power,
+  &PyQuaternion_Type,
+  PyQuaternion_FromQuaternion,
+  -1
+};
+
+// Convert a python number to a double, as with the "d" format of `PyArg_ParseTuple`, returning -1 on failure
+static NPY_INLINE int
+pyquaternion_as_double(PyObject* object, double* d) {
+  if (PyFloat_CheckExact(object)) {
+    *d = PyFloat_AS_DOUBLE(object);
+    return 0;
+  }
+  *d = PyFloat_AsDouble(object);
+  return (*d == -1.0 && PyErr_Occurred()) ? -1 : 0;
+}
+
+// Extract the value of a quaternion argument of the function `name`, returning -1 with a TypeError if it is not one
+static NPY_INLINE int
+pyquaternion_as_quaternion_argument(PyObject* object, quaternion* q, const char* name, int position) {
+  if (PyQuaternion_Check(object)) {
+    *q = ((PyQuaternion*)object)->obval;
+    return 0;
+  }
+  PyErr_Format(PyExc_TypeError, "%s() argument %d must be quaternion, not %.200s",
+               name, position, Py_TYPE(object)->tp_name);
+  return -1;
+}
+
+// Module functions taking only positional arguments are declared with these macros, so that they use METH_FASTCALL
+// (which passes the arguments as a C array, without building a tuple) where python supports it.  The body of the
+// function `name` is written as `name##_impl(PyObject *const *args, Py_ssize_t nargs)`.
+#if PY_VERSION_HEX >= 0x03070000
+#define PYQUATERNION_FASTCALL METH_FASTCALL
+#define PYQUATERNION_FASTCALL_FUNCTION(name)                            \
+  static PyObject* name##_impl(PyObject *const *args, Py_ssize_t nargs); \
+  static PyObject*                                                      \
+  name(PyObject *NPY_UNUSED(self), PyObject *const *args, Py_ssize_t nargs) { \
+    return name##_impl(args, nargs);                                    \
+  }
+#else
+#define PYQUATERNION_FASTCALL METH_VARARGS
+#define PYQUATERNION_FASTCALL_FUNCTION(name)                            \
+  static PyObject* name##_impl(PyObject *const *args, Py_ssize_t nargs); \
+  static PyObject*                                                      \
+  name(PyObject *NPY_UNUSED(self), PyObject *args) {                    \
+    return name##_impl(((PyTupleObject *)args)->ob_item, PyTuple_GET_SIZE(args)); \
+  }
+#endif
+
 // TODO: Add list/tuple conversions
 #define PyQuaternion_AsQuaternion(q, o)                                 \
   /* fprintf (stderr, "file %s, line %d., PyQuaternion_AsQuaternion\n", __FILE__, __LINE__); */ \
@@ -83,6 +161,31 @@ pyquaternion_new(PyTypeObject *type, PyObject *NPY_UNUSED(args), PyObject *NPY_U
   return (PyObject *)self;
 }
 
+// Set `q` from the three (vector) or four components passed to the constructor
+static int
+pyquaternion_parse_components(PyObject *const *args, Py_ssize_t nargs, quaternion* q)
+{
+  double components[4] = {0.0, 0.0, 0.0, 0.0};
+  Py_ssize_t i;
+  if (nargs < 3 || nargs > 4) {
+    goto fail;
+  }
+  for (i = 0; i < nargs; i++) {
+    if (pyquaternion_as_double(args[i], &components[4-nargs+i]) < 0) {
+      goto fail;
+    }
+  }
+  q->w = components[0];
+  q->x = components[1];
+  q->y = components[2];
+  q->z = components[3];
+  return 0;
+ fail:
+  PyErr_SetString(PyExc_TypeError,
+                  "quaternion constructor takes three or four float arguments");
+  return -1;
+}
+
 static int
 pyquaternion_init(PyObject *self, PyObject *args, PyObject *kwds)
 {
@@ -91,27 +194,67 @@ pyquaternion_init(PyObject *self, PyObject *args, PyObject *kwds)
   // types, most initialization should be deferred to `tp_init`."
   // ---Python 2.7.8 docs
 
-  Py_ssize_t size = PyTuple_Size(args);
-  quaternion* q;
-  q = &(((PyQuaternion*)self)->obval);
   if (kwds && PyDict_Size(kwds)) {
     PyErr_SetString(PyExc_TypeError,
                     "quaternion constructor takes no keyword arguments");
     return -1;
   }
+  return pyquaternion_parse_components(((PyTupleObject *)args)->ob_item, PyTuple_GET_SIZE(args),
+                                       &(((PyQuaternion*)self)->obval));
+}
 
-  if (((size == 3) && (!PyArg_ParseTuple(args, "ddd", &q->x, &q->y, &q->z)))
-      || ((size == 4) && (!PyArg_ParseTuple(args, "dddd", &q->w, &q->x, &q->y, &q->z)))
-      || ((size<3) || (size>4))) {
+#if PY_VERSION_HEX >= 0x03090000
+// Calling the type itself (as in `quaternion(w, x, y, z)`) goes through this function, which allocates and fills in the
+// object in one step, instead of building an argument tuple and calling `tp_new` and then `tp_init`.
+static PyObject *
+pyquaternion_vectorcall(PyObject *type, PyObject *const *args, size_t nargsf, PyObject *kwnames)
+{
+  Py_ssize_t nargs = PyVectorcall_NARGS(nargsf);
+  PyQuaternion* self;
+  if ((PyTypeObject *)type != &PyQuaternion_Type) {
+    // Subclasses may override `__new__` or `__init__`, so they take the general route through `type.__call__`
+    PyObject *result = NULL, *kwargs = NULL, *tuple = PyTuple_New(nargs);
+    Py_ssize_t i;
+    if (tuple == NULL) {
+      return NULL;
+    }
+    for (i = 0; i < nargs; i++) {
+      Py_INCREF(args[i]);
+      PyTuple_SET_ITEM(tuple, i, args[i]);
+    }
+    if (kwnames && PyTuple_GET_SIZE(kwnames)) {
+      kwargs = PyDict_New();
+      if (kwargs == NULL) {
+        goto done;
+      }
+      for (i = 0; i < PyTuple_GET_SIZE(kwnames); i++) {
+        if (PyDict_SetItem(kwargs, PyTuple_GET_ITEM(kwnames, i), args[nargs+i]) < 0) {
+          goto done;
+        }
+      }
+    }
+    result = PyType_Type.tp_call(type, tuple, kwargs);
+  done:
+    Py_DECREF(tuple);
+    Py_XDECREF(kwargs);
+    return result;
+  }
+  if (kwnames && PyTuple_GET_SIZE(kwnames)) {
     PyErr_SetString(PyExc_TypeError,
-                    "quaternion constructor takes three or four float arguments");
-    return -1;
-  } else if(size == 3) {
-    q->w = 0.0;
+                    "quaternion constructor takes no keyword arguments");
+    return NULL;
   }
-
-  return 0;
+  self = (PyQuaternion *)PyQuaternion_Type.tp_alloc(&PyQuaternion_Type, 0);
+  if (self == NULL) {
+    return NULL;
+  }
+  if (pyquaternion_parse_components(args, nargs, &(self->obval)) < 0) {
+    Py_DECREF(self);
+    return NULL;
+  }
+  return (PyObject *)self;
 }
+#endif
 
 #define UNARY_BOOL_RETURNER(name)                                       \
   static PyObject*                                                      \
@@ -211,6 +354,7 @@ pyquaternion_##fake_name##_array_operator(PyObject* a, PyObject* b) {   \
   char **dataptrarray;                                                  \
   char *src, *dst;                                                      \
   quaternion p = {0.0, 0.0, 0.0, 0.0};                                  \
+  NPY_BEGIN_THREADS_DEF;                                                \
   PyQuaternion_AsQuaternion(p, a);                                      \
   flags = NPY_ITER_EXTERNAL_LOOP;                                       \
   op[0] = (PyArrayObject *) b;                                          \
@@ -228,6 +372,10 @@ pyquaternion_##fake_name##_array_operator(PyObject* a, PyObject* b) {   \
   itemsize = NpyIter_GetDescrArray(iter)[1]->elsize;                    \
   innersizeptr = NpyIter_GetInnerLoopSizePtr(iter);                     \
   dataptrarray = NpyIter_GetDataPtrArray(iter);                         \
+  /* None of the loops below touches python objects */                  \
+  if (!NpyIter_IterationNeedsAPI(iter)) {                               \
+    NPY_BEGIN_THREADS_THRESHOLDED(NpyIter_GetIterSize(iter));           \
+  }                                                                     \
   if(PyArray_EquivTypes(PyArray_DESCR((PyArrayObject*) b), quaternion_descr)) { \
     npy_intp i;                                                         \
     do {                                                                \
@@ -259,9 +407,11 @@ pyquaternion_##fake_name##_array_operator(PyObject* a, PyObject* b) {   \
       }                                                                 \
     } while (iternext(iter));                                           \
   } else {                                                              \
+    NPY_END_THREADS;                                                    \
     NpyIter_Deallocate(iter);                                           \
     return NULL;                                                        \
   }                                                                     \
+  NPY_END_THREADS;                                                      \
   ret = (PyObject *) NpyIter_GetOperandArray(iter)[1];                  \
   Py_INCREF(ret);                                                       \
   if (NpyIter_Deallocate(iter) != NPY_SUCCEED) {                        \
@@ -277,6 +427,20 @@ pyquaternion_##fake_name(PyObject* a, PyObject* b) {                    \
   npy_int64 val64;                                                     \
   npy_int32 val32;                                                     \
   quaternion p = {0.0, 0.0, 0.0, 0.0};                                 \
+  /* Fast paths for the most common scalar operands */                 \
+  if(PyQuaternion_CheckExact(a)) {                                     \
+    if(PyQuaternion_CheckExact(b)) {                                   \
+      return PyQuaternion_FromQuaternion(quaternion_##name(((PyQuaternion*)a)->obval, ((PyQuaternion*)b)->obval)); \
+    } else if(PyFloat_CheckExact(b)) {                                 \
+      return PyQuaternion_FromQuaternion(quaternion_##name##_scalar(((PyQuaternion*)a)->obval, PyFloat_AS_DOUBLE(b))); \
+    }                                                                  \
+  }                                                                    \
+  /* Dual quaternions promote the quaternion operand themselves */      \
+  if(PyDualQuaternion_Check(b) || (PyArray_Check(b)                    \
+       && PyArray_DESCR((PyArrayObject*)b)->type_num == dual_quaternion_descr->type_num)) { \
+    Py_INCREF(Py_NotImplemented);                                      \
+    return Py_NotImplemented;                                          \
+  }                                                                    \
   if(PyArray_Check(b)) { return pyquaternion_##fake_name##_array_operator(a, b); } \
   if(PyFloat_Check(a) && PyQuaternion_Check(b)) {                      \
     return PyQuaternion_FromQuaternion(quaternion_scalar_##name(PyFloat_AsDouble(a), ((PyQuaternion*)b)->obval)); \
@@ -847,6 +1011,23 @@ static PyTypeObject PyQuaternion_Type = {
 // nonzero, copyswap, copyswapn, setitem, getitem, and cast.
 static PyArray_ArrFuncs _PyQuaternion_ArrFuncs;
 
+// Reverse the byte order of each component of the (possibly unaligned) quaternion at `p`.  Numpy may call the
+// functions below without holding the GIL, because the quaternion dtype does not set NPY_NEEDS_PYAPI, so they must
+// not touch any python objects -- including reference counts.
+static NPY_INLINE void
+quaternion_byteswap(char *p)
+{
+  int i, j;
+  char tmp;
+  for (i = 0; i < 4; i++, p += sizeof(double)) {
+    for (j = 0; j < (int)sizeof(double)/2; j++) {
+      tmp = p[j];
+      p[j] = p[sizeof(double)-1-j];
+      p[sizeof(double)-1-j] = tmp;
+    }
+  }
+}
+
 static npy_bool
 QUATERNION_nonzero (char *ip, PyArrayObject *ap)
 {
@@ -856,13 +1037,10 @@ QUATERNION_nonzero (char *ip, PyArrayObject *ap)
     q = *(quaternion *)ip;
   }
   else {
-    PyArray_Descr *descr;
-    descr = PyArray_DescrFromType(NPY_DOUBLE);
-    descr->f->copyswap(&q.w, ip, !PyArray_ISNOTSWAPPED(ap), NULL);
-    descr->f->copyswap(&q.x, ip+8, !PyArray_ISNOTSWAPPED(ap), NULL);
-    descr->f->copyswap(&q.y, ip+16, !PyArray_ISNOTSWAPPED(ap), NULL);
-    descr->f->copyswap(&q.z, ip+24, !PyArray_ISNOTSWAPPED(ap), NULL);
-    Py_DECREF(descr);
+    memcpy(&q, ip, sizeof(quaternion));
+    if (!PyArray_ISNOTSWAPPED(ap)) {
+      quaternion_byteswap((char *)&q);
+    }
   }
   return (npy_bool) !quaternion_equal(q, zero);
 }
@@ -871,10 +1049,12 @@ static void
 QUATERNION_copyswap(quaternion *dst, quaternion *src,
                     int swap, void *NPY_UNUSED(arr))
 {
-  PyArray_Descr *descr;
-  descr = PyArray_DescrFromType(NPY_DOUBLE);
-  descr->f->copyswapn(dst, sizeof(double), src, sizeof(double), 4, swap, NULL);
-  Py_DECREF(descr);
+  if (src != NULL && src != dst) {
+    memcpy(dst, src, sizeof(quaternion));
+  }
+  if (swap) {
+    quaternion_byteswap((char *)dst);
+  }
 }
 
 static void
@@ -882,37 +1062,45 @@ QUATERNION_copyswapn(quaternion *dst, npy_intp dstride,
                      quaternion *src, npy_intp sstride,
                      npy_intp n, int swap, void *NPY_UNUSED(arr))
 {
-  PyArray_Descr *descr;
-  descr = PyArray_DescrFromType(NPY_DOUBLE);
-  descr->f->copyswapn(&dst->w, dstride, &src->w, sstride, n, swap, NULL);
-  descr->f->copyswapn(&dst->x, dstride, &src->x, sstride, n, swap, NULL);
-  descr->f->copyswapn(&dst->y, dstride, &src->y, sstride, n, swap, NULL);
-  descr->f->copyswapn(&dst->z, dstride, &src->z, sstride, n, swap, NULL);
-  Py_DECREF(descr);
+  char *dstp, *srcp;
+  npy_intp i;
+  // Copy the data, in one block if possible, and then swap it in place if necessary
+  if (src != NULL) {
+    if (dstride == sizeof(quaternion) && sstride == sizeof(quaternion)) {
+      memmove(dst, src, n*sizeof(quaternion));
+    } else {
+      dstp = (char *)dst;
+      srcp = (char *)src;
+      for (i = 0; i < n; i++, dstp += dstride, srcp += sstride) {
+        memmove(dstp, srcp, sizeof(quaternion));
+      }
+    }
+  }
+  if (swap) {
+    dstp = (char *)dst;
+    for (i = 0; i < n; i++, dstp += dstride) {
+      quaternion_byteswap(dstp);
+    }
+  }
 }
 
 static int QUATERNION_setitem(PyObject* item, quaternion* qp, void* NPY_UNUSED(ap))
 {
-  PyObject *element;
+  PyObject *sequence;
+  PyObject **elements;
   if(PyQuaternion_Check(item)) {
     memcpy(qp,&(((PyQuaternion *)item)->obval),sizeof(quaternion));
   } else if(PySequence_Check(item) && PySequence_Length(item)==4) {
-    element = PySequence_GetItem(item, 0);
-    if(element == NULL) { return -1; } /* Not a sequence, or other failure */
-    qp->w = PyFloat_AsDouble(element);
-    Py_DECREF(element);
-    element = PySequence_GetItem(item, 1);
-    if(element == NULL) { return -1; } /* Not a sequence, or other failure */
-    qp->x = PyFloat_AsDouble(element);
-    Py_DECREF(element);
-    element = PySequence_GetItem(item, 2);
-    if(element == NULL) { return -1; } /* Not a sequence, or other failure */
-    qp->y = PyFloat_AsDouble(element);
-    Py_DECREF(element);
-    element = PySequence_GetItem(item, 3);
-    if(element == NULL) { return -1; } /* Not a sequence, or other failure */
-    qp->z = PyFloat_AsDouble(element);
-    Py_DECREF(element);
+    // Fetch all four components at once, rather than through separate `PySequence_GetItem` calls
+    sequence = PySequence_Fast(item, "Input to QUATERNION_setitem is not a sequence");
+    if(sequence == NULL) { return -1; }
+    elements = PySequence_Fast_ITEMS(sequence);
+    qp->w = PyFloat_AsDouble(elements[0]);
+    qp->x = PyFloat_AsDouble(elements[1]);
+    qp->y = PyFloat_AsDouble(elements[2]);
+    qp->z = PyFloat_AsDouble(elements[3]);
+    Py_DECREF(sequence);
+    if(PyErr_Occurred()) { return -1; }
   } else {
     PyErr_SetString(PyExc_TypeError,
                     "Unknown input to QUATERNION_setitem");
@@ -985,6 +1173,157 @@ QUATERNION_argmax(quaternion *ip, npy_intp n, npy_intp *max_ind, PyArrayObject *
   return 0;
 }
 
+static int
+QUATERNION_argmin(quaternion *ip, npy_intp n, npy_intp *min_ind, PyArrayObject *NPY_UNUSED(aip))
+{
+  npy_intp i;
+  quaternion mp = *ip;
+
+  *min_ind = 0;
+
+  if (quaternion_isnan(mp)) {
+    // nan encountered; it's minimal
+    return 0;
+  }
+
+  for (i = 1; i < n; i++) {
+    ip++;
+    //Propagate nans, similarly as max() and min()
+    if (!(quaternion_less_equal(mp, *ip))) {  // negated, for correct nan handling
+      mp = *ip;
+      *min_ind = i;
+      if (quaternion_isnan(mp)) {
+        // nan encountered, it's minimal
+        break;
+      }
+    }
+  }
+  return 0;
+}
+
+// Native sorting, using the same ordering as `QUATERNION_compare`.
+// Without these, numpy falls back on generic sorts that copy each
+// element through a buffer and call `compare` through a pointer.  A
+// merge sort is used for every kind of sort, since it is stable and
+// fast.  Numpy has already made the data contiguous and aligned.
+#define QUATERNION_SMALL_MERGESORT 20
+
+static NPY_INLINE int
+quaternion_sort_less(quaternion *a, quaternion *b)
+{
+  // Equivalent to `QUATERNION_compare(a, b, NULL) < 0`, checking for nans only once
+  int anan = quaternion_isnan(*a), bnan = quaternion_isnan(*b);
+  if (anan || bnan) {
+    return anan && !bnan;
+  }
+  return (a->w != b->w ? a->w < b->w :
+          a->x != b->x ? a->x < b->x :
+          a->y != b->y ? a->y < b->y :
+          a->z < b->z);
+}
+
+static void
+quaternion_mergesort0(quaternion *pl, quaternion *pr, quaternion *pw)
+{
+  quaternion vp, *pi, *pj, *pk, *pm;
+
+  if (pr - pl > QUATERNION_SMALL_MERGESORT) {
+    // merge sort
+    pm = pl + ((pr - pl) >> 1);
+    quaternion_mergesort0(pl, pm, pw);
+    quaternion_mergesort0(pm, pr, pw);
+    memcpy(pw, pl, (pm - pl)*sizeof(quaternion));
+    pi = pw + (pm - pl);
+    pj = pw;
+    pk = pl;
+    while (pj < pi && pm < pr) {
+      if (quaternion_sort_less(pm, pj)) {
+        *pk++ = *pm++;
+      } else {
+        *pk++ = *pj++;
+      }
+    }
+    while (pj < pi) {
+      *pk++ = *pj++;
+    }
+  } else {
+    // insertion sort
+    for (pi = pl + 1; pi < pr; ++pi) {
+      vp = *pi;
+      pj = pi;
+      pk = pi - 1;
+      while (pj > pl && quaternion_sort_less(&vp, pk)) {
+        *pj-- = *pk--;
+      }
+      *pj = vp;
+    }
+  }
+}
+
+static int
+QUATERNION_sort(quaternion *start, npy_intp num, void *NPY_UNUSED(varr))
+{
+  quaternion *pw = (quaternion *)malloc((num/2 + 1)*sizeof(quaternion));
+  if (pw == NULL) {
+    return -1;
+  }
+  quaternion_mergesort0(start, start + num, pw);
+  free(pw);
+  return 0;
+}
+
+static void
+quaternion_amergesort0(npy_intp *pl, npy_intp *pr, quaternion *v, npy_intp *pw)
+{
+  quaternion *vp;
+  npy_intp vi, *pi, *pj, *pk, *pm;
+
+  if (pr - pl > QUATERNION_SMALL_MERGESORT) {
+    // merge sort
+    pm = pl + ((pr - pl) >> 1);
+    quaternion_amergesort0(pl, pm, v, pw);
+    quaternion_amergesort0(pm, pr, v, pw);
+    memcpy(pw, pl, (pm - pl)*sizeof(npy_intp));
+    pi = pw + (pm - pl);
+    pj = pw;
+    pk = pl;
+    while (pj < pi && pm < pr) {
+      if (quaternion_sort_less(v + *pm, v + *pj)) {
+        *pk++ = *pm++;
+      } else {
+        *pk++ = *pj++;
+      }
+    }
+    while (pj < pi) {
+      *pk++ = *pj++;
+    }
+  } else {
+    // insertion sort
+    for (pi = pl + 1; pi < pr; ++pi) {
+      vi = *pi;
+      vp = v + vi;
+      pj = pi;
+      pk = pi - 1;
+      while (pj > pl && quaternion_sort_less(vp, v + *pk)) {
+        *pj-- = *pk--;
+      }
+      *pj = vi;
+    }
+  }
+}
+
+static int
+QUATERNION_argsort(quaternion *v, npy_intp *tosort, npy_intp num, void *NPY_UNUSED(varr))
+{
+  npy_intp *pw = (npy_intp *)malloc((num/2 + 1)*sizeof(npy_intp));
+  if (pw == NULL) {
+    return -1;
+  }
+  quaternion_amergesort0(tosort, tosort + num, v, pw);
+  free(pw);
+  return 0;
+}
+
 static void
 QUATERNION_fillwithscalar(quaternion *buffer, npy_intp length, quaternion *value, void *NPY_UNUSED(ignored))
 {
@@ -1047,90 +1386,500 @@ MAKE_CT_TO_QUATERNION(CFLOAT, npy_float);
 MAKE_CT_TO_QUATERNION(CDOUBLE, npy_double);
 MAKE_CT_TO_QUATERNION(CLONGDOUBLE, npy_longdouble);
 
-static void register_cast_function(int sourceType, int destType, PyArray_VectorUnaryFunc *castfunc)
+
+// The python object holding a dual quaternion, which is registered as
+// a second dtype below.  The kernels are in dual_quaternion.h.
+typedef struct {
+  PyObject_HEAD
+  dual_quaternion obval;
+} PyDualQuaternion;
+
+static PyObject*
+PyDualQuaternion_FromDualQuaternion(dual_quaternion q) {
+  PyDualQuaternion* p = (PyDualQuaternion*)PyDualQuaternion_Type.tp_alloc(&PyDualQuaternion_Type,0);
+  if (p) { p->obval = q; }
+  return (PyObject*)p;
+}
+
+// A quaternion is promoted to a dual quaternion representing a pure rotation
+static NPY_INLINE int
+pydual_quaternion_as_dual_quaternion(PyObject* object, dual_quaternion* q) {
+  dual_quaternion zero = {{0.0, 0.0, 0.0, 0.0}, {0.0, 0.0, 0.0, 0.0}};
+  if (PyDualQuaternion_Check(object)) {
+    *q = ((PyDualQuaternion*)object)->obval;
+    return 1;
+  }
+  if (PyQuaternion_Check(object)) {
+    *q = zero;
+    q->r = ((PyQuaternion*)object)->obval;
+    return 1;
+  }
+  return 0;
+}
+
+static PyObject *
+pydual_quaternion_new(PyTypeObject *type, PyObject *NPY_UNUSED(args), PyObject *NPY_UNUSED(kwds))
 {
-  PyArray_Descr *descr = PyArray_DescrFromType(sourceType);
-  PyArray_RegisterCastFunc(descr, destType, castfunc);
-  PyArray_RegisterCanCast(descr, destType, NPY_NOSCALAR);
-  Py_DECREF(descr);
+  PyDualQuaternion* self;
+  self = (PyDualQuaternion *)type->tp_alloc(type, 0);
+  return (PyObject *)self;
 }
 
+static int
+pydual_quaternion_init(PyObject *self, PyObject *args, PyObject *kwds)
+{
+  dual_quaternion *q = &(((PyDualQuaternion*)self)->obval);
+  quaternion zero = {0.0, 0.0, 0.0, 0.0};
+  double components[8];
+  Py_ssize_t i, nargs = PyTuple_GET_SIZE(args);
+  if (kwds && PyDict_Size(kwds)) {
+    PyErr_SetString(PyExc_TypeError,
+                    "dual_quaternion constructor takes no keyword arguments");
+    return -1;
+  }
+  if (nargs == 1 || nargs == 2) {
+    // The real part and (optionally) the dual part, as quaternions
+    if (!PyQuaternion_Check(PyTuple_GET_ITEM(args, 0))
+        || (nargs == 2 && !PyQuaternion_Check(PyTuple_GET_ITEM(args, 1)))) {
+      goto fail;
+    }
+    q->r = ((PyQuaternion*)PyTuple_GET_ITEM(args, 0))->obval;
+    if (nargs == 2) {
+      q->d = ((PyQuaternion*)PyTuple_GET_ITEM(args, 1))->obval;
+    } else {
+      q->d = zero;
+    }
+    return 0;
+  }
+  if (nargs == 8) {
+    for (i = 0; i < 8; i++) {
+      if (pyquaternion_as_double(PyTuple_GET_ITEM(args, i), &components[i]) < 0) {
+        goto fail;
+      }
+    }
+    memcpy(q, components, sizeof(dual_quaternion));
+    return 0;
+  }
+ fail:
+  PyErr_SetString(PyExc_TypeError,
+                  "dual_quaternion constructor takes one or two quaternions, or eight float arguments");
+  return -1;
+}
 
-// This is a macro that will be used to define the various basic unary
-// quaternion functions, so that they can be applied quickly to a
-// numpy array of quaternions.
-#define UNARY_GEN_UFUNC(ufunc_name, func_name, ret_type)        \
-  static void                                                           \
-  quaternion_##ufunc_name##_ufunc(char** args, npy_intp* dimensions,    \
-                                  npy_intp* steps, void* NPY_UNUSED(data)) { \
-    /* fprintf (stderr, "file %s, line %d, quaternion_%s_ufunc.\n", __FILE__, __LINE__, #ufunc_name); */ \
-    char *ip1 = args[0], *op1 = args[1];                                \
-    npy_intp is1 = steps[0], os1 = steps[1];                            \
-    npy_intp n = dimensions[0];                                         \
-    npy_intp i;                                                         \
-    for(i = 0; i < n; i++, ip1 += is1, op1 += os1){                     \
-      const quaternion in1 = *(quaternion *)ip1;                        \
-      *((ret_type *)op1) = quaternion_##func_name(in1);};}
-#define UNARY_UFUNC(name, ret_type) \
-  UNARY_GEN_UFUNC(name, name, ret_type)
-// And these all do the work mentioned above, using the macro
-UNARY_UFUNC(isnan, npy_bool)
-UNARY_UFUNC(isinf, npy_bool)
-UNARY_UFUNC(isfinite, npy_bool)
-UNARY_UFUNC(norm, npy_double)
-UNARY_UFUNC(absolute, npy_double)
-UNARY_UFUNC(angle, npy_double)
-UNARY_UFUNC(sqrt, quaternion)
-UNARY_UFUNC(log, quaternion)
-UNARY_UFUNC(exp, quaternion)
-UNARY_UFUNC(negative, quaternion)
-UNARY_UFUNC(conjugate, quaternion)
-UNARY_GEN_UFUNC(invert, inverse, quaternion)
-UNARY_UFUNC(normalized, quaternion)
-UNARY_UFUNC(x_parity_conjugate, quaternion)
-UNARY_UFUNC(x_parity_symmetric_part, quaternion)
-UNARY_UFUNC(x_parity_antisymmetric_part, quaternion)
-UNARY_UFUNC(y_parity_conjugate, quaternion)
-UNARY_UFUNC(y_parity_symmetric_part, quaternion)
-UNARY_UFUNC(y_parity_antisymmetric_part, quaternion)
-UNARY_UFUNC(z_parity_conjugate, quaternion)
-UNARY_UFUNC(z_parity_symmetric_part, quaternion)
-UNARY_UFUNC(z_parity_antisymmetric_part, quaternion)
-UNARY_UFUNC(parity_conjugate, quaternion)
-UNARY_UFUNC(parity_symmetric_part, quaternion)
-UNARY_UFUNC(parity_antisymmetric_part, quaternion)
+#define UNARY_DUAL_QUATERNION_RETURNER(name)                            \
+  static PyObject*                                                      \
+  pydual_quaternion_##name(PyObject* a, PyObject* NPY_UNUSED(b)) {      \
+    return PyDualQuaternion_FromDualQuaternion(dual_quaternion_##name(((PyDualQuaternion*)a)->obval)); \
+  }
+UNARY_DUAL_QUATERNION_RETURNER(conjugate)
+UNARY_DUAL_QUATERNION_RETURNER(inverse)
+UNARY_DUAL_QUATERNION_RETURNER(normalized)
 
+static PyObject*
+pydual_quaternion_multiply(PyObject* a, PyObject* b)
+{
+  dual_quaternion q1, q2;
+  if (!pydual_quaternion_as_dual_quaternion(a, &q1) || !pydual_quaternion_as_dual_quaternion(b, &q2)) {
+    Py_INCREF(Py_NotImplemented);
+    return Py_NotImplemented;
+  }
+  return PyDualQuaternion_FromDualQuaternion(dual_quaternion_multiply(q1, q2));
+}
 
-// This is a macro that will be used to define the various basic binary
-// quaternion functions, so that they can be applied quickly to a
-// numpy array of quaternions.
-#define BINARY_GEN_UFUNC(ufunc_name, func_name, arg_type1, arg_type2, ret_type) \
-  static void                                                           \
-  quaternion_##ufunc_name##_ufunc(char** args, npy_intp* dimensions,    \
-                                  npy_intp* steps, void* NPY_UNUSED(data)) { \
-    /* fprintf (stderr, "file %s, line %d, quaternion_%s_ufunc.\n", __FILE__, __LINE__, #ufunc_name); */ \
-    char *ip1 = args[0], *ip2 = args[1], *op1 = args[2];                \
-    npy_intp is1 = steps[0], is2 = steps[1], os1 = steps[2];            \
-    npy_intp n = dimensions[0];                                         \
-    npy_intp i;                                                         \
-    for(i = 0; i < n; i++, ip1 += is1, ip2 += is2, op1 += os1) {        \
-      const arg_type1 in1 = *(arg_type1 *)ip1;                          \
-      const arg_type2 in2 = *(arg_type2 *)ip2;                          \
-      *((ret_type *)op1) = quaternion_##func_name(in1, in2);            \
-    };                                                                  \
-  };
-// A couple special-case versions of the above
-#define BINARY_UFUNC(name, ret_type)                    \
-  BINARY_GEN_UFUNC(name, name, quaternion, quaternion, ret_type)
-#define BINARY_SCALAR_UFUNC(name, ret_type)                             \
-  BINARY_GEN_UFUNC(name##_scalar, name##_scalar, quaternion, npy_double, ret_type) \
-  BINARY_GEN_UFUNC(scalar_##name, scalar_##name, npy_double, quaternion, ret_type)
-// And these all do the work mentioned above, using the macros
-BINARY_UFUNC(add, quaternion)
-BINARY_UFUNC(subtract, quaternion)
-BINARY_UFUNC(multiply, quaternion)
-BINARY_UFUNC(divide, quaternion)
-BINARY_GEN_UFUNC(true_divide, divide, quaternion, quaternion, quaternion)
+static PyObject *
+pydual_quaternion__reduce(PyDualQuaternion* self)
+{
+  dual_quaternion q = self->obval;
+  return Py_BuildValue("O(dddddddd)", Py_TYPE(self),
+                       q.r.w, q.r.x, q.r.y, q.r.z, q.d.w, q.d.x, q.d.y, q.d.z);
+}
+
+static PyMethodDef pydual_quaternion_methods[] = {
+  {"conjugate", pydual_quaternion_conjugate, METH_NOARGS,
+   "Return the quaternion conjugate of both parts, which is the inverse of a unit dual quaternion"},
+  {"conj", pydual_quaternion_conjugate, METH_NOARGS,
+   "Return the quaternion conjugate of both parts, which is the inverse of a unit dual quaternion"},
+  {"inverse", pydual_quaternion_inverse, METH_NOARGS,
+   "Return the inverse r^{-1} - eps * r^{-1} * d * r^{-1}"},
+  {"normalized", pydual_quaternion_normalized, METH_NOARGS,
+   "Return the unit dual quaternion representing the same rigid transformation"},
+  {"__reduce__", (PyCFunction)pydual_quaternion__reduce, METH_NOARGS,
+   "Return state information for pickling."},
+  {NULL, NULL, 0, NULL}
+};
+
+// Only multiplication is defined for the scalars; numpy fills in the other slots
+static PyNumberMethods pydual_quaternion_as_number;
+
+static PyObject *
+pydual_quaternion_get_real(PyObject *self, void *NPY_UNUSED(closure))
+{
+  return PyQuaternion_FromQuaternion(((PyDualQuaternion *)self)->obval.r);
+}
+
+static PyObject *
+pydual_quaternion_get_dual(PyObject *self, void *NPY_UNUSED(closure))
+{
+  return PyQuaternion_FromQuaternion(((PyDualQuaternion *)self)->obval.d);
+}
+
+static PyObject *
+pydual_quaternion_get_translation(PyObject *self, void *NPY_UNUSED(closure))
+{
+  npy_intp dims[1] = { 3 };
+  PyObject* translation = PyArray_SimpleNew(1, dims, NPY_DOUBLE);
+  if (translation == NULL) {
+    return NULL;
+  }
+  dual_quaternion_translation(((PyDualQuaternion *)self)->obval, (double *)PyArray_DATA((PyArrayObject *)translation));
+  return translation;
+}
+
+static PyGetSetDef pydual_quaternion_getset[] = {
+  {"real", pydual_quaternion_get_real, NULL,
+   "The real part r of r + eps*d, representing the rotation", NULL},
+  {"dual", pydual_quaternion_get_dual, NULL,
+   "The dual part d of r + eps*d, representing the translation", NULL},
+  {"translation", pydual_quaternion_get_translation, NULL,
+   "The translation (applied after the rotation) as a numpy array", NULL},
+  {NULL, NULL, NULL, NULL, NULL}
+};
+
+static PyObject*
+pydual_quaternion_richcompare(PyObject* a, PyObject* b, int op)
+{
+  dual_quaternion x, y;
+  if ((op != Py_EQ && op != Py_NE)
+      || !pydual_quaternion_as_dual_quaternion(a, &x) || !pydual_quaternion_as_dual_quaternion(b, &y)) {
+    Py_INCREF(Py_NotImplemented);
+    return Py_NotImplemented;
+  }
+  return PyBool_FromLong(op == Py_EQ ? dual_quaternion_equal(x, y) : dual_quaternion_not_equal(x, y));
+}
+
+static long
+pydual_quaternion_hash(PyObject *o)
+{
+  dual_quaternion q = ((PyDualQuaternion *)o)->obval;
+  double *components = (double *)&q;
+  long value = 0x456789;
+  int i;
+  for (i = 0; i < 8; i++) {
+    value = (10000004 * value) ^ _Py_HashDouble(components[i]);
+  }
+  if (value == -1)
+    value = -2;
+  return value;
+}
+
+static PyObject *
+pydual_quaternion_repr(PyObject *o)
+{
+  char str[256];
+  dual_quaternion q = ((PyDualQuaternion *)o)->obval;
+  sprintf(str, "dual_quaternion(%.15g, %.15g, %.15g, %.15g, %.15g, %.15g, %.15g, %.15g)",
+          q.r.w, q.r.x, q.r.y, q.r.z, q.d.w, q.d.x, q.d.y, q.d.z);
+  return PyUString_FromString(str);
+}
+
+static PyTypeObject PyDualQuaternion_Type = {
+#if PY_MAJOR_VERSION >= 3
+  PyVarObject_HEAD_INIT(NULL, 0)
+#else
+  PyObject_HEAD_INIT(NULL)
+  0,                                          // ob_size
+#endif
+  "dual_quaternion",                          // tp_name
+  sizeof(PyDualQuaternion),                   // tp_basicsize
+  0,                                          // tp_itemsize
+  0,                                          // tp_dealloc
+  0,                                          // tp_print
+  0,                                          // tp_getattr
+  0,                                          // tp_setattr
+#if PY_MAJOR_VERSION >= 3
+  0,                                          // tp_reserved
+#else
+  0,                                          // tp_compare
+#endif
+  pydual_quaternion_repr,                     // tp_repr
+  &pydual_quaternion_as_number,               // tp_as_number
+  0,                                          // tp_as_sequence
+  0,                                          // tp_as_mapping
+  pydual_quaternion_hash,                     // tp_hash
+  0,                                          // tp_call
+  pydual_quaternion_repr,                     // tp_str
+  0,                                          // tp_getattro
+  0,                                          // tp_setattro
+  0,                                          // tp_as_buffer
+#if PY_MAJOR_VERSION >= 3
+  Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE,   // tp_flags
+#else
+  Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE | Py_TPFLAGS_CHECKTYPES, // tp_flags
+#endif
+  0,                                          // tp_doc
+  0,                                          // tp_traverse
+  0,                                          // tp_clear
+  pydual_quaternion_richcompare,              // tp_richcompare
+  0,                                          // tp_weaklistoffset
+  0,                                          // tp_iter
+  0,                                          // tp_iternext
+  pydual_quaternion_methods,                  // tp_methods
+  0,                                          // tp_members
+  pydual_quaternion_getset,                   // tp_getset
+  0,                                          // tp_base; will be reset to &PyGenericArrType_Type after numpy import
+  0,                                          // tp_dict
+  0,                                          // tp_descr_get
+  0,                                          // tp_descr_set
+  0,                                          // tp_dictoffset
+  pydual_quaternion_init,                     // tp_init
+  0,                                          // tp_alloc
+  pydual_quaternion_new,                      // tp_new
+  0,                                          // tp_free
+  0,                                          // tp_is_gc
+  0,                                          // tp_bases
+  0,                                          // tp_mro
+  0,                                          // tp_cache
+  0,                                          // tp_subclasses
+  0,                                          // tp_weaklist
+  0,                                          // tp_del
+#if PY_VERSION_HEX >= 0x02060000
+  0,                                          // tp_version_tag
+#endif
+#if PY_VERSION_HEX >= 0x030400a1
+  0,                                          // tp_finalize
+#endif
+};
+
+// The array functions for the dual-quaternion dtype, which (like those
+// for quaternions) must not touch python objects unless setting or
+// getting items
+static PyArray_ArrFuncs _PyDualQuaternion_ArrFuncs;
+
+static npy_bool
+DUAL_QUATERNION_nonzero (char *ip, PyArrayObject *ap)
+{
+  dual_quaternion q;
+  memcpy(&q, ip, sizeof(dual_quaternion));
+  if (ap != NULL && !PyArray_ISNOTSWAPPED(ap)) {
+    quaternion_byteswap((char *)&q.r);
+    quaternion_byteswap((char *)&q.d);
+  }
+  return (npy_bool) dual_quaternion_nonzero(q);
+}
+
+static void
+DUAL_QUATERNION_copyswap(dual_quaternion *dst, dual_quaternion *src,
+                         int swap, void *NPY_UNUSED(arr))
+{
+  if (src != NULL && src != dst) {
+    memcpy(dst, src, sizeof(dual_quaternion));
+  }
+  if (swap) {
+    quaternion_byteswap((char *)&dst->r);
+    quaternion_byteswap((char *)&dst->d);
+  }
+}
+
+static void
+DUAL_QUATERNION_copyswapn(dual_quaternion *dst, npy_intp dstride,
+                          dual_quaternion *src, npy_intp sstride,
+                          npy_intp n, int swap, void *NPY_UNUSED(arr))
+{
+  char *dstp, *srcp;
+  npy_intp i;
+  if (src != NULL) {
+    if (dstride == sizeof(dual_quaternion) && sstride == sizeof(dual_quaternion)) {
+      memmove(dst, src, n*sizeof(dual_quaternion));
+    } else {
+      dstp = (char *)dst;
+      srcp = (char *)src;
+      for (i = 0; i < n; i++, dstp += dstride, srcp += sstride) {
+        memmove(dstp, srcp, sizeof(dual_quaternion));
+      }
+    }
+  }
+  if (swap) {
+    dstp = (char *)dst;
+    for (i = 0; i < n; i++, dstp += dstride) {
+      quaternion_byteswap(dstp);
+      quaternion_byteswap(dstp + sizeof(quaternion));
+    }
+  }
+}
+
+static int DUAL_QUATERNION_setitem(PyObject* item, dual_quaternion* qp, void* NPY_UNUSED(ap))
+{
+  PyObject *sequence;
+  PyObject **elements;
+  double *components = (double *)qp;
+  int i;
+  if(pydual_quaternion_as_dual_quaternion(item, qp)) {
+    return 0;
+  } else if(PySequence_Check(item) && PySequence_Length(item)==8) {
+    sequence = PySequence_Fast(item, "Input to DUAL_QUATERNION_setitem is not a sequence");
+    if(sequence == NULL) { return -1; }
+    elements = PySequence_Fast_ITEMS(sequence);
+    for (i = 0; i < 8; i++) {
+      components[i] = PyFloat_AsDouble(elements[i]);
+    }
+    Py_DECREF(sequence);
+    if(PyErr_Occurred()) { return -1; }
+  } else {
+    PyErr_SetString(PyExc_TypeError,
+                    "Unknown input to DUAL_QUATERNION_setitem");
+    return -1;
+  }
+  return 0;
+}
+
+static PyObject *
+DUAL_QUATERNION_getitem(void* data, void* NPY_UNUSED(arr))
+{
+  dual_quaternion q;
+  memcpy(&q,data,sizeof(dual_quaternion));
+  return PyDualQuaternion_FromDualQuaternion(q);
+}
+
+static void
+DUAL_QUATERNION_fillwithscalar(dual_quaternion *buffer, npy_intp length, dual_quaternion *value,
+                               void *NPY_UNUSED(ignored))
+{
+  npy_intp i;
+  dual_quaternion val = *value;
+  for (i = 0; i < length; ++i) {
+    buffer[i] = val;
+  }
+}
+
+// Quaternions cast to dual quaternions representing pure rotations
+static void
+QUATERNION_to_dual_quaternion(quaternion *ip, dual_quaternion *op, npy_intp n,
+                              PyArrayObject *NPY_UNUSED(aip), PyArrayObject *NPY_UNUSED(aop))
+{
+  quaternion zero = {0.0, 0.0, 0.0, 0.0};
+  while (n--) {
+    op->r = *ip++;
+    op->d = zero;
+    op++;
+  }
+}
+
+// Real numbers cast to dual quaternions with only a nonzero scalar
+// part, as for quaternions; this provides the identity for reductions
+// such as `np.multiply.reduce`
+#define MAKE_T_TO_DUAL_QUATERNION(TYPE, type)                           \
+  static void                                                           \
+  TYPE ## _to_dual_quaternion(type *ip, dual_quaternion *op, npy_intp n, \
+                              PyArrayObject *NPY_UNUSED(aip), PyArrayObject *NPY_UNUSED(aop)) \
+  {                                                                     \
+    dual_quaternion zero = {{0.0, 0.0, 0.0, 0.0}, {0.0, 0.0, 0.0, 0.0}}; \
+    while (n--) {                                                       \
+      *op = zero;                                                       \
+      op->r.w = (double)(*ip++);                                        \
+      op++;                                                             \
+    }                                                                   \
+  }
+MAKE_T_TO_DUAL_QUATERNION(FLOAT, npy_float);
+MAKE_T_TO_DUAL_QUATERNION(DOUBLE, npy_double);
+MAKE_T_TO_DUAL_QUATERNION(LONGDOUBLE, npy_longdouble);
+MAKE_T_TO_DUAL_QUATERNION(BOOL, npy_bool);
+MAKE_T_TO_DUAL_QUATERNION(BYTE, npy_byte);
+MAKE_T_TO_DUAL_QUATERNION(UBYTE, npy_ubyte);
+MAKE_T_TO_DUAL_QUATERNION(SHORT, npy_short);
+MAKE_T_TO_DUAL_QUATERNION(USHORT, npy_ushort);
+MAKE_T_TO_DUAL_QUATERNION(INT, npy_int);
+MAKE_T_TO_DUAL_QUATERNION(UINT, npy_uint);
+MAKE_T_TO_DUAL_QUATERNION(LONG, npy_long);
+MAKE_T_TO_DUAL_QUATERNION(ULONG, npy_ulong);
+MAKE_T_TO_DUAL_QUATERNION(LONGLONG, npy_longlong);
+MAKE_T_TO_DUAL_QUATERNION(ULONGLONG, npy_ulonglong);
+
+static void register_cast_function(int sourceType, int destType, PyArray_VectorUnaryFunc *castfunc)
+{
+  PyArray_Descr *descr = PyArray_DescrFromType(sourceType);
+  PyArray_RegisterCastFunc(descr, destType, castfunc);
+  PyArray_RegisterCanCast(descr, destType, NPY_NOSCALAR);
+  Py_DECREF(descr);
+}
+
+
+// This is a macro that will be used to define the various basic unary
+// quaternion functions, so that they can be applied quickly to a
+// numpy array of quaternions.
+#define UNARY_GEN_UFUNC(ufunc_name, func_name, ret_type)        \
+  static void                                                           \
+  quaternion_##ufunc_name##_ufunc(char** args, npy_intp* dimensions,    \
+                                  npy_intp* steps, void* NPY_UNUSED(data)) { \
+    /* fprintf (stderr, "file %s, line %d, quaternion_%s_ufunc.\n", __FILE__, __LINE__, #ufunc_name); */ \
+    char *ip1 = args[0], *op1 = args[1];                                \
+    npy_intp is1 = steps[0], os1 = steps[1];                            \
+    npy_intp n = dimensions[0];                                         \
+    npy_intp i;                                                         \
+    for(i = 0; i < n; i++, ip1 += is1, op1 += os1){                     \
+      const quaternion in1 = *(quaternion *)ip1;                        \
+      *((ret_type *)op1) = quaternion_##func_name(in1);};}
+#define UNARY_UFUNC(name, ret_type) \
+  UNARY_GEN_UFUNC(name, name, ret_type)
+// And these all do the work mentioned above, using the macro
+UNARY_UFUNC(isnan, npy_bool)
+UNARY_UFUNC(isinf, npy_bool)
+UNARY_UFUNC(isfinite, npy_bool)
+UNARY_UFUNC(norm, npy_double)
+UNARY_UFUNC(absolute, npy_double)
+UNARY_UFUNC(angle, npy_double)
+UNARY_UFUNC(sqrt, quaternion)
+UNARY_UFUNC(log, quaternion)
+UNARY_UFUNC(exp, quaternion)
+UNARY_UFUNC(exp_approx, quaternion)
+UNARY_UFUNC(log_approx, quaternion)
+UNARY_UFUNC(negative, quaternion)
+UNARY_UFUNC(conjugate, quaternion)
+UNARY_GEN_UFUNC(invert, inverse, quaternion)
+UNARY_UFUNC(normalized, quaternion)
+UNARY_UFUNC(x_parity_conjugate, quaternion)
+UNARY_UFUNC(x_parity_symmetric_part, quaternion)
+UNARY_UFUNC(x_parity_antisymmetric_part, quaternion)
+UNARY_UFUNC(y_parity_conjugate, quaternion)
+UNARY_UFUNC(y_parity_symmetric_part, quaternion)
+UNARY_UFUNC(y_parity_antisymmetric_part, quaternion)
+UNARY_UFUNC(z_parity_conjugate, quaternion)
+UNARY_UFUNC(z_parity_symmetric_part, quaternion)
+UNARY_UFUNC(z_parity_antisymmetric_part, quaternion)
+UNARY_UFUNC(parity_conjugate, quaternion)
+UNARY_UFUNC(parity_symmetric_part, quaternion)
+UNARY_UFUNC(parity_antisymmetric_part, quaternion)
+
+
+// This is a macro that will be used to define the various basic binary
+// quaternion functions, so that they can be applied quickly to a
+// numpy array of quaternions.
+#define BINARY_GEN_UFUNC(ufunc_name, func_name, arg_type1, arg_type2, ret_type) \
+  static void                                                           \
+  quaternion_##ufunc_name##_ufunc(char** args, npy_intp* dimensions,    \
+                                  npy_intp* steps, void* NPY_UNUSED(data)) { \
+    /* fprintf (stderr, "file %s, line %d, quaternion_%s_ufunc.\n", __FILE__, __LINE__, #ufunc_name); */ \
+    char *ip1 = args[0], *ip2 = args[1], *op1 = args[2];                \
+    npy_intp is1 = steps[0], is2 = steps[1], os1 = steps[2];            \
+    npy_intp n = dimensions[0];                                         \
+    npy_intp i;                                                         \
+    for(i = 0; i < n; i++, ip1 += is1, ip2 += is2, op1 += os1) {        \
+      const arg_type1 in1 = *(arg_type1 *)ip1;                          \
+      const arg_type2 in2 = *(arg_type2 *)ip2;                          \
+      *((ret_type *)op1) = quaternion_##func_name(in1, in2);            \
+    };                                                                  \
+  };
+// A couple special-case versions of the above
+#define BINARY_UFUNC(name, ret_type)                    \
+  BINARY_GEN_UFUNC(name, name, quaternion, quaternion, ret_type)
+#define BINARY_SCALAR_UFUNC(name, ret_type)                             \
+  BINARY_GEN_UFUNC(name##_scalar, name##_scalar, quaternion, npy_double, ret_type) \
+  BINARY_GEN_UFUNC(scalar_##name, scalar_##name, npy_double, quaternion, ret_type)
+// And these all do the work mentioned above, using the macros
+BINARY_UFUNC(add, quaternion)
+BINARY_UFUNC(subtract, quaternion)
+BINARY_UFUNC(multiply, quaternion)
+BINARY_UFUNC(divide, quaternion)
+BINARY_GEN_UFUNC(true_divide, divide, quaternion, quaternion, quaternion)
 BINARY_GEN_UFUNC(floor_divide, divide, quaternion, quaternion, quaternion)
 BINARY_UFUNC(power, quaternion)
 BINARY_UFUNC(copysign, quaternion)
@@ -1151,135 +1900,1716 @@ BINARY_UFUNC(rotor_intrinsic_distance, npy_double)
 BINARY_UFUNC(rotor_chordal_distance, npy_double)
 BINARY_UFUNC(rotation_intrinsic_distance, npy_double)
 BINARY_UFUNC(rotation_chordal_distance, npy_double)
+BINARY_UFUNC(hemisphere_canonicalized, quaternion)
+
+// Generalized ufunc with signature (n)->(n) that flips the sign of
+// each quaternion along the core axis as needed to keep it in the same
+// hemisphere as the previous output, which removes sign discontinuities
+// from a time series of rotors in a single pass.  The first element is
+// unchanged.  Nans are passed through without becoming the reference
+// for later elements.
+static void
+unflip_rotors_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i, k;
+  npy_intp N = dimensions[0];
+  npy_intp n = dimensions[1];
+  npy_intp is_outer = steps[0], os_outer = steps[1];
+  npy_intp is = steps[2], os = steps[3];
+  char *ip_outer = args[0], *op_outer = args[1];
+  char *ip, *op;
+  quaternion previous = {1.0, 0.0, 0.0, 0.0}, q;
+  int have_previous;
+
+  for (k = 0; k < N; k++, ip_outer += is_outer, op_outer += os_outer) {
+    ip = ip_outer;
+    op = op_outer;
+    have_previous = 0;
+    for (i = 0; i < n; i++, ip += is, op += os) {
+      q = *(quaternion *)ip;
+      if (have_previous) {
+        q = quaternion_hemisphere_canonicalized(q, previous);
+      }
+      *((quaternion *)op) = q;
+      if (!quaternion_isnan(q)) {
+        previous = q;
+        have_previous = 1;
+      }
+    }
+  }
+}
+
+
+// Interface to the module-level slerp function
+PYQUATERNION_FASTCALL_FUNCTION(pyquaternion_slerp_evaluate)
+static PyObject*
+pyquaternion_slerp_evaluate_impl(PyObject *const *args, Py_ssize_t nargs)
+{
+  double tau;
+  quaternion q1, q2;
+  if (nargs != 3) {
+    PyErr_Format(PyExc_TypeError, "slerp_evaluate() takes exactly 3 arguments (%zd given)", nargs);
+    return NULL;
+  }
+  if (pyquaternion_as_quaternion_argument(args[0], &q1, "slerp_evaluate", 1) < 0
+      || pyquaternion_as_quaternion_argument(args[1], &q2, "slerp_evaluate", 2) < 0
+      || pyquaternion_as_double(args[2], &tau) < 0) {
+    return NULL;
+  }
+  return PyQuaternion_FromQuaternion(slerp(q1, q2, tau));
+}
+
+// Interface to the evaluate a squad interpolant at a particular time
+PYQUATERNION_FASTCALL_FUNCTION(pyquaternion_squad_evaluate)
+static PyObject*
+pyquaternion_squad_evaluate_impl(PyObject *const *args, Py_ssize_t nargs)
+{
+  double tau_i;
+  quaternion q_i, a_i, b_ip1, q_ip1;
+  if (nargs != 5) {
+    PyErr_Format(PyExc_TypeError, "squad_evaluate() takes exactly 5 arguments (%zd given)", nargs);
+    return NULL;
+  }
+  if (pyquaternion_as_double(args[0], &tau_i) < 0
+      || pyquaternion_as_quaternion_argument(args[1], &q_i, "squad_evaluate", 2) < 0
+      || pyquaternion_as_quaternion_argument(args[2], &a_i, "squad_evaluate", 3) < 0
+      || pyquaternion_as_quaternion_argument(args[3], &b_ip1, "squad_evaluate", 4) < 0
+      || pyquaternion_as_quaternion_argument(args[4], &q_ip1, "squad_evaluate", 5) < 0) {
+    return NULL;
+  }
+  return PyQuaternion_FromQuaternion(squad_evaluate(tau_i, q_i, a_i, b_ip1, q_ip1));
+}
+
+// This will be used to create the ufunc needed for `slerp`, which
+// evaluates the interpolant at a point.  The method for doing this
+// was pieced together from examples given on the page
+// <https://docs.scipy.org/doc/numpy/user/c-info.ufunc-tutorial.html>
+static void
+slerp_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i;
+  double tau_i;
+  quaternion *q_1, *q_2;
+
+  npy_intp is1=steps[0];
+  npy_intp is2=steps[1];
+  npy_intp is3=steps[2];
+  npy_intp os=steps[3];
+  npy_intp n=dimensions[0];
+
+  char *i1=args[0];
+  char *i2=args[1];
+  char *i3=args[2];
+  char *op=args[3];
+
+  if (is1==0 && is2==0 && n>1) {
+    // The same pair of endpoints is evaluated at many values of tau (as in
+    // `quaternion.slerp`), so find the relative rotation and its log just
+    // once; each sample then costs one exp and one multiplication.
+    quaternion q_rel, log_rel;
+    q_1 = (quaternion*)i1;
+    q_2 = (quaternion*)i2;
+    if (quaternion_rotor_chordal_distance(*q_1, *q_2)<=1.414213562373096) {
+      q_rel = quaternion_divide(*q_2, *q_1);
+    } else {
+      q_rel = quaternion_divide(quaternion_negative(*q_2), *q_1);
+    }
+    if (quaternion_nonzero(q_rel)) {
+      log_rel = quaternion_log(q_rel);
+      for (i = 0; i < n; i++) {
+        tau_i = *(double *)i3;
+        *((quaternion *)op) = quaternion_multiply(quaternion_exp(quaternion_multiply_scalar(log_rel, tau_i)), *q_1);
+        i3 += is3;
+        op += os;
+      }
+      return;
+    }
+  }
+
+  for (i = 0; i < n; i++) {
+    q_1 = (quaternion*)i1;
+    q_2 = (quaternion*)i2;
+    tau_i = *(double *)i3;
+
+    *((quaternion *)op) = slerp(*q_1, *q_2, tau_i);
+
+    i1 += is1;
+    i2 += is2;
+    i3 += is3;
+    op += os;
+  }
+}
+
+// This will be used to create the ufunc needed for `squad`, which
+// evaluates the interpolant at a point.  The method for doing this
+// was pieced together from examples given on the page
+// <https://docs.scipy.org/doc/numpy/user/c-info.ufunc-tutorial.html>
+static void
+squad_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i;
+  double tau_i;
+  quaternion *q_i, *a_i, *b_ip1, *q_ip1;
+
+  npy_intp is1=steps[0];
+  npy_intp is2=steps[1];
+  npy_intp is3=steps[2];
+  npy_intp is4=steps[3];
+  npy_intp is5=steps[4];
+  npy_intp os=steps[5];
+  npy_intp n=dimensions[0];
+
+  char *i1=args[0];
+  char *i2=args[1];
+  char *i3=args[2];
+  char *i4=args[3];
+  char *i5=args[4];
+  char *op=args[5];
+
+  for (i = 0; i < n; i++) {
+    tau_i = *(double *)i1;
+    q_i = (quaternion*)i2;
+    a_i = (quaternion*)i3;
+    b_ip1 = (quaternion*)i4;
+    q_ip1 = (quaternion*)i5;
+
+    *((quaternion *)op) = squad_evaluate(tau_i, *q_i, *a_i, *b_ip1, *q_ip1);
+
+    i1 += is1;
+    i2 += is2;
+    i3 += is3;
+    i4 += is4;
+    i5 += is5;
+    op += os;
+  }
+}
+
+
+// This will be used to create the gufunc `slerp_series_vectorized`,
+// with signature (n),(n),(),()->(), which evaluates the piecewise
+// slerp `exp(tau*log_rel[i]) * R[i]` for each (i, tau).  Here,
+// `log_rel[i]` is the log of the rotation taking R[i] to R[i+1].  The
+// segment index is used directly inside the loop, so the caller
+// doesn't need to gather R and log_rel into temporary arrays.
+static void
+slerp_series_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp k, i_k;
+  npy_intp N = dimensions[0];
+  npy_intp n = dimensions[1];
+  npy_intp is_R = steps[0], is_log = steps[1], is_i = steps[2], is_tau = steps[3], os = steps[4];
+  npy_intp cs_R = steps[5], cs_log = steps[6];
+  char *ip_R = args[0], *ip_log = args[1], *ip_i = args[2], *ip_tau = args[3], *op = args[4];
+  quaternion q_i, log_i;
+  quaternion nan_quaternion = {NPY_NAN, NPY_NAN, NPY_NAN, NPY_NAN};
+
+  for (k = 0; k < N; k++) {
+    i_k = *(npy_intp *)ip_i;
+    if (i_k < 0 || i_k >= n) {
+      *((quaternion *)op) = nan_quaternion;
+    } else {
+      q_i = *(quaternion *)(ip_R + i_k*cs_R);
+      log_i = *(quaternion *)(ip_log + i_k*cs_log);
+      *((quaternion *)op) = quaternion_multiply(quaternion_exp(quaternion_multiply_scalar(log_i, *(double *)ip_tau)),
+                                                q_i);
+    }
+    ip_R += is_R;
+    ip_log += is_log;
+    ip_i += is_i;
+    ip_tau += is_tau;
+    op += os;
+  }
+}
+
+
+// This will be used to create the gufunc `squad_series_vectorized`,
+// with signature (),(),(n),(n),(n),(n)->().  It is like
+// `squad_vectorized`, except that it takes the index i of each
+// segment along with tau, and reads q_i, a_i, b_ip1, q_ip1 at that
+// index from the full arrays, rather than requiring the caller to
+// gather them into temporary arrays.  The ufunc data points to the
+// function used to evaluate each point, so the same loop also serves
+// `squad_series_vectorized_approx`.
+typedef quaternion (*squad_evaluator)(double, quaternion, quaternion, quaternion, quaternion);
+static squad_evaluator squad_series_evaluators[2] = {squad_evaluate, squad_evaluate_approx};
+static void
+squad_series_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* data)
+{
+  squad_evaluator evaluate = *(squad_evaluator *)data;
+  npy_intp k, i_k;
+  npy_intp N = dimensions[0];
+  npy_intp n = dimensions[1];
+  npy_intp is_tau = steps[0], is_i = steps[1], is_q = steps[2], is_a = steps[3], is_b = steps[4], is_qp1 = steps[5];
+  npy_intp os = steps[6];
+  npy_intp cs_q = steps[7], cs_a = steps[8], cs_b = steps[9], cs_qp1 = steps[10];
+  char *ip_tau = args[0], *ip_i = args[1], *ip_q = args[2], *ip_a = args[3], *ip_b = args[4], *ip_qp1 = args[5];
+  char *op = args[6];
+  quaternion nan_quaternion = {NPY_NAN, NPY_NAN, NPY_NAN, NPY_NAN};
+
+  for (k = 0; k < N; k++) {
+    i_k = *(npy_intp *)ip_i;
+    if (i_k < 0 || i_k >= n) {
+      *((quaternion *)op) = nan_quaternion;
+    } else {
+      *((quaternion *)op) = evaluate(*(double *)ip_tau,
+                                     *(quaternion *)(ip_q + i_k*cs_q),
+                                     *(quaternion *)(ip_a + i_k*cs_a),
+                                     *(quaternion *)(ip_b + i_k*cs_b),
+                                     *(quaternion *)(ip_qp1 + i_k*cs_qp1));
+    }
+    ip_tau += is_tau;
+    ip_i += is_i;
+    ip_q += is_q;
+    ip_a += is_a;
+    ip_b += is_b;
+    ip_qp1 += is_qp1;
+    op += os;
+  }
+}
+
+
+// This will be used to create the gufunc `slerp_series_coefficients_vectorized`, with
+// signature (n)->(n), which computes the `log_rel` input of
+// `slerp_series_vectorized`: the log of the shorter of the two
+// rotations taking R[i] to R[i+1] (or to -R[i+1]), and zero for the
+// last element.
+static void
+slerp_series_coefficients_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp k, i;
+  npy_intp N = dimensions[0];
+  npy_intp n = dimensions[1];
+  npy_intp cs_R = steps[2], cs_log = steps[3];
+  char *ip_R = args[0], *op_log = args[1];
+  quaternion R_i, R_ip1;
+  quaternion zero = {0.0, 0.0, 0.0, 0.0};
+  double sqrt_2 = sqrt(2.0);
+
+  for (k = 0; k < N; k++, ip_R += steps[0], op_log += steps[1]) {
+    for (i = 0; i < n - 1; i++) {
+      R_i = *(quaternion *)(ip_R + i*cs_R);
+      R_ip1 = *(quaternion *)(ip_R + (i+1)*cs_R);
+      if (quaternion_rotor_chordal_distance(R_i, R_ip1) > sqrt_2) {
+        R_ip1 = quaternion_negative(R_ip1);
+      }
+      *(quaternion *)(op_log + i*cs_log) = quaternion_log(quaternion_divide(R_ip1, R_i));
+    }
+    if (n > 0) {
+      *(quaternion *)(op_log + (n-1)*cs_log) = zero;
+    }
+  }
+}
+
+
+// This will be used to create the gufunc `squad_series_coefficients_vectorized`,
+// with signature (n),(n)->(n),(n),(n), which computes the A, B, and
+// R_ip1 inputs of `squad_series_vectorized` from the input rotors R
+// and times t.  Writing L[i] = log(~R[i] * R[i+1]), these are
+//
+//   A[i] = R[i] * exp((-L[i] + L[i-1] * (t[i+1]-t[i]) / (t[i]-t[i-1])) * 0.25)
+//   B[i] = R[i+1] * exp((L[i+1] * (t[i+1]-t[i]) / (t[i+2]-t[i+1]) - L[i]) * -0.25)
+//
+// At the ends, R is extended by R[-1] = R[0] * ~R[1] * R[0] and
+// R[n] = R[n-1] * ~R[n-2] * R[n-1], for which the formulas simplify to
+// A[0] = R[0], A[n-1] = R[n-1], B[n-2] = R[n-1], and B[n-1] = R[n].
+// R_ip1[i] is R[i+1], including that R[n].  Each L[i] is computed
+// once and carried over to the next step.  As with
+// `squad_series_vectorized`, the ufunc data selects the exact or
+// approximate exp and log functions.
+typedef struct {
+  quaternion (*exp)(quaternion);
+  quaternion (*log)(quaternion);
+} exp_log_functions;
+static exp_log_functions squad_coefficients_functions[2] = {
+  {quaternion_exp, quaternion_log},
+  {quaternion_exp_approx, quaternion_log_approx}
+};
+static void
+squad_series_coefficients_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* data)
+{
+  exp_log_functions f = *(exp_log_functions *)data;
+  npy_intp k, i;
+  npy_intp N = dimensions[0];
+  npy_intp n = dimensions[1];
+  npy_intp cs_R = steps[5], cs_t = steps[6], cs_A = steps[7], cs_B = steps[8], cs_Rp1 = steps[9];
+  char *ip_R = args[0], *ip_t = args[1], *op_A = args[2], *op_B = args[3], *op_Rp1 = args[4];
+  quaternion R_i, R_ip1, R_ip2, R_n, L_im1, L_i, L_ip1;
+  double t_im1, t_i, t_ip1, t_ip2;
+
+  for (k = 0; k < N; k++, ip_R += steps[0], ip_t += steps[1], op_A += steps[2], op_B += steps[3], op_Rp1 += steps[4]) {
+    if (n == 0) {
+      continue;
+    }
+    R_i = *(quaternion *)ip_R;
+    if (n == 1) {
+      *(quaternion *)op_A = *(quaternion *)op_B = *(quaternion *)op_Rp1 = R_i;
+      continue;
+    }
+    R_n = quaternion_multiply(quaternion_multiply(*(quaternion *)(ip_R + (n-1)*cs_R),
+                                                  quaternion_inverse(*(quaternion *)(ip_R + (n-2)*cs_R))),
+                              *(quaternion *)(ip_R + (n-1)*cs_R));
+    R_ip1 = *(quaternion *)(ip_R + cs_R);
+    t_i = *(double *)ip_t;
+    t_ip1 = *(double *)(ip_t + cs_t);
+    L_i = f.log(quaternion_multiply(quaternion_inverse(R_i), R_ip1));
+    L_im1 = L_i;  // Unused for i = 0
+    t_im1 = t_i;
+    for (i = 0; i < n - 1; i++) {
+      if (i == 0) {
+        *(quaternion *)(op_A + i*cs_A) = R_i;
+      } else {
+        *(quaternion *)(op_A + i*cs_A) = quaternion_multiply(
+            R_i, f.exp(quaternion_multiply_scalar(
+                quaternion_add(quaternion_negative(L_i),
+                               quaternion_multiply_scalar(L_im1, (t_ip1 - t_i) / (t_i - t_im1))),
+                0.25)));
+      }
+      if (i + 2 < n) {
+        R_ip2 = *(quaternion *)(ip_R + (i+2)*cs_R);
+        t_ip2 = *(double *)(ip_t + (i+2)*cs_t);
+        L_ip1 = f.log(quaternion_multiply(quaternion_inverse(R_ip1), R_ip2));
+        *(quaternion *)(op_B + i*cs_B) = quaternion_multiply(
+            R_ip1, f.exp(quaternion_multiply_scalar(
+                quaternion_subtract(quaternion_multiply_scalar(L_ip1, (t_ip1 - t_i) / (t_ip2 - t_ip1)), L_i),
+                -0.25)));
+      } else {
+        *(quaternion *)(op_B + i*cs_B) = R_ip1;
+      }
+      *(quaternion *)(op_Rp1 + i*cs_Rp1) = R_ip1;
+      R_i = R_ip1;
+      L_im1 = L_i;
+      t_im1 = t_i;
+      t_i = t_ip1;
+      if (i + 2 < n) {
+        R_ip1 = R_ip2;
+        L_i = L_ip1;
+        t_ip1 = t_ip2;
+      }
+    }
+    *(quaternion *)(op_A + (n-1)*cs_A) = R_i;
+    *(quaternion *)(op_B + (n-1)*cs_B) = R_n;
+    *(quaternion *)(op_Rp1 + (n-1)*cs_Rp1) = R_n;
+  }
+}
+
+
+// These will be used to create the ufuncs `slerp_vectorized_approx` and
+// `squad_vectorized_approx`, which are like `slerp_vectorized` and
+// `squad_vectorized`, but use the approximate exp and log functions
+static void
+slerp_approx_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i;
+  npy_intp is1=steps[0], is2=steps[1], is3=steps[2], os=steps[3];
+  npy_intp n=dimensions[0];
+  char *i1=args[0], *i2=args[1], *i3=args[2], *op=args[3];
+
+  for (i = 0; i < n; i++, i1 += is1, i2 += is2, i3 += is3, op += os) {
+    *((quaternion *)op) = slerp_approx(*(quaternion *)i1, *(quaternion *)i2, *(double *)i3);
+  }
+}
+
+static void
+squad_approx_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i;
+  npy_intp is1=steps[0], is2=steps[1], is3=steps[2], is4=steps[3], is5=steps[4], os=steps[5];
+  npy_intp n=dimensions[0];
+  char *i1=args[0], *i2=args[1], *i3=args[2], *i4=args[3], *i5=args[4], *op=args[5];
+
+  for (i = 0; i < n; i++, i1 += is1, i2 += is2, i3 += is3, i4 += is4, i5 += is5, op += os) {
+    *((quaternion *)op) = squad_evaluate_approx(*(double *)i1, *(quaternion *)i2, *(quaternion *)i3,
+                                                *(quaternion *)i4, *(quaternion *)i5);
+  }
+}
+
+
+// These will be used to create the ufuncs `nlerp_vectorized`, taking
+// arrays of (q_1, q_2, tau), and `slerp_adaptive_vectorized`, taking
+// arrays of (q_1, q_2, tau, threshold)
+static void
+nlerp_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i;
+  npy_intp is1=steps[0], is2=steps[1], is3=steps[2], os=steps[3];
+  npy_intp n=dimensions[0];
+  char *i1=args[0], *i2=args[1], *i3=args[2], *op=args[3];
+
+  for (i = 0; i < n; i++, i1 += is1, i2 += is2, i3 += is3, op += os) {
+    *((quaternion *)op) = nlerp(*(quaternion *)i1, *(quaternion *)i2, *(double *)i3);
+  }
+}
+
+static void
+slerp_adaptive_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i;
+  npy_intp is1=steps[0], is2=steps[1], is3=steps[2], is4=steps[3], os=steps[4];
+  npy_intp n=dimensions[0];
+  char *i1=args[0], *i2=args[1], *i3=args[2], *i4=args[3], *op=args[4];
+
+  for (i = 0; i < n; i++, i1 += is1, i2 += is2, i3 += is3, i4 += is4, op += os) {
+    *((quaternion *)op) = slerp_adaptive(*(quaternion *)i1, *(quaternion *)i2, *(double *)i3, *(double *)i4);
+  }
+}
+
+// This will be used to create the gufunc `squad_series_vectorized_adaptive`,
+// with signature (),(),(n),(n),(n),(n),()->().  It is like
+// `squad_series_vectorized`, but each slerp is replaced by nlerp when the
+// endpoints are closer than the threshold given as the last input.
+static void
+squad_series_adaptive_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp k, i_k;
+  npy_intp N = dimensions[0];
+  npy_intp n = dimensions[1];
+  npy_intp is_tau = steps[0], is_i = steps[1], is_q = steps[2], is_a = steps[3], is_b = steps[4], is_qp1 = steps[5];
+  npy_intp is_th = steps[6], os = steps[7];
+  npy_intp cs_q = steps[8], cs_a = steps[9], cs_b = steps[10], cs_qp1 = steps[11];
+  char *ip_tau = args[0], *ip_i = args[1], *ip_q = args[2], *ip_a = args[3], *ip_b = args[4], *ip_qp1 = args[5];
+  char *ip_th = args[6], *op = args[7];
+  quaternion nan_quaternion = {NPY_NAN, NPY_NAN, NPY_NAN, NPY_NAN};
+
+  for (k = 0; k < N; k++) {
+    i_k = *(npy_intp *)ip_i;
+    if (i_k < 0 || i_k >= n) {
+      *((quaternion *)op) = nan_quaternion;
+    } else {
+      *((quaternion *)op) = squad_evaluate_adaptive(*(double *)ip_tau,
+                                                    *(quaternion *)(ip_q + i_k*cs_q),
+                                                    *(quaternion *)(ip_a + i_k*cs_a),
+                                                    *(quaternion *)(ip_b + i_k*cs_b),
+                                                    *(quaternion *)(ip_qp1 + i_k*cs_qp1),
+                                                    *(double *)ip_th);
+    }
+    ip_tau += is_tau;
+    ip_i += is_i;
+    ip_q += is_q;
+    ip_a += is_a;
+    ip_b += is_b;
+    ip_qp1 += is_qp1;
+    ip_th += is_th;
+    op += os;
+  }
+}
+
+
+// These loops implement the conversions between quaternions and other
+// representations of rotations used by `as_rotation_matrix`,
+// `from_euler_angles`, etc.  Each component of the non-quaternion side
+// is a separate input or output, so that the Python functions can pass
+// views of preallocated arrays, and no temporary arrays are needed.
+static void
+as_rotation_matrix_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i, j;
+  npy_intp n = dimensions[0];
+  char *ip = args[0];
+  char *op[9];
+  double m[9], norm;
+  quaternion q;
+  for (j = 0; j < 9; j++) {
+    op[j] = args[1+j];
+  }
+  for (i = 0; i < n; i++) {
+    q = *(quaternion *)ip;
+    norm = quaternion_norm(q);
+    m[0] = 1.0 - 2*(q.y*q.y + q.z*q.z)/norm;
+    m[1] = 2*(q.x*q.y - q.z*q.w)/norm;
+    m[2] = 2*(q.x*q.z + q.y*q.w)/norm;
+    m[3] = 2*(q.x*q.y + q.z*q.w)/norm;
+    m[4] = 1.0 - 2*(q.x*q.x + q.z*q.z)/norm;
+    m[5] = 2*(q.y*q.z - q.x*q.w)/norm;
+    m[6] = 2*(q.x*q.z - q.y*q.w)/norm;
+    m[7] = 2*(q.y*q.z + q.x*q.w)/norm;
+    m[8] = 1.0 - 2*(q.x*q.x + q.y*q.y)/norm;
+    ip += steps[0];
+    for (j = 0; j < 9; j++) {
+      *(double *)op[j] = m[j];
+      op[j] += steps[1+j];
+    }
+  }
+}
+
+static void
+from_rotation_matrix_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  // Markley's algorithm: compute the quaternion from whichever of the
+  // diagonal elements and the trace is largest, for numerical stability
+  npy_intp i, j;
+  npy_intp n = dimensions[0];
+  char *ip[9];
+  char *op = args[9];
+  double m[9], d[4], norm;
+  int k, k_max;
+  quaternion q;
+  for (j = 0; j < 9; j++) {
+    ip[j] = args[j];
+  }
+  for (i = 0; i < n; i++) {
+    for (j = 0; j < 9; j++) {
+      m[j] = *(double *)ip[j];
+      ip[j] += steps[j];
+    }
+    d[0] = m[0];
+    d[1] = m[4];
+    d[2] = m[8];
+    d[3] = m[0] + m[4] + m[8];
+    k_max = 0;
+    for (k = 1; k < 4; k++) {
+      if (d[k] > d[k_max] || (d[k] != d[k] && d[k_max] == d[k_max])) {  // NaN wins, like argmax
+        k_max = k;
+      }
+      if (d[k_max] != d[k_max]) {
+        break;
+      }
+    }
+    switch (k_max) {
+    case 0:
+      q.w = m[7] - m[5];
+      q.x = 1 + m[0] - m[4] - m[8];
+      q.y = m[1] + m[3];
+      q.z = m[2] + m[6];
+      break;
+    case 1:
+      q.w = m[2] - m[6];
+      q.x = m[3] + m[1];
+      q.y = 1 - m[0] + m[4] - m[8];
+      q.z = m[5] + m[7];
+      break;
+    case 2:
+      q.w = m[3] - m[1];
+      q.x = m[6] + m[2];
+      q.y = m[7] + m[5];
+      q.z = 1 - m[0] - m[4] + m[8];
+      break;
+    default:
+      q.w = 1 + m[0] + m[4] + m[8];
+      q.x = m[7] - m[5];
+      q.y = m[2] - m[6];
+      q.z = m[3] - m[1];
+      break;
+    }
+    norm = sqrt(quaternion_norm(q));
+    q.w /= norm;
+    q.x /= norm;
+    q.y /= norm;
+    q.z /= norm;
+    *(quaternion *)op = q;
+    op += steps[9];
+  }
+}
+
+// Solve Wahba's problem for the attitude profile matrix B = sum_i w_i
+// a_i b_i^T (in row-major order), returning the unit quaternion R that
+// maximizes sum_i w_i a_i . (R b_i R^{-1}), which is the eigenvector of
+// the largest eigenvalue of Davenport's symmetric 4x4 matrix K.  This
+// is the matrix K3 used in `from_rotation_matrix` (times 3, with the
+// scalar component first), since the optimal rotation matrix is the
+// one closest to B.  The eigenvalue is found as in QUEST, by Newton's
+// method on the characteristic polynomial, starting from the upper
+// bound `lambda` = sum_i w_i |a_i| |b_i|, which is exact when the
+// observations are consistent.  The eigenvector is the largest column
+// of the adjugate of (lambda I - K), as in ESOQ; that vanishes when the
+// largest eigenvalue is (nearly) repeated -- as when all the vectors
+// are parallel, and the optimum is not unique -- in which case Jacobi
+// iteration on K picks out one of the optimal rotations.
+static NPY_INLINE double
+adjugate_4x4(double a[4][4], double b[4][4])
+{
+  // Cofactors from the 2x2 minors of the first two and last two rows; returns the determinant
+  double s0 = a[0][0]*a[1][1] - a[1][0]*a[0][1];
+  double s1 = a[0][0]*a[1][2] - a[1][0]*a[0][2];
+  double s2 = a[0][0]*a[1][3] - a[1][0]*a[0][3];
+  double s3 = a[0][1]*a[1][2] - a[1][1]*a[0][2];
+  double s4 = a[0][1]*a[1][3] - a[1][1]*a[0][3];
+  double s5 = a[0][2]*a[1][3] - a[1][2]*a[0][3];
+  double c5 = a[2][2]*a[3][3] - a[3][2]*a[2][3];
+  double c4 = a[2][1]*a[3][3] - a[3][1]*a[2][3];
+  double c3 = a[2][1]*a[3][2] - a[3][1]*a[2][2];
+  double c2 = a[2][0]*a[3][3] - a[3][0]*a[2][3];
+  double c1 = a[2][0]*a[3][2] - a[3][0]*a[2][2];
+  double c0 = a[2][0]*a[3][1] - a[3][0]*a[2][1];
+  b[0][0] =  a[1][1]*c5 - a[1][2]*c4 + a[1][3]*c3;
+  b[0][1] = -a[0][1]*c5 + a[0][2]*c4 - a[0][3]*c3;
+  b[0][2] =  a[3][1]*s5 - a[3][2]*s4 + a[3][3]*s3;
+  b[0][3] = -a[2][1]*s5 + a[2][2]*s4 - a[2][3]*s3;
+  b[1][0] = -a[1][0]*c5 + a[1][2]*c2 - a[1][3]*c1;
+  b[1][1] =  a[0][0]*c5 - a[0][2]*c2 + a[0][3]*c1;
+  b[1][2] = -a[3][0]*s5 + a[3][2]*s2 - a[3][3]*s1;
+  b[1][3] =  a[2][0]*s5 - a[2][2]*s2 + a[2][3]*s1;
+  b[2][0] =  a[1][0]*c4 - a[1][1]*c2 + a[1][3]*c0;
+  b[2][1] = -a[0][0]*c4 + a[0][1]*c2 - a[0][3]*c0;
+  b[2][2] =  a[3][0]*s4 - a[3][1]*s2 + a[3][3]*s0;
+  b[2][3] = -a[2][0]*s4 + a[2][1]*s2 - a[2][3]*s0;
+  b[3][0] = -a[1][0]*c3 + a[1][1]*c1 - a[1][2]*c0;
+  b[3][1] =  a[0][0]*c3 - a[0][1]*c1 + a[0][2]*c0;
+  b[3][2] = -a[3][0]*s3 + a[3][1]*s1 - a[3][2]*s0;
+  b[3][3] =  a[2][0]*s3 - a[2][1]*s1 + a[2][2]*s0;
+  return s0*c5 - s1*c4 + s2*c3 + s3*c2 - s4*c1 + s5*c0;
+}
+
+static void
+symmetric_4x4_dominant_eigenvector_jacobi(double a[4][4], double v[4])
+{
+  double V[4][4] = {{1, 0, 0, 0}, {0, 1, 0, 0}, {0, 0, 1, 0}, {0, 0, 0, 1}};
+  double off, theta, t, c, s, tau, g, h;
+  int sweep, p, q, k, k_max;
+  for (sweep = 0; sweep < 50; sweep++) {
+    off = 0.0;
+    for (p = 0; p < 3; p++) {
+      for (q = p+1; q < 4; q++) {
+        off += a[p][q]*a[p][q];
+      }
+    }
+    if (!(off > 1e-30 * (a[0][0]*a[0][0] + a[1][1]*a[1][1] + a[2][2]*a[2][2] + a[3][3]*a[3][3]))) {
+      break;
+    }
+    for (p = 0; p < 3; p++) {
+      for (q = p+1; q < 4; q++) {
+        if (a[p][q] == 0.0) {
+          continue;
+        }
+        theta = (a[q][q] - a[p][p]) / (2 * a[p][q]);
+        t = (theta >= 0 ? 1.0 : -1.0) / (fabs(theta) + sqrt(theta*theta + 1));
+        c = 1 / sqrt(t*t + 1);
+        s = t * c;
+        tau = s / (1 + c);
+        h = t * a[p][q];
+        a[p][p] -= h;
+        a[q][q] += h;
+        a[p][q] = a[q][p] = 0.0;
+        for (k = 0; k < 4; k++) {
+          if (k != p && k != q) {
+            g = a[k][p];
+            h = a[k][q];
+            a[k][p] = a[p][k] = g - s*(h + g*tau);
+            a[k][q] = a[q][k] = h + s*(g - h*tau);
+          }
+          g = V[k][p];
+          h = V[k][q];
+          V[k][p] = g - s*(h + g*tau);
+          V[k][q] = h + s*(g - h*tau);
+        }
+      }
+    }
+  }
+  k_max = 0;
+  for (k = 1; k < 4; k++) {
+    if (a[k][k] > a[k_max][k_max]) {
+      k_max = k;
+    }
+  }
+  for (k = 0; k < 4; k++) {
+    v[k] = V[k][k_max];
+  }
+}
+
+// Euclidean norm of a 3-vector, scaled by its largest component so
+// that the squares cannot overflow or underflow
+static double
+vector_norm3(const double x[3])
+{
+  double m = fabs(x[0]);
+  if (fabs(x[1]) > m) {
+    m = fabs(x[1]);
+  }
+  if (fabs(x[2]) > m) {
+    m = fabs(x[2]);
+  }
+  if (!(m > 0.0 && npy_isfinite(m))) {
+    // Zero, infinite, or NaN, any of which the direct formula handles
+    return sqrt(x[0]*x[0] + x[1]*x[1] + x[2]*x[2]);
+  }
+  return m * sqrt((x[0]/m)*(x[0]/m) + (x[1]/m)*(x[1]/m) + (x[2]/m)*(x[2]/m));
+}
+
+static quaternion
+davenport_q_method(double B[9], double lambda)
+{
+  double K[4][4], M[4][4], adj[4][4], K2[4][4];
+  double c0, c1, c2, p, dp = 0.0, step, norm, v[4];
+  double scale, degenerate_threshold;
+  int i, j, k, k_max;
+  quaternion q;
+  // The rotation does not depend on the overall scale of B, so divide by the upper bound lambda on the eigenvalues.
+  // Otherwise the coefficients below, which are up to fourth degree in B, overflow or underflow for extreme inputs.
+  // If lambda itself overflowed or underflowed while B did not, its largest element serves as the scale instead.
+  if (lambda == 0.0 || npy_isinf(lambda)) {
+    scale = 0.0;
+    for (k = 0; k < 9; k++) {
+      if (fabs(B[k]) > scale) {
+        scale = fabs(B[k]);
+      }
+    }
+    if (scale > 0.0 && npy_isfinite(scale)) {
+      lambda = 6 * scale;  // The largest eigenvalue is at most the sum of the singular values, < 3*sqrt(3)*max|B_ij|
+    }
+  }
+  if (lambda > 0.0 && npy_isfinite(lambda)) {
+    for (k = 0; k < 9; k++) {
+      B[k] /= lambda;
+    }
+    lambda = 1.0;
+  }
+  scale = lambda;
+  K[0][0] = B[0] + B[4] + B[8];
+  K[1][1] = B[0] - B[4] - B[8];
+  K[2][2] = B[4] - B[0] - B[8];
+  K[3][3] = B[8] - B[0] - B[4];
+  K[0][1] = K[1][0] = B[7] - B[5];
+  K[0][2] = K[2][0] = B[2] - B[6];
+  K[0][3] = K[3][0] = B[3] - B[1];
+  K[1][2] = K[2][1] = B[3] + B[1];
+  K[1][3] = K[3][1] = B[6] + B[2];
+  K[2][3] = K[3][2] = B[7] + B[5];
+
+  // Characteristic polynomial lambda^4 + c2 lambda^2 + c1 lambda + c0 of the traceless matrix K
+  c2 = 0.0;
+  c1 = 0.0;
+  for (i = 0; i < 4; i++) {
+    for (j = 0; j < 4; j++) {
+      K2[i][j] = K[i][0]*K[0][j] + K[i][1]*K[1][j] + K[i][2]*K[2][j] + K[i][3]*K[3][j];
+      c2 -= K[i][j]*K[i][j] / 2;
+    }
+  }
+  for (i = 0; i < 4; i++) {
+    for (j = 0; j < 4; j++) {
+      c1 -= K2[i][j]*K[j][i] / 3;
+    }
+  }
+  c0 = adjugate_4x4(K, adj);
+
+  // Starting above the largest root, Newton's method decreases lambda monotonically.  The derivative of the
+  // polynomial at the root is the product of the gaps to the other eigenvalues, so it is small only when the largest
+  // eigenvalue is nearly repeated.  The error in the adjugate's eigenvector grows as the inverse square of that gap,
+  // so Jacobi iteration is used instead unless the gap is at least about 1e-3 of the scale.
+  degenerate_threshold = 1e-3 * scale*scale*scale;
+  for (k = 0; k < 100; k++) {
+    p = ((lambda*lambda + c2)*lambda + c1)*lambda + c0;
+    dp = (4*lambda*lambda + 2*c2)*lambda + c1;
+    if (!(dp > degenerate_threshold)) {
+      break;
+    }
+    step = p / dp;
+    if (!(step > 1e-16 * scale)) {
+      break;
+    }
+    lambda -= step;
+  }
+
+  // The eigenvector from the adjugate, or from Jacobi iteration when the eigenvalue is (nearly) degenerate
+  k_max = 0;
+  if (dp > degenerate_threshold) {
+    for (i = 0; i < 4; i++) {
+      for (j = 0; j < 4; j++) {
+        M[i][j] = (i == j ? lambda : 0.0) - K[i][j];
+      }
+    }
+    adjugate_4x4(M, adj);
+    for (k = 1; k < 4; k++) {
+      if (adj[k][k] > adj[k_max][k_max]) {
+        k_max = k;
+      }
+    }
+  }
+  if (dp > degenerate_threshold && adj[k_max][k_max] > 0.0) {
+    for (k = 0; k < 4; k++) {
+      v[k] = adj[k][k_max];
+    }
+  } else if (scale > 0.0) {
+    symmetric_4x4_dominant_eigenvector_jacobi(K, v);
+  } else {
+    // No information at all (or NaN), so the identity is as good as anything
+    v[0] = (scale == 0.0) ? 1.0 : scale;
+    v[1] = v[2] = v[3] = 0.0;
+  }
+  norm = sqrt(v[0]*v[0] + v[1]*v[1] + v[2]*v[2] + v[3]*v[3]);
+  if (v[0] < 0) {
+    norm = -norm;
+  }
+  q.w = v[0] / norm;
+  q.x = v[1] / norm;
+  q.y = v[2] / norm;
+  q.z = v[3] / norm;
+  return q;
+}
+
+// This will be used to create the gufunc `_optimal_rotation`, with
+// signature (n,d),(n,d),(n)->(), taking arrays of vectors a and b and
+// weights w (where d is checked to be 3 by the python wrapper).  The
+// sums are accumulated in a single pass over the vectors.
+static void
+optimal_rotation_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i, j;
+  npy_intp N = dimensions[0], n = dimensions[1];
+  npy_intp a_n = steps[4], a_d = steps[5], b_n = steps[6], b_d = steps[7], w_n = steps[8];
+  char *ip_a = args[0], *ip_b = args[1], *ip_w = args[2], *op = args[3];
+  char *a, *b, *w;
+  double B[9], lambda, wi, ai[3], bi[3];
+  int k;
+  for (i = 0; i < N; i++, ip_a += steps[0], ip_b += steps[1], ip_w += steps[2], op += steps[3]) {
+    for (k = 0; k < 9; k++) {
+      B[k] = 0.0;
+    }
+    lambda = 0.0;
+    for (j = 0, a = ip_a, b = ip_b, w = ip_w; j < n; j++, a += a_n, b += b_n, w += w_n) {
+      wi = *(double *)w;
+      for (k = 0; k < 3; k++) {
+        ai[k] = *(double *)(a + k*a_d);
+        bi[k] = *(double *)(b + k*b_d);
+      }
+      // The norms are taken separately, and before weighting, so that lambda does not underflow or overflow before B
+      lambda += wi * (vector_norm3(ai) * vector_norm3(bi));
+      for (k = 0; k < 3; k++) {
+        bi[k] *= wi;
+      }
+      B[0] += ai[0]*bi[0];
+      B[1] += ai[0]*bi[1];
+      B[2] += ai[0]*bi[2];
+      B[3] += ai[1]*bi[0];
+      B[4] += ai[1]*bi[1];
+      B[5] += ai[1]*bi[2];
+      B[6] += ai[2]*bi[0];
+      B[7] += ai[2]*bi[1];
+      B[8] += ai[2]*bi[2];
+    }
+    *(quaternion *)op = davenport_q_method(B, lambda);
+  }
+}
+
+static void
+as_rotation_vector_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i;
+  npy_intp n = dimensions[0];
+  char *ip = args[0], *op0 = args[1], *op1 = args[2], *op2 = args[3];
+  double b, f;
+  quaternion q;
+  for (i = 0; i < n; i++, ip += steps[0], op0 += steps[1], op1 += steps[2], op2 += steps[3]) {
+    // Vector part of `quaternion_log`, skipping the scalar part, which is discarded
+    q = quaternion_normalized(*(quaternion *)ip);
+    b = sqrt(q.x*q.x + q.y*q.y + q.z*q.z);
+    if (fabs(b) <= _QUATERNION_EPS*fabs(q.w)) {
+      *(double *)op0 = (q.w < 0.0) ? 2*M_PI : 0.0;
+      *(double *)op1 = 0.0;
+      *(double *)op2 = 0.0;
+    } else {
+      f = atan2(b, q.w) / b;
+      *(double *)op0 = 2*(f*q.x);
+      *(double *)op1 = 2*(f*q.y);
+      *(double *)op2 = 2*(f*q.z);
+    }
+  }
+}
+
+static void
+from_rotation_vector_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i;
+  npy_intp n = dimensions[0];
+  char *ip0 = args[0], *ip1 = args[1], *ip2 = args[2], *op = args[3];
+  double x, y, z, vnorm, s;
+  quaternion *r;
+  for (i = 0; i < n; i++, ip0 += steps[0], ip1 += steps[1], ip2 += steps[2], op += steps[3]) {
+    // `quaternion_exp` of a pure-vector quaternion, skipping the trivial exp(0) factor
+    x = *(double *)ip0 / 2;
+    y = *(double *)ip1 / 2;
+    z = *(double *)ip2 / 2;
+    vnorm = sqrt(x*x + y*y + z*z);
+    r = (quaternion *)op;
+    if (vnorm > _QUATERNION_EPS) {
+      s = sin(vnorm) / vnorm;
+      r->w = cos(vnorm);
+      r->x = s*x;
+      r->y = s*y;
+      r->z = s*z;
+    } else {
+      r->w = 1.0;
+      r->x = 0.0;
+      r->y = 0.0;
+      r->z = 0.0;
+    }
+  }
+}
+
+static void
+as_euler_angles_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i;
+  npy_intp n = dimensions[0];
+  char *ip = args[0], *op0 = args[1], *op1 = args[2], *op2 = args[3];
+  double a, b;
+  quaternion q;
+  for (i = 0; i < n; i++, ip += steps[0], op0 += steps[1], op1 += steps[2], op2 += steps[3]) {
+    q = *(quaternion *)ip;
+    a = atan2(q.z, q.w);
+    b = atan2(-q.x, q.y);
+    *(double *)op0 = a + b;
+    *(double *)op1 = 2*acos(sqrt((q.w*q.w + q.z*q.z)/quaternion_norm(q)));
+    *(double *)op2 = a - b;
+  }
+}
+
+static void
+from_euler_angles_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i;
+  npy_intp n = dimensions[0];
+  char *ip0 = args[0], *ip1 = args[1], *ip2 = args[2], *op = args[3];
+  double alpha, beta, gamma;
+  quaternion *r;
+  for (i = 0; i < n; i++, ip0 += steps[0], ip1 += steps[1], ip2 += steps[2], op += steps[3]) {
+    alpha = *(double *)ip0;
+    beta = *(double *)ip1;
+    gamma = *(double *)ip2;
+    r = (quaternion *)op;
+    r->w =  cos(beta/2)*cos((alpha+gamma)/2);
+    r->x = -sin(beta/2)*sin((alpha-gamma)/2);
+    r->y =  sin(beta/2)*cos((alpha-gamma)/2);
+    r->z =  cos(beta/2)*sin((alpha+gamma)/2);
+  }
+}
+
+static void
+as_spherical_coords_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i;
+  npy_intp n = dimensions[0];
+  char *ip = args[0], *op0 = args[1], *op1 = args[2];
+  quaternion q;
+  for (i = 0; i < n; i++, ip += steps[0], op0 += steps[1], op1 += steps[2]) {
+    q = *(quaternion *)ip;
+    *(double *)op0 = 2*acos(sqrt((q.w*q.w + q.z*q.z)/quaternion_norm(q)));
+    *(double *)op1 = atan2(q.z, q.w) + atan2(-q.x, q.y);
+  }
+}
+
+static void
+from_spherical_coords_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i;
+  npy_intp n = dimensions[0];
+  char *ip0 = args[0], *ip1 = args[1], *op = args[2];
+  double theta, phi;
+  quaternion *r;
+  for (i = 0; i < n; i++, ip0 += steps[0], ip1 += steps[1], op += steps[2]) {
+    theta = *(double *)ip0;
+    phi = *(double *)ip1;
+    r = (quaternion *)op;
+    r->w =  cos(phi/2)*cos(theta/2);
+    r->x = -sin(phi/2)*sin(theta/2);
+    r->y =  cos(phi/2)*sin(theta/2);
+    r->z =  sin(phi/2)*cos(theta/2);
+  }
+}
+
+static void
+rotate_vectors_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  // v' = v + 2 * r x (s * v + r x v) / m, where s and r are the scalar
+  // and vector parts of the quaternion, and m is its norm
+  npy_intp i;
+  npy_intp n = dimensions[0];
+  char *ip = args[0], *ip0 = args[1], *ip1 = args[2], *ip2 = args[3];
+  char *op0 = args[4], *op1 = args[5], *op2 = args[6];
+  double v[3], t[3], f;
+  quaternion q;
+  for (i = 0; i < n; i++) {
+    q = *(quaternion *)ip;
+    v[0] = *(double *)ip0;
+    v[1] = *(double *)ip1;
+    v[2] = *(double *)ip2;
+    f = 2 / quaternion_norm(q);
+    t[0] = q.w*v[0] + q.y*v[2] - q.z*v[1];
+    t[1] = q.w*v[1] + q.z*v[0] - q.x*v[2];
+    t[2] = q.w*v[2] + q.x*v[1] - q.y*v[0];
+    *(double *)op0 = v[0] + f*(q.y*t[2] - q.z*t[1]);
+    *(double *)op1 = v[1] + f*(q.z*t[0] - q.x*t[2]);
+    *(double *)op2 = v[2] + f*(q.x*t[1] - q.y*t[0]);
+    ip += steps[0];
+    ip0 += steps[1];
+    ip1 += steps[2];
+    ip2 += steps[3];
+    op0 += steps[4];
+    op1 += steps[5];
+    op2 += steps[6];
+  }
+}
+
+
+// Loops for the dual-quaternion dtype.  These act on whole arrays of
+// rigid transformations, so that (for example) `np.multiply.accumulate`
+// composes a chain of poses, and `_transform_points` moves a point
+// cloud, each in a single pass.
+#define DUAL_QUATERNION_UNARY_UFUNC(name, ret_type)                     \
+  static void                                                           \
+  dual_quaternion_##name##_ufunc(char** args, npy_intp* dimensions,     \
+                                 npy_intp* steps, void* NPY_UNUSED(data)) { \
+    char *ip1 = args[0], *op1 = args[1];                                \
+    npy_intp is1 = steps[0], os1 = steps[1];                            \
+    npy_intp n = dimensions[0];                                         \
+    npy_intp i;                                                         \
+    for(i = 0; i < n; i++, ip1 += is1, op1 += os1){                     \
+      const dual_quaternion in1 = *(dual_quaternion *)ip1;              \
+      *((ret_type *)op1) = dual_quaternion_##name(in1);};}
+DUAL_QUATERNION_UNARY_UFUNC(isnan, npy_bool)
+DUAL_QUATERNION_UNARY_UFUNC(isinf, npy_bool)
+DUAL_QUATERNION_UNARY_UFUNC(isfinite, npy_bool)
+DUAL_QUATERNION_UNARY_UFUNC(conjugate, dual_quaternion)
+DUAL_QUATERNION_UNARY_UFUNC(inverse, dual_quaternion)
+DUAL_QUATERNION_UNARY_UFUNC(normalized, dual_quaternion)
+#define DUAL_QUATERNION_BINARY_UFUNC(name, ret_type)                    \
+  static void                                                           \
+  dual_quaternion_##name##_ufunc(char** args, npy_intp* dimensions,     \
+                                 npy_intp* steps, void* NPY_UNUSED(data)) { \
+    char *ip1 = args[0], *ip2 = args[1], *op1 = args[2];                \
+    npy_intp is1 = steps[0], is2 = steps[1], os1 = steps[2];            \
+    npy_intp n = dimensions[0];                                         \
+    npy_intp i;                                                         \
+    for(i = 0; i < n; i++, ip1 += is1, ip2 += is2, op1 += os1) {        \
+      const dual_quaternion in1 = *(dual_quaternion *)ip1;              \
+      const dual_quaternion in2 = *(dual_quaternion *)ip2;              \
+      *((ret_type *)op1) = dual_quaternion_##name(in1, in2);};}
+DUAL_QUATERNION_BINARY_UFUNC(multiply, dual_quaternion)
+DUAL_QUATERNION_BINARY_UFUNC(equal, npy_bool)
+DUAL_QUATERNION_BINARY_UFUNC(not_equal, npy_bool)
+
+static void
+sclerp_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i;
+  npy_intp n = dimensions[0];
+  char *ip1 = args[0], *ip2 = args[1], *ip3 = args[2], *op = args[3];
+  for (i = 0; i < n; i++, ip1 += steps[0], ip2 += steps[1], ip3 += steps[2], op += steps[3]) {
+    *(dual_quaternion *)op = dual_quaternion_sclerp(*(dual_quaternion *)ip1, *(dual_quaternion *)ip2,
+                                                    *(double *)ip3);
+  }
+}
+
+// Generalized ufunc with signature (),(d)->(d) applying each rigid
+// transformation to a point.  The python wrapper checks that d is 3;
+// it is not written as a literal 3 because numpy only supports fixed
+// core dimensions since version 1.16.
+static void
+transform_points_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i;
+  npy_intp n = dimensions[0];
+  npy_intp is = steps[3], os = steps[4];
+  char *ip0 = args[0], *ip1 = args[1], *op = args[2];
+  double v[3], vprime[3];
+  for (i = 0; i < n; i++, ip0 += steps[0], ip1 += steps[1], op += steps[2]) {
+    v[0] = *(double *)ip1;
+    v[1] = *(double *)(ip1 + is);
+    v[2] = *(double *)(ip1 + 2*is);
+    dual_quaternion_transform_point(*(dual_quaternion *)ip0, v, vprime);
+    *(double *)op = vprime[0];
+    *(double *)(op + os) = vprime[1];
+    *(double *)(op + 2*os) = vprime[2];
+  }
+}
+
+static void
+from_rotation_and_translation_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i;
+  npy_intp n = dimensions[0];
+  char *ip = args[0], *ip0 = args[1], *ip1 = args[2], *ip2 = args[3], *op = args[4];
+  double t[3];
+  for (i = 0; i < n; i++, ip += steps[0], ip0 += steps[1], ip1 += steps[2], ip2 += steps[3], op += steps[4]) {
+    t[0] = *(double *)ip0;
+    t[1] = *(double *)ip1;
+    t[2] = *(double *)ip2;
+    *(dual_quaternion *)op = dual_quaternion_from_rotation_and_translation(*(quaternion *)ip, t);
+  }
+}
+
+static void
+as_rotation_and_translation_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i;
+  npy_intp n = dimensions[0];
+  char *ip = args[0], *op = args[1], *op0 = args[2], *op1 = args[3], *op2 = args[4];
+  double t[3];
+  dual_quaternion q;
+  for (i = 0; i < n; i++, ip += steps[0], op += steps[1], op0 += steps[2], op1 += steps[3], op2 += steps[4]) {
+    q = *(dual_quaternion *)ip;
+    dual_quaternion_translation(q, t);
+    *(quaternion *)op = q.r;
+    *(double *)op0 = t[0];
+    *(double *)op1 = t[1];
+    *(double *)op2 = t[2];
+  }
+}
+
+
+// This will be used to create the ufunc `isclose_vectorized`, which
+// takes arrays of (a, b, rtol, atol, equal_nan)
+static void
+isclose_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+{
+  npy_intp i;
+  npy_intp n=dimensions[0];
+  char *i1=args[0], *i2=args[1], *i3=args[2], *i4=args[3], *i5=args[4], *op=args[5];
 
+  for (i = 0; i < n; i++) {
+    *((npy_bool *)op) = (npy_bool)quaternion_isclose(*(quaternion *)i1, *(quaternion *)i2,
+                                                     *(double *)i3, *(double *)i4, *(npy_bool *)i5);
+    i1 += steps[0];
+    i2 += steps[1];
+    i3 += steps[2];
+    i4 += steps[3];
+    i5 += steps[4];
+    op += steps[5];
+  }
+}
 
-// Interface to the module-level slerp function
+// Return True if all elements of the (broadcast) quaternion arrays `a`
+// and `b` are close, stopping at the first element that is not
 static PyObject*
-pyquaternion_slerp_evaluate(PyObject *NPY_UNUSED(self), PyObject *args)
+pyquaternion_allclose(PyObject *NPY_UNUSED(self), PyObject *args)
 {
-  double tau;
-  PyObject* Q1 = {0};
-  PyObject* Q2 = {0};
-  PyQuaternion* Q = (PyQuaternion*)PyQuaternion_Type.tp_alloc(&PyQuaternion_Type,0);
-  if (!PyArg_ParseTuple(args, "OOd", &Q1, &Q2, &tau)) {
+  PyObject *a, *b;
+  double rtol, atol;
+  int equal_nan;
+  int close = 1;
+  PyArrayObject* op[2];
+  npy_uint32 op_flags[2] = {NPY_ITER_READONLY | NPY_ITER_ALIGNED, NPY_ITER_READONLY | NPY_ITER_ALIGNED};
+  PyArray_Descr* op_dtypes[2];
+  NpyIter* iter;
+  NpyIter_IterNextFunc* iternext;
+  char** dataptr;
+  npy_intp* strides;
+  npy_intp* innersize;
+  NPY_BEGIN_THREADS_DEF;
+
+  if (!PyArg_ParseTuple(args, "OOddi:_allclose", &a, &b, &rtol, &atol, &equal_nan)) {
+    return NULL;
+  }
+  Py_INCREF(quaternion_descr);
+  op[0] = (PyArrayObject*)PyArray_FromAny(a, quaternion_descr, 0, 0, NPY_ARRAY_ALIGNED, NULL);
+  if (op[0] == NULL) {
+    return NULL;
+  }
+  Py_INCREF(quaternion_descr);
+  op[1] = (PyArrayObject*)PyArray_FromAny(b, quaternion_descr, 0, 0, NPY_ARRAY_ALIGNED, NULL);
+  if (op[1] == NULL) {
+    Py_DECREF(op[0]);
+    return NULL;
+  }
+  op_dtypes[0] = quaternion_descr;
+  op_dtypes[1] = quaternion_descr;
+  iter = NpyIter_MultiNew(2, op, NPY_ITER_EXTERNAL_LOOP | NPY_ITER_ZEROSIZE_OK, NPY_KEEPORDER, NPY_NO_CASTING,
+                          op_flags, op_dtypes);
+  Py_DECREF(op[0]);
+  Py_DECREF(op[1]);
+  if (iter == NULL) {
     return NULL;
   }
-  Q->obval = slerp(((PyQuaternion*)Q1)->obval, ((PyQuaternion*)Q2)->obval, tau);
-  return (PyObject*)Q;
+
+  if (NpyIter_GetIterSize(iter) > 0) {
+    iternext = NpyIter_GetIterNext(iter, NULL);
+    if (iternext == NULL) {
+      NpyIter_Deallocate(iter);
+      return NULL;
+    }
+    dataptr = NpyIter_GetDataPtrArray(iter);
+    strides = NpyIter_GetInnerStrideArray(iter);
+    innersize = NpyIter_GetInnerLoopSizePtr(iter);
+    NPY_BEGIN_THREADS;
+    do {
+      char *p1 = dataptr[0], *p2 = dataptr[1];
+      npy_intp n = *innersize;
+      while (n--) {
+        if (!quaternion_isclose(*(quaternion *)p1, *(quaternion *)p2, rtol, atol, equal_nan)) {
+          close = 0;
+          break;
+        }
+        p1 += strides[0];
+        p2 += strides[1];
+      }
+    } while (close && iternext(iter));
+    NPY_END_THREADS;
+  }
+
+  NpyIter_Deallocate(iter);
+  return PyBool_FromLong(close);
 }
 
-// Interface to the evaluate a squad interpolant at a particular time
+// If `seq` is a list or tuple containing only quaternion objects, copy
+// their values directly into a new 1-d array.  Otherwise, return NULL
+// without setting an exception, so that the caller can fall back on
+// the general conversion (which goes through `QUATERNION_setitem` one
+// element at a time).
+static PyArrayObject*
+quaternion_array_from_quaternion_sequence(PyObject* seq)
+{
+  npy_intp i, n;
+  PyObject** items;
+  PyArrayObject* arr;
+  quaternion* data;
+  if (!PyList_CheckExact(seq) && !PyTuple_CheckExact(seq)) {
+    return NULL;
+  }
+  n = PySequence_Fast_GET_SIZE(seq);
+  items = PySequence_Fast_ITEMS(seq);
+  for (i = 0; i < n; i++) {
+    if (Py_TYPE(items[i]) != &PyQuaternion_Type) {
+      return NULL;
+    }
+  }
+  Py_INCREF(quaternion_descr);
+  arr = (PyArrayObject*)PyArray_NewFromDescr(&PyArray_Type, quaternion_descr, 1, &n, NULL, NULL, 0, NULL);
+  if (arr == NULL) {
+    return NULL;
+  }
+  data = (quaternion*)PyArray_DATA(arr);
+  for (i = 0; i < n; i++) {
+    data[i] = ((PyQuaternion*)items[i])->obval;
+  }
+  return arr;
+}
+
+// Convert any object to an aligned array of quaternions, using the
+// fast path above for sequences of quaternion objects
+static PyArrayObject*
+quaternion_array_from_object(PyObject* obj)
+{
+  PyArrayObject* arr = quaternion_array_from_quaternion_sequence(obj);
+  if (arr != NULL || PyErr_Occurred()) {
+    return arr;
+  }
+  Py_INCREF(quaternion_descr);
+  return (PyArrayObject*)PyArray_FromAny(obj, quaternion_descr, 0, 0, NPY_ARRAY_ALIGNED, NULL);
+}
+
+// Expose the fast path above to python, returning None for anything
+// other than a list or tuple of quaternion objects
 static PyObject*
-pyquaternion_squad_evaluate(PyObject *NPY_UNUSED(self), PyObject *args)
+pyquaternion_array_from_sequence(PyObject *NPY_UNUSED(self), PyObject *arg)
 {
-  double tau_i;
-  PyObject* q_i = {0};
-  PyObject* a_i = {0};
-  PyObject* b_ip1 = {0};
-  PyObject* q_ip1 = {0};
-  PyQuaternion* Q = (PyQuaternion*)PyQuaternion_Type.tp_alloc(&PyQuaternion_Type,0);
-  if (!PyArg_ParseTuple(args, "dOOOO", &tau_i, &q_i, &a_i, &b_ip1, &q_ip1)) {
+  PyArrayObject* arr = quaternion_array_from_quaternion_sequence(arg);
+  if (arr == NULL && !PyErr_Occurred()) {
+    Py_RETURN_NONE;
+  }
+  return (PyObject*)arr;
+}
+
+// Interleave separate arrays of components into an array of
+// quaternions in a single pass
+static PyObject*
+pyquaternion_from_components(PyObject *NPY_UNUSED(self), PyObject *args, PyObject *kwds)
+{
+  static char *kwlist[] = {"w", "x", "y", "z", "out", NULL};
+  PyObject* components[4] = {NULL, NULL, NULL, NULL};
+  PyObject* out = NULL;
+  PyArrayObject* op[5] = {NULL, NULL, NULL, NULL, NULL};
+  npy_uint32 op_flags[5];
+  PyArray_Descr* op_dtypes[5] = {NULL, NULL, NULL, NULL, NULL};
+  NpyIter* iter;
+  NpyIter_IterNextFunc* iternext;
+  char** dataptr;
+  npy_intp* strides;
+  npy_intp* innersize;
+  PyObject* result = NULL;
+  int k;
+  NPY_BEGIN_THREADS_DEF;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOOO|O:from_components", kwlist,
+                                   &components[0], &components[1], &components[2], &components[3], &out)) {
+    return NULL;
+  }
+  if (out == Py_None) {
+    out = NULL;
+  }
+  if (out != NULL && !(PyArray_Check(out) && PyArray_DESCR((PyArrayObject*)out)->type_num == quaternion_descr->type_num)) {
+    PyErr_SetString(PyExc_TypeError, "Output of `from_components` must be an array of quaternions");
     return NULL;
   }
-  Q->obval = squad_evaluate(tau_i,
-                        ((PyQuaternion*)q_i)->obval, ((PyQuaternion*)a_i)->obval,
-                        ((PyQuaternion*)b_ip1)->obval, ((PyQuaternion*)q_ip1)->obval);
-  return (PyObject*)Q;
+
+  op_dtypes[4] = quaternion_descr;
+  op_flags[4] = NPY_ITER_WRITEONLY | NPY_ITER_ALLOCATE | NPY_ITER_NO_BROADCAST;
+  op[4] = (PyArrayObject*)out;
+  for (k = 0; k < 4; k++) {
+    op[k] = (PyArrayObject*)PyArray_FromAny(components[k], NULL, 0, 0, 0, NULL);
+    if (op[k] == NULL) {
+      goto fail;
+    }
+    op_flags[k] = NPY_ITER_READONLY | NPY_ITER_NBO | NPY_ITER_ALIGNED;
+    op_dtypes[k] = PyArray_DescrFromType(NPY_DOUBLE);
+  }
+
+  iter = NpyIter_MultiNew(5, op, NPY_ITER_EXTERNAL_LOOP | NPY_ITER_BUFFERED | NPY_ITER_GROWINNER | NPY_ITER_ZEROSIZE_OK,
+                          NPY_KEEPORDER, NPY_SAFE_CASTING, op_flags, op_dtypes);
+  if (iter == NULL) {
+    goto fail;
+  }
+
+  if (NpyIter_GetIterSize(iter) > 0) {
+    iternext = NpyIter_GetIterNext(iter, NULL);
+    if (iternext == NULL) {
+      NpyIter_Deallocate(iter);
+      goto fail;
+    }
+    dataptr = NpyIter_GetDataPtrArray(iter);
+    strides = NpyIter_GetInnerStrideArray(iter);
+    innersize = NpyIter_GetInnerLoopSizePtr(iter);
+    if (!NpyIter_IterationNeedsAPI(iter)) {
+      NPY_BEGIN_THREADS;
+    }
+    do {
+      char *w = dataptr[0], *x = dataptr[1], *y = dataptr[2], *z = dataptr[3], *q = dataptr[4];
+      npy_intp n = *innersize;
+      while (n--) {
+        quaternion* qp = (quaternion*)q;
+        qp->w = *(double*)w;
+        qp->x = *(double*)x;
+        qp->y = *(double*)y;
+        qp->z = *(double*)z;
+        w += strides[0];
+        x += strides[1];
+        y += strides[2];
+        z += strides[3];
+        q += strides[4];
+      }
+    } while (iternext(iter));
+    NPY_END_THREADS;
+  }
+
+  result = (PyObject*)NpyIter_GetOperandArray(iter)[4];
+  Py_INCREF(result);
+  if (NpyIter_Deallocate(iter) != NPY_SUCCEED) {
+    Py_CLEAR(result);
+  }
+
+ fail:
+  for (k = 0; k < 4; k++) {
+    Py_XDECREF(op[k]);
+    Py_XDECREF(op_dtypes[k]);
+  }
+  return result;
 }
 
-// This will be used to create the ufunc needed for `slerp`, which
-// evaluates the interpolant at a point.  The method for doing this
-// was pieced together from examples given on the page
-// <https://docs.scipy.org/doc/numpy/user/c-info.ufunc-tutorial.html>
-static void
-slerp_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+// Deinterleave an array of quaternions into separate arrays of their
+// components in a single pass
+static PyObject*
+pyquaternion_to_components(PyObject *NPY_UNUSED(self), PyObject *arg)
 {
-  npy_intp i;
-  double tau_i;
-  quaternion *q_1, *q_2;
+  PyArrayObject* op[5] = {NULL, NULL, NULL, NULL, NULL};
+  npy_uint32 op_flags[5];
+  PyArray_Descr* op_dtypes[5];
+  NpyIter* iter;
+  NpyIter_IterNextFunc* iternext;
+  char** dataptr;
+  npy_intp* strides;
+  npy_intp* innersize;
+  PyArrayObject** operands;
+  PyObject* result = NULL;
+  int k;
+  NPY_BEGIN_THREADS_DEF;
+
+  op[0] = quaternion_array_from_object(arg);
+  if (op[0] == NULL) {
+    return NULL;
+  }
+  op_flags[0] = NPY_ITER_READONLY;
+  op_dtypes[0] = quaternion_descr;
+  for (k = 1; k < 5; k++) {
+    op_flags[k] = NPY_ITER_WRITEONLY | NPY_ITER_ALLOCATE;
+    op_dtypes[k] = PyArray_DescrFromType(NPY_DOUBLE);
+  }
 
-  npy_intp is1=steps[0];
-  npy_intp is2=steps[1];
-  npy_intp is3=steps[2];
-  npy_intp os=steps[3];
-  npy_intp n=dimensions[0];
+  iter = NpyIter_MultiNew(5, op, NPY_ITER_EXTERNAL_LOOP | NPY_ITER_ZEROSIZE_OK,
+                          NPY_KEEPORDER, NPY_NO_CASTING, op_flags, op_dtypes);
+  for (k = 1; k < 5; k++) {
+    Py_DECREF(op_dtypes[k]);
+  }
+  Py_DECREF(op[0]);
+  if (iter == NULL) {
+    return NULL;
+  }
 
-  char *i1=args[0];
-  char *i2=args[1];
-  char *i3=args[2];
-  char *op=args[3];
+  if (NpyIter_GetIterSize(iter) > 0) {
+    iternext = NpyIter_GetIterNext(iter, NULL);
+    if (iternext == NULL) {
+      NpyIter_Deallocate(iter);
+      return NULL;
+    }
+    dataptr = NpyIter_GetDataPtrArray(iter);
+    strides = NpyIter_GetInnerStrideArray(iter);
+    innersize = NpyIter_GetInnerLoopSizePtr(iter);
+    NPY_BEGIN_THREADS;
+    do {
+      char *q = dataptr[0], *w = dataptr[1], *x = dataptr[2], *y = dataptr[3], *z = dataptr[4];
+      npy_intp n = *innersize;
+      while (n--) {
+        const quaternion* qp = (quaternion*)q;
+        *(double*)w = qp->w;
+        *(double*)x = qp->x;
+        *(double*)y = qp->y;
+        *(double*)z = qp->z;
+        q += strides[0];
+        w += strides[1];
+        x += strides[2];
+        y += strides[3];
+        z += strides[4];
+      }
+    } while (iternext(iter));
+    NPY_END_THREADS;
+  }
 
-  for (i = 0; i < n; i++) {
-    q_1 = (quaternion*)i1;
-    q_2 = (quaternion*)i2;
-    tau_i = *(double *)i3;
+  operands = NpyIter_GetOperandArray(iter);
+  result = PyTuple_Pack(4, operands[1], operands[2], operands[3], operands[4]);
+  if (NpyIter_Deallocate(iter) != NPY_SUCCEED) {
+    Py_CLEAR(result);
+  }
+  return result;
+}
 
-    *((quaternion *)op) = slerp(*q_1, *q_2, tau_i);
 
-    i1 += is1;
-    i2 += is2;
-    i3 += is3;
-    op += os;
+// Kernels for `quaternion.pairwise_distance`.  The intrinsic distances
+// avoid the general logarithm and division used by the ufuncs.  With r
+// = a/b, we have |log(r)|^2 = log(|a|/|b|)^2 + atan2(|v|, a.b)^2, where
+// v is the vector part of a*conj(b), and log|a| and log|b| are computed
+// just once for each row and column.  The rotation metrics choose the
+// sign of b exactly as the ufuncs do, and a zero b gives NaN, as the
+// division in the ufuncs does.
+#define PAIRWISE_TILE_SIZE 256
+
+static NPY_INLINE double
+pairwise_chordal(quaternion a, quaternion b, int rotation)
+{
+  double dw = a.w-b.w, dx = a.x-b.x, dy = a.y-b.y, dz = a.z-b.z;
+  double difference = sqrt(dw*dw + dx*dx + dy*dy + dz*dz);
+  if (rotation && !(difference <= 1.414213562373096)) {
+    dw = a.w+b.w;
+    dx = a.x+b.x;
+    dy = a.y+b.y;
+    dz = a.z+b.z;
+    return sqrt(dw*dw + dx*dx + dy*dy + dz*dz);
   }
+  return difference;
 }
 
-// This will be used to create the ufunc needed for `squad`, which
-// evaluates the interpolant at a point.  The method for doing this
-// was pieced together from examples given on the page
-// <https://docs.scipy.org/doc/numpy/user/c-info.ufunc-tutorial.html>
+static NPY_INLINE double
+pairwise_intrinsic(quaternion a, double log_abs_a, quaternion b, double log_abs_b, int rotation)
+{
+  double dot = a.w*b.w + a.x*b.x + a.y*b.y + a.z*b.z;
+  double vx = b.w*a.x - a.w*b.x - (a.y*b.z - a.z*b.y);
+  double vy = b.w*a.y - a.w*b.y - (a.z*b.x - a.x*b.z);
+  double vz = b.w*a.z - a.w*b.z - (a.x*b.y - a.y*b.x);
+  double log_ratio = log_abs_a - log_abs_b;
+  double angle;
+  if (log_abs_b == -NPY_INFINITY) {
+    return NPY_NAN;
+  }
+  if (rotation && !(pairwise_chordal(a, b, 0) <= 1.414213562373096)) {
+    dot = -dot;
+  }
+  angle = atan2(sqrt(vx*vx + vy*vy + vz*vz), dot);
+  return 2*sqrt(log_ratio*log_ratio + angle*angle);
+}
+
+// Fill `out[j-j0]` for `j` in `[j0, j1)` with the distances from `a` to `B[j]`
 static void
-squad_loop(char **args, npy_intp *dimensions, npy_intp* steps, void* NPY_UNUSED(data))
+pairwise_distance_row(int metric, quaternion a, double log_abs_a, const quaternion *B, const double *log_abs_B,
+                      npy_intp j0, npy_intp j1, double *out)
 {
-  npy_intp i;
-  double tau_i;
-  quaternion *q_i, *a_i, *b_ip1, *q_ip1;
+  npy_intp j;
+  switch (metric) {
+  case 0:  // rotor_intrinsic
+    for (j = j0; j < j1; j++) { out[j-j0] = pairwise_intrinsic(a, log_abs_a, B[j], log_abs_B[j], 0); }
+    break;
+  case 1:  // rotor_chordal
+    for (j = j0; j < j1; j++) { out[j-j0] = pairwise_chordal(a, B[j], 0); }
+    break;
+  case 2:  // rotation_intrinsic
+    for (j = j0; j < j1; j++) { out[j-j0] = pairwise_intrinsic(a, log_abs_a, B[j], log_abs_B[j], 1); }
+    break;
+  default:  // rotation_chordal
+    for (j = j0; j < j1; j++) { out[j-j0] = pairwise_chordal(a, B[j], 1); }
+    break;
+  }
+}
 
-  npy_intp is1=steps[0];
-  npy_intp is2=steps[1];
-  npy_intp is3=steps[2];
-  npy_intp is4=steps[3];
-  npy_intp is5=steps[4];
-  npy_intp os=steps[5];
-  npy_intp n=dimensions[0];
+// Compute rows `[row_start, row_end)` of the matrix of distances
+// between elements of the 1-d arrays `A` and `B`.  If `condensed` is
+// nonzero, `B` must be `A`, and only the upper triangle (j > i) is
+// computed, and written to its position in the condensed output used
+// by `scipy.spatial.distance.pdist`.  Otherwise, the rows are written
+// consecutively to `out`.  The work is done in tiles of columns of `B`
+// that stay in cache, without the GIL, so that separate row ranges may
+// be computed simultaneously in separate threads.
+static PyObject*
+pyquaternion_pairwise_distance(PyObject *NPY_UNUSED(self), PyObject *args)
+{
+  PyArrayObject *A_array, *B_array, *out_array;
+  int metric, condensed;
+  npy_intp row_start, row_end, m, n, i, j0, j1, first;
+  const quaternion *A, *B;
+  double *out, *row, *log_abs_A, *log_abs_B;
+  NPY_BEGIN_THREADS_DEF;
+
+  if (!PyArg_ParseTuple(args, "O!O!iO!nni:_pairwise_distance", &PyArray_Type, &A_array, &PyArray_Type, &B_array,
+                        &metric, &PyArray_Type, &out_array, &row_start, &row_end, &condensed)) {
+    return NULL;
+  }
+  if (PyArray_DESCR(A_array)->type_num != quaternion_descr->type_num || PyArray_NDIM(A_array) != 1
+      || !PyArray_IS_C_CONTIGUOUS(A_array) || !PyArray_ISALIGNED(A_array)
+      || PyArray_DESCR(B_array)->type_num != quaternion_descr->type_num || PyArray_NDIM(B_array) != 1
+      || !PyArray_IS_C_CONTIGUOUS(B_array) || !PyArray_ISALIGNED(B_array)) {
+    PyErr_SetString(PyExc_TypeError, "Inputs must be contiguous 1-d arrays of quaternions");
+    return NULL;
+  }
+  if (PyArray_TYPE(out_array) != NPY_DOUBLE || !PyArray_IS_C_CONTIGUOUS(out_array) || !PyArray_ISALIGNED(out_array)
+      || !PyArray_ISWRITEABLE(out_array) || !PyArray_ISNOTSWAPPED(out_array)) {
+    PyErr_SetString(PyExc_TypeError, "Output must be a writeable contiguous array of float64");
+    return NULL;
+  }
+  m = PyArray_DIM(A_array, 0);
+  n = PyArray_DIM(B_array, 0);
+  if (metric < 0 || metric > 3) {
+    PyErr_Format(PyExc_ValueError, "Unknown metric index %d", metric);
+    return NULL;
+  }
+  if (row_start < 0 || row_end < row_start || row_end > m) {
+    PyErr_SetString(PyExc_ValueError, "Invalid range of rows");
+    return NULL;
+  }
+  if (condensed ? (n != m || PyArray_SIZE(out_array) != m*(m-1)/2)
+                : (PyArray_SIZE(out_array) != (row_end-row_start)*n)) {
+    PyErr_SetString(PyExc_ValueError, "Output array has the wrong size");
+    return NULL;
+  }
 
-  char *i1=args[0];
-  char *i2=args[1];
-  char *i3=args[2];
-  char *i4=args[3];
-  char *i5=args[4];
-  char *op=args[5];
+  A = (const quaternion *)PyArray_DATA(A_array);
+  B = (const quaternion *)PyArray_DATA(B_array);
+  out = (double *)PyArray_DATA(out_array);
 
-  for (i = 0; i < n; i++) {
-    tau_i = *(double *)i1;
-    q_i = (quaternion*)i2;
-    a_i = (quaternion*)i3;
-    b_ip1 = (quaternion*)i4;
-    q_ip1 = (quaternion*)i5;
+  log_abs_A = (double *)malloc((row_end-row_start+1)*sizeof(double));
+  log_abs_B = (double *)malloc((n+1)*sizeof(double));
+  if (log_abs_A == NULL || log_abs_B == NULL) {
+    free(log_abs_A);
+    free(log_abs_B);
+    return PyErr_NoMemory();
+  }
 
-    *((quaternion *)op) = squad_evaluate(tau_i, *q_i, *a_i, *b_ip1, *q_ip1);
+  NPY_BEGIN_THREADS;
+  for (i = row_start; i < row_end; i++) {
+    log_abs_A[i-row_start] = log(quaternion_norm(A[i]))/2.0;
+  }
+  for (j0 = 0; j0 < n; j0++) {
+    log_abs_B[j0] = log(quaternion_norm(B[j0]))/2.0;
+  }
+  for (j0 = 0; j0 < n; j0 += PAIRWISE_TILE_SIZE) {
+    j1 = (j0 + PAIRWISE_TILE_SIZE < n) ? j0 + PAIRWISE_TILE_SIZE : n;
+    for (i = row_start; i < row_end; i++) {
+      if (condensed) {
+        // Element (i, j) of the full matrix is at index m*i - i*(i+1)/2 + j - i - 1
+        first = (j0 > i) ? j0 : i + 1;
+        if (first >= j1) {
+          continue;
+        }
+        row = out + (m*i - i*(i+1)/2 + first - i - 1);
+      } else {
+        first = j0;
+        row = out + (i-row_start)*n + first;
+      }
+      pairwise_distance_row(metric, A[i], log_abs_A[i-row_start], B, log_abs_B, first, j1, row);
+    }
+  }
+  NPY_END_THREADS;
 
-    i1 += is1;
-    i2 += is2;
-    i3 += is3;
-    i4 += is4;
-    i5 += is5;
-    op += os;
+  free(log_abs_A);
+  free(log_abs_B);
+  Py_RETURN_NONE;
+}
+
+
+// Super-Fibonacci spiral points on the unit 3-sphere (Alexa, "Super-Fibonacci Spirals: Fast, Low-Discrepancy Sampling
+// of SO(3)", CVPR 2022).  Point i of n has |(w, x)|^2 = (i+1/2)/n, with the phases of the (w, x) and (y, z) pairs
+// advancing by 2*pi/sqrt(2) and 2*pi/psi per point, where psi is the real root of psi^4 = psi + 4.
+#define SUPER_FIBONACCI_PHI 1.4142135623730950488
+#define SUPER_FIBONACCI_PSI 1.5337511687552042881
+
+static PyObject*
+pyquaternion_super_fibonacci(PyObject *NPY_UNUSED(self), PyObject *args)
+{
+  PyArrayObject *out_array;
+  npy_intp n, start, size, i;
+  quaternion *out;
+  double s, r, R, alpha, beta;
+  NPY_BEGIN_THREADS_DEF;
+
+  if (!PyArg_ParseTuple(args, "nnO!:_super_fibonacci", &n, &start, &PyArray_Type, &out_array)) {
+    return NULL;
+  }
+  if (PyArray_DESCR(out_array)->type_num != quaternion_descr->type_num || !PyArray_IS_C_CONTIGUOUS(out_array)
+      || !PyArray_ISALIGNED(out_array) || !PyArray_ISWRITEABLE(out_array)) {
+    PyErr_SetString(PyExc_TypeError, "Output must be a writeable contiguous array of quaternions");
+    return NULL;
+  }
+  size = PyArray_SIZE(out_array);
+  if (start < 0 || start + size > n) {
+    PyErr_SetString(PyExc_ValueError, "Invalid range of points");
+    return NULL;
+  }
+
+  out = (quaternion *)PyArray_DATA(out_array);
+  NPY_BEGIN_THREADS;
+  for (i = 0; i < size; i++) {
+    s = (double)(start + i) + 0.5;
+    r = sqrt(s / n);
+    R = sqrt(1.0 - s / n);
+    // Reduce the phases to [0, 1) turns before scaling by 2*pi, which keeps the arguments of sin and cos small
+    alpha = s / SUPER_FIBONACCI_PHI;
+    beta = s / SUPER_FIBONACCI_PSI;
+    alpha = 2 * M_PI * (alpha - floor(alpha));
+    beta = 2 * M_PI * (beta - floor(beta));
+    out[i].w = r * sin(alpha);
+    out[i].x = r * cos(alpha);
+    out[i].y = R * sin(beta);
+    out[i].z = R * cos(beta);
   }
+  NPY_END_THREADS;
+
+  Py_RETURN_NONE;
 }
 
 
 // This contains assorted other top-level methods for the module
 static PyMethodDef QuaternionMethods[] = {
-  {"slerp_evaluate", pyquaternion_slerp_evaluate, METH_VARARGS,
+  {"slerp_evaluate", (PyCFunction)(void(*)(void))pyquaternion_slerp_evaluate, PYQUATERNION_FASTCALL,
    "Interpolate linearly along the geodesic between two rotors \n\n"
    "See also `numpy.slerp_vectorized` for a vectorized version of this function, and\n"
    "`quaternion.slerp` for the most useful form, which automatically finds the correct\n"
    "rotors to interpolate and the relative time to which they must be interpolated."},
-  {"squad_evaluate", pyquaternion_squad_evaluate, METH_VARARGS,
+  {"squad_evaluate", (PyCFunction)(void(*)(void))pyquaternion_squad_evaluate, PYQUATERNION_FASTCALL,
    "Interpolate linearly along the geodesic between two rotors\n\n"
    "See also `numpy.squad_vectorized` for a vectorized version of this function, and\n"
    "`quaternion.squad` for the most useful form, which automatically finds the correct\n"
    "rotors to interpolate and the relative time to which they must be interpolated."},
+  {"from_components", (PyCFunction)pyquaternion_from_components, METH_VARARGS | METH_KEYWORDS,
+   "Create an array of quaternions from separate arrays of their components\n\n"
+   "The inputs `w`, `x`, `y`, and `z` are broadcast against each other, and interleaved\n"
+   "into a new quaternion array (or into `out`, if given) in a single pass.\n\n"
+   "See also `quaternion.to_components` for the inverse operation."},
+  {"to_components", pyquaternion_to_components, METH_O,
+   "Return a tuple of arrays (w, x, y, z) of the components of the input quaternions\n\n"
+   "The input may be an array of quaternions, or any sequence that can be converted to\n"
+   "one.  Lists and tuples of quaternion objects are read directly, without the general\n"
+   "element-by-element conversion.\n\n"
+   "See also `quaternion.from_components` for the inverse operation."},
+  {"_array_from_sequence", pyquaternion_array_from_sequence, METH_O,
+   "Return a list or tuple of quaternion objects as a 1-d array, or None for other inputs"},
+  {"_allclose", pyquaternion_allclose, METH_VARARGS,
+   "Return True if all elements are close, stopping at the first failure; see `quaternion.allclose`"},
+  {"_pairwise_distance", pyquaternion_pairwise_distance, METH_VARARGS,
+   "Compute a range of rows of a distance matrix; see `quaternion.pairwise_distance`"},
+  {"_super_fibonacci", pyquaternion_super_fibonacci, METH_VARARGS,
+   "Compute a range of points of a super-Fibonacci rotation grid; see `quaternion.rotation_grid`"},
   {NULL, NULL, 0, NULL}
 };
 
@@ -1317,8 +3647,12 @@ PyMODINIT_FUNC initnumpy_quaternion(void) {
   PyObject *slerp_evaluate_ufunc;
   PyObject *squad_evaluate_ufunc;
   int quaternionNum;
+  int dualQuaternionNum;
+  int sortkind;
+  int i;
   int arg_types[3];
-  PyArray_Descr* arg_dtypes[6];
+  PyArray_Descr* arg_dtypes[8];
+  PyArray_Descr* conversion_dtypes[10];
   PyObject* numpy;
   PyObject* numpy_dict;
 
@@ -1354,6 +3688,9 @@ PyMODINIT_FUNC initnumpy_quaternion(void) {
   // Register the quaternion array base type.  Couldn't do this until
   // after we imported numpy (above)
   PyQuaternion_Type.tp_base = &PyGenericArrType_Type;
+#if PY_VERSION_HEX >= 0x03090000
+  PyQuaternion_Type.tp_vectorcall = pyquaternion_vectorcall;
+#endif
   if (PyType_Ready(&PyQuaternion_Type) < 0) {
     PyErr_Print();
     PyErr_SetString(PyExc_SystemError, "Could not initialize PyQuaternion_Type.");
@@ -1371,6 +3708,11 @@ PyMODINIT_FUNC initnumpy_quaternion(void) {
   _PyQuaternion_ArrFuncs.getitem = (PyArray_GetItemFunc*)QUATERNION_getitem;
   _PyQuaternion_ArrFuncs.compare = (PyArray_CompareFunc*)QUATERNION_compare;
   _PyQuaternion_ArrFuncs.argmax = (PyArray_ArgFunc*)QUATERNION_argmax;
+  _PyQuaternion_ArrFuncs.argmin = (PyArray_ArgFunc*)QUATERNION_argmin;
+  for (sortkind = 0; sortkind < NPY_NSORTS; sortkind++) {
+    _PyQuaternion_ArrFuncs.sort[sortkind] = (PyArray_SortFunc*)QUATERNION_sort;
+    _PyQuaternion_ArrFuncs.argsort[sortkind] = (PyArray_ArgSortFunc*)QUATERNION_argsort;
+  }
   _PyQuaternion_ArrFuncs.fillwithscalar = (PyArray_FillWithScalarFunc*)QUATERNION_fillwithscalar;
 
   // The quaternion array descr
@@ -1396,6 +3738,7 @@ PyMODINIT_FUNC initnumpy_quaternion(void) {
   if (quaternionNum < 0) {
     INITERROR;
   }
+  quaternion_c_api_table.type_num = quaternionNum;
 
   register_cast_function(NPY_BOOL, quaternionNum, (PyArray_VectorUnaryFunc*)BOOL_to_quaternion);
   register_cast_function(NPY_BYTE, quaternionNum, (PyArray_VectorUnaryFunc*)BYTE_to_quaternion);
@@ -1459,6 +3802,12 @@ PyMODINIT_FUNC initnumpy_quaternion(void) {
                              "Return square-root of rotor.  Assumes input has unit norm.\n");
   REGISTER_UFUNC(log);
   REGISTER_UFUNC(exp);
+  REGISTER_NEW_UFUNC(exp_approx, 1, 1,
+                     "Return exp of each quaternion, using series approximations for small angles\n\n"
+                     "See `quaternion.slerp` for the accuracy of the approximate functions.\n");
+  REGISTER_NEW_UFUNC(log_approx, 1, 1,
+                     "Return log of each quaternion, using series approximations for small angles\n\n"
+                     "See `quaternion.slerp` for the accuracy of the approximate functions.\n");
   REGISTER_NEW_UFUNC(normalized, 1, 1,
                      "Normalize all quaternions in this array\n");
   REGISTER_NEW_UFUNC(x_parity_conjugate, 1, 1,
@@ -1548,6 +3897,27 @@ PyMODINIT_FUNC initnumpy_quaternion(void) {
   REGISTER_NEW_UFUNC(rotation_chordal_distance, 2, 1,
                      "Distance measure from embedding of rotation manifold");
 
+  // quat, quat -> quat
+  arg_types[0] = quaternion_descr->type_num;
+  arg_types[1] = quaternion_descr->type_num;
+  arg_types[2] = quaternion_descr->type_num;
+  REGISTER_NEW_UFUNC(hemisphere_canonicalized, 2, 1,
+                     "Return q or -q, whichever has nonnegative inner product with the reference\n\n"
+                     "Both represent the same rotation, so this maps rotors onto a chosen hemisphere;\n"
+                     "for example, a reference of `quaternion.one` gives rotors with w >= 0.");
+
+  // Generalized ufunc scanning along a time axis: (n) -> (n)
+  arg_types[0] = quaternion_descr->type_num;
+  arg_types[1] = quaternion_descr->type_num;
+  tmp_ufunc = PyUFunc_FromFuncAndDataAndSignature(NULL, NULL, NULL, 0, 1, 1, PyUFunc_None, "unflip_rotors",
+                                                  "Flip signs of rotors along the last axis (or `axis`) to remove sign discontinuities\n\n"
+                                                  "Each output has nonnegative inner product with the one before it; the first is\n"
+                                                  "unchanged.  See `quaternion.unflip_rotors` for an easier-to-use version.",
+                                                  0, "(n)->(n)");
+  PyUFunc_RegisterLoopForType((PyUFuncObject *)tmp_ufunc, quaternion_descr->type_num, unflip_rotors_loop, arg_types, NULL);
+  PyDict_SetItemString(numpy_dict, "unflip_rotors", tmp_ufunc);
+  Py_DECREF(tmp_ufunc);
+
 
   /* I think before I do the following, I'll have to update numpy_dict
    * somehow, presumably with something related to
@@ -1595,12 +3965,343 @@ PyMODINIT_FUNC initnumpy_quaternion(void) {
   PyDict_SetItemString(numpy_dict, "slerp_vectorized", slerp_evaluate_ufunc);
   Py_DECREF(slerp_evaluate_ufunc);
 
+  arg_dtypes[0] = quaternion_descr;
+  arg_dtypes[1] = quaternion_descr;
+  arg_dtypes[2] = PyArray_DescrFromType(NPY_DOUBLE);
+  arg_dtypes[3] = PyArray_DescrFromType(NPY_DOUBLE);
+  arg_dtypes[4] = PyArray_DescrFromType(NPY_BOOL);
+  arg_dtypes[5] = PyArray_DescrFromType(NPY_BOOL);
+  tmp_ufunc = PyUFunc_FromFuncAndData(NULL, NULL, NULL, 0, 5, 1, PyUFunc_None, "isclose_vectorized",
+                                      "Calculate isclose from arrays of (a, b, rtol, atol, equal_nan)\n\n"
+                                      "See `quaternion.isclose` for an easier-to-use version of this function",
+                                      0);
+  PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, quaternion_descr, &isclose_loop, arg_dtypes, NULL);
+  PyDict_SetItemString(numpy_dict, "isclose_vectorized", tmp_ufunc);
+  Py_DECREF(tmp_ufunc);
+
+
+  arg_dtypes[0] = quaternion_descr;
+  arg_dtypes[1] = quaternion_descr;
+  arg_dtypes[2] = PyArray_DescrFromType(NPY_INTP);
+  arg_dtypes[3] = PyArray_DescrFromType(NPY_DOUBLE);
+  arg_dtypes[4] = quaternion_descr;
+  tmp_ufunc = PyUFunc_FromFuncAndDataAndSignature(NULL, NULL, NULL, 0, 4, 1, PyUFunc_None, "slerp_series_vectorized",
+                                                  "Evaluate piecewise slerp from (R, log_rel, index, tau)\n\n"
+                                                  "Each output is exp(tau*log_rel[index]) * R[index], where the core\n"
+                                                  "dimension of R and log_rel runs over the input samples.  See\n"
+                                                  "`quaternion.slerp_series` for an easier-to-use version of this function.",
+                                                  0, "(n),(n),(),()->()");
+  PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, quaternion_descr, &slerp_series_loop, arg_dtypes, NULL);
+  PyDict_SetItemString(numpy_dict, "slerp_series_vectorized", tmp_ufunc);
+  Py_DECREF(tmp_ufunc);
+
+
+  arg_dtypes[0] = PyArray_DescrFromType(NPY_DOUBLE);
+  arg_dtypes[1] = PyArray_DescrFromType(NPY_INTP);
+  arg_dtypes[2] = quaternion_descr;
+  arg_dtypes[3] = quaternion_descr;
+  arg_dtypes[4] = quaternion_descr;
+  arg_dtypes[5] = quaternion_descr;
+  arg_dtypes[6] = quaternion_descr;
+  tmp_ufunc = PyUFunc_FromFuncAndDataAndSignature(NULL, NULL, NULL, 0, 6, 1, PyUFunc_None, "squad_series_vectorized",
+                                                  "Evaluate squad from (tau, index, q, a, b, q_ip1)\n\n"
+                                                  "Each output is squad_evaluate(tau, q[index], a[index], b[index],\n"
+                                                  "q_ip1[index]), where the core dimension runs over the input samples.\n"
+                                                  "See `quaternion.squad` for an easier-to-use version of this function.",
+                                                  0, "(),(),(n),(n),(n),(n)->()");
+  PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, quaternion_descr, &squad_series_loop, arg_dtypes,
+                               &squad_series_evaluators[0]);
+  PyDict_SetItemString(numpy_dict, "squad_series_vectorized", tmp_ufunc);
+  Py_DECREF(tmp_ufunc);
+  tmp_ufunc = PyUFunc_FromFuncAndDataAndSignature(NULL, NULL, NULL, 0, 6, 1, PyUFunc_None,
+                                                  "squad_series_vectorized_approx",
+                                                  "Like `squad_series_vectorized`, but with approximate exp and log\n\n"
+                                                  "See `quaternion.slerp` for the accuracy of these approximations.",
+                                                  0, "(),(),(n),(n),(n),(n)->()");
+  PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, quaternion_descr, &squad_series_loop, arg_dtypes,
+                               &squad_series_evaluators[1]);
+  PyDict_SetItemString(numpy_dict, "squad_series_vectorized_approx", tmp_ufunc);
+  Py_DECREF(tmp_ufunc);
+
+  arg_dtypes[0] = quaternion_descr;
+  arg_dtypes[1] = quaternion_descr;
+  tmp_ufunc = PyUFunc_FromFuncAndDataAndSignature(NULL, NULL, NULL, 0, 1, 1, PyUFunc_None,
+                                                  "slerp_series_coefficients_vectorized",
+                                                  "Compute the log_rel input of `slerp_series_vectorized` from the rotors R\n\n"
+                                                  "See `quaternion.slerp_series_coefficients` for details.",
+                                                  0, "(n)->(n)");
+  PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, quaternion_descr, &slerp_series_coefficients_loop,
+                               arg_dtypes, NULL);
+  PyDict_SetItemString(numpy_dict, "slerp_series_coefficients_vectorized", tmp_ufunc);
+  Py_DECREF(tmp_ufunc);
+
+  arg_dtypes[0] = quaternion_descr;
+  arg_dtypes[1] = PyArray_DescrFromType(NPY_DOUBLE);
+  arg_dtypes[2] = quaternion_descr;
+  arg_dtypes[3] = quaternion_descr;
+  arg_dtypes[4] = quaternion_descr;
+  tmp_ufunc = PyUFunc_FromFuncAndDataAndSignature(NULL, NULL, NULL, 0, 2, 3, PyUFunc_None,
+                                                  "squad_series_coefficients_vectorized",
+                                                  "Compute the (a, b, q_ip1) inputs of `squad_series_vectorized` from (q, t)\n\n"
+                                                  "See `quaternion.squad_coefficients` for details.",
+                                                  0, "(n),(n)->(n),(n),(n)");
+  PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, quaternion_descr, &squad_series_coefficients_loop,
+                               arg_dtypes, &squad_coefficients_functions[0]);
+  PyDict_SetItemString(numpy_dict, "squad_series_coefficients_vectorized", tmp_ufunc);
+  Py_DECREF(tmp_ufunc);
+  tmp_ufunc = PyUFunc_FromFuncAndDataAndSignature(NULL, NULL, NULL, 0, 2, 3, PyUFunc_None,
+                                                  "squad_series_coefficients_vectorized_approx",
+                                                  "Like `squad_series_coefficients_vectorized`, but with approximate exp and log\n\n"
+                                                  "See `quaternion.slerp` for the accuracy of these approximations.",
+                                                  0, "(n),(n)->(n),(n),(n)");
+  PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, quaternion_descr, &squad_series_coefficients_loop,
+                               arg_dtypes, &squad_coefficients_functions[1]);
+  PyDict_SetItemString(numpy_dict, "squad_series_coefficients_vectorized_approx", tmp_ufunc);
+  Py_DECREF(tmp_ufunc);
+
+  arg_dtypes[0] = quaternion_descr;
+  arg_dtypes[1] = quaternion_descr;
+  arg_dtypes[2] = PyArray_DescrFromType(NPY_DOUBLE);
+  arg_dtypes[3] = quaternion_descr;
+  tmp_ufunc = PyUFunc_FromFuncAndData(NULL, NULL, NULL, 0, 3, 1, PyUFunc_None, "slerp_vectorized_approx",
+                                      "Like `slerp_vectorized`, but using approximate exp and log\n\n"
+                                      "See `quaternion.slerp` for the accuracy of the approximate functions.",
+                                      0);
+  PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, quaternion_descr, &slerp_approx_loop, arg_dtypes, NULL);
+  PyDict_SetItemString(numpy_dict, "slerp_vectorized_approx", tmp_ufunc);
+  Py_DECREF(tmp_ufunc);
+
+  arg_dtypes[0] = PyArray_DescrFromType(NPY_DOUBLE);
+  arg_dtypes[1] = quaternion_descr;
+  arg_dtypes[2] = quaternion_descr;
+  arg_dtypes[3] = quaternion_descr;
+  arg_dtypes[4] = quaternion_descr;
+  arg_dtypes[5] = quaternion_descr;
+  tmp_ufunc = PyUFunc_FromFuncAndData(NULL, NULL, NULL, 0, 5, 1, PyUFunc_None, "squad_vectorized_approx",
+                                      "Like `squad_vectorized`, but using approximate exp and log\n\n"
+                                      "See `quaternion.slerp` for the accuracy of the approximate functions.",
+                                      0);
+  PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, quaternion_descr, &squad_approx_loop, arg_dtypes, NULL);
+  PyDict_SetItemString(numpy_dict, "squad_vectorized_approx", tmp_ufunc);
+  Py_DECREF(tmp_ufunc);
+
+
+  arg_dtypes[0] = quaternion_descr;
+  arg_dtypes[1] = quaternion_descr;
+  arg_dtypes[2] = PyArray_DescrFromType(NPY_DOUBLE);
+  arg_dtypes[3] = quaternion_descr;
+  tmp_ufunc = PyUFunc_FromFuncAndData(NULL, NULL, NULL, 0, 3, 1, PyUFunc_None, "nlerp_vectorized",
+                                      "Calculate normalized linear interpolation from arrays of (q_1, q_2, tau)\n\n"
+                                      "Like `slerp_vectorized`, this follows the shorter of the paths from q_1 to\n"
+                                      "q_2 and -q_2, and returns unit quaternions.  The interpolant is not uniform in\n"
+                                      "angle, and differs from slerp by at most about 0.016*d**3, where d is the\n"
+                                      "chordal distance between the (unit) endpoints.",
+                                      0);
+  PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, quaternion_descr, &nlerp_loop, arg_dtypes, NULL);
+  PyDict_SetItemString(numpy_dict, "nlerp_vectorized", tmp_ufunc);
+  Py_DECREF(tmp_ufunc);
+
+  arg_dtypes[0] = quaternion_descr;
+  arg_dtypes[1] = quaternion_descr;
+  arg_dtypes[2] = PyArray_DescrFromType(NPY_DOUBLE);
+  arg_dtypes[3] = PyArray_DescrFromType(NPY_DOUBLE);
+  arg_dtypes[4] = quaternion_descr;
+  tmp_ufunc = PyUFunc_FromFuncAndData(NULL, NULL, NULL, 0, 4, 1, PyUFunc_None, "slerp_adaptive_vectorized",
+                                      "Interpolate from arrays of (q_1, q_2, tau, threshold) with nlerp or slerp\n\n"
+                                      "Uses `nlerp_vectorized` where the chordal distance between q_1 and q_2 (or\n"
+                                      "-q_2) is less than the threshold, and `slerp_vectorized` elsewhere.",
+                                      0);
+  PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, quaternion_descr, &slerp_adaptive_loop, arg_dtypes, NULL);
+  PyDict_SetItemString(numpy_dict, "slerp_adaptive_vectorized", tmp_ufunc);
+  Py_DECREF(tmp_ufunc);
+
+  arg_dtypes[0] = PyArray_DescrFromType(NPY_DOUBLE);
+  arg_dtypes[1] = PyArray_DescrFromType(NPY_INTP);
+  arg_dtypes[2] = quaternion_descr;
+  arg_dtypes[3] = quaternion_descr;
+  arg_dtypes[4] = quaternion_descr;
+  arg_dtypes[5] = quaternion_descr;
+  arg_dtypes[6] = PyArray_DescrFromType(NPY_DOUBLE);
+  arg_dtypes[7] = quaternion_descr;
+  tmp_ufunc = PyUFunc_FromFuncAndDataAndSignature(NULL, NULL, NULL, 0, 7, 1, PyUFunc_None,
+                                                  "squad_series_vectorized_adaptive",
+                                                  "Like `squad_series_vectorized`, with a final threshold argument\n\n"
+                                                  "Each slerp is replaced by nlerp where its endpoints are closer\n"
+                                                  "than the threshold; see `slerp_adaptive_vectorized`.",
+                                                  0, "(),(),(n),(n),(n),(n),()->()");
+  PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, quaternion_descr, &squad_series_adaptive_loop, arg_dtypes,
+                               NULL);
+  PyDict_SetItemString(numpy_dict, "squad_series_vectorized_adaptive", tmp_ufunc);
+  Py_DECREF(tmp_ufunc);
+
+
+  // Private ufuncs for the conversion functions; these are added to this
+  // module, rather than to numpy
+  #define ADD_CONVERSION_UFUNC(pyname, loop, nin, nout, doc)             \
+    tmp_ufunc = PyUFunc_FromFuncAndData(NULL, NULL, NULL, 0, nin, nout, PyUFunc_None, #pyname, doc, 0); \
+    PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, quaternion_descr, &loop, conversion_dtypes, NULL); \
+    PyModule_AddObject(module, #pyname, tmp_ufunc)
+  for (i = 0; i < 10; i++) {
+    conversion_dtypes[i] = PyArray_DescrFromType(NPY_DOUBLE);
+  }
+  conversion_dtypes[0] = quaternion_descr;
+  ADD_CONVERSION_UFUNC(_as_rotation_matrix, as_rotation_matrix_loop, 1, 9,
+                       "Rotation matrix elements (in row-major order) of each quaternion");
+  ADD_CONVERSION_UFUNC(_as_rotation_vector, as_rotation_vector_loop, 1, 3,
+                       "Rotation-vector components of each quaternion");
+  ADD_CONVERSION_UFUNC(_as_euler_angles, as_euler_angles_loop, 1, 3,
+                       "Euler angles (alpha, beta, gamma) of each quaternion");
+  ADD_CONVERSION_UFUNC(_as_spherical_coords, as_spherical_coords_loop, 1, 2,
+                       "Spherical coordinates (vartheta, varphi) of each quaternion");
+  conversion_dtypes[0] = PyArray_DescrFromType(NPY_DOUBLE);
+  conversion_dtypes[9] = quaternion_descr;
+  ADD_CONVERSION_UFUNC(_from_rotation_matrix, from_rotation_matrix_loop, 9, 1,
+                       "Unit quaternion from rotation matrix elements (in row-major order)");
+  conversion_dtypes[9] = PyArray_DescrFromType(NPY_DOUBLE);
+  conversion_dtypes[3] = quaternion_descr;
+  ADD_CONVERSION_UFUNC(_from_rotation_vector, from_rotation_vector_loop, 3, 1,
+                       "Unit quaternion from rotation-vector components");
+  ADD_CONVERSION_UFUNC(_from_euler_angles, from_euler_angles_loop, 3, 1,
+                       "Unit quaternion from Euler angles (alpha, beta, gamma)");
+  conversion_dtypes[3] = PyArray_DescrFromType(NPY_DOUBLE);
+  conversion_dtypes[2] = quaternion_descr;
+  ADD_CONVERSION_UFUNC(_from_spherical_coords, from_spherical_coords_loop, 2, 1,
+                       "Unit quaternion from spherical coordinates (theta, phi)");
+  conversion_dtypes[2] = PyArray_DescrFromType(NPY_DOUBLE);
+  conversion_dtypes[0] = quaternion_descr;
+  ADD_CONVERSION_UFUNC(_rotate_vectors, rotate_vectors_loop, 4, 3,
+                       "Components of the vectors (v_x, v_y, v_z) rotated by each quaternion");
+  conversion_dtypes[0] = PyArray_DescrFromType(NPY_DOUBLE);
+  conversion_dtypes[3] = quaternion_descr;
+  tmp_ufunc = PyUFunc_FromFuncAndDataAndSignature(NULL, NULL, NULL, 0, 3, 1, PyUFunc_None, "_optimal_rotation",
+                                                  "Unit quaternion best rotating vectors b onto a, with weights w",
+                                                  0, "(n,d),(n,d),(n)->()");
+  PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, quaternion_descr, &optimal_rotation_loop, conversion_dtypes,
+                               NULL);
+  PyModule_AddObject(module, "_optimal_rotation", tmp_ufunc);
+  conversion_dtypes[3] = PyArray_DescrFromType(NPY_DOUBLE);
+
+
+  // Register the dual-quaternion type and dtype in the same way as the
+  // quaternion type above
+  PyDualQuaternion_Type.tp_base = &PyGenericArrType_Type;
+  pydual_quaternion_as_number.nb_multiply = pydual_quaternion_multiply;
+  if (PyType_Ready(&PyDualQuaternion_Type) < 0) {
+    PyErr_Print();
+    PyErr_SetString(PyExc_SystemError, "Could not initialize PyDualQuaternion_Type.");
+    INITERROR;
+  }
+  PyArray_InitArrFuncs(&_PyDualQuaternion_ArrFuncs);
+  _PyDualQuaternion_ArrFuncs.nonzero = (PyArray_NonzeroFunc*)DUAL_QUATERNION_nonzero;
+  _PyDualQuaternion_ArrFuncs.copyswap = (PyArray_CopySwapFunc*)DUAL_QUATERNION_copyswap;
+  _PyDualQuaternion_ArrFuncs.copyswapn = (PyArray_CopySwapNFunc*)DUAL_QUATERNION_copyswapn;
+  _PyDualQuaternion_ArrFuncs.setitem = (PyArray_SetItemFunc*)DUAL_QUATERNION_setitem;
+  _PyDualQuaternion_ArrFuncs.getitem = (PyArray_GetItemFunc*)DUAL_QUATERNION_getitem;
+  _PyDualQuaternion_ArrFuncs.fillwithscalar = (PyArray_FillWithScalarFunc*)DUAL_QUATERNION_fillwithscalar;
+  dual_quaternion_descr = PyObject_New(PyArray_Descr, &PyArrayDescr_Type);
+  dual_quaternion_descr->typeobj = &PyDualQuaternion_Type;
+  dual_quaternion_descr->kind = 'V';
+  dual_quaternion_descr->type = 'Q';
+  dual_quaternion_descr->byteorder = '=';
+  dual_quaternion_descr->flags = 0;
+  dual_quaternion_descr->type_num = 0; // assigned at registration
+  dual_quaternion_descr->elsize = 8*8;
+  dual_quaternion_descr->alignment = 8;
+  dual_quaternion_descr->subarray = NULL;
+  dual_quaternion_descr->fields = NULL;
+  dual_quaternion_descr->names = NULL;
+  dual_quaternion_descr->f = &_PyDualQuaternion_ArrFuncs;
+  dual_quaternion_descr->metadata = NULL;
+  dual_quaternion_descr->c_metadata = NULL;
+  Py_INCREF(&PyDualQuaternion_Type);
+  dualQuaternionNum = PyArray_RegisterDataType(dual_quaternion_descr);
+  if (dualQuaternionNum < 0) {
+    INITERROR;
+  }
+  register_cast_function(quaternionNum, dualQuaternionNum, (PyArray_VectorUnaryFunc*)QUATERNION_to_dual_quaternion);
+  register_cast_function(NPY_BOOL, dualQuaternionNum, (PyArray_VectorUnaryFunc*)BOOL_to_dual_quaternion);
+  register_cast_function(NPY_BYTE, dualQuaternionNum, (PyArray_VectorUnaryFunc*)BYTE_to_dual_quaternion);
+  register_cast_function(NPY_UBYTE, dualQuaternionNum, (PyArray_VectorUnaryFunc*)UBYTE_to_dual_quaternion);
+  register_cast_function(NPY_SHORT, dualQuaternionNum, (PyArray_VectorUnaryFunc*)SHORT_to_dual_quaternion);
+  register_cast_function(NPY_USHORT, dualQuaternionNum, (PyArray_VectorUnaryFunc*)USHORT_to_dual_quaternion);
+  register_cast_function(NPY_INT, dualQuaternionNum, (PyArray_VectorUnaryFunc*)INT_to_dual_quaternion);
+  register_cast_function(NPY_UINT, dualQuaternionNum, (PyArray_VectorUnaryFunc*)UINT_to_dual_quaternion);
+  register_cast_function(NPY_LONG, dualQuaternionNum, (PyArray_VectorUnaryFunc*)LONG_to_dual_quaternion);
+  register_cast_function(NPY_ULONG, dualQuaternionNum, (PyArray_VectorUnaryFunc*)ULONG_to_dual_quaternion);
+  register_cast_function(NPY_LONGLONG, dualQuaternionNum, (PyArray_VectorUnaryFunc*)LONGLONG_to_dual_quaternion);
+  register_cast_function(NPY_ULONGLONG, dualQuaternionNum, (PyArray_VectorUnaryFunc*)ULONGLONG_to_dual_quaternion);
+  register_cast_function(NPY_FLOAT, dualQuaternionNum, (PyArray_VectorUnaryFunc*)FLOAT_to_dual_quaternion);
+  register_cast_function(NPY_DOUBLE, dualQuaternionNum, (PyArray_VectorUnaryFunc*)DOUBLE_to_dual_quaternion);
+  register_cast_function(NPY_LONGDOUBLE, dualQuaternionNum, (PyArray_VectorUnaryFunc*)LONGDOUBLE_to_dual_quaternion);
+
+  #define REGISTER_DUAL_QUATERNION_UFUNC(name, cname)                   \
+    PyUFunc_RegisterLoopForType((PyUFuncObject *)PyDict_GetItemString(numpy_dict, #name), \
+                                dualQuaternionNum, dual_quaternion_##cname##_ufunc, arg_types, NULL)
+  arg_types[0] = dualQuaternionNum;
+  arg_types[1] = NPY_BOOL;
+  REGISTER_DUAL_QUATERNION_UFUNC(isnan, isnan);
+  REGISTER_DUAL_QUATERNION_UFUNC(isinf, isinf);
+  REGISTER_DUAL_QUATERNION_UFUNC(isfinite, isfinite);
+  arg_types[1] = dualQuaternionNum;
+  REGISTER_DUAL_QUATERNION_UFUNC(conjugate, conjugate);
+  REGISTER_DUAL_QUATERNION_UFUNC(invert, inverse);
+  REGISTER_DUAL_QUATERNION_UFUNC(normalized, normalized);
+  arg_types[2] = NPY_BOOL;
+  REGISTER_DUAL_QUATERNION_UFUNC(equal, equal);
+  REGISTER_DUAL_QUATERNION_UFUNC(not_equal, not_equal);
+  arg_types[2] = dualQuaternionNum;
+  REGISTER_DUAL_QUATERNION_UFUNC(multiply, multiply);
+
+  arg_dtypes[0] = dual_quaternion_descr;
+  arg_dtypes[1] = dual_quaternion_descr;
+  arg_dtypes[2] = PyArray_DescrFromType(NPY_DOUBLE);
+  arg_dtypes[3] = dual_quaternion_descr;
+  tmp_ufunc = PyUFunc_FromFuncAndData(NULL, NULL, NULL, 0, 3, 1, PyUFunc_None, "sclerp_vectorized",
+                                      "Calculate screw linear interpolation from arrays of (dq_1, dq_2, tau)\n\n"
+                                      "The inputs must be unit dual quaternions.  See `quaternion.sclerp` for an\n"
+                                      "easier-to-use version of this function.",
+                                      0);
+  PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, dual_quaternion_descr, &sclerp_loop, arg_dtypes, NULL);
+  PyDict_SetItemString(numpy_dict, "sclerp_vectorized", tmp_ufunc);
+  Py_DECREF(tmp_ufunc);
+
+  // Private ufuncs for the dual-quaternion conversion functions
+  arg_dtypes[0] = dual_quaternion_descr;
+  arg_dtypes[1] = PyArray_DescrFromType(NPY_DOUBLE);
+  arg_dtypes[2] = PyArray_DescrFromType(NPY_DOUBLE);
+  tmp_ufunc = PyUFunc_FromFuncAndDataAndSignature(NULL, NULL, NULL, 0, 2, 1, PyUFunc_None, "_transform_points",
+                                                  "Points (along the core axis) transformed by each dual quaternion",
+                                                  0, "(),(d)->(d)");
+  PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, dual_quaternion_descr, &transform_points_loop, arg_dtypes,
+                               NULL);
+  PyModule_AddObject(module, "_transform_points", tmp_ufunc);
+  conversion_dtypes[0] = quaternion_descr;
+  conversion_dtypes[4] = dual_quaternion_descr;
+  tmp_ufunc = PyUFunc_FromFuncAndData(NULL, NULL, NULL, 0, 4, 1, PyUFunc_None, "_from_rotation_and_translation",
+                                      "Dual quaternion from rotation and translation components (t_x, t_y, t_z)", 0);
+  PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, dual_quaternion_descr, &from_rotation_and_translation_loop,
+                               conversion_dtypes, NULL);
+  PyModule_AddObject(module, "_from_rotation_and_translation", tmp_ufunc);
+  conversion_dtypes[0] = dual_quaternion_descr;
+  conversion_dtypes[1] = quaternion_descr;
+  conversion_dtypes[4] = PyArray_DescrFromType(NPY_DOUBLE);
+  tmp_ufunc = PyUFunc_FromFuncAndData(NULL, NULL, NULL, 0, 1, 4, PyUFunc_None, "_as_rotation_and_translation",
+                                      "Rotation and translation components (t_x, t_y, t_z) of each dual quaternion", 0);
+  PyUFunc_RegisterLoopForDescr((PyUFuncObject*)tmp_ufunc, dual_quaternion_descr, &as_rotation_and_translation_loop,
+                               conversion_dtypes, NULL);
+  PyModule_AddObject(module, "_as_rotation_and_translation", tmp_ufunc);
+
+
+  // Export the C API for other extension modules
+  PyModule_AddObject(module, "_C_API",
+                     PyCapsule_New((void *)&quaternion_c_api_table, "quaternion.numpy_quaternion._C_API", NULL));
 
   // Add the constant `_QUATERNION_EPS` to the module as `quaternion._eps`
   PyModule_AddObject(module, "_eps", PyFloat_FromDouble(_QUATERNION_EPS));
  
   // Finally, add this quaternion object to the quaternion module itself
   PyModule_AddObject(module, "quaternion", (PyObject *)&PyQuaternion_Type);
+  PyModule_AddObject(module, "dual_quaternion", (PyObject *)&PyDualQuaternion_Type);
 
 
 #if PY_MAJOR_VERSION >= 3
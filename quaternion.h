@@ -35,9 +35,47 @@ extern "C" {
     double z;
   } quaternion;
 
-  // Constructor-ish
-  quaternion quaternion_create_from_spherical_coords(double vartheta, double varphi);
-  quaternion quaternion_create_from_euler_angles(double alpha, double beta, double gamma);
+  // The C API exported by `quaternion.numpy_quaternion` as the capsule `quaternion.numpy_quaternion._C_API`.  It holds
+  // the functions compiled in quaternion.c (everything else in this file is inline), along with the python scalar
+  // type and the numpy type number.  New entries are only ever appended, and the version incremented.
+  #define QUATERNION_C_API_VERSION 1
+  typedef struct {
+    int version;
+    quaternion (*create_from_spherical_coords)(double vartheta, double varphi);
+    quaternion (*create_from_euler_angles)(double alpha, double beta, double gamma);
+    quaternion (*sqrt)(quaternion q);
+    quaternion (*log)(quaternion q);
+    quaternion (*exp)(quaternion q);
+    quaternion (*scalar_power)(double s, quaternion q);
+    struct _typeobject *type;  // PyTypeObject of `quaternion.quaternion`
+    struct _object *(*from_quaternion)(quaternion q);  // New reference to a `quaternion.quaternion` object
+    int type_num;  // numpy type number of the quaternion dtype
+  } quaternion_c_api;
+
+  #ifdef QUATERNION_IMPORT_C_API
+    // Other extension modules call the compiled functions through the table, which `import_quaternion` (in
+    // quaternion_api.h) fills in
+    static quaternion_c_api *quaternion_api = NULL;
+    static NPY_INLINE quaternion quaternion_create_from_spherical_coords(double vartheta, double varphi) {
+      return quaternion_api->create_from_spherical_coords(vartheta, varphi);
+    }
+    static NPY_INLINE quaternion quaternion_create_from_euler_angles(double alpha, double beta, double gamma) {
+      return quaternion_api->create_from_euler_angles(alpha, beta, gamma);
+    }
+    static NPY_INLINE quaternion quaternion_sqrt(quaternion q) { return quaternion_api->sqrt(q); }
+    static NPY_INLINE quaternion quaternion_log(quaternion q) { return quaternion_api->log(q); }
+    static NPY_INLINE quaternion quaternion_exp(quaternion q) { return quaternion_api->exp(q); }
+    static NPY_INLINE quaternion quaternion_scalar_power(double s, quaternion q) {
+      return quaternion_api->scalar_power(s, q);
+    }
+  #else
+    quaternion quaternion_create_from_spherical_coords(double vartheta, double varphi);
+    quaternion quaternion_create_from_euler_angles(double alpha, double beta, double gamma);
+    quaternion quaternion_sqrt(quaternion q);
+    quaternion quaternion_log(quaternion q);
+    quaternion quaternion_exp(quaternion q);
+    quaternion quaternion_scalar_power(double s, quaternion q);
+  #endif
 
   // Unary bool returners
   static NPY_INLINE int quaternion_isnan(quaternion q) {
@@ -111,7 +149,6 @@ extern "C" {
   }
 
   // Unary float returners
-  quaternion quaternion_log(quaternion q); // Pre-declare; declared again below, in its rightful place
   static NPY_INLINE double quaternion_norm(quaternion q) {
     return q.w*q.w + q.x*q.x + q.y*q.y + q.z*q.z;
   }
@@ -123,9 +160,6 @@ extern "C" {
   }
 
   // Unary quaternion returners
-  quaternion quaternion_sqrt(quaternion q);
-  quaternion quaternion_log(quaternion q);
-  quaternion quaternion_exp(quaternion q);
   static NPY_INLINE quaternion quaternion_normalized(quaternion q) {
     double q_abs = quaternion_absolute(q);
     quaternion r = {q.w/q_abs, q.x/q_abs, q.y/q_abs, q.z/q_abs};
@@ -415,7 +449,6 @@ extern "C" {
     *q1 = q3;
     return;
   }
-  quaternion quaternion_scalar_power(double s, quaternion q);
   static NPY_INLINE void quaternion_inplace_scalar_power(double s, quaternion* q) {
     /* Not overly useful as an in-place operator, but here for completeness. */
     quaternion q2 = quaternion_scalar_power(s, *q);
@@ -463,6 +496,25 @@ extern "C" {
       return quaternion_absolute(quaternion_add(q1,q2));
     }
   }
+  static NPY_INLINE int quaternion_isclose(quaternion q1, quaternion q2, double rtol, double atol, int equal_nan) {
+    // Same as `quaternion.isclose`: finite values are compared with tolerances; others must be equal, or both nan
+    if(quaternion_isfinite(q1) && quaternion_isfinite(q2)) {
+      return quaternion_absolute(quaternion_subtract(q1,q2)) <= atol + rtol*quaternion_absolute(q2);
+    }
+    if(equal_nan && quaternion_isnan(q1) && quaternion_isnan(q2)) {
+      return 1;
+    }
+    return quaternion_equal(q1, q2);
+  }
+  static NPY_INLINE quaternion quaternion_hemisphere_canonicalized(quaternion q, quaternion reference) {
+    // Return whichever of q and -q lies in the same hemisphere as the reference (for rotors, both represent the
+    // same rotation)
+    if(q.w*reference.w + q.x*reference.x + q.y*reference.y + q.z*reference.z < 0) {
+      return quaternion_negative(q);
+    } else {
+      return q;
+    }
+  }
   static NPY_INLINE quaternion slerp(quaternion q1, quaternion q2, double tau) {
     if(quaternion_rotor_chordal_distance(q1,q2)<=1.414213562373096) {
       return quaternion_multiply( quaternion_power_scalar(quaternion_divide(q2,q1), tau), q1);
@@ -475,6 +527,93 @@ extern "C" {
                  slerp(a_i, b_ip1, tau_i),
                  2*tau_i*(1-tau_i));
   }
+  static NPY_INLINE quaternion nlerp(quaternion q1, quaternion q2, double tau) {
+    // Normalized linear interpolation, along the shorter path like slerp.  The result is a unit quaternion.
+    quaternion r;
+    if(quaternion_rotor_chordal_distance(q1,q2)>1.414213562373096) {
+      q2 = quaternion_negative(q2);
+    }
+    r.w = q1.w + tau*(q2.w-q1.w);
+    r.x = q1.x + tau*(q2.x-q1.x);
+    r.y = q1.y + tau*(q2.y-q1.y);
+    r.z = q1.z + tau*(q2.z-q1.z);
+    return quaternion_normalized(r);
+  }
+  static NPY_INLINE quaternion slerp_adaptive(quaternion q1, quaternion q2, double tau, double threshold) {
+    // nlerp differs from slerp by at most about 0.016*d^3 (for unit inputs), where d is the chordal distance
+    // between q1 and q2 (or -q2, whichever is closer); use it when that is below the threshold
+    double d2_minus = quaternion_norm(quaternion_subtract(q1, q2));
+    double d2_plus = quaternion_norm(quaternion_add(q1, q2));
+    if((d2_minus < d2_plus ? d2_minus : d2_plus) < threshold*threshold) {
+      return nlerp(q1, q2, tau);
+    }
+    return slerp(q1, q2, tau);
+  }
+  static NPY_INLINE quaternion squad_evaluate_adaptive(double tau_i, quaternion q_i, quaternion a_i, quaternion b_ip1,
+                                                       quaternion q_ip1, double threshold) {
+    return slerp_adaptive(slerp_adaptive(q_i, q_ip1, tau_i, threshold),
+                          slerp_adaptive(a_i, b_ip1, tau_i, threshold),
+                          2*tau_i*(1-tau_i), threshold);
+  }
+
+  // Approximate versions of exp, log, slerp, and squad.  For the small
+  // angles typical of closely spaced rotors, the trigonometric functions
+  // are replaced by truncated Taylor series; their truncation errors are
+  // below 1e-15 relative to the exact functions, so that the results
+  // generally differ from the exact ones only by roundoff.  Larger angles
+  // fall back to the exact functions.
+  static NPY_INLINE quaternion quaternion_exp_approx(quaternion q) {
+    // Series for cos(b) and sin(b)/b, valid for b = |v| <= 1/4; the
+    // exact function has no trigonometric calls for even smaller b
+    double b2 = q.x*q.x + q.y*q.y + q.z*q.z;
+    if(b2 <= 0.0625 && b2 > _QUATERNION_EPS*_QUATERNION_EPS) {
+      double c = 1 + b2*(-1./2 + b2*(1./24 + b2*(-1./720 + b2*(1./40320 + b2*(-1./3628800)))));
+      double s = 1 + b2*(-1./6 + b2*(1./120 + b2*(-1./5040 + b2*(1./362880 + b2*(-1./39916800)))));
+      double e = (q.w==0.0) ? 1.0 : exp(q.w);
+      quaternion r = {e*c, e*s*q.x, e*s*q.y, e*s*q.z};
+      return r;
+    }
+    return quaternion_exp(q);
+  }
+  static NPY_INLINE quaternion quaternion_log_approx(quaternion q) {
+    // Series for atan(x)/x with x = |v|/w <= 1/10, and for log(1+s)
+    // with s = |q|^2-1 in [-1e-3, 1e-3]
+    double b2 = q.x*q.x + q.y*q.y + q.z*q.z;
+    if(q.w > 0.0 && b2 <= 0.01*q.w*q.w) {
+      double x2 = b2 / (q.w*q.w);
+      double s = (q.w*q.w + b2) - 1;
+      double f = (1 + x2*(-1./3 + x2*(1./5 + x2*(-1./7 + x2*(1./9 + x2*(-1./11 + x2*(1./13))))))) / q.w;
+      double l;
+      if(fabs(s) <= 1e-3) {
+        l = 0.5*s*(1 + s*(-1./2 + s*(1./3 + s*(-1./4 + s*(1./5)))));
+      } else {
+        l = log(q.w*q.w + b2)/2.0;
+      }
+      {
+        quaternion r = {l, f*q.x, f*q.y, f*q.z};
+        return r;
+      }
+    }
+    return quaternion_log(q);
+  }
+  static NPY_INLINE quaternion slerp_approx(quaternion q1, quaternion q2, double tau) {
+    quaternion q_rel;
+    if(quaternion_rotor_chordal_distance(q1,q2)<=1.414213562373096) {
+      q_rel = quaternion_divide(q2,q1);
+    } else {
+      q_rel = quaternion_divide(quaternion_negative(q2),q1);
+    }
+    if(! quaternion_nonzero(q_rel)) {
+      return slerp(q1, q2, tau);
+    }
+    return quaternion_multiply(quaternion_exp_approx(quaternion_multiply_scalar(quaternion_log_approx(q_rel), tau)),
+                               q1);
+  }
+  static NPY_INLINE quaternion squad_evaluate_approx(double tau_i, quaternion q_i, quaternion a_i, quaternion b_ip1, quaternion q_ip1) {
+    return slerp_approx(slerp_approx(q_i, q_ip1, tau_i),
+                        slerp_approx(a_i, b_ip1, tau_i),
+                        2*tau_i*(1-tau_i));
+  }
 
 
 #ifdef __cplusplus
@@ -0,0 +1,57 @@
+// Copyright (c) 2018, Michael Boyle
+// See LICENSE file for details: <https://github.com/moble/quaternion/blob/master/LICENSE>
+
+// Access to the quaternion kernels from other extension modules
+//
+// Include this header (found in the directory returned by `quaternion.get_include()`) instead of quaternion.h, and
+// call `import_quaternion()` once in the module's initialization function, much as with numpy's `import_array()`.
+// All the inline functions in quaternion.h and dual_quaternion.h are then available, and those compiled into
+// `quaternion.numpy_quaternion` are called through the table it exports, so there is nothing extra to link against.
+// The table is static, so each source file that uses these functions must call `import_quaternion()` itself.
+
+#ifndef __QUATERNION_API_H__
+#define __QUATERNION_API_H__
+
+#include <Python.h>
+
+#define QUATERNION_IMPORT_C_API
+#include "quaternion.h"
+#include "dual_quaternion.h"
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+  // The python object holding a quaternion scalar, with the same layout as in numpy_quaternion.c
+  typedef struct {
+    PyObject_HEAD
+    quaternion obval;
+  } PyQuaternion;
+
+  #define PyQuaternion_Type (*(PyTypeObject *)quaternion_api->type)
+  #define PyQuaternion_Check(object) PyObject_TypeCheck(object, &PyQuaternion_Type)
+  #define PyQuaternion_AsQuaternion(object) (((PyQuaternion *)(object))->obval)
+  #define PyQuaternion_FromQuaternion(q) (quaternion_api->from_quaternion(q))
+  #define NPY_QUATERNION (quaternion_api->type_num)
+
+  // Load the C API from `quaternion.numpy_quaternion`, returning 0 on success, or -1 with an exception set
+  static NPY_INLINE int import_quaternion(void) {
+    quaternion_c_api *api = (quaternion_c_api *)PyCapsule_Import("quaternion.numpy_quaternion._C_API", 0);
+    if (api == NULL) {
+      return -1;
+    }
+    if (api->version < QUATERNION_C_API_VERSION) {
+      PyErr_Format(PyExc_ImportError,
+                   "module compiled against quaternion C API version %d, but the installed version is only %d",
+                   QUATERNION_C_API_VERSION, api->version);
+      return -1;
+    }
+    quaternion_api = api;
+    return 0;
+  }
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif // __QUATERNION_API_H__
@@ -8,7 +8,7 @@ import quaternion
 from quaternion.numba_wrapper import njit
 
 
-def slerp(R1, R2, t1, t2, t_out):
+def slerp(R1, R2, t1, t2, t_out, approximate=False, out=None):
     """Spherical linear interpolation of rotors
 
     This function uses a simpler interface than the more fundamental
@@ -28,14 +28,193 @@ def slerp(R1, R2, t1, t2, t_out):
         Time corresponding to R2
     t_out: float or array of floats
         Times to which the rotors should be interpolated
+    approximate: bool, optional
+        If True, use `slerp_vectorized_approx`, which evaluates the
+        exp and log functions with truncated series when the rotation
+        between R1 and R2 is small (less than about 0.2 radians); larger
+        rotations fall back to the exact functions.  The truncation
+        errors are below 1e-15, so the results agree with the exact
+        version to within a few multiples of roundoff error, but small
+        rotations are interpolated about 1.5 times as fast.  Defaults
+        to False.
+    out: array of quaternions, optional
+        Array with the shape of `t_out` in which to place the result.
 
 
     """
     tau = (t_out-t1)/(t2-t1)
-    return np.slerp_vectorized(R1, R2, tau)
+    if approximate:
+        return np.slerp_vectorized_approx(R1, R2, tau, out=out)
+    return np.slerp_vectorized(R1, R2, tau, out=out)
 
 
-def squad(R_in, t_in, t_out):
+def _segment_indices(t_in, t_out, dt=None):
+    """Return `t_in.searchsorted(t_out, side='right') - 1`, using arithmetic when `t_in` is a uniform grid
+
+    If `dt` is None, `t_in` is checked to see if it is close to the uniform grid `t_in[0] + dt*arange(t_in.size)`;
+    otherwise, `t_in` is assumed to be such a grid, with the given spacing.  In either case, the index estimated as
+    `floor((t_out - t_in[0]) / dt)` is corrected by one step where necessary, so the result is exactly what the
+    binary search would have given.
+
+    """
+    t_in = np.asarray(t_in, dtype=float)
+    t_out = np.asarray(t_out, dtype=float)
+    n = t_in.size
+    if dt is None and n > 2:
+        dt = (t_in[-1] - t_in[0]) / (n - 1)
+        if not (dt > 0 and np.all(np.abs(t_in - (t_in[0] + dt * np.arange(n))) <= 0.25 * dt)):
+            dt = None
+    if dt is None or n < 2:
+        return t_in.searchsorted(t_out, side='right') - 1
+    i = np.floor((t_out - t_in[0]) / dt)
+    np.copyto(i, n - 1, where=np.isnan(i))  # As for searchsorted, NaN sorts after everything
+    np.clip(i, -1, n - 1, out=i)
+    i = i.astype(np.intp)
+    i -= (i >= 0) & (t_out < t_in[np.maximum(i, 0)])
+    i += (i < n - 1) & (t_out >= t_in[np.minimum(i + 1, n - 1)])
+    return i
+
+
+def interpolation_segments(t_in, t_out, dt=None):
+    """Find the input segment containing each output time, for use with `slerp_series`
+
+    The binary search over `t_in` is usually the most expensive part of interpolating onto a fixed grid, so when the
+    same `t_in` and `t_out` are used repeatedly (for example, to interpolate many different time series sampled at
+    the same times), the result of this function can be computed once and passed as the `segments` argument of
+    `slerp_series`.
+
+    Parameters
+    ----------
+    t_in: array of float
+        The (sorted) times of the input data
+    t_out: array of float
+        The times to which the input data will be interpolated
+    dt: float, optional
+        Spacing of `t_in`, if it is a uniform grid.  In that case, the segments are found arithmetically rather than
+        by binary search.  If this is not given, `t_in` is checked for uniform spacing automatically.
+
+    Returns
+    -------
+    i: array of int
+        Index of the segment for each element of `t_out`, such that `t_in[i] <= t_out < t_in[i+1]`.  Times outside of
+        the range of `t_in` are assigned to the first or last segment.
+    tau: array of float
+        Fractional position of each element of `t_out` within its segment.  This is less than 0 or greater than 1 for
+        times outside of the range of `t_in`.
+
+    """
+    t_in = np.asarray(t_in, dtype=float)
+    t_out = np.asarray(t_out, dtype=float)
+    if t_in.size < 2:
+        return np.zeros(t_out.shape, dtype=np.intp), np.zeros(t_out.shape, dtype=float)
+    i = _segment_indices(t_in, t_out, dt)
+    np.clip(i, 0, t_in.size - 2, out=i)
+    tau = (t_out - t_in[i]) / (t_in[i+1] - t_in[i])
+    return i, tau
+
+
+def slerp_series_coefficients(R_in, out=None):
+    """Compute the logarithms of the relative rotations used by `slerp_series`
+
+    Element `i` of the result is the log of the shorter of the two rotations taking `R_in[i]` to `R_in[i+1]` (or to
+    `-R_in[i+1]`), and the last element is zero.  These depend only on `R_in`, so when the same series is
+    interpolated repeatedly -- for example, onto successive chunks of output times -- they can be computed once and
+    passed as the `coefficients` argument of `slerp_series`.  Passing `out` as well allows them to be recomputed for
+    new input rotors without allocating anything.
+
+    Parameters
+    ----------
+    R_in: array of quaternions
+        A time-series of rotors (unit quaternions) to be interpolated
+    out: array of quaternions, optional
+        Array with the shape of `R_in` in which to place the result.
+
+    """
+    return np.slerp_series_coefficients_vectorized(np.asarray(R_in, dtype=np.quaternion), out=out)
+
+
+def slerp_series(R_in, t_in, t_out, segments=None, out=None, coefficients=None):
+    """Piecewise spherical linear interpolation of a time series of rotors
+
+    This is the linear counterpart of `squad`: between each pair of consecutive input rotors, the output follows
+    `slerp`.  The relative rotation for each segment is computed just once, and the interpolant is evaluated for
+    all output times in a single loop at the C level.  Output times outside the range of `t_in` are extrapolated
+    along the first or last segment.
+
+    As with `squad`, the input `R_in` rotors are assumed to be reasonably continuous (no sign flips), and the
+    input `t` arrays are assumed to be sorted.
+
+    Parameters
+    ----------
+    R_in: array of quaternions
+        A time-series of rotors (unit quaternions) to be interpolated
+    t_in: array of float
+        The times corresponding to R_in
+    t_out: array of float
+        The times to which R_in should be interpolated
+    segments: tuple of arrays, optional
+        The output of `interpolation_segments(t_in, t_out)`.  If the same times are used for many calls, computing
+        this once and passing it here skips the search for the segment containing each output time.
+    out: array of quaternions, optional
+        Array with the shape of `t_out` in which to place the result.
+    coefficients: array of quaternions, optional
+        The output of `slerp_series_coefficients(R_in)`.  With this, `segments`, and `out`, nothing is allocated.
+
+    """
+    R_in = np.asarray(R_in, dtype=np.quaternion)
+    t_out = np.asarray(t_out, dtype=float)
+    if t_out.size == 0:
+        return np.empty(t_out.shape, dtype=np.quaternion) if out is None else out
+    if R_in.size == 0:
+        raise ValueError("Cannot interpolate an empty series of rotors to {0} output times".format(t_out.size))
+    if segments is None:
+        segments = interpolation_segments(t_in, t_out)
+    i, tau = segments
+    if coefficients is None:
+        coefficients = slerp_series_coefficients(R_in)
+
+    return np.slerp_series_vectorized(R_in, coefficients, i, tau, out=out)
+
+
+def squad_coefficients(R_in, t_in, approximate=False, out=None):
+    """Compute the interpolation coefficients used by `squad`
+
+    These are the rotors `A` and `B` forming the inner corners of the "quadrangle" for each segment, along with
+    `R_ip1`, the rotor at the end of each segment (where the segment after the last input extrapolates the final
+    rotation).  They depend only on `R_in` and `t_in`, so when the same series is interpolated repeatedly -- for
+    example, onto successive chunks of output times -- they can be computed once and passed as the `coefficients`
+    argument of `squad`.  Passing `out` as well allows them to be recomputed for new input rotors without
+    allocating anything.
+
+    Parameters
+    ----------
+    R_in: array of quaternions
+        A time-series of rotors (unit quaternions) to be interpolated
+    t_in: array of float
+        The times corresponding to R_in
+    approximate: bool, optional
+        As in `squad`.  This must match the value passed to `squad`.
+    out: tuple of three arrays of quaternions, optional
+        Arrays with the shape of `R_in` in which to place `A`, `B`, and `R_ip1`.
+
+    Returns
+    -------
+    A, B, R_ip1: arrays of quaternions
+
+    """
+    R_in = np.asarray(R_in, dtype=np.quaternion)
+    t_in = np.asarray(t_in, dtype=float)
+    if approximate:
+        coefficients = np.squad_series_coefficients_vectorized_approx
+    else:
+        coefficients = np.squad_series_coefficients_vectorized
+    if out is None:
+        return coefficients(R_in, t_in)
+    return coefficients(R_in, t_in, out=tuple(out))
+
+
+def squad(R_in, t_in, t_out, dt=None, approximate=False, nlerp_threshold=None, out=None, segments=None,
+          coefficients=None):
     """Spherical "quadrangular" interpolation of rotors with a cubic spline
 
     This is the best way to interpolate rotations.  It uses the analog
@@ -49,7 +228,8 @@ def squad(R_in, t_in, t_out):
     The input `R_in` rotors are assumed to be reasonably continuous
     (no sign flips), and the input `t` arrays are assumed to be
     sorted.  No checking is done for either case, and you may get
-    silently bad results if these conditions are violated.
+    silently bad results if these conditions are violated.  Sign flips
+    can be removed with `quaternion.unflip_rotors`.
 
     This function simplifies the calling, compared to `squad_evaluate`
     (which takes a set of four quaternions forming the edges of the
@@ -65,96 +245,74 @@ def squad(R_in, t_in, t_out):
         The times corresponding to R_in
     t_out: array of float
         The times to which R_in should be interpolated
+    dt: float, optional
+        Spacing of `t_in`, if it is a uniform grid.  In that case, the
+        segment containing each output time is found arithmetically
+        rather than by binary search.  If this is not given, `t_in` is
+        checked for uniform spacing automatically.
+    approximate: bool, optional
+        If True, use the approximate exp and log functions for nearby
+        rotors, as described in `slerp`.  Defaults to False.
+    nlerp_threshold: float, optional
+        If given, each of the slerps making up the squad interpolant
+        is replaced by normalized linear interpolation (see
+        `numpy.nlerp_vectorized`) when the chordal distance between its
+        endpoints is less than this threshold.  This is several times
+        faster, and for unit rotors differs from slerp by at most about
+        0.016*d**3 for endpoints a distance d apart; for example, a
+        threshold of 1e-3 limits the error of each step to about 2e-11.
+        Defaults to None, meaning that slerp is always used.
+    out: array of quaternions, optional
+        Array with the shape of `t_out` in which to place the result.
+    segments: tuple of arrays, optional
+        The output of `interpolation_segments(t_in, t_out)`.  If the same times are used for many calls, computing
+        this once and passing it here skips the search for the segment containing each output time, and the
+        allocation of the index and `tau` arrays.  Output times outside the range of `t_in` are then extrapolated
+        along the first or last segment.
+    coefficients: tuple of arrays, optional
+        The output of `squad_coefficients(R_in, t_in, approximate)`.  With this, `segments`, and `out`, nothing is
+        allocated.
 
     """
+    if approximate:
+        squad_series_vectorized = np.squad_series_vectorized_approx
+    else:
+        squad_series_vectorized = np.squad_series_vectorized
+
     if R_in.size == 0 or t_out.size == 0:
-        return np.array((), dtype=np.quaternion)
-
-    # This list contains an index for each `t_out` such that
-    # t_in[i-1] <= t_out < t_in[i]
-    # Note that `side='right'` is much faster in my tests
-    # i_in_for_out = t_in.searchsorted(t_out, side='left')
-    # np.clip(i_in_for_out, 0, len(t_in) - 1, out=i_in_for_out)
-    i_in_for_out = t_in.searchsorted(t_out, side='right')-1
-
-    # Now, for each index `i` in `i_in`, we need to compute the
-    # interpolation "coefficients" (`A_i`, `B_ip1`).
-    #
-    # I previously tested an explicit version of the loops below,
-    # comparing `stride_tricks.as_strided` with explicit
-    # implementation via `roll` (as seen here).  I found that the
-    # `roll` was significantly more efficient for simple calculations,
-    # though the difference is probably totally washed out here.  In
-    # any case, it might be useful to test again.
-    #
-    A = R_in * np.exp((- np.log((~R_in) * np.roll(R_in, -1))
-                       + np.log((~np.roll(R_in, 1)) * R_in) * ((np.roll(t_in, -1) - t_in) / (t_in - np.roll(t_in, 1)))
-                       ) * 0.25)
-    B = np.roll(R_in, -1) * np.exp((np.log((~np.roll(R_in, -1)) * np.roll(R_in, -2))
-                                    * ((np.roll(t_in, -1) - t_in) / (np.roll(t_in, -2) - np.roll(t_in, -1)))
-                                    - np.log((~R_in) * np.roll(R_in, -1))) * -0.25)
-
-    # Correct the first and last A time steps, and last two B time steps.  We extend R_in with the following wrap-around
-    # values:
-    # R_in[0-1] = R_in[0]*(~R_in[1])*R_in[0]
-    # R_in[n+0] = R_in[-1] * (~R_in[-2]) * R_in[-1]
-    # R_in[n+1] = R_in[0] * (~R_in[-1]) * R_in[0]
-    #           = R_in[-1] * (~R_in[-2]) * R_in[-1] * (~R_in[-1]) * R_in[-1] * (~R_in[-2]) * R_in[-1]
-    #           = R_in[-1] * (~R_in[-2]) * R_in[-1] * (~R_in[-2]) * R_in[-1]
-    # A[i] = R_in[i] * np.exp((- np.log((~R_in[i]) * R_in[i+1])
-    #                          + np.log((~R_in[i-1]) * R_in[i]) * ((t_in[i+1] - t_in[i]) / (t_in[i] - t_in[i-1]))
-    #                          ) * 0.25)
-    # A[0] = R_in[0] * np.exp((- np.log((~R_in[0]) * R_in[1]) + np.log((~R_in[0])*R_in[1]*(~R_in[0])) * R_in[0]) * 0.25)
-    #      = R_in[0]
-    A[0] = R_in[0]
-    # A[-1] = R_in[-1] * np.exp((- np.log((~R_in[-1]) * R_in[n+0])
-    #                          + np.log((~R_in[-2]) * R_in[-1]) * ((t_in[n+0] - t_in[-1]) / (t_in[-1] - t_in[-2]))
-    #                          ) * 0.25)
-    #       = R_in[-1] * np.exp((- np.log((~R_in[-1]) * R_in[n+0]) + np.log((~R_in[-2]) * R_in[-1])) * 0.25)
-    #       = R_in[-1] * np.exp((- np.log((~R_in[-1]) * R_in[-1] * (~R_in[-2]) * R_in[-1])
-    #                           + np.log((~R_in[-2]) * R_in[-1])) * 0.25)
-    #       = R_in[-1] * np.exp((- np.log((~R_in[-2]) * R_in[-1]) + np.log((~R_in[-2]) * R_in[-1])) * 0.25)
-    #       = R_in[-1]
-    A[-1] = R_in[-1]
-    # B[i] = R_in[i+1] * np.exp((np.log((~R_in[i+1]) * R_in[i+2]) * ((t_in[i+1] - t_in[i]) / (t_in[i+2] - t_in[i+1]))
-    #                            - np.log((~R_in[i]) * R_in[i+1])) * -0.25)
-    # B[-2] = R_in[-1] * np.exp((np.log((~R_in[-1]) * R_in[0]) * ((t_in[-1] - t_in[-2]) / (t_in[0] - t_in[-1]))
-    #                            - np.log((~R_in[-2]) * R_in[-1])) * -0.25)
-    #       = R_in[-1] * np.exp((np.log((~R_in[-1]) * R_in[0]) - np.log((~R_in[-2]) * R_in[-1])) * -0.25)
-    #       = R_in[-1] * np.exp((np.log((~R_in[-1]) * R_in[-1] * (~R_in[-2]) * R_in[-1])
-    #                            - np.log((~R_in[-2]) * R_in[-1])) * -0.25)
-    #       = R_in[-1] * np.exp((np.log((~R_in[-2]) * R_in[-1]) - np.log((~R_in[-2]) * R_in[-1])) * -0.25)
-    #       = R_in[-1]
-    B[-2] = R_in[-1]
-    # B[-1] = R_in[0]
-    # B[-1] = R_in[0] * np.exp((np.log((~R_in[0]) * R_in[1]) - np.log((~R_in[-1]) * R_in[0])) * -0.25)
-    #       = R_in[-1] * (~R_in[-2]) * R_in[-1]
-    #         * np.exp((np.log((~(R_in[-1] * (~R_in[-2]) * R_in[-1])) * R_in[-1] * (~R_in[-2]) * R_in[-1] * (~R_in[-2]) * R_in[-1])
-    #                  - np.log((~R_in[-1]) * R_in[-1] * (~R_in[-2]) * R_in[-1])) * -0.25)
-    #       = R_in[-1] * (~R_in[-2]) * R_in[-1]
-    #         * np.exp((np.log(((~R_in[-1]) * R_in[-2] * (~R_in[-1])) * R_in[-1] * (~R_in[-2]) * R_in[-1] * (~R_in[-2]) * R_in[-1])
-    #                  - np.log((~R_in[-1]) * R_in[-1] * (~R_in[-2]) * R_in[-1])) * -0.25)
-    #         * np.exp((np.log((~R_in[-2]) * R_in[-1])
-    #                  - np.log((~R_in[-2]) * R_in[-1])) * -0.25)
-    B[-1] = R_in[-1] * (~R_in[-2]) * R_in[-1]
-
-    # Use the coefficients at the corresponding t_out indices to
-    # compute the squad interpolant
-    # R_ip1 = np.array(np.roll(R_in, -1)[i_in_for_out])
-    # R_ip1[-1] = R_in[-1]*(~R_in[-2])*R_in[-1]
-    R_ip1 = np.roll(R_in, -1)
-    R_ip1[-1] = R_in[-1]*(~R_in[-2])*R_in[-1]
-    R_ip1 = np.array(R_ip1[i_in_for_out])
-    t_inp1 = np.roll(t_in, -1)
-    t_inp1[-1] = t_in[-1] + (t_in[-1] - t_in[-2])
-    tau = (t_out - t_in[i_in_for_out]) / ((t_inp1 - t_in)[i_in_for_out])
-    # tau = (t_out - t_in[i_in_for_out]) / ((np.roll(t_in, -1) - t_in)[i_in_for_out])
-    R_out = np.squad_vectorized(tau, R_in[i_in_for_out], A[i_in_for_out], B[i_in_for_out], R_ip1)
+        return np.array((), dtype=np.quaternion) if out is None else out
+
+    if coefficients is None:
+        coefficients = squad_coefficients(R_in, t_in, approximate)
+    A, B, R_ip1 = coefficients
+
+    if segments is None:
+        # This list contains an index for each `t_out` such that
+        # t_in[i-1] <= t_out < t_in[i]
+        # Note that `side='right'` is much faster in my tests
+        # i_in_for_out = t_in.searchsorted(t_out, side='left')
+        # np.clip(i_in_for_out, 0, len(t_in) - 1, out=i_in_for_out)
+        i_in_for_out = _segment_indices(t_in, t_out, dt)
+        # Times before t_in[0] use the last segment, as negative indexing would
+        i_in_for_out[i_in_for_out < 0] += t_in.size
+        # The last segment extends past t_in[-1] by one more step
+        t_inp1 = np.roll(t_in, -1)
+        t_inp1[-1] = t_in[-1] + (t_in[-1] - t_in[-2])
+        tau = (t_out - t_in[i_in_for_out]) / ((t_inp1 - t_in)[i_in_for_out])
+    else:
+        i_in_for_out, tau = segments
+
+    # The quaternions for each segment are looked up inside the loop,
+    # which avoids gathering four arrays the size of `t_out`
+    if nlerp_threshold is not None:
+        R_out = np.squad_series_vectorized_adaptive(tau, i_in_for_out, R_in, A, B, R_ip1, nlerp_threshold, out=out)
+    else:
+        R_out = squad_series_vectorized(tau, i_in_for_out, R_in, A, B, R_ip1, out=out)
 
     return R_out
 
 
-@njit
+@njit(cache=True)
 def frame_from_angular_velocity_integrand(rfrak, Omega):
     import math
     from numpy import dot, cross
@@ -0,0 +1,161 @@
+# Copyright (c) 2018, Michael Boyle
+# See LICENSE file for details: <https://github.com/moble/quaternion/blob/master/LICENSE>
+
+from __future__ import division, print_function, absolute_import
+
+import numpy as np
+import quaternion
+
+
+_metrics = ('intrinsic', 'chordal')
+
+
+class RotationIndex(object):
+    """Spatial index for fast nearest-rotation queries against a fixed set of rotors
+
+    Brute-force comparison of M query rotations with N reference rotations using, for example,
+    `rotation_intrinsic_distance` costs O(N*M).  This class instead stores the references in a KD-tree over their
+    components as unit 4-vectors, so that each query costs roughly O(log N).  A rotor and its negative represent the
+    same rotation, so each query is made with both signs of the query rotor, and the results are merged.
+
+    Because `rotation_chordal_distance` between unit quaternions is the Euclidean distance in this space (for the
+    better of the two signs), and the intrinsic distance is a monotonic function of it,
+
+        rotation_intrinsic_distance = 4 * arcsin(rotation_chordal_distance / 2),
+
+    both metrics give exact results.  The input rotors are normalized before being indexed.
+
+    This class requires `scipy.spatial`.
+
+    Parameters
+    ==========
+    rotors: array_like of quaternions
+        Reference rotations.  The array may have any shape; indices returned by the query functions refer to the
+        flattened array.
+    leafsize: int, optional
+        Number of points at which the tree switches to brute force.  Defaults to 16.
+
+    """
+    def __init__(self, rotors, leafsize=16):
+        from scipy.spatial import cKDTree
+        self.rotors = np.asarray(rotors, dtype=np.quaternion).ravel()
+        self._tree = cKDTree(_unit_vectors(np.hemisphere_canonicalized(self.rotors, quaternion.one)),
+                             leafsize=leafsize)
+
+    def __len__(self):
+        return self.rotors.size
+
+    def query(self, q, k=1, metric='intrinsic', distance_upper_bound=np.inf):
+        """Find the `k` nearest reference rotations to each query rotation
+
+        Parameters
+        ==========
+        q: array_like of quaternions
+            Query rotations, which may have any shape.
+        k: int, optional
+            Number of neighbors to return.  Defaults to 1.
+        metric: {'intrinsic', 'chordal'}, optional
+            Whether to measure distances like `rotation_intrinsic_distance` (the default) or
+            `rotation_chordal_distance`.
+        distance_upper_bound: float, optional
+            Return only neighbors closer than this, in the chosen metric.
+
+        Returns
+        =======
+        distances: array of floats
+            Distances to the nearest neighbors, sorted in increasing order along the last axis.  The shape is
+            `q.shape+(k,)`, or just `q.shape` if `k` is 1.  Missing neighbors have infinite distance.
+        indices: array of ints
+            Indices of the neighbors in the flattened reference array, with the same shape as `distances`.  Missing
+            neighbors have index `len(self)`.
+
+        """
+        q = np.asarray(q, dtype=np.quaternion)
+        if k < 1:
+            raise ValueError("Number of neighbors k={0} must be at least 1".format(k))
+        points = _unit_vectors(q)
+        bound = _chordal_from(distance_upper_bound, metric)
+        k_tree = min(k, len(self))
+        if k_tree == 0:
+            distances = np.full((points.shape[0], k), np.inf)
+            indices = np.full((points.shape[0], k), len(self), dtype=np.intp)
+        else:
+            d1, i1 = self._tree.query(points, k=k_tree, distance_upper_bound=bound)
+            d2, i2 = self._tree.query(-points, k=k_tree, distance_upper_bound=bound)
+            distances = np.concatenate((d1.reshape(-1, k_tree), d2.reshape(-1, k_tree)), axis=1)
+            indices = np.concatenate((i1.reshape(-1, k_tree), i2.reshape(-1, k_tree)), axis=1)
+
+            # A reference can be found with both signs of a query; discard the farther of the two
+            rows = np.arange(points.shape[0])[:, np.newaxis]
+            order = np.lexsort((distances, indices))
+            distances, indices = distances[rows, order], indices[rows, order]
+            distances[:, 1:][indices[:, 1:] == indices[:, :-1]] = np.inf
+
+            order = np.argsort(distances, axis=1, kind='mergesort')[:, :k]
+            distances, indices = distances[rows, order], indices[rows, order]
+            indices[np.isinf(distances)] = len(self)
+            if distances.shape[1] < k:
+                padding = ((0, 0), (0, k - distances.shape[1]))
+                distances = np.pad(distances, padding, 'constant', constant_values=np.inf)
+                indices = np.pad(indices, padding, 'constant', constant_values=len(self))
+
+        distances = _metric_from_chordal(distances, metric)
+        shape = q.shape if k == 1 else q.shape + (k,)
+        return distances.reshape(shape), indices.reshape(shape)
+
+    def query_radius(self, q, r, metric='intrinsic'):
+        """Find all reference rotations within distance `r` of each query rotation
+
+        Parameters
+        ==========
+        q: array_like of quaternions
+            Query rotations, which may have any shape.
+        r: float
+            Maximum distance, in the chosen metric.
+        metric: {'intrinsic', 'chordal'}, optional
+            Whether to measure distances like `rotation_intrinsic_distance` (the default) or
+            `rotation_chordal_distance`.
+
+        Returns
+        =======
+        indices: array of objects
+            Array of shape `q.shape`, each element of which is a sorted array of the indices of the reference rotations
+            within distance `r`.  If `q` is a single quaternion, this is just that array of indices.
+
+        """
+        q = np.asarray(q, dtype=np.quaternion)
+        points = _unit_vectors(q)
+        radius = _chordal_from(r, metric)
+        neighbors1 = self._tree.query_ball_point(points, radius)
+        neighbors2 = self._tree.query_ball_point(-points, radius)
+        indices = np.empty(points.shape[0], dtype=object)
+        for i, (n1, n2) in enumerate(zip(neighbors1, neighbors2)):
+            indices[i] = np.union1d(np.asarray(n1, dtype=np.intp), np.asarray(n2, dtype=np.intp))
+        if q.ndim == 0:
+            return indices[0]
+        return indices.reshape(q.shape)
+
+
+def _unit_vectors(q):
+    """Return the components of the normalized quaternions `q` as an array of shape (q.size, 4)"""
+    return quaternion.as_float_array(np.normalized(np.asarray(q, dtype=np.quaternion))).reshape(-1, 4)
+
+
+def _chordal_from(distance, metric):
+    """Convert a distance in the given metric to the equivalent chordal distance"""
+    if metric == 'chordal':
+        return distance
+    elif metric == 'intrinsic':
+        if distance >= 2 * np.pi:
+            return np.inf
+        return 2 * np.sin(max(distance, 0.0) / 4)
+    raise ValueError("Unknown metric '{0}'; expected one of {1}".format(metric, _metrics))
+
+
+def _metric_from_chordal(distance, metric):
+    """Convert chordal distances to distances in the given metric"""
+    if metric == 'chordal':
+        return distance
+    elif metric == 'intrinsic':
+        return np.where(np.isinf(distance), np.inf, 4 * np.arcsin(np.minimum(distance / 2, 1.0)))
+    raise ValueError("Unknown metric '{0}'; expected one of {1}".format(metric, _metrics))
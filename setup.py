@@ -66,12 +66,14 @@ if __name__ == "__main__":
         name='quaternion.numpy_quaternion',  # This is the name of the object file that will be compiled
         sources=['quaternion.c', 'numpy_quaternion.c'],
         extra_compile_args=['/O2' if on_windows else '-O3'],
-        depends=['quaternion.c', 'quaternion.h', 'numpy_quaternion.c'],
+        depends=['quaternion.c', 'quaternion.h', 'dual_quaternion.h', 'quaternion_api.h', 'numpy_quaternion.c'],
         include_dirs=[numpy.get_include()]
     )
     setup(name='numpy-quaternion',  # Uploaded to pypi under this name
           packages=['quaternion'],  # This is the actual package name
           package_dir={'quaternion': ''},
+          # Headers and Cython declarations for other compiled extensions; see `quaternion.get_include()`
+          package_data={'quaternion': ['quaternion.h', 'dual_quaternion.h', 'quaternion_api.h', 'math_msvc_compatibility.h', '__init__.pxd']},
           ext_modules=[extension],
           version=version,
           install_requires=[
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+
+"""Timing benchmarks for performance-sensitive parts of the quaternion package
+
+These are not run by pytest.  Run this file directly to print the results of every benchmark, or pass the names of
+particular benchmarks as arguments, as in
+
+    python test/benchmarks.py import_time
+
+"""
+
+from __future__ import print_function, division, absolute_import
+
+import sys
+import subprocess
+
+
+def _subprocess_seconds(code, repeat):
+    timer = ("import time, sys\n"
+             "start = time.time()\n"
+             "{0}\n"
+             "sys.stdout.write(repr(time.time() - start))\n").format(code)
+    return min(float(subprocess.check_output([sys.executable, '-c', timer])) for _ in range(repeat))
+
+
+def benchmark_import_time(repeat=7):
+    """Time `import quaternion` in fresh processes
+
+    The submodules that load numba are imported lazily, so the bare import should cost little more than importing
+    numpy itself; touching one of the lazy functions pays the remaining cost.
+
+    """
+    numpy_time = _subprocess_seconds("import numpy", repeat)
+    quaternion_time = _subprocess_seconds("import quaternion", repeat)
+    full_time = _subprocess_seconds("import quaternion; quaternion.derivative", repeat)
+    print("import numpy:                          {0:8.1f} ms".format(1000 * numpy_time))
+    print("import quaternion:                     {0:8.1f} ms".format(1000 * quaternion_time))
+    print("import quaternion + lazy submodules:   {0:8.1f} ms".format(1000 * full_time))
+
+
+def benchmark_scalar_throughput(number=200000, repeat=5):
+    """Time python-level operations on single quaternion objects
+
+    Code that works with one quaternion at a time spends most of its time in the python entry points -- argument
+    parsing, type checks, and allocating the result -- rather than in the arithmetic itself, so these numbers measure
+    that overhead directly.
+
+    """
+    import timeit
+    setup = ("import numpy as np, quaternion\n"
+             "q1 = quaternion.quaternion(1.0, 2.0, 3.0, 4.0).normalized()\n"
+             "q2 = quaternion.quaternion(-0.5, 0.1, 0.7, 0.2).normalized()\n"
+             "slerp_evaluate, squad_evaluate = quaternion.slerp_evaluate, quaternion.squad_evaluate\n"
+             "constructor = quaternion.quaternion\n")
+    statements = [
+        ('quaternion(w, x, y, z)', 'constructor(1.0, 2.0, 3.0, 4.0)'),
+        ('quaternion(x, y, z)', 'constructor(2.0, 3.0, 4.0)'),
+        ('q1 * q2', 'q1 * q2'),
+        ('q1 * 2.0', 'q1 * 2.0'),
+        ('2.0 * q1', '2.0 * q1'),
+        ('q1 + q2', 'q1 + q2'),
+        ('q1.normalized()', 'q1.normalized()'),
+        ('slerp_evaluate(q1, q2, 0.3)', 'slerp_evaluate(q1, q2, 0.3)'),
+        ('squad_evaluate(0.3, q1, q1, q2, q2)', 'squad_evaluate(0.3, q1, q1, q2, q2)'),
+    ]
+    for label, statement in statements:
+        seconds = min(timeit.repeat(statement, setup, number=number, repeat=repeat)) / number
+        print("{0:38}{1:8.1f} ns".format(label + ':', 1e9 * seconds))
+
+
+def benchmark_thread_scaling(size=2000000, repeat=3):
+    """Time large array operations split across threads
+
+    The quaternion loops run without the GIL, so splitting a large array into chunks handled by separate python
+    threads should give a speedup close to the number of threads, up to the number of available cores.
+
+    """
+    import os
+    import time
+    import numpy as np
+    import quaternion
+    from concurrent.futures import ThreadPoolExecutor
+    np.random.seed(1234)
+    q1 = np.normalized(quaternion.as_quat_array(np.random.normal(size=(size, 4))))
+    q2 = np.normalized(quaternion.as_quat_array(np.random.normal(size=(size, 4))))
+    tau = np.random.uniform(size=size)
+    out = np.empty(size, dtype=np.quaternion)
+    distances = np.empty(size)
+    operations = [
+        ('multiply', lambda s: np.multiply(q1[s], q2[s], out=out[s])),
+        ('scalar * array', lambda s: quaternion.one * q1[s]),
+        ('slerp_vectorized', lambda s: np.slerp_vectorized(q1[s], q2[s], tau[s], out=out[s])),
+        ('rotation_intrinsic_distance', lambda s: np.rotation_intrinsic_distance(q1[s], q2[s], out=distances[s])),
+    ]
+    cpus = os.cpu_count() if hasattr(os, 'cpu_count') else 1
+    thread_counts = sorted(set([1, 2, 4, cpus]))
+    print("{0} available cores".format(cpus))
+    print("{0:30}".format('') + ''.join("{0:>9} threads".format(n) for n in thread_counts))
+    for name, operation in operations:
+        times = []
+        for n_threads in thread_counts:
+            chunks = [slice(i*size//n_threads, (i+1)*size//n_threads) for i in range(n_threads)]
+            with ThreadPoolExecutor(n_threads) as executor:
+                best = float('inf')
+                for _ in range(repeat):
+                    start = time.time()
+                    list(executor.map(operation, chunks))
+                    best = min(best, time.time() - start)
+            times.append(best)
+        print("{0:30}".format(name + ':') + ''.join("{0:8.1f} ms {1:4.1f}x".format(1000*t, times[0]/t)
+                                                    for t in times))
+
+
+def benchmark_gil_release(size=400000, repeat=3):
+    """Measure how long the main thread goes without running while another thread runs each operation
+
+    While a worker thread runs the operation, the main thread records the longest gap between its own steps, as a
+    fraction of the operation's duration.  If the operation held the GIL, the gap would be the whole operation, so the
+    fraction would be close to 1; loops that release the GIL give small fractions, depending on the OS scheduler.
+
+    """
+    import threading
+    import time
+    import numpy as np
+    import quaternion
+    timer = getattr(time, 'perf_counter', time.time)
+    np.random.seed(1234)
+    q1 = np.normalized(quaternion.as_quat_array(np.random.normal(size=(size, 4))))
+    q2 = np.normalized(quaternion.as_quat_array(np.random.normal(size=(size, 4))))
+    tau = np.random.uniform(size=size)
+    operations = [
+        ('multiply', lambda: q1 * q2),
+        ('scalar * array', lambda: quaternion.one * q1),
+        ('slerp_vectorized', lambda: np.slerp_vectorized(q1, q2, tau)),
+        ('squad_vectorized', lambda: np.squad_vectorized(tau, q1, q2, q1, q2)),
+        ('rotation_intrinsic_distance', lambda: quaternion.rotation_intrinsic_distance(q1, q2)),
+        ('as_rotation_matrix', lambda: quaternion.as_rotation_matrix(q1)),
+        ('from_components', lambda: quaternion.from_components(tau, tau, tau, tau)),
+    ]
+
+    def longest_gap(operation):
+        done = threading.Event()
+
+        def work():
+            operation()
+            done.set()
+        worker = threading.Thread(target=work)
+        start = previous = timer()
+        gap = 0.0
+        worker.start()
+        while not done.is_set():
+            now = timer()
+            gap, previous = max(gap, now - previous), now
+        end = timer()
+        worker.join()
+        return max(gap, end - previous) / (end - start)
+
+    for name, operation in operations:
+        operation()  # Warm up
+        print("{0:38}{1:8.2f}".format(name + ':', min(longest_gap(operation) for _ in range(repeat))))
+
+
+def benchmark_rigid_transforms(size=1000000, repeat=5):
+    """Time rigid transformations stored as dual quaternions against separate rotations and translations
+
+    Applying a rotation and translation to a point cloud with `rotate_vectors` needs a temporary array for the rotated
+    points before the translation is added, and composing a chain of poses needs several temporaries per step, whereas
+    the dual-quaternion versions run as single loops.
+
+    """
+    import timeit
+    setup = ("import numpy as np, quaternion\n"
+             "np.random.seed(1234)\n"
+             "R = np.normalized(quaternion.as_quat_array(np.random.normal(size=({0}, 4))))\n"
+             "t = np.random.normal(size=({0}, 3))\n"
+             "points = np.random.normal(size=({0}, 3))\n"
+             "dq = quaternion.from_rotation_and_translation(R, t)\n"
+             "R0, t0, dq0 = R[0], t[0], dq[0]\n").format(size)
+    statements = [
+        ('rotate_vectors(R0, points) + t0', 'quaternion.rotate_vectors(R0, points) + t0'),
+        ('transform_points(dq0, points)', 'quaternion.transform_points(dq0, points)'),
+        ('compose (R, t) pairs', 'R[1:] * R[:-1], quaternion.as_float_array(R[1:] * quaternion.as_quat_array('
+                                 'np.insert(t[:-1], 0, 0.0, axis=1)) * np.conjugate(R[1:]))[:, 1:] + t[1:]'),
+        ('dq[1:] * dq[:-1]', 'dq[1:] * dq[:-1]'),
+        ('np.multiply.accumulate(dq)', 'np.multiply.accumulate(dq)'),
+        ('sclerp(dq[:-1], dq[1:], 0.3)', 'quaternion.sclerp(dq[:-1], dq[1:], 0.3)'),
+    ]
+    for label, statement in statements:
+        seconds = min(timeit.repeat(statement, setup, number=1, repeat=repeat))
+        print("{0:38}{1:8.1f} ms".format(label + ':', 1e3 * seconds))
+
+
+def benchmark_optimal_rotation(frames=20000, n=6, repeat=5):
+    """Time many small Wahba problems solved by `optimal_rotation` against the batched SVD solution
+
+    Each frame only has a few vectors, so the SVD approach is dominated by per-matrix overhead in LAPACK and the
+    temporaries for the attitude profile matrices and the determinant correction.
+
+    """
+    import timeit
+    setup = ("import numpy as np, quaternion\n"
+             "np.random.seed(1234)\n"
+             "a = np.random.normal(size=({0}, {1}, 3))\n"
+             "b = np.random.normal(size=({0}, {1}, 3))\n"
+             "w = np.random.uniform(size=({0}, {1}))\n"
+             "def kabsch(a, b, w):\n"
+             "    U, S, Vt = np.linalg.svd(np.einsum('fn,fni,fnj->fij', w, a, b))\n"
+             "    U[:, :, 2] *= np.sign(np.linalg.det(np.matmul(U, Vt)))[:, np.newaxis]\n"
+             "    return quaternion.from_rotation_matrix(np.matmul(U, Vt))\n").format(frames, n)
+    statements = [
+        ('SVD + from_rotation_matrix', 'kabsch(a, b, w)'),
+        ('optimal_rotation(a, b, w)', 'quaternion.optimal_rotation(a, b, w)'),
+    ]
+    for label, statement in statements:
+        seconds = min(timeit.repeat(statement, setup, number=1, repeat=repeat))
+        print("{0:38}{1:8.1f} ms".format(label + ':', 1e3 * seconds))
+
+
+def benchmark_random_sampling(size=10000000, repeat=3):
+    """Time drawing random rotors into a preallocated array against the usual numpy idioms
+
+    The usual idioms allocate arrays of normal variates, then the quaternion array and its normalized copy, or the
+    rotation vectors and their exponentials, whereas the sampling functions write into `out` directly.
+
+    """
+    import timeit
+    setup = ("import numpy as np, quaternion\n"
+             "rng = np.random.default_rng(1234)\n"
+             "out = np.empty({0}, dtype=np.quaternion)\n"
+             "mean = quaternion.random_rotors(rng=rng)\n").format(size)
+    statements = [
+        ('normalized(as_quat_array(normal))', 'np.normalized(quaternion.as_quat_array(rng.standard_normal(({0}, 4))))'
+                                             .format(size)),
+        ('random_rotors(out=out)', 'quaternion.random_rotors(rng=rng, out=out)'),
+        ('mean * exp(quaternion(0.1*normal))', 'mean * np.exp(quaternion.as_quat_array(np.insert('
+                                               '0.05*rng.standard_normal(({0}, 3)), 0, 0.0, axis=1)))'.format(size)),
+        ('random_perturbations(out=out)', 'quaternion.random_perturbations(mean, 0.01, rng=rng, out=out)'),
+    ]
+    for label, statement in statements:
+        seconds = min(timeit.repeat(statement, setup, number=1, repeat=repeat))
+        print("{0:38}{1:8.1f} ms".format(label + ':', 1e3 * seconds))
+
+
+def benchmark_rotation_grid(size=10000000, repeat=3):
+    """Time generating a super-Fibonacci rotation grid against the same formula written with numpy
+
+    The numpy version needs more than a dozen temporary arrays the size of the grid, while `rotation_grid` fills the
+    output (or each block of `rotation_grid_chunks`) in a single loop.
+
+    """
+    import timeit
+    setup = ("import numpy as np, quaternion\n"
+             "n = {0}\n"
+             "out = np.empty(n, dtype=np.quaternion)\n"
+             "def numpy_grid(n):\n"
+             "    s = np.arange(n) + 0.5\n"
+             "    r, R = np.sqrt(s / n), np.sqrt(1 - s / n)\n"
+             "    alpha, beta = 2 * np.pi * s / np.sqrt(2), 2 * np.pi * s / 1.533751168755204288118041\n"
+             "    return quaternion.as_quat_array(np.stack([r * np.sin(alpha), r * np.cos(alpha),\n"
+             "                                              R * np.sin(beta), R * np.cos(beta)], axis=-1))\n"
+             ).format(size)
+    statements = [
+        ('numpy formula', 'numpy_grid(n)'),
+        ('rotation_grid(n, out=out)', 'quaternion.rotation_grid(n, out=out)'),
+        ('rotation_grid_chunks(n)', 'for rows, block in quaternion.rotation_grid_chunks(n): pass'),
+    ]
+    for label, statement in statements:
+        seconds = min(timeit.repeat(statement, setup, number=1, repeat=repeat))
+        print("{0:38}{1:8.1f} ms".format(label + ':', 1e3 * seconds))
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or sorted(name[len('benchmark_'):] for name in dir() if name.startswith('benchmark_'))
+    for name in names:
+        print('{0}\n{1}'.format(name, '-'*len(name)))
+        globals()['benchmark_' + name]()
+        print()
@@ -2,6 +2,7 @@
 
 from __future__ import print_function, division, absolute_import
 import os
+import sys
 import operator
 
 import math
@@ -16,6 +17,12 @@ try:
 except:
     has_scipy = False
 
+try:
+    import numba
+    has_numba = True
+except:
+    has_numba = False
+
 
 from sys import platform
 on_windows = ('win' in platform.lower() and not 'darwin' in platform.lower())
@@ -1315,6 +1322,1100 @@ def test_numpy_save_and_load():
     assert np.array_equal(a, b)
 
 
+def test_derivative():
+    from quaternion.calculus import derivative
+
+    def bowen_smith(f, t):
+        # Direct transcription of the five-point stencil, for one-dimensional input
+        dfdt = np.empty_like(f)
+        for i in range(len(t)):
+            s = min(max(i - 2, 0), len(t) - 5)
+            ts = t[s:s+5]
+            for j in range(5):
+                others = [k for k in range(5) if k != j]
+                numerator = sum(np.prod([t[i] - ts[m] for m in others if m != l]) for l in others)
+                denominator = np.prod([ts[j] - ts[k] for k in others])
+                dfdt[i] = (dfdt[i] if j > 0 else 0.0) + numerator / denominator * f[s+j]
+        return dfdt
+
+    np.random.seed(1234)
+    t = np.sort(np.random.uniform(-1, 1, size=23))
+
+    # Fourth-order formula is exact on quartics, even with non-uniform steps
+    f = 1.2 - 0.3 * t + 2.1 * t**2 + 0.7 * t**3 - 1.3 * t**4
+    fdot = -0.3 + 4.2 * t + 2.1 * t**2 - 5.2 * t**3
+    assert np.allclose(derivative(f, t), fdot, rtol=0, atol=1e-10)
+    assert np.allclose(derivative(f, t), bowen_smith(f, t), rtol=0, atol=1e-12)
+
+    # Arbitrary axes and numbers of dimensions
+    f = np.random.normal(size=(3, 23, 2, 4))
+    expected = np.empty_like(f)
+    for index in np.ndindex(3, 2, 4):
+        expected[index[0], :, index[1], index[2]] = bowen_smith(f[index[0], :, index[1], index[2]], t)
+    assert np.allclose(derivative(f, t, axis=1), expected, rtol=0, atol=1e-10)
+    assert np.allclose(derivative(np.moveaxis(f, 1, -1), t, axis=-1), np.moveaxis(expected, 1, -1),
+                       rtol=0, atol=1e-10)
+
+    # Writing into a provided (non-contiguous) output
+    out = np.empty((3, 23, 2, 8))[..., ::2]
+    result = derivative(f, t, axis=1, out=out)
+    assert result is out
+    assert np.allclose(out, expected, rtol=0, atol=1e-10)
+
+    # Quaternion input
+    q = quaternion.as_quat_array(f)
+    qdot = derivative(q, t, axis=1)
+    assert qdot.dtype == np.dtype(np.quaternion)
+    assert np.allclose(quaternion.as_float_array(qdot), expected, rtol=0, atol=1e-10)
+
+    with pytest.raises(ValueError):
+        derivative(f, t, axis=0)
+    with pytest.raises(ValueError):
+        derivative(f, t, axis=1, out=np.empty((3, 23, 2)))
+
+
+def test_uniform_grid_calculus():
+    from quaternion import calculus
+    np.random.seed(4321)
+    t = np.linspace(-1.3, 2.9, num=37)
+    assert calculus._uniform_step(t) is not None
+    assert calculus._uniform_step(t + np.random.uniform(-1e-6, 1e-6, size=t.shape)) is None
+    dt = t[1] - t[0]
+    f = np.random.normal(size=(37, 3, 4))
+
+    # Uniform stencil agrees with the general non-uniform weights
+    weights = np.empty((len(t), 5))
+    calculus._derivative_weights(t, weights)
+    expected = np.empty_like(f)
+    calculus._derivative_apply(f.reshape(37, -1), weights, expected.reshape(37, -1))
+    assert np.allclose(calculus.derivative(f, t), expected, rtol=0, atol=1e-11)
+    assert np.allclose(calculus.derivative(f, dt=dt), expected, rtol=0, atol=1e-11)
+    assert np.allclose(calculus.derivative(np.moveaxis(f, 0, 1), dt=dt, axis=1), np.moveaxis(expected, 0, 1),
+                       rtol=0, atol=1e-11)
+    q = quaternion.as_quat_array(f)
+    assert np.allclose(quaternion.as_float_array(calculus.derivative(q, dt=dt)), expected, rtol=0, atol=1e-11)
+
+    # Non-uniform weights are computed once and reused for equal time arrays
+    t_nonuniform = np.sort(np.random.uniform(0, 1, size=37))
+    calculus.derivative(f, t_nonuniform)
+    grid = calculus._time_grid(t_nonuniform.copy(), None, 37)
+    weights = grid.derivative_weights
+    assert calculus._time_grid(t_nonuniform.copy(), None, 37).derivative_weights is weights
+
+    # Uniform integrals agree with the trapezoidal rule written out for general steps
+    f = f.reshape(37, -1)
+    expected = np.zeros_like(f)
+    expected[1:] = np.cumsum(np.diff(t)[:, np.newaxis] * (f[1:] + f[:-1]) / 2, axis=0)
+    assert np.allclose(calculus.indefinite_integral(f, t), expected, rtol=0, atol=1e-13)
+    assert np.allclose(calculus.indefinite_integral(f, dt=dt), expected, rtol=0, atol=1e-13)
+    assert np.allclose(calculus.definite_integral(f, t), expected[-1], rtol=0, atol=1e-13)
+
+    with pytest.raises(ValueError):
+        calculus.derivative(f)
+
+
+def test_integrals():
+    from quaternion.calculus import indefinite_integral, definite_integral
+    np.random.seed(2718)
+    t = np.sort(np.random.uniform(-1, 2, size=31))
+    t[0], t[-1] = -1.0, 2.0
+
+    # Both methods are exact for linear functions; Simpson is exact for quadratics
+    f = 0.3 + 1.7 * t
+    F = 0.3 * t + 0.85 * t**2
+    for method in ['trapezoid', 'simpson']:
+        assert np.allclose(indefinite_integral(f, t, method=method), F - F[0], rtol=0, atol=1e-13)
+        assert np.allclose(definite_integral(f, t, method=method), F[-1] - F[0], rtol=0, atol=1e-13)
+    f = 0.3 + 1.7 * t - 2.2 * t**2
+    F = 0.3 * t + 0.85 * t**2 - 2.2 * t**3 / 3
+    assert np.allclose(indefinite_integral(f, t, method='simpson'), F - F[0], rtol=0, atol=1e-13)
+    assert np.allclose(definite_integral(f, t, method='simpson'), F[-1] - F[0], rtol=0, atol=1e-13)
+    assert not np.allclose(definite_integral(f, t, method='trapezoid'), F[-1] - F[0], rtol=0, atol=1e-6)
+
+    # Arbitrary axes, quaternions, and agreement between definite and indefinite integrals
+    f = np.random.normal(size=(5, 31, 2, 4))
+    for method in ['trapezoid', 'simpson']:
+        indefinite = indefinite_integral(f, t, axis=1, method=method)
+        for index in np.ndindex(5, 2, 4):
+            assert np.allclose(indefinite[index[0], :, index[1], index[2]],
+                               indefinite_integral(f[index[0], :, index[1], index[2]], t, method=method),
+                               rtol=0, atol=1e-14)
+        definite = definite_integral(f, t, axis=1, method=method)
+        assert definite.shape == (5, 2, 4)
+        assert np.allclose(definite, indefinite[:, -1], rtol=0, atol=1e-13)
+        q = quaternion.as_quat_array(f)
+        assert np.allclose(quaternion.as_float_array(indefinite_integral(q, t, axis=1, method=method)),
+                           indefinite, rtol=0, atol=1e-14)
+        assert np.allclose(quaternion.as_float_array(definite_integral(q, t, axis=1, method=method)),
+                           definite, rtol=0, atol=1e-14)
+        assert isinstance(definite_integral(q[0, :, 0], t, method=method), np.quaternion)
+
+    with pytest.raises(ValueError):
+        definite_integral(f, t, axis=1, method='rectangle')
+
+    # The reduction runs over the input in place, without copying it even along a non-leading axis
+    tracemalloc = pytest.importorskip('tracemalloc')
+    f = np.random.normal(size=(40, 31, 500))[::2, :, ::-1]
+    expected = np.moveaxis(f, 1, 0).copy()
+    expected = indefinite_integral(expected, t)[-1]
+    definite_integral(f, t, axis=-2)
+    tracemalloc.start()
+    try:
+        definite = definite_integral(f, t, axis=-2)
+        assert tracemalloc.get_traced_memory()[1] < f.nbytes // 4
+    finally:
+        tracemalloc.stop()
+    assert np.allclose(definite, expected, rtol=0, atol=1e-13)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="Lazy loading requires module-level __getattr__")
+def test_lazy_submodules():
+    import subprocess
+    code = ("import sys, quaternion\n"
+            "assert 'numba' not in sys.modules, 'numba was imported eagerly'\n"
+            "assert 'quaternion.calculus' not in sys.modules\n"
+            "assert 'quaternion.quaternion_time_series' not in sys.modules\n"
+            "assert 'derivative' in dir(quaternion)\n"
+            "from quaternion import squad, derivative, mean_rotor_in_chordal_metric\n"
+            "assert 'quaternion.calculus' in sys.modules\n")
+    subprocess.check_call([sys.executable, '-c', code])
+    for name in quaternion.__all__:
+        assert getattr(quaternion, name) is not None
+    with pytest.raises(AttributeError):
+        quaternion.no_such_function
+
+
+@pytest.mark.skipif(os.environ.get('FAST'), reason="Takes ~5 seconds")
+@pytest.mark.skipif(not has_numba, reason="Numba is not installed")
+def test_numba_aot(tmpdir):
+    from quaternion import calculus, numba_aot
+    output_dir = numba_aot.compile_kernels(str(tmpdir))
+    sys.path.insert(0, output_dir)
+    try:
+        import _numba_aot
+    finally:
+        sys.path.remove(output_dir)
+    t = np.sort(np.random.rand(40))
+    f = np.random.rand(40, 3)
+    weights_jit, weights_aot = np.empty((40, 5)), np.empty((40, 5))
+    calculus._derivative_weights(t, weights_jit)
+    _numba_aot.derivative_weights(t, weights_aot)
+    assert np.array_equal(weights_jit, weights_aot)
+    dfdt_jit, dfdt_aot = np.empty_like(f), np.empty_like(f)
+    calculus._derivative_apply(f, weights_jit, dfdt_jit)
+    _numba_aot.derivative_apply(f, weights_aot, dfdt_aot)
+    assert np.array_equal(dfdt_jit, dfdt_aot)
+    _check_derivative_with_kernels(calculus, _numba_aot.derivative_weights, _numba_aot.derivative_apply)
+
+
+@pytest.mark.skipif(not has_numba, reason="Numba is not installed")
+def test_derivative_float64_only_kernels():
+    # Stand-ins for the ahead-of-time kernels, which only accept float64
+    from quaternion import calculus
+
+    def derivative_apply(f, weights, dfdt):
+        assert f.dtype == np.float64 and dfdt.dtype == np.float64
+        calculus._derivative_apply(f, weights, dfdt)
+
+    _check_derivative_with_kernels(calculus, calculus._derivative_weights, derivative_apply)
+
+
+def _check_derivative_with_kernels(calculus, derivative_weights, derivative_apply):
+    t = np.sort(np.random.rand(40))
+    t[0] = 0.0  # Make sure this grid is not cached already
+    f = np.random.rand(40, 3) + 1j * np.random.rand(40, 3)
+    inputs = [f, f.real.copy(), f.real.astype(np.float32), (100 * f.real).astype(np.int64),
+              quaternion.as_quat_array(np.random.rand(40, 4))]
+    expected = [quaternion.derivative(f_i, t) for f_i in inputs]
+    kernels = calculus._derivative_weights_kernel, calculus._derivative_apply_kernel
+    calculus._derivative_weights_kernel, calculus._derivative_apply_kernel = derivative_weights, derivative_apply
+    calculus._time_grid_cache.clear()
+    try:
+        for f_i, expected_i in zip(inputs, expected):
+            dfdt = quaternion.derivative(f_i, t)
+            assert dfdt.dtype == f_i.dtype
+            assert np.array_equal(dfdt, expected_i)
+    finally:
+        calculus._derivative_weights_kernel, calculus._derivative_apply_kernel = kernels
+        calculus._time_grid_cache.clear()
+    assert np.allclose(expected[0], quaternion.derivative(f.real, t) + 1j * quaternion.derivative(f.imag, t),
+                       rtol=0.0, atol=1e-8)
+
+
+def test_as_quat_array_strided_views():
+    a = np.random.rand(10, 3, 8)
+    for sliced in [a[::2], a[:, 1], a[::3, ::-1], a[..., 4:], a[..., :4]]:
+        copies = quaternion.as_quat_array.copies
+        q = quaternion.as_quat_array(sliced, copy=False)
+        assert quaternion.as_quat_array.copies == copies
+        assert np.shares_memory(q, a)
+        assert np.array_equal(quaternion.as_float_array(q).reshape(sliced.shape), sliced)
+    q = quaternion.as_quat_array(a[::2, 1, :4])
+    q[0] = quaternion.one
+    assert np.array_equal(a[0, 1, :4], [1, 0, 0, 0])
+    b = a.copy()
+    b.flags.writeable = False
+    assert not quaternion.as_quat_array(b[::2]).flags.writeable
+
+    # Copies are counted, and forbidden in strict mode
+    copies = quaternion.as_quat_array.copies
+    for needs_copy in [a[..., ::2], a[..., :4].astype(np.float32), a[:, 0, :4].T.copy().T]:
+        with pytest.raises(ValueError):
+            quaternion.as_quat_array(needs_copy, copy=False)
+        q = quaternion.as_quat_array(needs_copy)
+        assert not np.shares_memory(q, needs_copy)
+        assert np.array_equal(quaternion.as_float_array(q), needs_copy)
+    assert quaternion.as_quat_array.copies == copies + 3
+    assert not np.shares_memory(quaternion.as_quat_array(a, copy=True), a)
+    assert quaternion.as_quat_array.copies == copies + 4
+
+    # Copies are detected for empty arrays and non-array inputs too
+    empty = np.zeros((0, 4))
+    assert quaternion.as_quat_array(empty, copy=False).shape == (0,)
+    assert quaternion.as_quat_array(np.zeros((3, 0, 8)), copy=False).shape == (3, 0, 2)
+    assert quaternion.as_quat_array.copies == copies + 4
+    for not_array in [[[1.0, 2.0, 3.0, 4.0]], ((1, 2, 3, 4), (5, 6, 7, 8))]:
+        with pytest.raises(ValueError):
+            quaternion.as_quat_array(not_array, copy=False)
+        assert quaternion.as_quat_array(not_array).shape == (len(not_array),)
+    assert quaternion.as_quat_array.copies == copies + 6
+    assert quaternion.as_quat_array([[1.0, 2.0, 3.0, 4.0]], copy=True).shape == (1,)
+    assert quaternion.as_quat_array.copies == copies + 7
+    with pytest.raises(ValueError):
+        quaternion.as_quat_array(a[0, 0, :4], copy=False)
+    assert quaternion.as_quat_array(a[0, 0, :4]) == quaternion.quaternion(*a[0, 0, :4])
+    assert np.shares_memory(quaternion.as_quat_array(a[np.newaxis, 0, 0, :4], copy=False)[0, ...], a)
+
+
+def test_components():
+    w, x, y, z = np.random.rand(4, 3, 5)
+    q = quaternion.from_components(w, x, y, z)
+    assert q.dtype == np.dtype(np.quaternion) and q.shape == (3, 5)
+    assert np.array_equal(quaternion.as_float_array(q), np.stack((w, x, y, z), axis=-1))
+    for a, b in zip(quaternion.to_components(q), (w, x, y, z)):
+        assert a.dtype == np.float64 and np.array_equal(a, b)
+    for a, b in zip(quaternion.to_components(q[::2, ::-2]), (w, x, y, z)):
+        assert np.array_equal(a, b[::2, ::-2])
+
+    # Broadcasting, type conversion, and output arrays
+    assert np.array_equal(quaternion.from_components(1, [1, 2], np.arange(2, dtype=np.int32), np.float32(0.5)),
+                          np.array([quaternion.quaternion(1, 1, 0, 0.5), quaternion.quaternion(1, 2, 1, 0.5)]))
+    out = np.empty((3, 5), dtype=np.quaternion)
+    assert quaternion.from_components(w, x, y, z, out=out) is out
+    assert np.array_equal(out, q)
+    with pytest.raises(ValueError):
+        quaternion.from_components(w, x, y, z, out=np.empty(5, dtype=np.quaternion))
+    with pytest.raises(TypeError):
+        quaternion.from_components(w, x, y, z, out=np.empty((3, 5)))
+    with pytest.raises(TypeError):
+        quaternion.from_components(w.astype(complex), x, y, z)
+
+    # Failing to convert a later component releases everything acquired for the earlier ones
+    class Unconvertible(object):
+        def __array__(self, *args):
+            raise RuntimeError("cannot convert")
+    float64 = np.dtype(np.float64)
+    refcount = sys.getrefcount(float64)
+    for _ in range(100):
+        with pytest.raises(RuntimeError):
+            quaternion.from_components(w, x, Unconvertible(), z)
+    assert sys.getrefcount(float64) == refcount
+
+    # Sequences of quaternion objects
+    for sequence in [list(q[0]), tuple(q[0])]:
+        for a, b in zip(quaternion.to_components(sequence), (w, x, y, z)):
+            assert np.array_equal(a, b[0])
+    assert all(a.shape == (0,) for a in quaternion.to_components([]))
+    assert quaternion.to_components(quaternion.one) == (1, 0, 0, 0)
+    copies = quaternion.as_quat_array.copies
+    for sequence in [list(q[0]), tuple(q[0])]:
+        assert np.array_equal(quaternion.as_quat_array(sequence), q[0])
+        with pytest.raises(ValueError):
+            quaternion.as_quat_array(sequence, copy=False)
+    assert quaternion.as_quat_array.copies == copies + 2
+    assert quaternion.as_quat_array([]).shape == (0,)
+
+
+def test_sort_and_copy_arrfuncs():
+    f = np.random.randint(0, 3, (1000, 4)).astype(float)
+    f[7, 2] = np.nan
+    f[9, 0] = np.nan
+    q = quaternion.as_quat_array(f)
+
+    # Lexicographic order, with nans first and ties kept in their original order
+    nans = np.isnan(f).any(axis=1)
+    order = np.lexsort(f.T[::-1])
+    order = np.concatenate((np.nonzero(nans)[0], order[~nans[order]]))
+    for kind in ['quicksort', 'heapsort', 'stable']:
+        assert np.array_equal(np.argsort(q, kind=kind)[2:], order[2:])
+        assert np.array_equal(np.sort(q, kind=kind)[2:], q[order[2:]])
+    assert np.array_equal(np.argsort(q, kind='stable'), order)
+    assert np.array_equal(np.unique(q[~nans]), quaternion.as_quat_array(np.unique(f[~nans], axis=0)))
+    assert np.argmin(q) == 7 and np.argmax(q) == 7
+    assert np.argmin(q[~nans]) == order[2] - np.sum(nans[:order[2]])
+
+    # Copies with and without byte swapping
+    swapped = q.astype(q.dtype.newbyteorder())
+    np.testing.assert_array_equal(quaternion.as_float_array(swapped.astype(q.dtype)), f)
+    indices = np.random.randint(0, len(q), len(q))
+    np.testing.assert_array_equal(quaternion.as_float_array(q[indices]), f[indices])
+    np.testing.assert_array_equal(quaternion.as_float_array(q[::3].copy()), f[::3])
+    np.testing.assert_array_equal(quaternion.as_float_array(np.concatenate((q, q[::-2]))),
+                                  np.concatenate((f, f[::-2])))
+
+
+def test_unflip_rotors():
+    np.random.seed(1234)
+    R = quaternion.from_rotation_vector(np.cumsum(np.random.normal(scale=0.1, size=(2, 500, 3)), axis=1))
+    signs = np.random.choice([-1.0, 1.0], size=R.shape)
+    signs[:, 0] = 1.0
+    flipped = R * signs
+    assert np.array_equal(quaternion.unflip_rotors(flipped, axis=1), R)
+    assert np.array_equal(quaternion.unflip_rotors(flipped.T).T, R)
+    assert np.array_equal(quaternion.unflip_rotors(flipped[0]), R[0])
+    assert np.array_equal(quaternion.unflip_rotors(flipped[:, ::-1], axis=-1)[:, ::-1], R * signs[:, -1:])
+    inplace = flipped.copy()
+    assert quaternion.unflip_rotors(inplace, axis=1, inplace=True) is inplace
+    assert np.array_equal(inplace, R)
+    assert quaternion.unflip_rotors(flipped[:, :0], axis=1).shape == (2, 0)
+
+    # Nans are passed through without breaking the continuity of later elements
+    flipped[0, 10] = quaternion.quaternion(np.nan, 0, 0, 0)
+    unflipped = quaternion.unflip_rotors(flipped, axis=1)
+    assert np.isnan(unflipped[0, 10])
+    assert np.array_equal(unflipped[0, 11:], R[0, 11:])
+
+    # Hemisphere canonicalization
+    canonical = quaternion.hemisphere_canonicalized(flipped, quaternion.one)
+    assert np.all(quaternion.as_float_array(canonical[~np.isnan(canonical)])[:, 0] >= 0)
+    assert np.all(quaternion.rotation_chordal_distance(canonical[:, 11:], R[:, 11:]) < 4 * eps)
+    reference = quaternion.quaternion(-1, 2, -3, 4).normalized()
+    canonical = quaternion.hemisphere_canonicalized(R, reference)
+    assert np.all(quaternion.as_float_array(canonical).dot(quaternion.as_float_array(reference)) >= 0)
+
+
+@pytest.mark.skipif(not has_scipy, reason="Scipy is not installed")
+def test_rotation_index():
+    np.random.seed(1234)
+    references = np.normalized(quaternion.as_quat_array(np.random.normal(size=(40, 50, 4))))
+    queries = np.normalized(quaternion.as_quat_array(np.random.normal(size=(7, 3, 4))))
+    index = quaternion.RotationIndex(references)
+    assert len(index) == references.size
+    brute_force = {
+        'intrinsic': quaternion.rotation_intrinsic_distance(queries[..., np.newaxis], references.ravel()),
+        'chordal': quaternion.rotation_chordal_distance(queries[..., np.newaxis], references.ravel()),
+    }
+    for metric, distances in brute_force.items():
+        order = np.argsort(distances, axis=-1)
+        d, i = index.query(queries, metric=metric)
+        assert d.shape == i.shape == queries.shape
+        assert np.array_equal(i, order[..., 0])
+        assert np.allclose(d, np.min(distances, axis=-1), rtol=0, atol=1e-14)
+        d, i = index.query(-queries, k=5, metric=metric)
+        assert d.shape == i.shape == queries.shape + (5,)
+        assert np.array_equal(i, order[..., :5])
+        assert np.allclose(d, np.sort(distances, axis=-1)[..., :5], rtol=0, atol=1e-14)
+        d, i = index.query(queries[0, 0], k=3, metric=metric)
+        assert d.shape == i.shape == (3,)
+        assert np.array_equal(i, order[0, 0, :3])
+
+        # Radius queries and upper bounds
+        sorted_distances = np.sort(distances, axis=-1)
+        r = np.median((sorted_distances[..., 20] + sorted_distances[..., 21]) / 2)  # Not too close to any distance
+        neighbors = index.query_radius(queries, r, metric=metric)
+        assert neighbors.shape == queries.shape
+        for n, dist in zip(neighbors.ravel(), distances.reshape(-1, references.size)):
+            assert np.array_equal(n, np.nonzero(dist <= r)[0])
+        assert np.array_equal(index.query_radius(queries[1, 2], r, metric=metric), neighbors[1, 2])
+        d, i = index.query(queries, k=30, metric=metric, distance_upper_bound=r)
+        missing = ~(sorted_distances[..., :30] < r)
+        assert np.array_equal(np.isinf(d), missing)
+        assert np.all(i[missing] == len(index))
+        assert np.array_equal(i[~missing], order[..., :30][~missing])
+
+    # Asking for more neighbors than there are references
+    d, i = quaternion.RotationIndex(references[0, :3]).query(queries[0, 0], k=5)
+    assert np.all(np.isinf(d[3:])) and np.all(i[3:] == 3)
+    assert np.array_equal(np.sort(i[:3]), [0, 1, 2])
+    with pytest.raises(ValueError):
+        index.query(queries, metric='euclidean')
+
+
+def test_pairwise_distance():
+    np.random.seed(1234)
+    A = quaternion.as_quat_array(np.random.normal(size=(30, 2, 4)))
+    B = quaternion.as_quat_array(np.random.normal(size=(45, 4)))
+    for a, b in [(A, B), (np.normalized(A), np.normalized(B))]:
+        for metric in ['rotor_intrinsic', 'rotor_chordal', 'rotation_intrinsic', 'rotation_chordal']:
+            ufunc = getattr(np, metric + '_distance')
+            expected = ufunc(a[..., np.newaxis], b)
+            d = quaternion.pairwise_distance(a, b, metric=metric)
+            assert d.shape == (30, 2, 45)
+            assert np.allclose(d, expected, rtol=0, atol=1e-13)
+            assert np.array_equal(quaternion.pairwise_distance(a, b, metric=ufunc, threads=4), d)
+            out = np.empty((30, 2, 45))
+            assert quaternion.pairwise_distance(a, b, metric=metric, out=out) is out
+            assert np.array_equal(out, d)
+
+            # Condensed output for a single set
+            square = quaternion.pairwise_distance(a, metric=metric)
+            rows, columns = np.triu_indices(a.size, 1)
+            for threads in [1, 3]:
+                condensed = quaternion.pairwise_distance(a, metric=metric, condensed=True, threads=threads)
+                assert np.array_equal(condensed, square.reshape(a.size, a.size)[rows, columns])
+
+            # Chunked output
+            chunks = list(quaternion.pairwise_distance_chunks(a, b, metric=metric, chunk_size=7, threads=2))
+            assert len(chunks) == 9
+            assert chunks[-1][0] == slice(56, 60)
+            assert np.array_equal(np.concatenate([block for rows, block in chunks]), d.reshape(60, 45))
+
+    # Zero quaternions give the same infinities and NaNs as the ufuncs
+    Z = np.array([quaternion.quaternion(0, 0, 0, 0), quaternion.one, quaternion.quaternion(1, 2, 3, 4)])
+    for metric in ['rotor_intrinsic', 'rotor_chordal', 'rotation_intrinsic', 'rotation_chordal']:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            expected = getattr(np, metric + '_distance')(Z[:, np.newaxis], Z)
+        d = quaternion.pairwise_distance(Z, metric=metric)
+        assert np.array_equal(np.isnan(d), np.isnan(expected)), metric
+        assert np.allclose(d, expected, rtol=0, atol=1e-13, equal_nan=True), metric
+        condensed = quaternion.pairwise_distance(Z, metric=metric, condensed=True)
+        assert np.allclose(condensed, expected[[0, 0, 1], [1, 2, 2]], rtol=0, atol=1e-13, equal_nan=True), metric
+
+    assert quaternion.pairwise_distance(A[:1], condensed=True).shape == (1,)
+    assert quaternion.pairwise_distance(B[:0], B).shape == (0, 45)
+    assert quaternion.pairwise_distance(B, B[:0]).shape == (45, 0)
+    assert quaternion.pairwise_distance(A, B[:0], threads=4).shape == (30, 2, 0)
+    assert quaternion.pairwise_distance(B[:0]).shape == (0, 0)
+    assert quaternion.pairwise_distance(B[:0], condensed=True).shape == (0,)
+    assert quaternion.pairwise_distance(B[:1], condensed=True).shape == (0,)
+    assert [block.shape for rows, block in quaternion.pairwise_distance_chunks(B, B[:0], chunk_size=20)] == [
+        (20, 0), (20, 0), (5, 0)]
+    assert list(quaternion.pairwise_distance_chunks(B[:0], B)) == []
+    with pytest.raises(ValueError):
+        quaternion.pairwise_distance(A, B, metric='euclidean')
+    with pytest.raises(ValueError):
+        quaternion.pairwise_distance(A, B, condensed=True)
+    with pytest.raises(ValueError):
+        quaternion.pairwise_distance(A, B, out=np.empty((60, 45)))
+
+
+def test_isclose_allclose_vectorized():
+    np.random.seed(1234)
+    a = quaternion.as_quat_array(np.random.normal(size=(17, 4)))
+    b = a + quaternion.as_quat_array(1e-9 * np.random.normal(size=(17, 4)))
+    specials = np.array([quaternion.quaternion(np.nan, 0, 0, 0), quaternion.quaternion(np.inf, 0, 0, 0),
+                         quaternion.quaternion(-np.inf, 0, 0, 0), quaternion.quaternion(0, np.inf, 1, 0),
+                         quaternion.one, quaternion.quaternion(1, 0, 0, 1e-12)])
+    x = np.concatenate((a, specials[:, np.newaxis].repeat(6, 1).ravel()))
+    y = np.concatenate((b, specials[np.newaxis, :].repeat(6, 0).ravel()))
+    for equal_nan in [False, True]:
+        for rtol, atol in [(1e-5, 1e-8), (0.0, 0.0), (1e-12, 0.0)]:
+            # Reference implementation from the generic code path, applied to a pure-python loop
+            expected = np.array([
+                (xi == yi) or (equal_nan and np.isnan(xi) and np.isnan(yi)) or
+                (np.isfinite(xi) and np.isfinite(yi) and abs(xi - yi) <= atol + rtol * abs(yi))
+                for xi, yi in zip(x, y)
+            ])
+            assert np.array_equal(quaternion.isclose(x, y, rtol=rtol, atol=atol, equal_nan=equal_nan), expected)
+            assert quaternion.allclose(x, y, rtol=rtol, atol=atol, equal_nan=equal_nan) == np.all(expected)
+            assert quaternion.allclose(x[expected], y[expected], rtol=rtol, atol=atol, equal_nan=equal_nan)
+    # Broadcasting, scalars, and mixed float/quaternion inputs
+    assert np.array_equal(quaternion.isclose(a[:, np.newaxis], a[np.newaxis, :]), np.eye(17, dtype=bool))
+    assert quaternion.isclose(quaternion.one, 1.0) is True
+    assert quaternion.allclose(np.ones(5), np.full(5, quaternion.one))
+    assert not quaternion.allclose(a[:, np.newaxis], a[np.newaxis, :])
+    with pytest.raises(ValueError):
+        quaternion.allclose(a, a[:3])
+
+
+def test_slerp_broadcast_endpoints(Rs):
+    # Broadcast endpoints take a separate path in the ufunc loop; it must agree with the elementwise evaluation
+    tau = np.concatenate((np.linspace(-0.5, 1.5, 41), [0.0, 1.0, np.nan, np.inf]))
+    for R1, R2 in [(Rs[1], Rs[2]), (Rs[3], -Rs[3]), (Rs[4], Rs[4]), (quaternion.zero, Rs[1]),
+                   (quaternion.one, quaternion.quaternion(np.nan, 0, 0, 0))]:
+        for Q2 in [R2, -R2]:
+            expected = np.array([quaternion.slerp_evaluate(R1, Q2, tau_i) for tau_i in tau])
+            np.testing.assert_array_equal(quaternion.as_float_array(np.slerp_vectorized(R1, Q2, tau)),
+                                          quaternion.as_float_array(expected))
+            np.testing.assert_array_equal(quaternion.as_float_array(quaternion.slerp(R1, Q2, 1.0, 3.0, 1.0 + 2 * tau)),
+                                          quaternion.as_float_array(expected))
+    # Broadcasting over several pairs, each evaluated at many times
+    R1, R2 = Rs[1:4, np.newaxis], Rs[4:7, np.newaxis]
+    expected = np.array([[quaternion.slerp_evaluate(r1, r2, tau_i) for tau_i in tau] for r1, r2 in zip(Rs[1:4], Rs[4:7])])
+    np.testing.assert_array_equal(quaternion.as_float_array(np.slerp_vectorized(R1, R2, tau)),
+                                  quaternion.as_float_array(expected))
+
+
+def test_slerp_series(Rs):
+    np.random.seed(1234)
+    R_in = quaternion.unflip_rotors(np.normalized(Rs[Rs.size // 2:Rs.size // 2 + 20]))
+    t_in = np.cumsum(np.random.uniform(0.1, 1.0, size=R_in.size))
+    t_out = np.concatenate(([t_in[0] - 0.3], np.linspace(t_in[0], t_in[-1], 201), [t_in[-1] + 0.5]))
+    R_out = quaternion.slerp_series(R_in, t_in, t_out)
+    # Compare with separate calls to `slerp` for each segment
+    expected = np.empty_like(R_out)
+    for j, t in enumerate(t_out):
+        i = min(max(np.searchsorted(t_in, t, side='right') - 1, 0), t_in.size - 2)
+        expected[j] = quaternion.slerp(R_in[i], R_in[i+1], t_in[i], t_in[i+1], t)
+    assert quaternion.allclose(R_out, expected, rtol=0.0, atol=1e-14)
+    assert quaternion.allclose(quaternion.slerp_series(R_in, t_in, t_in), R_in, rtol=0.0, atol=1e-14)
+    # Reusing the segments gives identical results, including for multidimensional t_out
+    segments = quaternion.interpolation_segments(t_in, t_out)
+    np.testing.assert_array_equal(quaternion.as_float_array(quaternion.slerp_series(R_in, t_in, t_out, segments)),
+                                  quaternion.as_float_array(R_out))
+    t_out_2d = t_out[:200].reshape(10, 20)
+    assert quaternion.slerp_series(R_in, t_in, t_out_2d).shape == (10, 20)
+    # Degenerate inputs
+    with pytest.raises(ValueError):
+        quaternion.slerp_series(R_in[:0], t_in[:0], t_out)
+    assert quaternion.slerp_series(R_in, t_in, t_out_2d[:, :0]).shape == (10, 0)
+    assert quaternion.slerp_series(R_in[:0], t_in[:0], t_out[:0]).shape == (0,)
+    assert np.all(quaternion.slerp_series(R_in[:1], t_in[:1], t_out) == R_in[0])
+
+
+def test_squad_uniform_grid(Rs):
+    from quaternion.quaternion_time_series import _segment_indices
+    np.random.seed(1234)
+    # Arithmetic index lookup must agree exactly with the binary search
+    for t_in in [np.linspace(-1.3, 7.9, num=47), 0.1 * np.arange(1000), np.linspace(0.0, 1.0, num=11),
+                 np.linspace(0.0, 1.0, num=31) + np.random.uniform(-0.008, 0.008, size=31),
+                 np.sort(np.random.uniform(0.0, 1.0, size=23)), np.array([0.0, 1.0])]:
+        t_out = np.concatenate((t_in, np.random.uniform(t_in[0] - 1, t_in[-1] + 1, size=500),
+                                [np.nan, np.inf, -np.inf, t_in[0] - 1e-300, t_in[-1] * (1 + 1e-16)]))
+        expected = t_in.searchsorted(t_out, side='right') - 1
+        assert np.array_equal(_segment_indices(t_in, t_out), expected)
+    t_in = 0.25 * np.arange(40)
+    t_out = np.random.uniform(-1.0, 11.0, size=300)
+    assert np.array_equal(_segment_indices(t_in, t_out, dt=0.25), t_in.searchsorted(t_out, side='right') - 1)
+    # The gufunc reads each segment's quaternions at the given index
+    q, a, b, q_ip1 = (np.normalized(quaternion.as_quat_array(np.random.normal(size=(40, 4)))) for _ in range(4))
+    i = np.random.randint(0, 40, size=300)
+    tau = np.random.uniform(0, 1, size=300)
+    np.testing.assert_array_equal(quaternion.as_float_array(np.squad_series_vectorized(tau, i, q, a, b, q_ip1)),
+                                  quaternion.as_float_array(np.squad_vectorized(tau, q[i], a[i], b[i], q_ip1[i])))
+    assert np.all(np.isnan(np.squad_series_vectorized(tau[:2], [-1, 40], q, a, b, q_ip1)))
+    # squad gives the same results whether or not the spacing is given explicitly
+    R_in = np.array([quaternion.slerp_evaluate(Rs[3], Rs[4], t) for t in np.linspace(0, 1, num=40)])
+    R_out = quaternion.squad(R_in, t_in, np.sort(t_out))
+    np.testing.assert_array_equal(quaternion.as_float_array(quaternion.squad(R_in, t_in, np.sort(t_out), dt=0.25)),
+                                  quaternion.as_float_array(R_out))
+
+
+def test_interpolation_coefficients(Rs):
+    np.random.seed(1234)
+    R_in = quaternion.unflip_rotors(np.normalized(Rs[Rs.size // 2:Rs.size // 2 + 20]))
+    t_in = np.cumsum(np.random.uniform(0.1, 1.0, size=R_in.size))
+    t_out = np.linspace(t_in[0], t_in[-1], 301)[:-1]
+    segments = quaternion.interpolation_segments(t_in, t_out)
+
+    # Precomputed squad coefficients give identical results, and match the defining formulas
+    for approximate in [True, False]:
+        coefficients = quaternion.squad_coefficients(R_in, t_in, approximate)
+        R_out = quaternion.squad(R_in, t_in, t_out, approximate=approximate)
+        np.testing.assert_array_equal(
+            quaternion.as_float_array(quaternion.squad(R_in, t_in, t_out, approximate=approximate,
+                                                       coefficients=coefficients)),
+            quaternion.as_float_array(R_out))
+        assert quaternion.allclose(quaternion.squad(R_in, t_in, t_out, approximate=approximate, segments=segments,
+                                                    coefficients=coefficients), R_out, rtol=0.0, atol=1e-14)
+    A, B, R_ip1 = coefficients
+    L = np.log(np.invert(R_in[:-1]) * R_in[1:])
+    dt = np.diff(t_in)
+    assert quaternion.allclose(A[1:-1], R_in[1:-1] * np.exp((-L[1:] + L[:-1] * (dt[1:] / dt[:-1])) * 0.25),
+                               rtol=0.0, atol=1e-14)
+    assert quaternion.allclose(B[:-2], R_in[1:-1] * np.exp((L[1:] * (dt[:-1] / dt[1:]) - L[:-1]) * -0.25),
+                               rtol=0.0, atol=1e-14)
+    assert A[0] == R_in[0] and A[-1] == R_in[-1] and B[-2] == R_in[-1]
+    assert np.array_equal(R_ip1[:-1], R_in[1:])
+    assert B[-1] == R_ip1[-1] == R_in[-1] * np.invert(R_in[-2]) * R_in[-1]
+    out = tuple(np.empty_like(R_in) for _ in range(3))
+    coefficients = quaternion.squad_coefficients(R_in, t_in, out=out)
+    assert all(c is o for c, o in zip(coefficients, out))
+    assert np.array_equal(out[0], A) and np.array_equal(out[1], B)
+
+    # The slerp coefficients take the shorter path, whatever the signs of the input rotors
+    log_rel = quaternion.slerp_series_coefficients(R_in)
+    assert log_rel[-1] == quaternion.zero
+    assert quaternion.allclose(np.exp(log_rel[:-1]) * R_in[:-1], R_in[1:], rtol=0.0, atol=1e-14)
+    R_smooth = quaternion.from_rotation_vector(np.cumsum(0.3 * np.random.normal(size=(20, 3)), axis=0))
+    R_flipped = R_smooth * np.where(np.arange(R_smooth.size) % 3 == 1, -1.0, 1.0)
+    assert quaternion.allclose(quaternion.slerp_series_coefficients(R_flipped),
+                               quaternion.slerp_series_coefficients(R_smooth), rtol=0.0, atol=1e-14)
+    out = np.empty_like(R_in)
+    assert quaternion.slerp_series_coefficients(R_in, out=out) is out
+    np.testing.assert_array_equal(
+        quaternion.as_float_array(quaternion.slerp_series(R_in, t_in, t_out, segments, coefficients=log_rel)),
+        quaternion.as_float_array(quaternion.slerp_series(R_in, t_in, t_out)))
+
+    # Once everything is preallocated, repeated interpolation allocates nothing
+    tracemalloc = pytest.importorskip('tracemalloc')
+    R_out = np.empty(t_out.shape, dtype=np.quaternion)
+    tracemalloc.start()
+    try:
+        for _ in range(3):
+            quaternion.squad_coefficients(R_in, t_in, out=coefficients)
+            quaternion.squad(R_in, t_in, t_out, segments=segments, coefficients=coefficients, out=R_out)
+            quaternion.slerp_series_coefficients(R_in, out=log_rel)
+            quaternion.slerp_series(R_in, t_in, t_out, segments, out=R_out, coefficients=log_rel)
+        assert tracemalloc.get_traced_memory()[1] < R_out.nbytes // 2
+    finally:
+        tracemalloc.stop()
+
+
+def test_approximate_exp_log_slerp_squad():
+    np.random.seed(1234)
+    N = 20000
+    for scale in [0.0, 1e-8, 1e-3, 0.05, 0.2, 0.5, 2.0]:
+        v = quaternion.as_quat_array(np.random.normal(size=(N, 4)) * [0.0, 1.0, 1.0, 1.0] * scale)
+        q = np.exp(v) * np.random.uniform(0.999, 1.001, size=N)
+        assert np.max(np.abs(quaternion.as_float_array(np.exp_approx(v) - np.exp(v)))) < 2e-15
+        assert np.max(np.abs(quaternion.as_float_array(np.log_approx(q) - np.log(q)))) < 2e-15
+        R1 = np.normalized(quaternion.as_quat_array(np.random.normal(size=(N, 4))))
+        R2 = R1 * np.exp(v)
+        tau = np.random.uniform(-0.5, 1.5, size=N)
+        R_exact = np.slerp_vectorized(R1, R2, tau)
+        assert np.max(np.abs(quaternion.as_float_array(np.slerp_vectorized_approx(R1, R2, tau) - R_exact))) < 2e-15
+        assert np.max(np.abs(quaternion.as_float_array(np.slerp_vectorized_approx(R1, -R2, tau) - R_exact))) < 2e-15
+    # Large angles and special values use the exact functions
+    specials = np.array([quaternion.zero, quaternion.one, -quaternion.one, quaternion.x, 3 * quaternion.y,
+                         quaternion.quaternion(-2, 1e-3, 0, 0), quaternion.quaternion(np.nan, 0, 0, 0)])
+    for f, f_approx in [(np.exp, np.exp_approx), (np.log, np.log_approx)]:
+        np.testing.assert_array_equal(quaternion.as_float_array(f_approx(specials)),
+                                      quaternion.as_float_array(f(specials)))
+    # squad on densely sampled data
+    t_in = np.arange(500) * 1e-3
+    R_in = np.exp(quaternion.as_quat_array(np.cumsum(np.random.normal(size=(500, 4)) * [0, 1, 1, 1] * 1e-3, axis=0)))
+    t_out = np.linspace(t_in[0], t_in[-1], 2001)
+    R_exact = quaternion.squad(R_in, t_in, t_out)
+    R_approx = quaternion.squad(R_in, t_in, t_out, approximate=True)
+    assert np.max(np.abs(quaternion.as_float_array(R_approx - R_exact))) < 1e-14
+    i = np.minimum(np.searchsorted(t_in, t_out, side='right') - 1, t_in.size - 2)
+    tau = np.random.uniform(0, 1, size=t_out.size)
+    assert np.max(np.abs(quaternion.as_float_array(
+        np.squad_vectorized_approx(tau, R_in[i], R_in[i], R_in[i+1], R_in[i+1])
+        - np.squad_vectorized(tau, R_in[i], R_in[i], R_in[i+1], R_in[i+1])))) < 2e-15
+    assert quaternion.allclose(quaternion.slerp(R_in[0], R_in[1], 0.0, 1.0, tau, approximate=True),
+                               quaternion.slerp(R_in[0], R_in[1], 0.0, 1.0, tau), rtol=0.0, atol=2e-15)
+
+
+def test_nlerp_and_adaptive_slerp():
+    np.random.seed(1234)
+    N = 20000
+    R1 = np.normalized(quaternion.as_quat_array(np.random.normal(size=(N, 4))))
+    tau = np.random.uniform(-0.5, 1.5, size=N)
+    for scale in [1e-6, 1e-3, 1e-2, 0.1]:
+        R2 = R1 * np.exp(quaternion.as_quat_array(np.random.normal(size=(N, 4)) * [0, 1, 1, 1] * scale))
+        d = np.minimum(np.abs(R1 - R2), np.abs(R1 + R2))
+        tau_in = np.clip(tau, 0, 1)
+        R_slerp = np.slerp_vectorized(R1, R2, tau_in)
+        for R_nlerp in [np.nlerp_vectorized(R1, R2, tau_in), np.nlerp_vectorized(R1, -R2, tau_in)]:
+            assert np.allclose(np.abs(R_nlerp), 1.0, rtol=0.0, atol=1e-15)
+            assert np.all(quaternion.rotation_chordal_distance(R_nlerp, R_slerp) <= 0.017 * d**3 + 1e-15)
+        # The adaptive version uses nlerp exactly where the endpoints are close
+        threshold = np.median(d)
+        R_adaptive = np.slerp_adaptive_vectorized(R1, R2, tau, threshold)
+        close = d < threshold
+        np.testing.assert_array_equal(quaternion.as_float_array(R_adaptive[close]),
+                                      quaternion.as_float_array(np.nlerp_vectorized(R1, R2, tau)[close]))
+        np.testing.assert_array_equal(quaternion.as_float_array(R_adaptive[~close]),
+                                      quaternion.as_float_array(np.slerp_vectorized(R1, R2, tau)[~close]))
+    # squad with nlerp for nearby rotors
+    t_in = np.arange(500) * 1e-3
+    R_in = np.exp(quaternion.as_quat_array(np.cumsum(np.random.normal(size=(500, 4)) * [0, 1, 1, 1] * 1e-3, axis=0)))
+    t_out = np.linspace(t_in[0], t_in[-1], 2001)
+    R_exact = quaternion.squad(R_in, t_in, t_out)
+    R_adaptive = quaternion.squad(R_in, t_in, t_out, nlerp_threshold=1e-2)
+    assert np.max(quaternion.rotation_chordal_distance(R_adaptive, R_exact)) < 1e-8
+    np.testing.assert_array_equal(quaternion.as_float_array(quaternion.squad(R_in, t_in, t_out, nlerp_threshold=0.0)),
+                                  quaternion.as_float_array(R_exact))
+
+
+def test_conversion_and_interpolation_out(Rs):
+    np.random.seed(1234)
+    R = np.normalized(Rs[Rs.size // 2:Rs.size // 2 + 24]).reshape(8, 3)
+    vecs = np.random.normal(size=(5, 3))
+    t_in = np.linspace(0.0, 1.0, num=9)
+    R_in = quaternion.unflip_rotors(np.normalized(Rs[Rs.size // 2:Rs.size // 2 + 9]))
+    t_out = np.linspace(0.0, 1.0, num=27)
+    for function, args, expected_shape, dtype in [
+            (quaternion.as_rotation_matrix, (R,), R.shape + (3, 3), float),
+            (quaternion.from_rotation_matrix, (quaternion.as_rotation_matrix(R),), R.shape, np.quaternion),
+            (quaternion.as_rotation_vector, (R,), R.shape + (3,), float),
+            (quaternion.from_rotation_vector, (quaternion.as_rotation_vector(R),), R.shape, np.quaternion),
+            (quaternion.as_euler_angles, (R,), R.shape + (3,), float),
+            (quaternion.from_euler_angles, (quaternion.as_euler_angles(R),), R.shape, np.quaternion),
+            (quaternion.as_spherical_coords, (R,), R.shape + (2,), float),
+            (quaternion.from_spherical_coords, (quaternion.as_spherical_coords(R),), R.shape, np.quaternion),
+            (quaternion.rotate_vectors, (R, vecs), R.shape + vecs.shape, float),
+            (quaternion.slerp, (R_in[0], R_in[1], 0.0, 1.0, t_out), t_out.shape, np.quaternion),
+            (quaternion.slerp_series, (R_in, t_in, t_out), t_out.shape, np.quaternion),
+            (quaternion.squad, (R_in, t_in, t_out), t_out.shape, np.quaternion),
+    ]:
+        expected = function(*args)
+        out = np.zeros(expected_shape, dtype=dtype)
+        result = function(*args, out=out)
+        assert result is out, function.__name__
+        assert np.array_equal(out.view(float), np.asarray(expected, dtype=dtype).view(float)), function.__name__
+        # Non-contiguous outputs are filled in place, too
+        out = np.zeros((2,) + expected_shape, dtype=dtype)[1]
+        function(*args, out=out)
+        assert np.array_equal(np.ascontiguousarray(out).view(float), np.asarray(expected, dtype=dtype).view(float))
+    with pytest.raises(ValueError):
+        quaternion.as_rotation_matrix(R, out=np.empty(R.shape + (3,)))
+    with pytest.raises(ValueError):
+        quaternion.from_euler_angles(quaternion.as_euler_angles(R), out=np.empty(R.shape))
+    with pytest.raises(ZeroDivisionError):
+        quaternion.rotate_vectors(np.array([quaternion.one, quaternion.zero]), vecs)
+    # rotate_vectors along other axes, and with single quaternions and vectors
+    vprime = quaternion.rotate_vectors(R, vecs.T, axis=0)
+    assert np.allclose(vprime, np.swapaxes(quaternion.rotate_vectors(R, vecs), -1, -2), rtol=0.0, atol=1e-15)
+    assert np.allclose(quaternion.rotate_vectors(quaternion.x, [0.0, 1.0, 0.0]), [0.0, -1.0, 0.0], atol=1e-15)
+    assert isinstance(quaternion.from_euler_angles(0.1, 0.2, 0.3), quaternion.quaternion)
+
+
+def test_c_api_capsule():
+    import os.path
+    import ctypes
+    include = quaternion.get_include()
+    for filename in ['quaternion.h', 'quaternion_api.h', '__init__.pxd']:
+        assert os.path.isfile(os.path.join(include, filename))
+
+    class Quaternion(ctypes.Structure):
+        _fields_ = [(component, ctypes.c_double) for component in 'wxyz']
+    unary = ctypes.CFUNCTYPE(Quaternion, Quaternion)
+
+    class API(ctypes.Structure):
+        _fields_ = [('version', ctypes.c_int),
+                    ('create_from_spherical_coords', ctypes.CFUNCTYPE(Quaternion, ctypes.c_double, ctypes.c_double)),
+                    ('create_from_euler_angles', ctypes.CFUNCTYPE(Quaternion, *[ctypes.c_double]*3)),
+                    ('sqrt', unary), ('log', unary), ('exp', unary),
+                    ('scalar_power', ctypes.CFUNCTYPE(Quaternion, ctypes.c_double, Quaternion)),
+                    ('type', ctypes.c_void_p), ('from_quaternion', ctypes.c_void_p), ('type_num', ctypes.c_int)]
+
+    get_pointer = ctypes.pythonapi.PyCapsule_GetPointer
+    get_pointer.restype = ctypes.c_void_p
+    get_pointer.argtypes = [ctypes.py_object, ctypes.c_char_p]
+    capsule = quaternion.numpy_quaternion._C_API
+    api = API.from_address(get_pointer(capsule, b'quaternion.numpy_quaternion._C_API'))
+    assert api.version >= 1
+    assert api.type == id(quaternion.quaternion)
+    assert api.type_num == np.dtype(np.quaternion).num
+
+    def as_tuple(q):
+        return (q.w, q.x, q.y, q.z)
+    q = quaternion.quaternion(1.2, 0.3, -0.4, 0.5)
+    c_q = Quaternion(*as_tuple(q))
+    assert as_tuple(api.exp(c_q)) == as_tuple(np.exp(q))
+    assert as_tuple(api.log(c_q)) == as_tuple(np.log(q))
+    assert as_tuple(api.sqrt(c_q)) == as_tuple(q.sqrt())
+    assert as_tuple(api.scalar_power(2.5, c_q)) == as_tuple(2.5 ** q)
+    assert np.allclose(as_tuple(api.create_from_euler_angles(0.1, 0.2, 0.3)),
+                       as_tuple(quaternion.from_euler_angles(0.1, 0.2, 0.3)), rtol=0, atol=2*eps)
+    assert np.allclose(as_tuple(api.create_from_spherical_coords(0.1, 0.2)),
+                       as_tuple(quaternion.from_spherical_coords(0.1, 0.2)), rtol=0, atol=2*eps)
+
+
+def test_scalar_entry_points():
+    # Constructor
+    assert quaternion.quaternion(1.0, 2.0, 3.0, 4.0) == quaternion.quaternion(1, 2, 3, 4)
+    assert quaternion.quaternion(2, 3, 4) == quaternion.quaternion(0, 2, 3, 4)
+    assert quaternion.quaternion(np.float32(1.5), np.int64(2), 3, 4).w == 1.5
+    for args in [(), (1.0,), (1.0, 2.0), (1.0, 2.0, 3.0, 4.0, 5.0), (1.0, 'a', 3.0), (1.0, None, 3.0, 4.0)]:
+        with pytest.raises(TypeError):
+            quaternion.quaternion(*args)
+    with pytest.raises(TypeError):
+        quaternion.quaternion(1.0, 2.0, 3.0, w=4.0)
+
+    class Subclass(quaternion.quaternion):
+        pass
+    s = Subclass(1.0, 2.0, 3.0, 4.0)
+    assert type(s) is Subclass and s == quaternion.quaternion(1, 2, 3, 4)
+
+    # Binary operations with the fast paths and the general paths giving the same results
+    q1 = quaternion.quaternion(1.0, 2.0, 3.0, 4.0)
+    q2 = quaternion.quaternion(-0.5, 0.1, 0.7, 0.2)
+    assert q1 * q2 == s * q2 == q1 * Subclass(-0.5, 0.1, 0.7, 0.2)
+    assert q1 * 2.0 == q1 * 2 == q1 * np.float64(2.0) == s * 2.0
+    assert q1 / 2.0 == q1 / 2 == s / 2.0
+    assert q1 + q2 == s + q2 and q1 - q2 == s - q2
+
+    # Module functions
+    q1, q2 = q1.normalized(), q2.normalized()
+    assert quaternion.slerp_evaluate(q1, q2, 0.3) == quaternion.slerp_evaluate(q1, q2, np.float64(0.3))
+    assert quaternion.slerp_evaluate(q1, q2, 0) == quaternion.slerp_evaluate(q1, q2, 0.0)
+    assert quaternion.squad_evaluate(0.3, q1, q1, q2, q2) == quaternion.squad_evaluate(np.float64(0.3), q1, q1, q2, q2)
+    for args in [(q1, q2), (q1, q2, 0.3, 0.4), (q1, 1.0, 0.3), (q1, q2, 'a'), (None, q2, 0.3)]:
+        with pytest.raises(TypeError):
+            quaternion.slerp_evaluate(*args)
+    for args in [(0.3, q1, q1, q2), (0.3, q1, q1, q2, 1.0), ('a', q1, q1, q2, q2)]:
+        with pytest.raises(TypeError):
+            quaternion.squad_evaluate(*args)
+
+
+def test_byteswap():
+    np.random.seed(1234)
+    a = quaternion.as_quat_array(np.random.normal(size=(7, 4)))
+    a[3] = quaternion.zero
+    swapped = a.byteswap()
+    assert swapped.tobytes() == quaternion.as_float_array(a).byteswap().tobytes()
+    assert np.array_equal(swapped.byteswap(), a)
+    b = a.copy()
+    b.byteswap(inplace=True)
+    assert b.tobytes() == swapped.tobytes()
+    assert np.count_nonzero(a.astype(np.dtype(np.quaternion).newbyteorder())) == 6
+
+
+def test_gil_released():
+    """Check that nothing stops the quaternion loops from running without the GIL
+
+    numpy releases the GIL around a ufunc loop -- as do the `NpyIter` loops in this package -- unless one of the dtypes
+    involved has a flag saying that its items need the python API, so it is enough to check that the quaternion dtypes
+    have none of those flags.  How well threads actually run in parallel is measured by `benchmark_gil_release` and
+    `benchmark_thread_scaling` in test/benchmarks.py.
+
+    """
+    NPY_ITEM_REFCOUNT, NPY_ITEM_IS_POINTER, NPY_NEEDS_PYAPI = 0x01, 0x04, 0x10
+    for dtype in [np.quaternion, np.dual_quaternion]:
+        assert not np.dtype(dtype).hasobject, dtype
+        assert not np.dtype(dtype).flags & (NPY_ITEM_REFCOUNT | NPY_ITEM_IS_POINTER | NPY_NEEDS_PYAPI), dtype
+
+
+def test_dual_quaternions(Rs):
+    np.random.seed(1234)
+    R = np.normalized(Rs[Rs.size//2:])
+    t = np.random.normal(size=R.shape + (3,))
+    points = np.random.normal(size=R.shape + (3,))
+    dq = quaternion.from_rotation_and_translation(R, t)
+    assert dq.dtype == np.dtype(np.dual_quaternion) and dq.shape == R.shape
+    assert quaternion.as_float_array(dq).shape == R.shape + (8,)
+    assert np.array_equal(quaternion.as_dual_quat_array(quaternion.as_float_array(dq)), dq)
+
+    # Conversions and point transformations agree with `rotate_vectors`
+    R2, t2 = quaternion.as_rotation_and_translation(dq)
+    assert np.array_equal(R2, R) and np.allclose(t2, t, rtol=0.0, atol=8*eps)
+    expected_points = np.array([quaternion.rotate_vectors(r, p) for r, p in zip(R, points)]) + t
+    assert np.allclose(quaternion.transform_points(dq, points), expected_points, rtol=0.0, atol=16*eps)
+    assert np.allclose(quaternion.transform_points(dq, points.T, axis=0), expected_points.T, rtol=0.0, atol=16*eps)
+    outer = quaternion.transform_points(dq[:, np.newaxis], points)
+    assert outer.shape == R.shape + points.shape
+    assert np.allclose(outer[3], quaternion.rotate_vectors(R[3], points) + t[3], rtol=0.0, atol=16*eps)
+    assert np.allclose(dq[3].translation, t[3], rtol=0.0, atol=8*eps)
+    assert dq[3].real == R[3]
+
+    # Products compose transformations, and accumulate along pose chains
+    chain = np.multiply.accumulate(dq)
+    composed = points[-1]
+    for i in reversed(range(R.size)):
+        composed = quaternion.transform_points(dq[i], composed)
+    assert np.allclose(quaternion.transform_points(chain[-1], points[-1]), composed, rtol=0.0, atol=500*eps)
+    assert chain[1] == dq[0] * dq[1]
+    assert np.multiply.reduce(dq) == chain[-1]
+    assert np.prod(dq) == chain[-1]
+    assert np.multiply.reduce(dq[:0]) == np.dual_quaternion(1, 0, 0, 0, 0, 0, 0, 0)
+    assert R[1] * dq[2] == np.dual_quaternion(R[1]) * dq[2]
+    assert dq[2] * R[1] == dq[2] * np.dual_quaternion(R[1])
+    assert np.array_equal(R * dq[2], np.array([np.dual_quaternion(R_i) * dq[2] for R_i in R]))
+    assert np.array_equal(R[1] * dq, np.array([np.dual_quaternion(R[1]) * dq_i for dq_i in dq]))
+    identity = quaternion.as_float_array(dq * np.conjugate(dq))
+    assert np.allclose(identity, [1, 0, 0, 0, 0, 0, 0, 0], rtol=0.0, atol=8*eps)
+    assert np.allclose(quaternion.as_float_array(dq[2].inverse()), quaternion.as_float_array(np.invert(dq)[2]))
+    scaled = quaternion.as_dual_quat_array(2.5 * quaternion.as_float_array(dq))
+    assert np.allclose(quaternion.as_float_array(np.normalized(scaled)), quaternion.as_float_array(dq),
+                       rtol=0.0, atol=8*eps)
+    assert np.allclose(quaternion.transform_points(scaled, points), expected_points, rtol=0.0, atol=16*eps)
+
+    # Screw interpolation moves uniformly along the screw axis
+    def screw(angle, pitch, point):
+        rotation = quaternion.from_rotation_vector([0, 0, angle])
+        return quaternion.from_rotation_and_translation(
+            rotation, point - quaternion.rotate_vectors(rotation, point) + [0, 0, pitch*angle])
+    identity = quaternion.dual_quaternion(quaternion.one)
+    point = np.array([1.0, 2.0, 0.0])
+    tau = np.linspace(0, 1, 11)
+    expected = quaternion.as_float_array(np.array([screw(2.0*tau_i, 1.5, point) for tau_i in tau]))
+    assert np.allclose(quaternion.as_float_array(quaternion.sclerp(identity, screw(2.0, 1.5, point), tau)), expected,
+                       rtol=0.0, atol=8*eps)
+    flipped = quaternion.as_dual_quat_array(-quaternion.as_float_array(screw(2.0, 1.5, point)))
+    assert np.allclose(quaternion.as_float_array(quaternion.sclerp(identity, flipped, tau)), expected,
+                       rtol=0.0, atol=8*eps)
+    translation = quaternion.from_rotation_and_translation(quaternion.one, [1.0, 2.0, 3.0])
+    assert np.allclose(quaternion.sclerp(identity, translation, 0.25).translation, [0.25, 0.5, 0.75],
+                       rtol=0.0, atol=8*eps)
+    assert quaternion.sclerp(dq[0], dq[1], 0.0) == dq[0]
+    assert np.allclose(quaternion.transform_points(quaternion.sclerp(dq[:-1], dq[1:], 1.0), points[1:]),
+                       expected_points[1:], rtol=0.0, atol=64*eps)
+
+
+def test_optimal_rotation():
+    np.random.seed(1234)
+    frames, n = 200, 5
+    R = np.normalized(quaternion.as_quat_array(np.random.normal(size=(frames, 4))))
+    b = np.random.normal(size=(frames, n, 3))
+    a = np.einsum('fij,fnj->fni', quaternion.as_rotation_matrix(R), b)
+    weights = np.random.uniform(0.5, 2.0, size=(frames, n))
+
+    # Consistent observations give back the rotation exactly
+    R_opt = quaternion.optimal_rotation(a, b, weights)
+    assert R_opt.shape == (frames,) and R_opt.dtype == np.dtype(np.quaternion)
+    assert np.max(quaternion.rotation_intrinsic_distance(R_opt, R)) < 10*eps
+    assert np.all(quaternion.as_float_array(R_opt)[..., 0] >= 0)
+
+    # Noisy observations agree with the SVD solution of Wahba's problem
+    a = a + 0.2 * np.random.normal(size=a.shape)
+    U, S, Vt = np.linalg.svd(np.einsum('fn,fni,fnj->fij', weights, a, b))
+    D = np.ones((frames, 3))
+    D[:, 2] = np.sign(np.linalg.det(np.matmul(U, Vt)))
+    expected = np.matmul(U * D[:, np.newaxis, :], Vt)
+    out = np.empty(frames, dtype=np.quaternion)
+    assert quaternion.optimal_rotation(a, b, weights, out=out) is out
+    assert np.allclose(quaternion.as_rotation_matrix(out), expected, rtol=0.0, atol=100*eps)
+
+    # Zero weights ignore observations, and leading dimensions broadcast
+    weights[:, -1] = 0.0
+    a[:, -1] = np.random.normal(size=(frames, 3))
+    assert np.allclose(quaternion.as_float_array(quaternion.optimal_rotation(a, b, weights)),
+                       quaternion.as_float_array(quaternion.optimal_rotation(a[:, :-1], b[:, :-1], weights[:, :-1])),
+                       rtol=0.0, atol=100*eps)
+    assert quaternion.optimal_rotation(a[:3, np.newaxis], b[:4], weights[:4]).shape == (3, 4)
+    assert quaternion.optimal_rotation(a[0], b[0]).shape == ()
+
+    # Degenerate problems, where the optimal rotation is not unique, still give an optimal rotation
+    R_opt = quaternion.optimal_rotation([[0.0, 0.0, 2.0]], [[1.0, 0.0, 0.0]])
+    assert np.allclose(quaternion.rotate_vectors(R_opt, [1.0, 0.0, 0.0]), [0.0, 0.0, 1.0], rtol=0.0, atol=10*eps)
+    R_opt = quaternion.optimal_rotation([[0.0, 3.0, 0.0], [0.0, -1.0, 0.0]], [[1.0, 0.0, 0.0], [-2.0, 0.0, 0.0]])
+    assert np.allclose(quaternion.rotate_vectors(R_opt, [1.0, 0.0, 0.0]), [0.0, 1.0, 0.0], rtol=0.0, atol=10*eps)
+    assert quaternion.optimal_rotation(np.zeros((2, 3)), np.zeros((2, 3))) == quaternion.one
+
+    # The result does not depend on the overall scale of the weights or vectors, as long as the products are finite
+    a, b = a[0, :-1], b[0, :-1]
+    R_opt = quaternion.optimal_rotation(a, b)
+    for scale in [1e-300, 1e-200, 1e-60, 1e60, 1e200, 1e300]:
+        assert quaternion.rotation_intrinsic_distance(quaternion.optimal_rotation(a, b, np.full(4, scale)), R_opt) < 10*eps
+    for scale in [1e-150, 1e-100, 1e100, 1e150]:
+        assert quaternion.rotation_intrinsic_distance(quaternion.optimal_rotation(scale*a, scale*b), R_opt) < 10*eps
+    for scale in [1e-200, 1e-170, 1e-160, 1e160, 1e200]:
+        assert quaternion.rotation_intrinsic_distance(quaternion.optimal_rotation(scale*a, b), R_opt) < 10*eps
+        assert quaternion.rotation_intrinsic_distance(quaternion.optimal_rotation(a, scale*b), R_opt) < 10*eps
+        assert quaternion.rotation_intrinsic_distance(quaternion.optimal_rotation(scale*a, b/scale), R_opt) < 10*eps
+    a_nan = a.copy()
+    a_nan[1, 2] = np.nan
+    assert np.isnan(quaternion.optimal_rotation(a_nan, b))
+    with pytest.raises(ValueError):
+        quaternion.optimal_rotation(a[..., :2], b[..., :2])
+
+
+def test_random_rotors_and_perturbations():
+    # Uniform rotors are unit quaternions whose rotation matrices average to zero, and seeds make them reproducible
+    R = quaternion.random_rotors((100000,), rng=1234)
+    assert R.shape == (100000,) and R.dtype == np.dtype(np.quaternion)
+    assert np.allclose(np.abs(R), 1.0, rtol=0.0, atol=10*eps)
+    assert np.allclose(np.mean(quaternion.as_rotation_matrix(R), axis=0), 0.0, rtol=0.0, atol=0.02)
+    assert np.array_equal(quaternion.random_rotors(5, rng=1234), R[:5])
+    # An int seeds a RandomState, so the output does not depend on the numpy version; None uses the global state
+    expected = np.random.RandomState(7).standard_normal(size=(2, 3, 4))
+    expected /= np.sqrt(np.sum(expected**2, axis=-1))[..., np.newaxis]
+    assert np.allclose(quaternion.as_float_array(quaternion.random_rotors((2, 3), rng=7)), expected,
+                       rtol=0.0, atol=10*eps)
+    assert np.array_equal(quaternion.random_rotors((2, 3), rng=np.random.RandomState(7)),
+                          quaternion.random_rotors((2, 3), rng=7))
+    np.random.seed(11)
+    R_global = quaternion.random_rotors((2, 3))
+    np.random.seed(11)
+    assert np.array_equal(quaternion.random_rotors((2, 3)), R_global)
+    if hasattr(np.random, 'default_rng'):
+        out = np.empty((3, 4), dtype=np.quaternion)
+        quaternion.random_rotors(rng=np.random.default_rng(7), out=out.T)
+        assert np.array_equal(out.T, quaternion.random_rotors((4, 3), rng=np.random.default_rng(7)))
+    assert isinstance(quaternion.random_rotors(), quaternion.quaternion)
+    out = np.empty((4, 5), dtype=np.quaternion)
+    assert quaternion.random_rotors(rng=3, out=out) is out
+    assert np.allclose(np.abs(out), 1.0, rtol=0.0, atol=10*eps)
+    with pytest.raises(ValueError):
+        quaternion.random_rotors((3, 4), out=out)
+
+    # The rotation vectors of perturbations relative to the mean have the requested covariance
+    mean = quaternion.random_rotors(rng=5)
+    cov = np.array([[0.01, 0.002, 0.0], [0.002, 0.02, 0.001], [0.0, 0.001, 0.005]])
+    R = quaternion.random_perturbations(mean, cov, 100000, rng=6)
+    assert np.allclose(np.abs(R), 1.0, rtol=0.0, atol=10*eps)
+    v = quaternion.as_rotation_vector(mean.inverse() * R)
+    assert np.allclose(np.mean(v, axis=0), 0.0, rtol=0.0, atol=2e-3)
+    assert np.allclose(np.cov(v.T), cov, rtol=0.0, atol=5e-4)
+    assert np.array_equal(quaternion.random_perturbations(mean, cov, 100000, rng=6), R)
+    v = quaternion.as_rotation_vector(quaternion.random_perturbations(cov=[0.04, 0.0, 0.01], shape=100000, rng=7))
+    assert np.allclose(np.var(v, axis=0), [0.04, 0.0, 0.01], rtol=0.05, atol=0.0)
+    v = quaternion.as_rotation_vector(quaternion.random_perturbations(cov=0.01, shape=100000, rng=8))
+    assert np.allclose(np.cov(v.T), 0.01*np.eye(3), rtol=0.0, atol=5e-4)
+
+    # Means broadcast against the output shape, which defaults to theirs
+    means = quaternion.random_rotors(4, rng=9)
+    assert quaternion.random_perturbations(means, 0.1).shape == (4,)
+    R = quaternion.random_perturbations(means, 0.0, (2, 4))
+    assert np.array_equal(R, np.array([means, means]))
+    out = np.empty((3, 4), dtype=np.quaternion)
+    assert quaternion.random_perturbations(means, 0.1, rng=10, out=out) is out
+    with pytest.raises(ValueError):
+        quaternion.random_perturbations(cov=-1.0)
+    with pytest.raises(ValueError):
+        quaternion.random_perturbations(cov=-np.eye(3))
+    with pytest.raises(ValueError):
+        quaternion.random_perturbations(cov=np.eye(2))
+
+    # The samples are drawn in blocks through reused buffers, which does not change the result
+    means = quaternion.random_rotors((3, 1), rng=11)
+    cases = [(m, c, s) for m, s in [(means, (3, 1000)), (means.T, (1000, 3))] for c in [0.1, cov]]
+    expected = [quaternion.random_perturbations(m, c, s, rng=12) for m, c, s in cases]
+    block_size = quaternion._random_perturbations_block_size
+    try:
+        quaternion._random_perturbations_block_size = 700
+        for (m, c, s), R in zip(cases, expected):
+            assert np.array_equal(quaternion.random_perturbations(m, c, s, rng=12), R)
+    finally:
+        quaternion._random_perturbations_block_size = block_size
+    tracemalloc = pytest.importorskip('tracemalloc')
+    out = np.empty(1000000, dtype=np.quaternion)
+    quaternion.random_perturbations(mean, cov, rng=13, out=out)
+    tracemalloc.start()
+    try:
+        quaternion.random_perturbations(mean, cov, rng=13, out=out)
+        assert tracemalloc.get_traced_memory()[1] < out.nbytes // 4
+    finally:
+        tracemalloc.stop()
+
+
+def test_rotation_grid():
+    n = 2000
+    R = quaternion.rotation_grid(n)
+    assert R.shape == (n,) and R.dtype == np.dtype(np.quaternion)
+    assert np.allclose(np.abs(R), 1.0, rtol=0.0, atol=10*eps)
+    assert np.array_equal(quaternion.rotation_grid(n), R)
+
+    # Points are well separated as rotations, and cover SO(3) evenly
+    separation = np.min(quaternion.pairwise_distance(R, condensed=True))
+    probes = quaternion.random_rotors(5000, rng=1234)
+    coverage = np.max(np.min(quaternion.pairwise_distance(probes, R), axis=1))
+    assert 0.5 * (6 * np.pi / n)**(1/3) < separation
+    assert (6 * np.pi / n)**(1/3) < coverage < 4 * n**(-1/3)
+    assert np.allclose(np.mean(quaternion.as_rotation_matrix(R), axis=0), 0.0, rtol=0.0, atol=0.01)
+
+    # Pieces of the grid match the whole
+    assert np.array_equal(quaternion.rotation_grid(n, 700, 1234), R[700:1234])
+    out = np.empty(100, dtype=np.quaternion)
+    assert quaternion.rotation_grid(n, n - 100, out=out) is out
+    assert np.array_equal(out, R[-100:])
+    rows = []
+    for points, block in quaternion.rotation_grid_chunks(n, chunk_size=384):
+        assert np.array_equal(block, R[points])
+        rows.append(points)
+    assert rows == [slice(i, min(i + 384, n)) for i in range(0, n, 384)]
+    assert quaternion.rotation_grid(0).shape == (0,)
+    assert list(quaternion.rotation_grid_chunks(0)) == []
+    with pytest.raises(ValueError):
+        quaternion.rotation_grid(n, 10, n + 1)
+    with pytest.raises(ValueError):
+        quaternion.rotation_grid(n, 10, 20, out=out)
+
+
 if __name__ == '__main__':
     print("The tests should be run automatically via pytest (`pip install pytest` and then just `pytest`)")
 